@@ -70,7 +70,7 @@ const cargarIndiceTiles = new Promise((resolve, reject) => {
           console.log('✅ Formato tiles clásico detectado');
           for (const key in data.tiles) {
             const tile = data.tiles[key];
-            if (!tile.filename || !tile.bounds || typeof tile.bounds !== 'object') {
+            if ((!tile.filename && !tile.sintetico) || !tile.bounds || typeof tile.bounds !== 'object') {
               throw new Error(`El tile con clave '${key}' no tiene la estructura correcta.`);
             }
           }
@@ -125,38 +125,30 @@ async function cargarDatosElevacion(bounds) {
       return null;
     }
 
+    // Tiles sin dato o constantes: no tienen archivo, se arman desde el índice
+    if (tile.sintetico) {
+      return datosTileSintetico(tile);
+    }
+
     // Construir ruta del tile dependiendo del formato
     let tilePath;
     if (tile.provincia) {
-      // Formato mini-tiles: intentar múltiples URLs
+      // Formato mini-tiles
       console.log(`🗂️ Tile en formato mini-tiles: ${tile.filename} (provincia: ${tile.provincia})`);
       
-      // Primero intentar extraer el tile si es necesario
-      await extractTileIfNeeded(tile);
-      
-        // URLs a intentar en orden de preferencia
-        const urlsToTry = [
-          `Client/Libs/datos_argentina/Altimetria_Mini_Tiles/${tile.provincia}/tiles/${tile.filename}`,
-          `Client/Libs/datos_argentina/Altimetria_Mini_Tiles/${tile.provincia}/${tile.filename}`,
-          `https://cdn.jsdelivr.net/gh/Ehr051/MAIRA@main/Client/Libs/datos_argentina/Altimetria_Mini_Tiles/${tile.provincia}/${tile.filename}`,
-          `https://raw.githubusercontent.com/Ehr051/MAIRA/main/Client/Libs/datos_argentina/Altimetria_Mini_Tiles/${tile.provincia}/${tile.filename}`
-        ];      // Intentar cargar desde cada URL
-      for (const url of urlsToTry) {
-        try {
-          console.log(`📍 Intentando cargar tile desde: ${url}`);
-          const tileData = await loadTileData(url);
-          if (tileData) {
-            console.log(`✅ Tile cargado exitosamente desde: ${url}`);
-            return tileData;
-          }
-        } catch (error) {
-          console.warn(`⚠️ Error cargando desde ${url}:`, error.message);
-          continue;
+      // El servidor lo lee directo de su TAR: un solo request por tile
+      const clave = claveTileElevacion(tile.provincia, tile.tar_file, tile.filename);
+      let tileData = cacheTilesElevacion().get(clave);
+      if (!tileData) {
+        tileData = await loadTileData(urlTileMiniTiles(tile));
+        if (!tileData) {
+          console.error(`❌ No se pudo cargar el tile ${tile.filename} de ${tile.provincia}`);
+          return null;
         }
+        guardarTileElevacion(clave, tileData);
       }
-      
-      console.error(`❌ No se pudo cargar el tile desde ninguna URL para ${tile.filename}`);
-      return null;
+      // Un duplicado usa el archivo de otro tile: la ubicación sale de su propia entrada
+      return tile.duplicado_de ? { ...tileData, ...georreferenciaDesdeBounds(tile.bounds, tileData.width, tileData.height) } : tileData;
     } else {
       // Formato clásico
       tilePath = `${ELEVATION_TILE_FOLDER_PATH}/${tile.filename}`;
@@ -171,6 +163,167 @@ async function cargarDatosElevacion(bounds) {
   }
 }
 
+// Tiepoint/escala (como los de GeoTIFF) de una grilla de width x height sobre los bounds
+function georreferenciaDesdeBounds(bounds, width, height) {
+  return {
+    tiepoint: [0, 0, 0, bounds.west, bounds.north, 0],
+    scale: [(bounds.east - bounds.west) / width, (bounds.north - bounds.south) / height, 0]
+  };
+}
+
+// Datos de un tile sin dato (null) o constante a partir de su entrada del índice
+function datosTileSintetico(tile) {
+  if (tile.sintetico.tipo !== 'constante') {
+    return null;
+  }
+  return {
+    data: new Float32Array(tile.ancho * tile.alto).fill(tile.sintetico.valor),
+    width: tile.ancho,
+    height: tile.alto,
+    ...georreferenciaDesdeBounds(tile.bounds, tile.ancho, tile.alto)
+  };
+}
+
+// Mini-tiles ya decodificados, compartidos por los handlers de elevación (salen primero los más viejos)
+function cacheTilesElevacion() {
+  if (!window.tilesElevacionCache) {
+    window.tilesElevacionCache = new Map();
+  }
+  return window.tilesElevacionCache;
+}
+
+function claveTileElevacion(provincia, tarFile, filename) {
+  return `${provincia}/${tarFile}/${filename}`;
+}
+
+function guardarTileElevacion(clave, tileData) {
+  const cache = cacheTilesElevacion();
+  cache.set(clave, tileData);
+  while (cache.size > 256) {
+    cache.delete(cache.keys().next().value);
+  }
+}
+
+// URL que sirve el mini-tile directamente desde su archivo TAR
+function urlTileMiniTiles(tile) {
+  const tar = tile.tar_file ? `?tar=${encodeURIComponent(tile.tar_file)}` : '';
+  return `/api/tiles/${encodeURIComponent(tile.provincia)}/${encodeURIComponent(tile.filename)}${tar}`;
+}
+
+// Grilla y georreferenciación de un GeoTIFF ya descargado
+async function decodificarTileGeoTIFF(arrayBuffer) {
+  const tiff = await GeoTIFF.fromArrayBuffer(arrayBuffer);
+  const image = await tiff.getImage();
+  const rasters = await image.readRasters();
+  const metadata = await image.getFileDirectory();
+  return {
+    data: rasters[0],
+    width: image.getWidth(),
+    height: image.getHeight(),
+    tiepoint: metadata.ModelTiepoint,
+    scale: metadata.ModelPixelScale,
+  };
+}
+
+// Tiles de mini-tiles (con su provincia) que se superponen con los bounds
+async function buscarTilesEnBounds(bounds) {
+  if (!(elevationTileIndex && elevationTileIndex.provincias)) {
+    return [];
+  }
+  const provincias = new Set([
+    provinciaParaCoordenadas(bounds.north, bounds.west),
+    provinciaParaCoordenadas(bounds.north, bounds.east),
+    provinciaParaCoordenadas(bounds.south, bounds.west),
+    provinciaParaCoordenadas(bounds.south, bounds.east)
+  ]);
+
+  const tiles = [];
+  for (const provincia of provincias) {
+    const provincialTiles = await cargarIndiceProvincial(provincia);
+    for (const tileKey in provincialTiles || {}) {
+      const tile = provincialTiles[tileKey];
+      if (tile.bounds &&
+          tile.bounds.south <= bounds.north && tile.bounds.north >= bounds.south &&
+          tile.bounds.west <= bounds.east && tile.bounds.east >= bounds.west) {
+        tiles.push({ ...tile, provincia, tileKey });
+      }
+    }
+  }
+  return tiles;
+}
+
+// Separa un paquete maira-tiles-v1 de /api/extract-tiles: uint32 big-endian con el
+// largo del manifiesto JSON, el manifiesto y los bytes de cada tile (offset/size
+// relativos al final del manifiesto)
+function leerPaqueteTiles(buffer) {
+  const largo = new DataView(buffer).getUint32(0, false);
+  const manifiesto = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, largo)));
+  if (manifiesto.formato !== 'maira-tiles-v1') {
+    throw new Error(`Formato de paquete desconocido: ${manifiesto.formato}`);
+  }
+  const inicio = 4 + largo;
+  return {
+    faltantes: manifiesto.faltantes || [],
+    tiles: manifiesto.tiles.map(tile => ({
+      ...tile,
+      datos: buffer.slice(inicio + tile.offset, inicio + tile.offset + tile.size)
+    }))
+  };
+}
+
+// Trae con un solo request (/api/extract-tiles, de a 500 tiles) los mini-tiles del
+// área que todavía no están en cache; devuelve cuántos se cargaron
+async function precargarTilesBounds(bounds) {
+  if (!indiceCargado) {
+    await cargarIndiceTiles;
+  }
+
+  const cache = cacheTilesElevacion();
+  const pendientes = new Map();
+  for (const tile of await buscarTilesEnBounds(bounds)) {
+    if (tile.sintetico || !tile.filename || !tile.tar_file) {
+      continue;
+    }
+    const clave = claveTileElevacion(tile.provincia, tile.tar_file, tile.filename);
+    if (!cache.has(clave)) {
+      pendientes.set(clave, { provincia: tile.provincia, tar_filename: tile.tar_file, tile_filename: tile.filename });
+    }
+  }
+
+  const solicitados = [...pendientes.values()];
+  let cargados = 0;
+  for (let i = 0; i < solicitados.length; i += 500) {
+    try {
+      const response = await fetch('/api/extract-tiles', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ tiles: solicitados.slice(i, i + 500) })
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+      const paquete = leerPaqueteTiles(await response.arrayBuffer());
+      for (const tile of paquete.tiles) {
+        guardarTileElevacion(
+          claveTileElevacion(tile.provincia, tile.tar_filename, tile.tile_filename),
+          await decodificarTileGeoTIFF(tile.datos)
+        );
+        cargados++;
+      }
+      if (paquete.faltantes.length) {
+        console.warn(`⚠️ ${paquete.faltantes.length} tiles no disponibles en el servidor`);
+      }
+    } catch (error) {
+      console.error('❌ Error cargando lote de tiles:', error);
+    }
+  }
+
+  if (solicitados.length) {
+    console.log(`📦 Lote de tiles: ${cargados} de ${solicitados.length} cargados en ${Math.ceil(solicitados.length / 500)} request(s)`);
+  }
+  return cargados;
+}
+
 // Función para cargar un archivo GeoTIFF
 async function loadTileData(tilePath) {
   try {
@@ -178,20 +331,9 @@ async function loadTileData(tilePath) {
     if (!response.ok) {
       throw new Error(`Error al cargar el tile: ${tilePath}`);
     }
-    const arrayBuffer = await response.arrayBuffer();
-    const tiff = await GeoTIFF.fromArrayBuffer(arrayBuffer);
-    const image = await tiff.getImage();
-    const rasters = await image.readRasters();
-    const metadata = await image.getFileDirectory();
-
-    console.log(`Tile cargado desde: ${tilePath}`, metadata);
-    return {
-      data: rasters[0],
-      width: image.getWidth(),
-      height: image.getHeight(),
-      tiepoint: metadata.ModelTiepoint,
-      scale: metadata.ModelPixelScale,
-    };
+    const tileData = await decodificarTileGeoTIFF(await response.arrayBuffer());
+    console.log(`Tile cargado desde: ${tilePath}`);
+    return tileData;
   } catch (error) {
     console.error('Error al cargar el archivo GeoTIFF:', error);
     return null;
@@ -230,14 +372,8 @@ async function buscarTileCorrespondiente(bounds) {
   return null;
 }
 
-// Nueva función para buscar tiles en provincias del formato mini-tiles
-async function buscarTileEnProvincias(bounds) {
-  const masterIndex = elevationTileIndex;
-  
-  // Determinar qué provincia puede contener estas coordenadas
-  const lat = (bounds.north + bounds.south) / 2;
-  const lng = (bounds.east + bounds.west) / 2;
-  
+// Provincia de mini-tiles que cubre unas coordenadas
+function provinciaParaCoordenadas(lat, lng) {
   // Lógica simple para determinar provincia basada en coordenadas
   let provinciaTarget = 'centro'; // Buenos Aires está en centro
   
@@ -256,8 +392,11 @@ async function buscarTileEnProvincias(bounds) {
     provinciaTarget = 'centro_norte';
   }
   
-  console.log(`🌍 Buscando en provincia: ${provinciaTarget} para coordenadas lat:${lat.toFixed(3)}, lng:${lng.toFixed(3)}`);
-  
+  return provinciaTarget;
+}
+
+// Tiles del índice de una provincia (se carga una sola vez); null si no se pudo cargar
+async function cargarIndiceProvincial(provinciaTarget) {
   // Cargar índice provincial si no está en cache
   if (!window.provincialIndexes) {
     window.provincialIndexes = {};
@@ -312,8 +451,27 @@ async function buscarTileEnProvincias(bounds) {
     }
   }
   
+  return window.provincialIndexes[provinciaTarget];
+}
+
+// Nueva función para buscar tiles en provincias del formato mini-tiles
+async function buscarTileEnProvincias(bounds) {
+  const masterIndex = elevationTileIndex;
+  
+  // Determinar qué provincia puede contener estas coordenadas
+  const lat = (bounds.north + bounds.south) / 2;
+  const lng = (bounds.east + bounds.west) / 2;
+  
+  const provinciaTarget = provinciaParaCoordenadas(lat, lng);
+  
+  console.log(`🌍 Buscando en provincia: ${provinciaTarget} para coordenadas lat:${lat.toFixed(3)}, lng:${lng.toFixed(3)}`);
+  
+  const provincialTiles = await cargarIndiceProvincial(provinciaTarget);
+  if (!provincialTiles) {
+    return null;
+  }
+  
   // Buscar en el índice provincial
-  const provincialTiles = window.provincialIndexes[provinciaTarget];
   for (const tileKey in provincialTiles) {
     const tile = provincialTiles[tileKey];
     if (!tile.bounds) continue;
@@ -362,6 +520,15 @@ async function procesarElevacionDirecto(puntosInterpolados) {
     // Caché para evitar consultas repetitivas
     const cache = new Map();
     
+    // Los tiles que faltan para todo el recorrido se piden juntos antes de consultar punto por punto
+    if (puntosInterpolados.length && window.elevationHandler?.precargarTilesBounds) {
+        try {
+            await window.elevationHandler.precargarTilesBounds(calcularBoundsRuta(puntosInterpolados));
+        } catch (error) {
+            console.warn('⚠️ No se pudo precargar el lote de tiles:', error);
+        }
+    }
+    
     for (let i = 0; i < puntosInterpolados.length; i++) {
         const punto = puntosInterpolados[i];
         
@@ -542,6 +709,8 @@ async function calcularPerfilElevacion(ruta) {
     
     // ✅ USAR PROCESAMIENTO DIRECTO EN LUGAR DEL WORKER:
     const bounds = calcularBoundsRuta(ruta);
+    // Todos los tiles que cruza la ruta en un solo request; después cada punto sale de la cache
+    await precargarTilesBounds(bounds);
     const datosElevacion = await cargarDatosElevacion(bounds);
 
     if (!datosElevacion) {
@@ -650,41 +819,9 @@ window.elevationHandler = {
   calcularPerfilElevacion,
   obtenerElevacion,
   obtenerEstadoSistema,
+  precargarTilesBounds,
 };
 
-// Función para extraer automáticamente un tile si es necesario
-async function extractTileIfNeeded(tile) {
-  try {
-    if (!tile.tar_file) {
-      // No hay información de archivo TAR, saltar extracción
-      return;
-    }
-    
-    console.log(`🔧 Verificando si necesita extraer: ${tile.filename} desde ${tile.tar_file}`);
-    
-    const response = await fetch('/api/extract-tile', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({
-        provincia: tile.provincia,
-        tile_filename: tile.filename,
-        tar_filename: tile.tar_file
-      })
-    });
-    
-    const result = await response.json();
-    
-    if (result.success) {
-      console.log(`✅ ${result.message}: ${tile.filename}`);
-    } else {
-      console.warn(`⚠️ Error extrayendo tile: ${result.message}`);
-    }
-  } catch (error) {
-    console.error(`❌ Error en extractTileIfNeeded para ${tile.filename}:`, error);
-  }
-}
 
 
 // ✅ ESTRUCTURA MAIRA PARA ELEVACIÓN
@@ -631,6 +631,7 @@ actualizarSidcPorEquipo(caracter) {
     emitirNuevoElemento(elemento) {
         if (this.gestorJuego?.gestorComunicacion?.socket) {
             this.gestorJuego.gestorComunicacion.socket.emit('nuevoElemento', {
+                partidaCodigo: window.codigoPartida,
                 tipo: 'unidad',
                 datos: {
                     id: elemento.options.id,
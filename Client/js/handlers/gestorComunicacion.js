@@ -107,6 +107,7 @@ class GestorComunicacion extends GestorBase {
                         username: window.userName,
                         equipo: window.equipoJugador
                     });
+                    this.unirseEquipo();
 
                     resolve(this.socket);
                 });
@@ -519,6 +520,11 @@ configurarEventosSocket() {
             this.emisorEventos.emit('mensajeJuego', mensaje);
         },
 
+        'nieblaActualizada': (datos) => {
+            this.log('nieblaActualizada recibida:', datos);
+            this.aplicarNiebla(datos);
+        },
+
         'cambioTurno': (datos) => {
             this.log('cambioTurno recibido:', datos);
             this.emisorEventos.emit('cambioTurno', datos);
@@ -547,6 +553,7 @@ configurarEventosSocket() {
         'reconnect': (attemptNumber) => {
             this.log(`Reconexión exitosa, intento: ${attemptNumber}`);
             this.conectado = true;
+            this.unirseEquipo();
             this.intentosReconexion = 0;
             this.emisorEventos.emit('reconexion', attemptNumber);
             // Recuperar estado después de reconectar
@@ -584,6 +591,60 @@ async solicitarEstadoInicial() {
     return true;
 }
 
+// Sala del equipo en la partida: por ahí llegan las unidades propias y los enemigos que se ven
+unirseEquipo() {
+    if (!this.socket || !this.codigoPartida || !window.equipoJugador) return;
+    this.socket.emit('unirseEquipo', {
+        partidaCodigo: this.codigoPartida,
+        equipo: window.equipoJugador
+    });
+}
+
+// Enemigos visibles según la niebla de guerra del servidor: se dibujan los
+// que llegan y se quitan los que dejaron de verse
+aplicarNiebla(datos) {
+    if (datos.equipo !== window.equipoJugador) return;
+    const calco = window.calcoActivo || this.gestorJuego?.gestorMapa?.calcoActivo;
+    if (!calco) return;
+
+    this.enemigosVisibles = this.enemigosVisibles || new Map();
+    const visibles = new Set();
+    (datos.unidades_visibles || []).forEach(unidad => {
+        visibles.add(unidad.id);
+        const posicion = [unidad.lat, unidad.lng];
+        const marcador = this.enemigosVisibles.get(unidad.id);
+        if (marcador) {
+            marcador.setLatLng(posicion);
+            return;
+        }
+        try {
+            const sym = new ms.Symbol(unidad.sidc || 'SHGPU----------', { size: 35 });
+            const nuevo = L.marker(posicion, {
+                icon: L.divIcon({
+                    className: `custom-div-icon equipo-${unidad.equipo}`,
+                    html: sym.asSVG(),
+                    iconSize: [70, 50],
+                    iconAnchor: [35, 25]
+                }),
+                id: unidad.id,
+                equipo: unidad.equipo,
+                nombre: unidad.nombre
+            });
+            calco.addLayer(nuevo);
+            this.enemigosVisibles.set(unidad.id, nuevo);
+        } catch (error) {
+            this.log('Error al dibujar enemigo visible:', error, 'error');
+        }
+    });
+
+    this.enemigosVisibles.forEach((marcador, id) => {
+        if (!visibles.has(id)) {
+            calco.removeLayer(marcador);
+            this.enemigosVisibles.delete(id);
+        }
+    });
+}
+
 // Sincronización de elementos y estado
 sincronizarElemento(datos) {
     if (datos.creadorId === window.userId) return;
@@ -457,10 +457,23 @@ class GestorTurnos extends GestorBase {
         // ✅ VERIFICAR MODO DE JUEGO
         if (this.modoJuego === MODOS_JUEGO.ONLINE && this.socket) {
             // Modo online: notificar al servidor
+            // El servidor lo reenvía a toda la partida (incluido este cliente, que cambia
+            // de turno al recibirlo) y calcula la niebla con las posiciones de las unidades propias
             this.socket.emit('finTurno', {
+                partidaCodigo: window.codigoPartida,
                 jugadorId: jugadorActual.id,
                 turno: this.turnoActual,
-                forzado: forzado
+                forzado: forzado,
+                unidades: this.gestorJuego?.gestorComunicacion?.obtenerEstadoElementos()
+                    .filter(elemento => elemento.propiedades.equipo === window.equipoJugador)
+                    .map(elemento => ({
+                        id: elemento.id,
+                        equipo: elemento.propiedades.equipo,
+                        tipo: elemento.tipo,
+                        sidc: elemento.propiedades.sidc,
+                        nombre: elemento.propiedades.nombre,
+                        posicion: elemento.posicion
+                    })) || []
             });
             console.log('🌐 Fin de turno enviado al servidor');
         } else {
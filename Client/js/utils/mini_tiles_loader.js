@@ -197,6 +197,16 @@ class MiniTilesLoader {
      * Carga interna del tile desde TAR
      */
     async loadTileFromTarInternal(provincia, tileData, cacheKey) {
+        // Tiles sin dato o de valor constante: no están en ningún TAR, el índice trae su valor
+        if (tileData.sintetico) {
+            return {
+                id: tileData.id,
+                bounds: tileData.bounds,
+                sintetico: tileData.sintetico,
+                provincia: provincia
+            };
+        }
+
         try {
             console.log(`📦 Cargando ${tileData.filename} desde ${tileData.tar_file}...`);
             
@@ -210,12 +220,15 @@ class MiniTilesLoader {
             
             console.log(`✅ Tile ${tileData.id} cargado exitosamente`);
             
+            // Un duplicado comparte el archivo de su canónico (y su georreferencia
+            // embebida): hay que ubicarlo con los bounds de esta entrada
             return {
                 id: tileData.id,
                 bounds: tileData.bounds,
                 tarUrl: tarUrl,
                 filename: tileData.filename,
-                provincia: provincia
+                provincia: provincia,
+                duplicado_de: tileData.duplicado_de || null
             };
             
         } catch (error) {
@@ -225,28 +238,114 @@ class MiniTilesLoader {
     }
 
     /**
-     * Pre-carga tiles de una región específica
+     * Pre-carga tiles de una región específica: los que faltan en cache se piden
+     * juntos al servidor (/api/extract-tiles, hasta 500 por request)
      */
     async preloadRegion(bounds) {
         console.log('🔄 Pre-cargando región...', bounds);
+        await this.initialize();
         
         const { north, south, east, west } = bounds;
-        const promises = [];
+        const provincias = new Set([
+            this.getProvinciaForCoordinate(north, west),
+            this.getProvinciaForCoordinate(north, east),
+            this.getProvinciaForCoordinate(south, west),
+            this.getProvinciaForCoordinate(south, east)
+        ]);
 
-        // Pre-cargar tiles en paralelo para la región
-        for (let lat = south; lat <= north; lat += 0.5) {
-            for (let lon = west; lon <= east; lon += 0.5) {
-                promises.push(this.getTile(lat, lon).catch(err => null));
+        // Tiles del área que todavía no están en cache
+        const pendientes = new Map();
+        for (const provincia of provincias) {
+            if (!this.provinciaIndices.has(provincia)) {
+                await this.loadProvinciaIndex(provincia).catch(err => null);
+            }
+            const provinciaIndex = this.provinciaIndices.get(provincia);
+            for (const tileData of Object.values(provinciaIndex?.tiles || {})) {
+                const tb = tileData.bounds;
+                const cacheKey = `${provincia}_${tileData.id}`;
+                if (!tb || tb.south > north || tb.north < south || tb.west > east || tb.east < west ||
+                    this.tileCache.has(cacheKey)) {
+                    continue;
+                }
+                if (tileData.sintetico) {
+                    // No hay nada que descargar: el índice trae el valor
+                    this.tileCache.set(cacheKey, await this.loadTileFromTarInternal(provincia, tileData, cacheKey));
+                } else {
+                    // Los duplicados comparten archivo: se pide una vez y se guarda para cada uno
+                    const archivo = `${provincia}/${tileData.tar_file}/${tileData.filename}`;
+                    if (!pendientes.has(archivo)) pendientes.set(archivo, []);
+                    pendientes.get(archivo).push({ provincia, tileData, cacheKey });
+                }
             }
         }
 
-        const results = await Promise.all(promises);
-        const loadedCount = results.filter(r => r !== null).length;
+        const solicitados = [...pendientes.values()];
+        let loadedCount = 0;
+        for (let i = 0; i < solicitados.length; i += 500) {
+            const lote = solicitados.slice(i, i + 500);
+            try {
+                const response = await fetch('/api/extract-tiles', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        tiles: lote.map(([{ provincia, tileData }]) => ({
+                            provincia,
+                            tar_filename: tileData.tar_file,
+                            tile_filename: tileData.filename
+                        }))
+                    })
+                });
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                }
+                const paquete = this.parseTilesBundle(await response.arrayBuffer());
+                for (const tile of paquete.tiles) {
+                    const entradas = pendientes.get(`${tile.provincia}/${tile.tar_filename}/${tile.tile_filename}`) || [];
+                    for (const pendiente of entradas) {
+                        this.tileCache.set(pendiente.cacheKey, {
+                            id: pendiente.tileData.id,
+                            bounds: pendiente.tileData.bounds,
+                            filename: pendiente.tileData.filename,
+                            provincia: pendiente.provincia,
+                            duplicado_de: pendiente.tileData.duplicado_de || null,
+                            buffer: tile.datos
+                        });
+                        loadedCount++;
+                    }
+                }
+                if (paquete.faltantes.length) {
+                    console.warn(`⚠️ ${paquete.faltantes.length} tiles no disponibles en el servidor`);
+                }
+            } catch (error) {
+                console.error('❌ Error cargando lote de tiles:', error);
+            }
+        }
         
-        console.log(`✅ Pre-carga completada: ${loadedCount} tiles cargados`);
+        console.log(`✅ Pre-carga completada: ${loadedCount} de ${solicitados.length} tiles en ${Math.ceil(solicitados.length / 500)} request(s)`);
         return loadedCount;
     }
 
+    /**
+     * Separa un paquete maira-tiles-v1: uint32 big-endian con el largo del
+     * manifiesto JSON, el manifiesto y los bytes de cada tile (offset/size
+     * relativos al final del manifiesto)
+     */
+    parseTilesBundle(buffer) {
+        const largo = new DataView(buffer).getUint32(0, false);
+        const manifiesto = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, largo)));
+        if (manifiesto.formato !== 'maira-tiles-v1') {
+            throw new Error(`Formato de paquete desconocido: ${manifiesto.formato}`);
+        }
+        const inicio = 4 + largo;
+        return {
+            faltantes: manifiesto.faltantes || [],
+            tiles: manifiesto.tiles.map(tile => ({
+                ...tile,
+                datos: buffer.slice(inicio + tile.offset, inicio + tile.offset + tile.size)
+            }))
+        };
+    }
+
     /**
      * Limpia la cache de tiles
      */
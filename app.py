@@ -9,7 +9,7 @@ import time
 import traceback
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify, send_from_directory
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -28,13 +28,6 @@ def lazy_import_bcrypt():
     import bcrypt
     return bcrypt
 
-def lazy_import_tarfile():
-    """Importar tarfile solo cuando se necesite"""
-    global tarfile, traceback
-    import tarfile
-    import traceback
-    return tarfile, traceback
-
 # Variables globales
 usuarios_conectados = {}  
 operaciones_batalla = {}
@@ -43,12 +36,19 @@ adjuntos_info = {}
 partidas = {}
 user_sid_map = {}
 user_id_sid_map = {} 
+unidades_niebla = {}  # codigo_partida -> {unidad_id: unidad} para la niebla de guerra
 
 # Configuración de Flask
 app = Flask(__name__, static_folder='.')
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
+MAX_TILES_POR_LOTE = 500
+MAX_PUNTOS_MUESTREO = 20000
+MAX_RADIO_CUENCA_M = 50000
+MAX_DISTANCIA_RUTA_M = 150000
+MAX_CONSULTAS_TERRENO = 5000
+MAX_PUNTOS_CONSULTAS = 100000
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1, x_prefix=1)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
@@ -261,42 +261,216 @@ def debug_tables():
 @app.route('/api/proxy/github/<path:file_path>')
 def proxy_github_file(file_path):
     """Proxy para archivos de GitHub Release para evitar CORS"""
-    import requests
+    from flask import Response
+    from werkzeug.wsgi import wrap_file
+    from terrain.github_proxy import cache_github, ArchivoNoEncontrado
     
     try:
-        # URL base del release tiles-v3.0
-        base_url = 'https://github.com/Ehr051/MAIRA/releases/download/tiles-v3.0/'
-        github_url = base_url + file_path
-        
-        # Hacer la request al archivo de GitHub
-        response = requests.get(github_url, stream=True)
-        
-        if response.status_code == 200:
-            # Determinar el content-type basado en la extensión
-            content_type = 'application/octet-stream'
-            if file_path.endswith('.json'):
-                content_type = 'application/json'
-            elif file_path.endswith('.tar.gz'):
-                content_type = 'application/gzip'
-            
-            # Agregar headers CORS
-            headers = {
-                'Content-Type': content_type,
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            }
-            
-            return response.content, 200, headers
-        else:
-            return jsonify({"error": f"File not found: {file_path}"}), 404
-            
+        # Sirve desde la cache en disco (con soporte de Range) o, si hay que descargarlo,
+        # envía cada chunk de GitHub a la vez que lo escribe en la cache
+        ref, contenido = cache_github.abrir(file_path)
+        
+        # Determinar el content-type basado en la extensión
+        content_type = 'application/octet-stream'
+        if file_path.endswith('.json'):
+            content_type = 'application/json'
+        elif file_path.endswith('.tar.gz'):
+            content_type = 'application/gzip'
+        
+        try:
+            if 'sha256' in ref:
+                response = Response(wrap_file(request.environ, contenido), mimetype=content_type, direct_passthrough=True)
+                response.content_length = ref['size']
+                response.set_etag(ref['sha256'][:20])
+                response.cache_control.public = True
+                response.cache_control.max_age = 3600
+                response = response.make_conditional(request, accept_ranges=True, complete_length=ref['size'])
+            else:
+                response = Response(contenido, mimetype=content_type, direct_passthrough=True)
+                if ref['size'] is not None:
+                    response.content_length = ref['size']
+        except Exception:
+            contenido.close()
+            raise
+        
+        # Agregar headers CORS
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Allow-Methods'] = 'GET'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Range'
+        response.headers['Access-Control-Expose-Headers'] = 'Content-Length, Content-Range, ETag'
+        return response
+    
+    except ArchivoNoEncontrado:
+        return jsonify({"error": f"File not found: {file_path}"}), 404
     except Exception as e:
         return jsonify({"error": f"Proxy error: {str(e)}"}), 500
 
+def nombre_seguro(nombre):
+    """True si el nombre es un componente de ruta simple (sin '..' ni separadores)"""
+    return bool(nombre) and secure_filename(nombre) == nombre
+
+def responder_tile(tar_path, tile_filename):
+    """Respuesta HTTP con los bytes del tile leídos directamente del archivo TAR"""
+    from flask import Response
+    from terrain.tiles import leer_tile, etag_tile
+    
+    content_type = 'image/tiff' if tile_filename.lower().endswith(('.tif', '.tiff')) else 'application/octet-stream'
+    response = Response(leer_tile(tar_path, tile_filename), mimetype=content_type)
+    response.set_etag(etag_tile(tar_path, tile_filename))
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response.make_conditional(request)
+
+@app.route('/api/tiles/<provincia>/<path:tile_filename>')
+def servir_tile(provincia, tile_filename):
+    """Servir un mini-tile de altimetría directamente desde su archivo TAR"""
+    from terrain.tiles import ruta_tar_provincia, buscar_tar_tile
+    try:
+        tar_filename = request.args.get('tar') or buscar_tar_tile(provincia, tile_filename)
+        
+        if not nombre_seguro(provincia) or not tar_filename or not nombre_seguro(tar_filename):
+            return jsonify({"success": False, "message": f"Tile {tile_filename} no encontrado"}), 404
+        
+        tar_path = ruta_tar_provincia(provincia, tar_filename)
+        if not os.path.exists(tar_path):
+            return jsonify({"success": False, "message": f"Archivo TAR.GZ no encontrado: {tar_filename}"}), 404
+        
+        return responder_tile(tar_path, tile_filename)
+    
+    except KeyError:
+        return jsonify({"success": False, "message": f"Tile {tile_filename} no encontrado en {tar_filename}"}), 404
+    except Exception as e:
+        print(f"❌ Error sirviendo tile {tile_filename}: {e}")
+        return jsonify({"success": False, "message": f"Error sirviendo tile: {str(e)}"}), 500
+
+def entrada_tile_nivel0(provincia, tile_id, meta):
+    """Entrada del listado de overviews para un mini-tile original (nivel 0)"""
+    entrada = {"id": tile_id, "bounds": meta['bounds']}
+    if meta.get('sintetico'):
+        entrada['sintetico'] = meta['sintetico']
+        return entrada
+    entrada['path'] = f"/api/tiles/{provincia}/{meta['filename']}?tar={meta['tar_file']}"
+    if meta.get('duplicado_de'):
+        entrada['duplicado_de'] = meta['duplicado_de']
+    return entrada
+
+@app.route('/api/tiles/overview/<provincia>')
+def listar_tiles_overview(provincia):
+    """Tiles del nivel de overview adecuado para un zoom (opcionalmente dentro de un bbox)"""
+    from terrain.overview import indice_overviews, nivel_para_zoom, tiles_nivel
+    from terrain.spatial_index import obtener_indice_espacial
+    try:
+        if not nombre_seguro(provincia):
+            return jsonify({"success": False, "message": f"Provincia inválida: {provincia}"}), 400
+        
+        indice = indice_overviews(provincia)
+        if indice is None:
+            return jsonify({"success": False, "message": f"Overviews de {provincia} no disponibles"}), 404
+        
+        bbox = None
+        if request.args.get('bbox'):
+            bbox = tuple(float(v) for v in request.args['bbox'].split(','))
+            if len(bbox) != 4:
+                raise ValueError("bbox debe ser west,south,east,north")
+        
+        if request.args.get('nivel') is not None:
+            nivel = int(request.args['nivel'])
+        else:
+            bounds = indice['bounds']
+            lat = (bbox[1] + bbox[3]) / 2 if bbox else (bounds['south'] + bounds['north']) / 2
+            nivel = nivel_para_zoom(indice, float(request.args.get('zoom', 8)), lat)
+        
+        if nivel == 0:
+            espacial = obtener_indice_espacial()
+            tile_ids = espacial.tiles_en_bbox(*bbox) if bbox else espacial.tile_ids
+            # Los tiles sin dato o constantes no tienen archivo: van con su descripción.
+            # Un duplicado apunta al archivo de su canónico, que trae la georreferencia
+            # del canónico: el cliente lo ubica con los bounds de la entrada
+            tiles = [entrada_tile_nivel0(provincia, tile_id, meta)
+                     for tile_id, meta in ((t, espacial.metadatos_tile(t)) for t in tile_ids)
+                     if meta.get('provincia') == provincia]
+            factor, resolucion = 1, indice['resolucion_base']
+        else:
+            info = indice['niveles'].get(str(nivel))
+            if info is None:
+                return jsonify({"success": False, "message": f"Nivel {nivel} no disponible. Niveles: 0-{len(indice['niveles'])}"}), 404
+            tiles = [
+                {"id": tile['id'], "bounds": tile['bounds'], "path": f"/api/tiles/overview/{provincia}/{tile['filename']}"}
+                for tile in tiles_nivel(provincia, nivel, bbox)
+            ]
+            factor, resolucion = info['factor'], info['resolucion']
+        
+        return jsonify({
+            "success": True,
+            "provincia": provincia,
+            "nivel": nivel,
+            "factor": factor,
+            "resolucion": resolucion,
+            "total": len(tiles),
+            "tiles": tiles
+        })
+    
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error listando overviews de {provincia}: {e}")
+        return jsonify({"success": False, "message": f"Error listando overviews: {str(e)}"}), 500
+
+@app.route('/api/tiles/overview/<provincia>/<path:tile_filename>')
+def servir_tile_overview(provincia, tile_filename):
+    """Servir un tile de un nivel de overview directamente desde su archivo TAR"""
+    from terrain.tiles import ruta_tar_provincia
+    from terrain.overview import buscar_tar_overview
+    try:
+        tar_filename = buscar_tar_overview(provincia, tile_filename) if nombre_seguro(provincia) else None
+        if not tar_filename:
+            return jsonify({"success": False, "message": f"Tile de overview {tile_filename} no encontrado"}), 404
+        
+        return responder_tile(ruta_tar_provincia(provincia, tar_filename), tile_filename)
+    
+    except (KeyError, FileNotFoundError):
+        return jsonify({"success": False, "message": f"Tile de overview {tile_filename} no encontrado"}), 404
+    except Exception as e:
+        print(f"❌ Error sirviendo tile de overview {tile_filename}: {e}")
+        return jsonify({"success": False, "message": f"Error sirviendo tile de overview: {str(e)}"}), 500
+
+@app.route('/api/tiles/vegetacion/<archivo_tar>/<path:tile_filename>')
+def servir_tile_vegetacion(archivo_tar, tile_filename):
+    """Servir un mini-tile de vegetación directamente desde su archivo TAR del CDN"""
+    from terrain.tiles import descargar_tar_vegetacion, ArchivoNoEncontrado
+    try:
+        if not nombre_seguro(archivo_tar):
+            return jsonify({"success": False, "message": f"Archivo TAR inválido: {archivo_tar}"}), 400
+        
+        return responder_tile(descargar_tar_vegetacion(archivo_tar), tile_filename)
+    
+    except ArchivoNoEncontrado:
+        return jsonify({"success": False, "message": f"Archivo TAR de vegetación no encontrado: {archivo_tar}"}), 404
+    except KeyError:
+        return jsonify({"success": False, "message": f"Tile de vegetación {tile_filename} no encontrado en {archivo_tar}"}), 404
+    except Exception as e:
+        print(f"❌ Error sirviendo tile de vegetación {tile_filename}: {e}")
+        return jsonify({"success": False, "message": f"Error sirviendo tile de vegetación: {str(e)}"}), 500
+
+@app.route('/api/cache/tiles')
+def estadisticas_cache_tiles():
+    """Contadores de la cache en memoria de tiles"""
+    from terrain.tiles import cache_tiles, tiles_populares
+    from terrain import sample_cache
+    return jsonify({
+        "success": True,
+        "cache": cache_tiles.estadisticas(),
+        "muestras_elevacion": sample_cache.estadisticas(),
+        "mas_pedidos": [
+            {"archivo": os.path.basename(tar_path), "tile": tile}
+            for tar_path, tile in tiles_populares.mas_pedidos(20)
+        ]
+    })
+
 @app.route('/api/extract-tile', methods=['POST'])
 def extract_tile():
-    """Endpoint para extraer un tile específico desde un archivo TAR.GZ"""
+    """Verifica que un tile exista en su archivo TAR.GZ y devuelve la URL que lo sirve"""
+    from terrain.tiles import ruta_tar_provincia
+    from terrain.archive_index import obtener_indice
     try:
         data = request.json
         provincia = data.get('provincia')
@@ -306,42 +480,86 @@ def extract_tile():
         if not all([provincia, tile_filename, tar_filename]):
             return jsonify({"success": False, "message": "Faltan parámetros requeridos"}), 400
         
-        # Construir rutas
-        base_path = f"mini_tiles_github/{provincia}"
-        tar_path = os.path.join(base_path, tar_filename)
-        tiles_dir = os.path.join(base_path, "tiles")
-        output_path = os.path.join(tiles_dir, tile_filename)
-        
-        # Verificar si el tile ya está extraído
-        if os.path.exists(output_path):
-            return jsonify({"success": True, "message": "Tile ya disponible", "path": f"/{output_path}"})
-        
-        # Crear directorio de tiles si no existe
-        os.makedirs(tiles_dir, exist_ok=True)
+        if not nombre_seguro(provincia) or not nombre_seguro(tar_filename):
+            return jsonify({"success": False, "message": "Parámetros inválidos"}), 400
         
         # Verificar que el archivo TAR.GZ existe
+        tar_path = ruta_tar_provincia(provincia, tar_filename)
         if not os.path.exists(tar_path):
             return jsonify({"success": False, "message": f"Archivo TAR.GZ no encontrado: {tar_path}"}), 404
         
-        # Extraer el tile específico
-        tarfile_lib, traceback_lib = lazy_import_tarfile()
-        with tarfile_lib.open(tar_path, 'r:gz') as tar:
-            try:
-                tar.extract(tile_filename, tiles_dir)
-                return jsonify({
-                    "success": True, 
-                    "message": "Tile extraído exitosamente",
-                    "path": f"/{output_path}"
-                })
-            except KeyError:
-                return jsonify({"success": False, "message": f"Tile {tile_filename} no encontrado en {tar_filename}"}), 404
+        if not obtener_indice(tar_path).contiene(tile_filename):
+            return jsonify({"success": False, "message": f"Tile {tile_filename} no encontrado en {tar_filename}"}), 404
+        
+        # El tile se sirve directamente desde el TAR, sin escribirlo a disco
+        return jsonify({
+            "success": True, 
+            "message": "Tile disponible",
+            "path": f"/api/tiles/{provincia}/{tile_filename}?tar={tar_filename}"
+        })
     
     except Exception as e:
         return jsonify({"success": False, "message": f"Error extrayendo tile: {str(e)}"}), 500
 
+@app.route('/api/extract-tiles', methods=['POST'])
+def extract_tiles():
+    """Extraer varios tiles en un solo request, con una pasada por archivo TAR"""
+    from flask import Response
+    from terrain.tiles import ruta_tar_provincia, leer_tiles, empaquetar_tiles
+    try:
+        data = request.json or {}
+        provincia_default = data.get('provincia')
+        solicitados = data.get('tiles') or []
+        
+        if not solicitados:
+            return jsonify({"success": False, "message": "Parámetro requerido: tiles"}), 400
+        
+        if len(solicitados) > MAX_TILES_POR_LOTE:
+            return jsonify({"success": False, "message": f"Máximo {MAX_TILES_POR_LOTE} tiles por request"}), 400
+        
+        # Agrupar por archivo TAR
+        por_archivo = {}
+        faltantes = []
+        for item in solicitados:
+            provincia = item.get('provincia') or provincia_default
+            tar_filename = item.get('tar_filename')
+            tile_filename = item.get('tile_filename')
+            entrada = {"provincia": provincia, "tar_filename": tar_filename, "tile_filename": tile_filename}
+            
+            if not all([provincia, tar_filename, tile_filename]) or not nombre_seguro(provincia) or not nombre_seguro(tar_filename):
+                faltantes.append(entrada)
+                continue
+            por_archivo.setdefault((provincia, tar_filename), []).append(entrada)
+        
+        tiles = []
+        for (provincia, tar_filename), entradas in por_archivo.items():
+            tar_path = ruta_tar_provincia(provincia, tar_filename)
+            if not os.path.exists(tar_path):
+                faltantes.extend(entradas)
+                continue
+            
+            leidos = leer_tiles(tar_path, [e['tile_filename'] for e in entradas])
+            for entrada in entradas:
+                if entrada['tile_filename'] in leidos:
+                    tiles.append((entrada, leidos[entrada['tile_filename']]))
+                else:
+                    faltantes.append(entrada)
+        
+        print(f"📦 Lote de tiles: {len(tiles)} servidos desde {len(por_archivo)} archivos, {len(faltantes)} faltantes")
+        
+        response = Response(empaquetar_tiles(tiles, faltantes), mimetype='application/octet-stream')
+        response.headers['X-Bundle-Format'] = 'maira-tiles-v1'
+        return response
+    
+    except Exception as e:
+        print(f"❌ Error extrayendo lote de tiles: {e}")
+        return jsonify({"success": False, "message": f"Error extrayendo tiles: {str(e)}"}), 500
+
 @app.route('/extraer_tile_vegetacion', methods=['POST'])
 def extraer_tile_vegetacion():
-    """Extraer un tile específico de vegetación desde archivos TAR.GZ del CDN"""
+    """Verifica un tile de vegetación de los TAR.GZ del CDN y devuelve la URL que lo sirve"""
+    from terrain.tiles import descargar_tar_vegetacion, ArchivoNoEncontrado
+    from terrain.archive_index import obtener_indice
     try:
         data = request.json
         archivo_tar = data.get('archivo_tar')
@@ -350,46 +568,428 @@ def extraer_tile_vegetacion():
         if not archivo_tar or not tile_filename:
             return jsonify({"success": False, "message": "Parámetros requeridos: archivo_tar, tile_filename"}), 400
         
-        # Construir rutas
-        base_path = "https://github.com/Ehr051/MAIRA/releases/download/tiles-v3.0/"
-        tar_url = base_path + archivo_tar
-        tiles_dir = os.path.join("tiles", "vegetacion")
-        output_path = os.path.join(tiles_dir, tile_filename)
-        local_tar_path = os.path.join("temp_extract", archivo_tar)
+        if not nombre_seguro(archivo_tar):
+            return jsonify({"success": False, "message": f"Archivo TAR inválido: {archivo_tar}"}), 400
         
         print(f"🌿 Solicitando tile de vegetación: {tile_filename} desde {archivo_tar}")
         
-        # Verificar si el tile ya está extraído
-        if os.path.exists(output_path):
-            return jsonify({"success": True, "message": "Tile de vegetación ya disponible", "path": f"/{output_path}"})
+        # Descargar el archivo TAR.GZ si no existe localmente
+        local_tar_path = descargar_tar_vegetacion(archivo_tar)
         
-        # Crear directorios si no existen
-        os.makedirs(tiles_dir, exist_ok=True)
-        os.makedirs("temp_extract", exist_ok=True)
+        if not obtener_indice(local_tar_path).contiene(tile_filename):
+            return jsonify({"success": False, "message": f"Tile de vegetación {tile_filename} no encontrado en {archivo_tar}"}), 404
         
-        # Descargar el archivo TAR.GZ si no existe localmente
-        if not os.path.exists(local_tar_path):
-            print(f"📥 Descargando archivo TAR: {tar_url}")
-            import urllib.request
-            urllib.request.urlretrieve(tar_url, local_tar_path)
-        
-        # Extraer el tile específico de vegetación
-        tarfile_lib, traceback_lib = lazy_import_tarfile()
-        with tarfile_lib.open(local_tar_path, 'r:gz') as tar:
-            try:
-                tar.extract(tile_filename, tiles_dir)
-                return jsonify({
-                    "success": True, 
-                    "message": "Tile de vegetación extraído exitosamente",
-                    "path": f"/{output_path}"
-                })
-            except KeyError:
-                return jsonify({"success": False, "message": f"Tile de vegetación {tile_filename} no encontrado en {archivo_tar}"}), 404
+        return jsonify({
+            "success": True, 
+            "message": "Tile de vegetación disponible",
+            "path": f"/api/tiles/vegetacion/{archivo_tar}/{tile_filename}"
+        })
     
+    except ArchivoNoEncontrado:
+        return jsonify({"success": False, "message": f"Archivo TAR de vegetación no encontrado: {archivo_tar}"}), 404
     except Exception as e:
         print(f"❌ Error extrayendo tile de vegetación: {str(e)}")
         return jsonify({"success": False, "message": f"Error extrayendo tile de vegetación: {str(e)}"}), 500
 
+# ==============================================
+# 🗻 ENDPOINTS DE ANÁLISIS DE TERRENO
+# ==============================================
+
+@app.route('/api/elevation/sample', methods=['POST'])
+def muestrear_elevacion():
+    """Elevación en un lote de puntos, por interpolación bilineal sobre los mini-tiles"""
+    from terrain.sampling import parsear_puntos, a_lista
+    from terrain.sample_cache import muestrear_memorizado
+    try:
+        data = request.json or {}
+        puntos = data.get('puntos') or []
+        
+        if not puntos:
+            return jsonify({"success": False, "message": "Parámetro requerido: puntos"}), 400
+        
+        if len(puntos) > MAX_PUNTOS_MUESTREO:
+            return jsonify({"success": False, "message": f"Máximo {MAX_PUNTOS_MUESTREO} puntos por request"}), 400
+        
+        lats, lons = parsear_puntos(puntos)
+        elevaciones = muestrear_memorizado(lats, lons)
+        
+        return jsonify({
+            "success": True,
+            "total": len(puntos),
+            "elevaciones": a_lista(elevaciones)
+        })
+    
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Puntos inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error muestreando elevación: {e}")
+        return jsonify({"success": False, "message": f"Error muestreando elevación: {str(e)}"}), 500
+
+@app.route('/api/elevation/profile', methods=['POST'])
+def perfil_elevacion():
+    """Perfil de elevación de una polilínea densificada cada `espaciado` metros"""
+    from terrain.sampling import parsear_puntos, a_lista
+    from terrain.profile import calcular_perfil, cantidad_puntos
+    try:
+        data = request.json or {}
+        puntos = data.get('puntos') or []
+        espaciado = float(data.get('espaciado', 30))
+        
+        if len(puntos) < 2:
+            return jsonify({"success": False, "message": "Se requieren al menos 2 puntos"}), 400
+        
+        if espaciado < 1:
+            return jsonify({"success": False, "message": "El espaciado mínimo es 1 metro"}), 400
+        
+        lats, lons = parsear_puntos(puntos)
+        if cantidad_puntos(lats, lons, espaciado) > MAX_PUNTOS_MUESTREO:
+            return jsonify({"success": False, "message": f"El perfil supera {MAX_PUNTOS_MUESTREO} puntos; aumenta el espaciado"}), 400
+        
+        perfil = calcular_perfil(lats, lons, espaciado)
+        
+        return jsonify({
+            "success": True,
+            "espaciado": espaciado,
+            "puntos": [[round(float(lat), 7), round(float(lng), 7)] for lat, lng in zip(perfil['lats'], perfil['lons'])],
+            "distancias": a_lista(perfil['distancias'], 1),
+            "elevaciones": a_lista(perfil['elevaciones']),
+            "pendientes": a_lista(perfil['pendientes']),
+            "distancia_total": round(perfil['distancia_total'], 1),
+            "ascenso_acumulado": round(perfil['ascenso_acumulado'], 1),
+            "descenso_acumulado": round(perfil['descenso_acumulado'], 1),
+            "elevacion_min": perfil['elevacion_min'],
+            "elevacion_max": perfil['elevacion_max']
+        })
+    
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error calculando perfil de elevación: {e}")
+        return jsonify({"success": False, "message": f"Error calculando perfil: {str(e)}"}), 500
+
+@app.route('/api/pendiente/<provincia>/<tile_id>')
+def servir_tile_pendiente(provincia, tile_id):
+    """Servir el mini-tile precalculado de pendiente/orientación de un tile de elevación"""
+    from terrain.tiles import ruta_tar_provincia, buscar_tar_tile
+    from terrain.slope import SUFIJO_PENDIENTE
+    try:
+        # Los nombres se validan antes de armar rutas o recorrer índices con ellos
+        if not nombre_seguro(provincia) or not nombre_seguro(tile_id):
+            return jsonify({"success": False, "message": f"Tile de pendiente {tile_id} no encontrado"}), 404
+        
+        tile_filename = f"{tile_id}{SUFIJO_PENDIENTE}.tif"
+        tar_filename = buscar_tar_tile(provincia, tile_filename)
+        if not tar_filename:
+            return jsonify({"success": False, "message": f"Tile de pendiente {tile_id} no encontrado"}), 404
+        
+        return responder_tile(ruta_tar_provincia(provincia, tar_filename), tile_filename)
+    
+    except (KeyError, FileNotFoundError):
+        return jsonify({"success": False, "message": f"Tile de pendiente {tile_id} no encontrado"}), 404
+    except Exception as e:
+        print(f"❌ Error sirviendo tile de pendiente {tile_id}: {e}")
+        return jsonify({"success": False, "message": f"Error sirviendo tile de pendiente: {str(e)}"}), 500
+
+@app.route('/api/pendiente/sample', methods=['POST'])
+def muestrear_pendiente_puntos():
+    """Pendiente y orientación (grados) en un lote de puntos, desde las capas precalculadas"""
+    from terrain.sampling import parsear_puntos, a_lista
+    from terrain.slope import muestrear_pendiente
+    try:
+        data = request.json or {}
+        puntos = data.get('puntos') or []
+        
+        if not puntos:
+            return jsonify({"success": False, "message": "Parámetro requerido: puntos"}), 400
+        
+        if len(puntos) > MAX_PUNTOS_MUESTREO:
+            return jsonify({"success": False, "message": f"Máximo {MAX_PUNTOS_MUESTREO} puntos por request"}), 400
+        
+        lats, lons = parsear_puntos(puntos)
+        pendientes, orientaciones = muestrear_pendiente(lats, lons)
+        
+        return jsonify({
+            "success": True,
+            "total": len(puntos),
+            "pendientes": a_lista(pendientes),
+            "orientaciones": a_lista(orientaciones, 1)
+        })
+    
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Puntos inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error muestreando pendiente: {e}")
+        return jsonify({"success": False, "message": f"Error muestreando pendiente: {str(e)}"}), 500
+
+@app.route('/api/cobertura/clases')
+def clases_cobertura():
+    """Leyenda de las clases de cobertura/ocultamiento (códigos, factores y colores de la paleta)"""
+    from terrain.cover import leyenda
+    return jsonify({"success": True, "clases": leyenda()})
+
+@app.route('/api/cobertura/sample', methods=['POST'])
+def muestrear_cobertura_puntos():
+    """Clase de cobertura y sus factores de protección/ocultamiento en un lote de puntos"""
+    from terrain.sampling import parsear_puntos
+    from terrain.cover import muestrear_cobertura, CLASES_COBERTURA, OCULTAMIENTO, PROTECCION
+    try:
+        data = request.json or {}
+        puntos = data.get('puntos') or []
+        
+        if not puntos:
+            return jsonify({"success": False, "message": "Parámetro requerido: puntos"}), 400
+        
+        if len(puntos) > MAX_PUNTOS_MUESTREO:
+            return jsonify({"success": False, "message": f"Máximo {MAX_PUNTOS_MUESTREO} puntos por request"}), 400
+        
+        lats, lons = parsear_puntos(puntos)
+        clases = muestrear_cobertura(lats, lons)
+        
+        return jsonify({
+            "success": True,
+            "total": len(puntos),
+            "clases": clases.tolist(),
+            "nombres": [CLASES_COBERTURA[int(c)]['nombre'] for c in clases],
+            "ocultamiento": OCULTAMIENTO[clases].tolist(),
+            "proteccion": PROTECCION[clases].tolist()
+        })
+    
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Puntos inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error muestreando cobertura: {e}")
+        return jsonify({"success": False, "message": f"Error muestreando cobertura: {str(e)}"}), 500
+
+@app.route('/api/terreno/linea-vision', methods=['POST'])
+def linea_vision():
+    """Intervisibilidad entre dos puntos sobre el terreno"""
+    from terrain.viewshed import linea_de_vision
+    from terrain.profile import distancia_haversine
+    try:
+        data = request.json or {}
+        origen = data['origen']
+        destino = data['destino']
+        lat1, lon1 = float(origen['lat']), float(origen['lng'])
+        lat2, lon2 = float(destino['lat']), float(destino['lng'])
+        
+        # Mismo alcance que la cuenca visual: más lejos el perfil recorre demasiados tiles
+        if distancia_haversine(lat1, lon1, lat2, lon2) > MAX_RADIO_CUENCA_M:
+            return jsonify({"success": False, "message": f"La distancia máxima entre origen y destino es {MAX_RADIO_CUENCA_M} metros"}), 400
+        
+        resultado = linea_de_vision(
+            lat1, lon1, lat2, lon2,
+            altura_observador=float(data.get('altura_observador', 2.0)),
+            altura_objetivo=float(data.get('altura_objetivo', 0.0))
+        )
+        return jsonify({"success": True, **resultado})
+    
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error calculando línea de visión: {e}")
+        return jsonify({"success": False, "message": f"Error calculando línea de visión: {str(e)}"}), 500
+
+@app.route('/api/terreno/cuenca-visual', methods=['POST'])
+def cuenca_visual_observador():
+    """Raster de visibilidad (viewshed) desde un observador hasta un radio"""
+    from terrain.viewshed import cuenca_visual
+    try:
+        data = request.json or {}
+        radio = float(data.get('radio', 5000))
+        
+        if not 0 < radio <= MAX_RADIO_CUENCA_M:
+            return jsonify({"success": False, "message": f"El radio debe estar entre 0 y {MAX_RADIO_CUENCA_M} metros"}), 400
+        
+        resultado = cuenca_visual(
+            float(data['lat']), float(data['lng']), radio,
+            altura_observador=float(data.get('altura_observador', 2.0)),
+            altura_objetivo=float(data.get('altura_objetivo', 0.0)),
+            resolucion_m=float(data['resolucion']) if data.get('resolucion') else None
+        )
+        
+        if resultado is None:
+            return jsonify({"success": False, "message": "Sin datos de elevación en la posición del observador"}), 404
+        
+        return jsonify({"success": True, **resultado})
+    
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error calculando cuenca visual: {e}")
+        return jsonify({"success": False, "message": f"Error calculando cuenca visual: {str(e)}"}), 500
+
+@app.route('/api/transitabilidad/<tile_id>')
+def transitabilidad_tile_vehiculo(tile_id):
+    """Grilla de transitabilidad de un tile de elevación para una clase de vehículo"""
+    import base64
+    import numpy as np
+    from terrain.transitability import (transitabilidad_tile, velocidad_kmh, codificar_transitabilidad,
+                                        CLASES_VEHICULO, FACTORES_CLIMA, VEHICULO_DEFAULT)
+    try:
+        vehiculo = request.args.get('vehiculo', VEHICULO_DEFAULT)
+        clima = request.args.get('clima', 'clear')
+        
+        if vehiculo not in CLASES_VEHICULO:
+            return jsonify({"success": False, "message": f"Vehículo desconocido: {vehiculo}. Opciones: {', '.join(CLASES_VEHICULO)}"}), 400
+        if clima not in FACTORES_CLIMA:
+            return jsonify({"success": False, "message": f"Clima desconocido: {clima}. Opciones: {', '.join(FACTORES_CLIMA)}"}), 400
+        
+        raster, transitabilidad = transitabilidad_tile(tile_id, vehiculo)
+        transitabilidad = transitabilidad * FACTORES_CLIMA[clima]
+        validos = transitabilidad[np.isfinite(transitabilidad)]
+        
+        return jsonify({
+            "success": True,
+            "tile": tile_id,
+            "vehiculo": vehiculo,
+            "clima": clima,
+            "ancho": raster.ancho,
+            "alto": raster.alto,
+            "bounds": raster.bounds,
+            "geotransform": list(raster.geotransform),
+            "velocidad_base": CLASES_VEHICULO[vehiculo]['velocidad_base'],
+            "transitabilidad_media": round(float(validos.mean()), 4) if len(validos) else None,
+            "velocidad_media": round(float(velocidad_kmh(validos, vehiculo).mean()), 2) if len(validos) else None,
+            # uint8 por celda, filas de norte a sur: 0 = sin dato, 1-255 = transitabilidad 0-1
+            "transitabilidad": base64.b64encode(codificar_transitabilidad(transitabilidad).tobytes()).decode('ascii')
+        })
+    
+    except KeyError:
+        return jsonify({"success": False, "message": f"Tile {tile_id} no encontrado"}), 404
+    except Exception as e:
+        print(f"❌ Error calculando transitabilidad de {tile_id}: {e}")
+        return jsonify({"success": False, "message": f"Error calculando transitabilidad: {str(e)}"}), 500
+
+@app.route('/api/rutas/optima', methods=['POST'])
+def ruta_optima_vehiculo():
+    """Ruta de menor tiempo entre dos puntos según la transitabilidad del vehículo"""
+    from terrain.routing import ruta_optima, RESOLUCION_RUTA_M
+    from terrain.profile import distancia_haversine
+    from terrain.transitability import CLASES_VEHICULO, FACTORES_CLIMA, VEHICULO_DEFAULT
+    try:
+        data = request.json or {}
+        origen = data['origen']
+        destino = data['destino']
+        vehiculo = data.get('vehiculo', VEHICULO_DEFAULT)
+        clima = data.get('clima', 'clear')
+        lat1, lon1 = float(origen['lat']), float(origen['lng'])
+        lat2, lon2 = float(destino['lat']), float(destino['lng'])
+        
+        if vehiculo not in CLASES_VEHICULO:
+            return jsonify({"success": False, "message": f"Vehículo desconocido: {vehiculo}. Opciones: {', '.join(CLASES_VEHICULO)}"}), 400
+        if clima not in FACTORES_CLIMA:
+            return jsonify({"success": False, "message": f"Clima desconocido: {clima}. Opciones: {', '.join(FACTORES_CLIMA)}"}), 400
+        if distancia_haversine(lat1, lon1, lat2, lon2) > MAX_DISTANCIA_RUTA_M:
+            return jsonify({"success": False, "message": f"La distancia máxima entre origen y destino es {MAX_DISTANCIA_RUTA_M} metros"}), 400
+        
+        resultado = ruta_optima(lat1, lon1, lat2, lon2, vehiculo, clima,
+                                resolucion_m=float(data.get('resolucion', RESOLUCION_RUTA_M)))
+        
+        if resultado is None:
+            return jsonify({"success": False, "message": "No hay una ruta transitable entre origen y destino"}), 404
+        
+        return jsonify({"success": True, **resultado})
+    
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error calculando ruta óptima: {e}")
+        return jsonify({"success": False, "message": f"Error calculando ruta: {str(e)}"}), 500
+
+@app.route('/api/terreno/consultas', methods=['POST'])
+def consultas_terreno():
+    """Lote mixto de consultas de terreno (elevación, línea de visión, pendiente, vegetación) en una pasada"""
+    from terrain.batch import resolver_consultas, puntos_estimados
+    try:
+        data = request.json or {}
+        consultas = data.get('consultas') or []
+        
+        if not consultas:
+            return jsonify({"success": False, "message": "Parámetro requerido: consultas"}), 400
+        
+        if len(consultas) > MAX_CONSULTAS_TERRENO:
+            return jsonify({"success": False, "message": f"Máximo {MAX_CONSULTAS_TERRENO} consultas por request"}), 400
+        
+        if puntos_estimados(consultas) > MAX_PUNTOS_CONSULTAS:
+            return jsonify({"success": False, "message": f"El lote supera {MAX_PUNTOS_CONSULTAS} puntos de muestreo; divide las consultas"}), 400
+        
+        return jsonify({
+            "success": True,
+            "total": len(consultas),
+            "resultados": resolver_consultas(consultas)
+        })
+    
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Consultas inválidas: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error resolviendo consultas de terreno: {e}")
+        return jsonify({"success": False, "message": f"Error resolviendo consultas: {str(e)}"}), 500
+
+@app.route('/api/terreno/malla/<tile_id>')
+def malla_terreno(tile_id):
+    """Malla de terreno cuantizada (maira-mesh-v1) de un tile de elevación para la vista 3D"""
+    from flask import Response
+    from terrain.mesh import malla_tile, ERROR_MALLA_M
+    try:
+        nivel = int(request.args.get('nivel', 0))
+        error_max = float(request.args.get('error', ERROR_MALLA_M))
+        
+        if nivel < 0 or error_max < 0:
+            return jsonify({"success": False, "message": "nivel y error deben ser mayores o iguales a 0"}), 400
+        
+        datos, etag = malla_tile(tile_id, nivel, error_max)
+        response = Response(datos, mimetype='application/octet-stream')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        return response.make_conditional(request)
+    
+    except KeyError:
+        return jsonify({"success": False, "message": f"Tile {tile_id} no encontrado en el nivel {request.args.get('nivel', 0)}"}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error generando malla de {tile_id}: {e}")
+        return jsonify({"success": False, "message": f"Error generando malla: {str(e)}"}), 500
+
+@app.route('/api/tiles/resolver', methods=['POST'])
+def resolver_tiles():
+    """Mini-tiles que cubren un lote de puntos, un bbox o una polilínea"""
+    from terrain.spatial_index import obtener_indice_espacial
+    from terrain.sampling import parsear_puntos
+    try:
+        data = request.json or {}
+        indice = obtener_indice_espacial()
+        
+        if data.get('bbox'):
+            west, south, east, north = [float(v) for v in data['bbox']]
+            tile_ids = indice.tiles_en_bbox(west, south, east, north)
+        elif data.get('polilinea'):
+            lats, lons = parsear_puntos(data['polilinea'])
+            tile_ids = indice.tiles_en_polilinea(lats, lons)
+        elif data.get('puntos'):
+            if len(data['puntos']) > MAX_PUNTOS_MUESTREO:
+                return jsonify({"success": False, "message": f"Máximo {MAX_PUNTOS_MUESTREO} puntos por request"}), 400
+            lats, lons = parsear_puntos(data['puntos'])
+            posiciones = indice.resolver_puntos(lons, lats)
+            return jsonify({
+                "success": True,
+                "tiles": [indice.tile_ids[p] if p >= 0 else None for p in posiciones]
+            })
+        else:
+            return jsonify({"success": False, "message": "Parámetro requerido: puntos, bbox o polilinea"}), 400
+        
+        return jsonify({
+            "success": True,
+            "total": len(tile_ids),
+            "tiles": [{"id": tile_id, **indice.metadatos_tile(tile_id)} for tile_id in tile_ids]
+        })
+    
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        print(f"❌ Error resolviendo tiles: {e}")
+        return jsonify({"success": False, "message": f"Error resolviendo tiles: {str(e)}"}), 500
+
 # API Routes
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -1156,6 +1756,7 @@ def cancelar_partida(data):
             cursor.execute("DELETE FROM partidas WHERE id = %s", (partida['id'],))
             
             conn.commit()
+            unidades_niebla.pop(codigo_partida, None)
             
             # Notificar a todos en la sala que la partida fue cancelada
             socketio.emit('partidaCancelada', {
@@ -1230,7 +1831,13 @@ def anunciar_elemento(data):
 @socketio.on('nuevoElemento')
 def nuevo_elemento(data):
     sala = data.get('sala', 'general')
-    emit('elementoCreado', data, room=sala)
+    # Los dibujos y demás elementos que no son unidades van a toda la sala
+    envuelta = isinstance(data.get('datos'), dict)
+    unidad = data['datos'] if envuelta else data
+    if envuelta and data.get('tipo', 'unidad') != 'unidad':
+        unidad = None
+    codigo_partida = data.get('partidaCodigo') or data.get('codigo') or sala_partida_del_emisor()
+    emitir_a_equipo('elementoCreado', data, codigo_partida, unidad, room=sala)
 
 @socketio.on('nuevoInforme')
 def nuevo_informe(data):
@@ -1264,7 +1871,17 @@ def estado_actual(data):
 @socketio.on('unidadDesplegada')
 def unidad_desplegada(data):
     sala = data.get('sala', 'general')
-    emit('unidadDesplegada', data, room=sala)
+    codigo_partida = data.get('partidaCodigo') or data.get('codigo') or sala_partida_del_emisor()
+    emitir_a_equipo('unidadDesplegada', data, codigo_partida, data, room=sala)
+
+@socketio.on('unirseEquipo')
+def unirse_equipo(data):
+    """Sala del equipo en la partida: recibe sólo los enemigos que ve su equipo"""
+    codigo_partida = data.get('partidaCodigo') or data.get('codigo')
+    equipo = data.get('equipo')
+    if codigo_partida and equipo:
+        join_room(sala_equipo(codigo_partida, equipo), sid=request.sid)
+        emit('unidoAEquipo', {'partida_codigo': codigo_partida, 'equipo': equipo})
 
 @socketio.on('crearOperacionGB')
 def crear_operacion_gb(data):
@@ -1569,13 +2186,17 @@ def actualizar_posicion_elemento(data):
             emit('error', {'mensaje': 'Datos incompletos para actualizar posición'})
             return
         
-        # Emitir actualización a otros usuarios en la misma sala
-        emit('posicionActualizada', {
+        actualizacion = {
             'elemento_id': elemento_id,
             'posicion': nueva_posicion,
             'usuario_id': usuario_id,
             'timestamp': data.get('timestamp', datetime.now().isoformat())
-        }, broadcast=True, include_self=False)
+        }
+        
+        # Emitir actualización al equipo de la unidad o, si no es una unidad de partida, a los demás usuarios
+        codigo_partida = data.get('partidaCodigo') or data.get('codigo') or sala_partida_del_emisor()
+        emitir_a_equipo('posicionActualizada', actualizacion, codigo_partida, data,
+                        broadcast=True, include_self=False)
         
         print(f"📍 Posición actualizada - Elemento: {elemento_id}, Usuario: {usuario_id}")
         
@@ -1593,6 +2214,8 @@ def eliminar_elemento(data):
             emit('error', {'mensaje': 'Datos incompletos para eliminar elemento'})
             return
         
+        unidades_niebla.get(data.get('partidaCodigo') or data.get('codigo'), {}).pop(str(elemento_id), None)
+        
         # Emitir eliminación a todos los usuarios
         emit('elementoEliminado', {
             'elemento_id': elemento_id,
@@ -1653,10 +2276,94 @@ def cambio_turno(data):
         
         print(f"✅ Turno actualizado en partida {codigo_partida}")
         
+        actualizar_niebla(codigo_partida, data)
+        
     except Exception as e:
         print(f"❌ Error en cambio de turno: {e}")
         emit('error', {'mensaje': 'Error en cambio de turno'})
 
+@socketio.on('finTurno')
+def fin_turno(data):
+    try:
+        codigo_partida = (data.get('partidaCodigo') or data.get('partida_codigo') or data.get('codigo')
+                          or sala_partida_del_emisor())
+        
+        if not codigo_partida:
+            print("❌ Código de partida faltante en finTurno")
+            return
+        
+        print(f"⏹️ Fin de turno {data.get('turno')} en partida {codigo_partida}")
+        
+        # A toda la sala, emisor incluido: cada cliente avanza su gestor de turnos al recibirlo
+        socketio.emit('finTurno', data, room=codigo_partida)
+        actualizar_niebla(codigo_partida, data)
+        
+    except Exception as e:
+        print(f"❌ Error en fin de turno: {e}")
+        emit('error', {'mensaje': 'Error en fin de turno'})
+
+def sala_equipo(codigo_partida, equipo):
+    return f"{codigo_partida}_{equipo}"
+
+def sala_partida_del_emisor():
+    """Código de la partida del emisor: la sala a la que está unido junto con su chat_<codigo>"""
+    salas = set(rooms())
+    return next((sala for sala in salas if f"chat_{sala}" in salas), None)
+
+def emitir_a_equipo(evento, data, codigo_partida, unidad, include_self=True, **destino):
+    """
+    En una partida las posiciones de una unidad sólo van a la sala de su
+    equipo; los enemigos las reciben con la niebla de guerra, si la ven.
+    Lo que no es una unidad con equipo y posición (dibujos, elementos o
+    clientes sin equipo) o llega fuera de una partida se emite como antes,
+    con `destino` (room= o broadcast=).
+    """
+    from terrain.fog import normalizar_unidad
+    normalizada = normalizar_unidad(unidad) if codigo_partida and isinstance(unidad, dict) else None
+    if normalizada is None:
+        emit(evento, data, include_self=include_self, **destino)
+        return
+    registrar_unidades_niebla(codigo_partida, [unidad])
+    emit(evento, data, room=sala_equipo(codigo_partida, normalizada['equipo']), include_self=include_self)
+
+def registrar_unidades_niebla(codigo_partida, unidades):
+    """Guarda la última posición conocida de las unidades de la partida (las incompletas se ignoran)"""
+    from terrain.fog import normalizar_unidad
+    if not codigo_partida:
+        return
+    registradas = unidades_niebla.setdefault(codigo_partida, {})
+    for datos in unidades or []:
+        unidad = normalizar_unidad(datos) if isinstance(datos, dict) else None
+        if unidad:
+            registradas[unidad['id']] = unidad
+
+def actualizar_niebla(codigo_partida, data):
+    """Calcula qué enemigos ve cada equipo y emite a cada sala de equipo sólo esos"""
+    from terrain.fog import calcular_visibilidad
+    try:
+        registrar_unidades_niebla(codigo_partida, data.get('unidades'))
+        unidades = list(unidades_niebla.get(codigo_partida, {}).values())
+        if not unidades:
+            return
+        
+        inicio = time.time()
+        visibles = calcular_visibilidad(unidades, data.get('clima', 'clear'), data.get('iluminacion', 'day'))
+        por_id = {unidad['id']: unidad for unidad in unidades}
+        
+        for equipo, ids in visibles.items():
+            socketio.emit('nieblaActualizada', {
+                'partida_codigo': codigo_partida,
+                'turno': data.get('turno'),
+                'equipo': equipo,
+                'unidades_visibles': [por_id[unidad_id] for unidad_id in ids],
+                'timestamp': datetime.now().isoformat()
+            }, room=sala_equipo(codigo_partida, equipo))
+        
+        print(f"🌫️ Niebla de guerra de {codigo_partida}: {len(unidades)} unidades en {time.time() - inicio:.2f}s")
+        
+    except Exception as e:
+        print(f"❌ Error calculando niebla de guerra en {codigo_partida}: {e}")
+
 @socketio.on('iniciarCombate')
 def iniciar_combate(data):
     try:
@@ -2703,6 +3410,19 @@ def fix_json_configuracion():
 # CONFIGURACIÓN DE INICIO
 # ==========================================
 
+# Precalentar la cache de tiles con los más pedidos (antes del fork de gunicorn con preload_app)
+from terrain.config import TILE_CACHE_WARMUP
+if TILE_CACHE_WARMUP:
+    from terrain.tiles import precalentar_cache
+    precalentar_cache()
+
+# Construir el índice espacial de mini-tiles al arrancar
+try:
+    from terrain.spatial_index import obtener_indice_espacial
+    obtener_indice_espacial()
+except Exception as e:
+    print(f"⚠️ Índice espacial de mini-tiles no disponible: {e}")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"🚀 Iniciando MAIRA 4.0 en puerto {port}")
@@ -1,16 +1,125 @@
 import rasterio
+import numpy as np
 from rasterio.windows import Window
+from rasterio.coords import BoundingBox
 from rasterio.merge import merge
 from rasterio.warp import reproject, Resampling
 import os
 import json
 import tarfile
+import sys
 import tempfile
 from pathlib import Path
 
+# Pendiente/orientación compartidas con el servidor (terrain/slope.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from terrain.slope import (pendiente_orientacion, agregar_halo, codificar,
+                           NODATA_PENDIENTE, SUFIJO_PENDIENTE)
+from terrain.overview import sumas_iniciales, reducir_2x, promedio, invalidar_overviews
+from terrain.build_manifest import (cargar_manifiesto, guardar_manifiesto, huella_fuente,
+                                    hash_parametros, fuentes_cambiadas, reempaquetar_tar,
+                                    invalidar_tiles_reconstruidos)
+from terrain.tile_dedup import es_sin_dato, valor_constante, hash_contenido, TIPO_SIN_DATO, TIPO_CONSTANTE
+from terrain.tile_store import CAPA_ELEVACION
+
 # Configuración para tiles pequeños
 TILE_SIZE_KM = 25  # Cada tile será de 25x25 km aprox
 MAX_TAR_SIZE_MB = 45  # Límite para GitHub (menos que 50MB para seguridad)
+# Leer cada mini-tile directo de los TIF fuente en lugar de armar un mosaico temporal
+USAR_MOSAICO_VIRTUAL = True
+
+class MosaicoVirtual:
+    """
+    Mosaico de los TIF de una provincia resuelto por ventanas: cada lectura
+    toma los píxeles de los archivos fuente que la cubren, con la misma
+    grilla y prioridad que rasterio.merge (gana el primer archivo con dato).
+    No arma el mosaico en memoria ni lo escribe a disco.
+
+    Expone lo que usan cortar_en_mini_tiles y crear_niveles_overview de un
+    dataset de rasterio (height, width, transform, nodata, profile, bounds, read).
+    Requiere que todos los TIF compartan resolución y estén alineados a la misma grilla.
+    """
+
+    def __init__(self, tif_files):
+        self.fuentes = [rasterio.open(tif) for tif in tif_files]
+        try:
+            primero = self.fuentes[0]
+            res_x, res_y = primero.res
+            oeste = min(f.bounds.left for f in self.fuentes)
+            sur = min(f.bounds.bottom for f in self.fuentes)
+            este = max(f.bounds.right for f in self.fuentes)
+            norte = max(f.bounds.top for f in self.fuentes)
+
+            self.width = int(round((este - oeste) / res_x))
+            self.height = int(round((norte - sur) / res_y))
+            self.transform = rasterio.Affine.translation(oeste, norte) * rasterio.Affine.scale(res_x, -res_y)
+            self.bounds = BoundingBox(oeste, norte - self.height * res_y, oeste + self.width * res_x, norte)
+            self.nodata = primero.nodata
+            self.count = primero.count
+            self.dtype = primero.dtypes[0]
+            self.profile = primero.meta.copy()
+            self.profile.update({
+                'driver': 'GTiff',
+                'height': self.height,
+                'width': self.width,
+                'transform': self.transform
+            })
+
+            # Posición (fila, columna) de cada fuente en la grilla del mosaico
+            self.offsets = []
+            for fuente in self.fuentes:
+                if not np.allclose(fuente.res, primero.res, rtol=1e-6):
+                    raise ValueError(f"{fuente.name} tiene otra resolución ({fuente.res} vs {primero.res})")
+                col = (fuente.bounds.left - oeste) / res_x
+                fila = (norte - fuente.bounds.top) / res_y
+                if abs(col - round(col)) > 1e-3 or abs(fila - round(fila)) > 1e-3:
+                    raise ValueError(f"{fuente.name} no está alineado a la grilla del mosaico")
+                self.offsets.append((int(round(fila)), int(round(col))))
+        except Exception:
+            self.close()
+            raise
+
+    def _validos(self, datos, nodata):
+        if nodata is None:
+            return np.ones(datos.shape, dtype=bool)
+        if np.isnan(nodata):
+            return ~np.isnan(datos)
+        return datos != nodata
+
+    def read(self, indexes=None, window=None):
+        if window is None:
+            window = Window(0, 0, self.width, self.height)
+        fila0, col0 = int(window.row_off), int(window.col_off)
+        alto, ancho = int(window.height), int(window.width)
+        bandas = list(range(1, self.count + 1)) if indexes is None else (
+            [indexes] if isinstance(indexes, int) else list(indexes))
+
+        relleno = self.nodata if self.nodata is not None else 0
+        salida = np.full((len(bandas), alto, ancho), relleno, dtype=self.dtype)
+        escrito = np.zeros(salida.shape, dtype=bool)
+
+        for fuente, (fila_fuente, col_fuente) in zip(self.fuentes, self.offsets):
+            f_a, f_b = max(fila0, fila_fuente), min(fila0 + alto, fila_fuente + fuente.height)
+            c_a, c_b = max(col0, col_fuente), min(col0 + ancho, col_fuente + fuente.width)
+            if f_a >= f_b or c_a >= c_b:
+                continue
+            datos = fuente.read(bandas, window=Window(c_a - col_fuente, f_a - fila_fuente, c_b - c_a, f_b - f_a))
+            region = (slice(None), slice(f_a - fila0, f_b - fila0), slice(c_a - col0, c_b - col0))
+            nuevos = self._validos(datos, fuente.nodata) & ~escrito[region]
+            np.copyto(salida[region], datos, where=nuevos)
+            escrito[region] |= nuevos
+
+        return salida[0] if isinstance(indexes, int) else salida
+
+    def close(self):
+        for fuente in self.fuentes:
+            fuente.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 def calcular_tile_size_pixels(src, tile_size_km):
     """
@@ -31,9 +140,53 @@ def calcular_tile_size_pixels(src, tile_size_km):
     
     return max(pixels_x, pixels_y)  # Usar el mayor para tiles cuadrados
 
-def crear_mini_tiles_provincia(provincia_json_path, tif_files_dir, output_dir):
+def pendiente_codificada(src, window):
     """
-    Toma un JSON de provincia y crea mini-tiles compatibles con GitHub
+    Pendiente/orientación codificadas (int16, 2 bandas) de la ventana, junto
+    con la elevación con halo de la que salen.
+
+    Se lee la ventana con un píxel de halo de los tiles vecinos del mosaico;
+    sólo en el borde del mosaico se replica el borde para completar el halo.
+    """
+    fila0, col0 = window.row_off, window.col_off
+    fila1, col1 = fila0 + window.height, col0 + window.width
+
+    halo_f0, halo_c0 = max(fila0 - 1, 0), max(col0 - 1, 0)
+    halo_f1, halo_c1 = min(fila1 + 1, src.height), min(col1 + 1, src.width)
+    datos = src.read(1, window=Window(halo_c0, halo_f0, halo_c1 - halo_c0, halo_f1 - halo_f0))
+    faltantes = (1 - (fila0 - halo_f0), 1 - (halo_f1 - fila1), 1 - (col0 - halo_c0), 1 - (halo_c1 - col1))
+    datos = agregar_halo(datos, faltantes)
+
+    ventana_halo = Window(col0 - 1, fila0 - 1, window.width + 2, window.height + 2)
+    geotransform = rasterio.windows.transform(ventana_halo, src.transform).to_gdal()
+    pendiente, orientacion = pendiente_orientacion(datos, geotransform, src.nodata)
+    return codificar(pendiente, orientacion), datos
+
+def guardar_tile_pendiente(bandas, profile, tile_path):
+    """Escribe el mini-tile de pendiente/orientación con el perfil del mini-tile de elevación"""
+    profile = profile.copy()
+    profile.update({
+        'count': 2,
+        'dtype': 'int16',
+        'nodata': NODATA_PENDIENTE,
+        'compress': 'lzw'
+    })
+    with rasterio.open(tile_path, 'w', **profile) as dst:
+        dst.write(bandas)
+
+def crear_mini_tiles_provincia(provincia_json_path, tif_files_dir, output_dir, mosaico_virtual=USAR_MOSAICO_VIRTUAL,
+                               incremental=False):
+    """
+    Toma un JSON de provincia y crea mini-tiles compatibles con GitHub.
+
+    Con mosaico_virtual cada mini-tile se lee directo de los TIF fuente
+    (MosaicoVirtual); si no, o si los TIF no comparten grilla, se arma el
+    mosaico temporal con rasterio.merge.
+
+    Cada construcción queda registrada en el manifiesto del directorio de
+    salida. Con incremental, si la provincia no cambió no se hace nada y si
+    cambiaron algunas fuentes sólo se regeneran los mini-tiles que tocan
+    (ver actualizar_provincia).
     """
     
     print(f"🔧 Procesando provincia: {provincia_json_path}")
@@ -74,6 +227,43 @@ def crear_mini_tiles_provincia(provincia_json_path, tif_files_dir, output_dir):
     
     print(f"✅ Encontrados {len(tif_files)} archivos TIF")
     
+    # Huellas de las fuentes y parámetros para el manifiesto de construcción
+    anterior = cargar_manifiesto(output_dir)['grupos'].get(provincia_name, {})
+    fuentes = huellas_fuentes(tif_files, anterior.get('fuentes', {}))
+    parametros = hash_parametros({'tile_size_km': TILE_SIZE_KM, 'max_tar_size_mb': MAX_TAR_SIZE_MB})
+    
+    if incremental and anterior.get('parametros') == parametros:
+        cambiadas = fuentes_cambiadas(anterior.get('fuentes', {}), fuentes)
+        if not cambiadas:
+            print(f"⏭️  {provincia_name} sin cambios en sus fuentes")
+            return
+        print(f"🔁 {provincia_name}: {len(cambiadas)} fuentes nuevas, cambiadas o borradas")
+        zonas = [huella['bounds'] for nombre in cambiadas
+                 for huella in (anterior['fuentes'].get(nombre), fuentes.get(nombre)) if huella]
+        grilla = actualizar_provincia(tif_files, provincia_output_dir, provincia_name, zonas, anterior.get('grilla'))
+        if grilla:
+            registrar_construccion(output_dir, provincia_name, fuentes, parametros, grilla)
+            return
+        print(f"🔄 {provincia_name}: reconstrucción completa")
+    
+    if mosaico_virtual:
+        try:
+            mosaico = MosaicoVirtual(tif_files)
+        except ValueError as e:
+            print(f"⚠️ Mosaico virtual no disponible ({e}), se usa mosaico temporal")
+        except Exception as e:
+            print(f"❌ Error procesando {provincia_name}: {str(e)}")
+            return
+        else:
+            print(f"🧭 Mosaico virtual de {mosaico.width}x{mosaico.height} píxeles sobre {len(tif_files)} archivos")
+            try:
+                grilla = grilla_mosaico(mosaico)
+                cortar_en_mini_tiles(mosaico, provincia_output_dir, provincia_name)
+                registrar_construccion(output_dir, provincia_name, fuentes, parametros, grilla)
+            except Exception as e:
+                print(f"❌ Error procesando {provincia_name}: {str(e)}")
+            return
+    
     # Crear un mosaico temporal de todos los TIF de la provincia
     print("🔄 Creando mosaico temporal...")
     
@@ -112,6 +302,12 @@ def crear_mini_tiles_provincia(provincia_json_path, tif_files_dir, output_dir):
         os.remove(temp_mosaic_path)
         print(f"🧹 Mosaico temporal eliminado")
         
+        registrar_construccion(output_dir, provincia_name, fuentes, parametros, {
+            'transform': list(out_trans)[:6],
+            'ancho': mosaic.shape[2],
+            'alto': mosaic.shape[1]
+        })
+        
     except Exception as e:
         print(f"❌ Error procesando {provincia_name}: {str(e)}")
         # Cerrar archivos si hay error
@@ -121,14 +317,250 @@ def crear_mini_tiles_provincia(provincia_json_path, tif_files_dir, output_dir):
         except:
             pass
 
+def huellas_fuentes(tif_files, anteriores):
+    """Huella de cada TIF fuente (por nombre de archivo), con sus bounds para ubicar los tiles afectados"""
+    fuentes = {}
+    for tif in tif_files:
+        with rasterio.open(tif) as src:
+            bounds = list(src.bounds)
+        nombre = os.path.basename(tif)
+        fuentes[nombre] = huella_fuente(tif, anteriores.get(nombre), bounds=bounds)
+    return fuentes
+
+def grilla_mosaico(src):
+    """Grilla del mosaico: si cambia, los mini-tiles se numeran distinto y hay que reconstruir todo"""
+    return {'transform': list(src.transform)[:6], 'ancho': src.width, 'alto': src.height}
+
+def registrar_construccion(output_dir, provincia_name, fuentes, parametros, grilla):
+    """Guarda en el manifiesto con qué fuentes, parámetros y grilla se construyó la provincia"""
+    manifiesto = cargar_manifiesto(output_dir)
+    manifiesto['grupos'][provincia_name] = {
+        'fuentes': fuentes,
+        'parametros': parametros,
+        'grilla': grilla
+    }
+    guardar_manifiesto(output_dir, manifiesto)
+
+def actualizar_provincia(tif_files, output_dir, provincia_name, zonas, grilla_anterior):
+    """
+    Reconstrucción incremental: con la misma grilla que la construcción
+    anterior, regenera sólo los mini-tiles que tocan las zonas (bounds
+    viejos y nuevos de las fuentes cambiadas). Devuelve la grilla, o None si
+    hace falta una reconstrucción completa.
+    """
+    index_path = os.path.join(output_dir, f"{provincia_name}_mini_tiles_index.json")
+    if not os.path.exists(index_path):
+        return None
+    try:
+        mosaico = MosaicoVirtual(tif_files)
+    except ValueError as e:
+        print(f"⚠️ Mosaico virtual no disponible ({e})")
+        return None
+    
+    with mosaico:
+        grilla = grilla_mosaico(mosaico)
+        if grilla != grilla_anterior:
+            print(f"📐 La grilla de {provincia_name} cambió")
+            return None
+        actualizar_mini_tiles(mosaico, output_dir, provincia_name, zonas)
+    return grilla
+
+def preparar_mini_tile(src, window, output_dir, tile_id, canonicos):
+    """
+    Lee la ventana y decide cómo se guarda el mini-tile:
+    - sin ningún dato, o constante junto con su halo (pendiente nula): no se
+      escribe nada y se devuelve {'sintetico': {...}} para el índice;
+    - con los mismos píxeles que un tile ya guardado (canonicos: hash ->
+      entrada del índice): {'duplicado': entrada, 'hash_contenido': ...};
+    - si no, escribe el mini-tile y su pendiente/orientación y devuelve
+      {'rutas': (mini_tile_path, pendiente_path), 'hash_contenido': ...}.
+    """
+    # Leer datos del tile
+    tile_data = src.read(window=window)
+    if es_sin_dato(tile_data, src.nodata):
+        return {'sintetico': {'tipo': TIPO_SIN_DATO}}
+    
+    pendiente, datos_halo = pendiente_codificada(src, window)
+    valor = valor_constante(datos_halo, src.nodata) if src.count == 1 else None
+    if valor is not None:
+        return {'sintetico': {'tipo': TIPO_CONSTANTE, 'valor': valor, 'dtype': src.profile['dtype']}}
+    
+    contenido = hash_contenido(tile_data, pendiente)
+    if contenido in canonicos:
+        return {'duplicado': canonicos[contenido], 'hash_contenido': contenido}
+    
+    # Crear perfil para el mini-tile
+    profile = src.profile.copy()
+    profile.update({
+        'height': window.height,
+        'width': window.width,
+        'transform': rasterio.windows.transform(window, src.transform)
+    })
+    
+    # Guardar mini-tile
+    mini_tile_path = os.path.join(output_dir, f"{tile_id}.tif")
+    with rasterio.open(mini_tile_path, 'w', **profile) as dst:
+        dst.write(tile_data)
+    
+    # Mini-tile de pendiente/orientación con la misma grilla
+    pendiente_path = os.path.join(output_dir, f"{tile_id}{SUFIJO_PENDIENTE}.tif")
+    guardar_tile_pendiente(pendiente, profile, pendiente_path)
+    
+    return {'rutas': (mini_tile_path, pendiente_path), 'hash_contenido': contenido}
+
+def entrada_mini_tile(tile_id, tile_index, bounds, resultado, tar_file):
+    """Entrada del índice para el resultado de preparar_mini_tile"""
+    tile = {'id': tile_id}
+    if 'sintetico' in resultado:
+        tile['sintetico'] = resultado['sintetico']
+    elif 'duplicado' in resultado:
+        canonico = resultado['duplicado']
+        tile.update({
+            'filename': canonico['filename'],
+            'pendiente_filename': canonico['pendiente_filename'],
+            'duplicado_de': canonico['id']
+        })
+    else:
+        mini_tile_path, pendiente_path = resultado['rutas']
+        tile.update({
+            'filename': os.path.basename(mini_tile_path),
+            'pendiente_filename': os.path.basename(pendiente_path)
+        })
+    
+    tile.update({
+        'bounds': {
+            'west': bounds[0],
+            'south': bounds[1],
+            'east': bounds[2],
+            'north': bounds[3]
+        },
+        'tile_index': tile_index
+    })
+    if 'sintetico' not in resultado:
+        tile['tar_file'] = resultado['duplicado']['tar_file'] if 'duplicado' in resultado else tar_file
+        tile['hash_contenido'] = resultado['hash_contenido']
+    return tile
+
+def resumir_indice(index_data):
+    """Totales del índice de la provincia a partir de sus entradas"""
+    tiles = index_data['tiles'].values()
+    index_data['total_tiles'] = len(index_data['tiles'])
+    index_data['total_tar_files'] = len({t['tar_file'] for t in tiles if t.get('tar_file')})
+    index_data['tiles_sinteticos'] = sum(1 for t in tiles if t.get('sintetico'))
+    index_data['tiles_duplicados'] = sum(1 for t in tiles if t.get('duplicado_de'))
+
+def actualizar_mini_tiles(src, output_dir, provincia_name, zonas):
+    """
+    Regenera los mini-tiles del índice existente que tocan alguna de las zonas
+    (west, south, east, north), reempaqueta sólo los TAR afectados, actualiza
+    sus entradas del índice y rehace los niveles de overview.
+    
+    También se regeneran los duplicados de un tile regenerado, porque su
+    archivo puede cambiar o desaparecer. Un tile que antes no tenía archivo
+    propio (sintético o duplicado) y ahora sí va al último TAR, o a uno
+    nuevo si el último ya llegó al límite de tamaño o de archivos.
+    """
+    index_path = os.path.join(output_dir, f"{provincia_name}_mini_tiles_index.json")
+    with open(index_path, 'r') as f:
+        index_data = json.load(f)
+    tiles = index_data['tiles']
+    
+    # La pendiente lee un píxel de halo: también cuenta lo que cambió justo al lado del tile
+    margen_x, margen_y = abs(src.transform.a), abs(src.transform.e)
+    
+    afectados = set()
+    for tile in tiles.values():
+        b = tile['bounds']
+        if any(b['west'] - margen_x < zona[2] and b['east'] + margen_x > zona[0] and
+               b['south'] - margen_y < zona[3] and b['north'] + margen_y > zona[1] for zona in zonas):
+            afectados.add(tile['id'])
+    afectados |= {tile['id'] for tile in tiles.values() if tile.get('duplicado_de') in afectados}
+    
+    # Tiles con archivo propio que no se tocan: los regenerados pueden repetirlos
+    canonicos = {
+        tile['hash_contenido']: tile for tile in tiles.values()
+        if tile['id'] not in afectados and tile.get('hash_contenido') and not tile.get('duplicado_de')
+    }
+    propios = [t['tar_file'] for t in tiles.values() if t.get('tar_file') and not t.get('duplicado_de')]
+    ultimo_tar = max(propios, default=f"{provincia_name}_part_01.tar.gz")
+    # Lo que ya ocupa el último TAR (MB y archivos), con los mismos límites que cortar_en_mini_tiles
+    ultimo_path = os.path.join(output_dir, ultimo_tar)
+    ocupacion = [os.path.getsize(ultimo_path) / (1024 * 1024) if os.path.exists(ultimo_path) else 0,
+                 2 * propios.count(ultimo_tar)]
+    
+    reemplazos = {}
+    eliminar = {}
+    for tile_id in sorted(afectados, key=lambda t: tiles[t]['tile_index']):
+        anterior = tiles[tile_id]
+        b = anterior['bounds']
+        window = Window(
+            int(round((b['west'] - src.transform.c) / src.transform.a)),
+            int(round((b['north'] - src.transform.f) / src.transform.e)),
+            int(round((b['east'] - b['west']) / margen_x)),
+            int(round((b['north'] - b['south']) / margen_y))
+        )
+        resultado = preparar_mini_tile(src, window, output_dir, tile_id, canonicos)
+        
+        tenia_archivo = anterior.get('tar_file') and not anterior.get('duplicado_de')
+        tar_file = anterior['tar_file'] if tenia_archivo else ultimo_tar
+        if 'rutas' in resultado and not tenia_archivo:
+            # Archivo propio nuevo: al último TAR, o a uno nuevo si ya está lleno
+            if ocupacion[0] >= MAX_TAR_SIZE_MB or ocupacion[1] >= 200:
+                tar_index = int(ultimo_tar[len(f"{provincia_name}_part_"):-len('.tar.gz')]) + 1
+                ultimo_tar = f"{provincia_name}_part_{tar_index:02d}.tar.gz"
+                ocupacion = [0, 0]
+            tar_file = ultimo_tar
+            ocupacion[0] += sum(os.path.getsize(ruta) for ruta in resultado['rutas']) / (1024 * 1024)
+            ocupacion[1] += 2
+        tile = entrada_mini_tile(tile_id, anterior['tile_index'], rasterio.windows.bounds(window, src.transform),
+                                 resultado, tar_file)
+        if 'sintetico' in resultado:
+            tile.update({'ancho': window.width, 'alto': window.height})
+        tiles[tile_id] = tile
+        
+        if 'rutas' in resultado:
+            mini_tile_path, pendiente_path = resultado['rutas']
+            reemplazos.setdefault(tar_file, {}).update({
+                tile['filename']: mini_tile_path,
+                tile['pendiente_filename']: pendiente_path
+            })
+            canonicos[tile['hash_contenido']] = tile
+        elif tenia_archivo:
+            eliminar.setdefault(anterior['tar_file'], set()).update(
+                {anterior['filename'], anterior['pendiente_filename']}
+            )
+    
+    for tar_file in sorted(set(reemplazos) | set(eliminar)):
+        miembros = reemplazos.get(tar_file, {})
+        reempaquetar_tar(os.path.join(output_dir, tar_file), miembros, eliminar.get(tar_file, ()))
+        for ruta in miembros.values():
+            os.remove(ruta)
+        print(f"📦 Reempaquetado: {tar_file} ({len(miembros) // 2} tiles escritos, "
+              f"{len(eliminar.get(tar_file, ())) // 2} quitados)")
+    
+    resumir_indice(index_data)
+    with open(index_path, 'w') as f:
+        json.dump(index_data, f, indent=2)
+    invalidar_tiles_reconstruidos(CAPA_ELEVACION, afectados)
+    
+    print(f"✅ {provincia_name}: {len(afectados)} de {len(tiles)} mini-tiles regenerados, "
+          f"{len(set(reemplazos) | set(eliminar))} archivos TAR reempaquetados")
+    
+    # Los overviews promedian toda la provincia: se rehacen completos
+    crear_niveles_overview(src, output_dir, provincia_name, calcular_tile_size_pixels(src, TILE_SIZE_KM))
+    invalidar_overviews(provincia_name)
+
 def cortar_en_mini_tiles(mosaic_path, output_dir, provincia_name):
     """
-    Corta un mosaico en mini-tiles pequeños
+    Corta un mosaico (ruta a un GeoTIFF o MosaicoVirtual) en mini-tiles pequeños.
+    
+    Los tiles sin dato o constantes quedan sólo en el índice (sintéticos) y
+    los que repiten los píxeles de otro apuntan a su archivo (terrain/tile_dedup.py).
     """
     
     print(f"✂️  Cortando {provincia_name} en mini-tiles de {TILE_SIZE_KM}km...")
     
-    with rasterio.open(mosaic_path) as src:
+    with (rasterio.open(mosaic_path) if isinstance(mosaic_path, str) else mosaic_path) as src:
         # Calcular tamaño de tile en píxeles
         tile_pixels = calcular_tile_size_pixels(src, TILE_SIZE_KM)
         
@@ -138,6 +570,7 @@ def cortar_en_mini_tiles(mosaic_path, output_dir, provincia_name):
         height, width = src.height, src.width
         
         mini_tiles_data = []
+        canonicos = {}
         tile_count = 0
         current_tar_files = []
         current_tar_size = 0
@@ -158,54 +591,29 @@ def cortar_en_mini_tiles(mosaic_path, output_dir, provincia_name):
                 if window.width < tile_pixels // 4 or window.height < tile_pixels // 4:
                     continue
                 
-                # Leer datos del tile
-                tile_data = src.read(window=window)
-                
-                # Verificar que no esté vacío (todos los valores son no-data)
-                if tile_data.size == 0:
-                    continue
-                
-                # Crear perfil para el mini-tile
-                profile = src.profile.copy()
-                profile.update({
-                    'height': window.height,
-                    'width': window.width,
-                    'transform': rasterio.windows.transform(window, src.transform)
-                })
-                
-                # Nombre del archivo
-                mini_tile_filename = f"{provincia_name}_tile_{tile_count:04d}.tif"
-                mini_tile_path = os.path.join(output_dir, mini_tile_filename)
-                
-                # Guardar mini-tile
-                with rasterio.open(mini_tile_path, 'w', **profile) as dst:
-                    dst.write(tile_data)
-                
-                # Calcular bounds geográficos
-                bounds = rasterio.windows.bounds(window, src.transform)
+                # Guardar mini-tile y su pendiente/orientación (salvo sintéticos y duplicados)
+                tile_id = f"{provincia_name}_tile_{tile_count:04d}"
+                resultado = preparar_mini_tile(src, window, output_dir, tile_id, canonicos)
                 
                 # Agregar a metadata
-                mini_tiles_data.append({
-                    'id': f"{provincia_name}_tile_{tile_count:04d}",
-                    'filename': mini_tile_filename,
-                    'bounds': {
-                        'west': bounds[0],
-                        'south': bounds[1], 
-                        'east': bounds[2],
-                        'north': bounds[3]
-                    },
-                    'tile_index': tile_count,
-                    'tar_file': f"{provincia_name}_part_{tar_index:02d}.tar.gz"
-                })
+                tile = entrada_mini_tile(tile_id, tile_count, rasterio.windows.bounds(window, src.transform),
+                                         resultado, f"{provincia_name}_part_{tar_index:02d}.tar.gz")
+                if 'sintetico' in resultado:
+                    tile.update({'ancho': window.width, 'alto': window.height})
+                mini_tiles_data.append(tile)
+                tile_count += 1
                 
-                # Agregar a lista para TAR actual
-                current_tar_files.append(mini_tile_path)
-                current_tar_size += os.path.getsize(mini_tile_path) / (1024 * 1024)  # MB
+                if 'rutas' not in resultado:
+                    continue
+                canonicos[tile['hash_contenido']] = tile
                 
-                tile_count += 1
+                # Agregar a lista para TAR actual
+                mini_tile_path, pendiente_path = resultado['rutas']
+                current_tar_files.extend([mini_tile_path, pendiente_path])
+                current_tar_size += (os.path.getsize(mini_tile_path) + os.path.getsize(pendiente_path)) / (1024 * 1024)  # MB
                 
                 # Si el TAR actual está lleno, crear el archivo
-                if current_tar_size >= MAX_TAR_SIZE_MB or len(current_tar_files) >= 100:
+                if current_tar_size >= MAX_TAR_SIZE_MB or len(current_tar_files) >= 200:
                     crear_tar_file(current_tar_files, output_dir, provincia_name, tar_index)
                     current_tar_files = []
                     current_tar_size = 0
@@ -220,16 +628,193 @@ def cortar_en_mini_tiles(mosaic_path, output_dir, provincia_name):
             'provincia': provincia_name,
             'total_tiles': tile_count,
             'tile_size_km': TILE_SIZE_KM,
-            'total_tar_files': tar_index,
+            'total_tar_files': 0,
             'tiles': {tile['id']: tile for tile in mini_tiles_data}
         }
+        resumir_indice(index_data)
         
         index_path = os.path.join(output_dir, f"{provincia_name}_mini_tiles_index.json")
         with open(index_path, 'w') as f:
             json.dump(index_data, f, indent=2)
         
-        print(f"✅ {provincia_name}: {tile_count} mini-tiles en {tar_index} archivos TAR")
+        print(f"✅ {provincia_name}: {tile_count} mini-tiles en {index_data['total_tar_files']} archivos TAR "
+              f"({index_data['tiles_sinteticos']} sintéticos, {index_data['tiles_duplicados']} duplicados)")
         print(f"📄 Índice guardado: {index_path}")
+        
+        # Niveles reducidos para vistas alejadas
+        crear_niveles_overview(src, output_dir, provincia_name, tile_pixels)
+
+def reducir_franjas(franjas):
+    """
+    Franjas (suma, cuenta) del nivel siguiente: junta de a dos las del nivel
+    anterior y las reduce 2x. Todas las franjas de entrada salvo la última
+    tienen el mismo alto, así cada par empieza en fila par igual que si se
+    redujera el nivel entero.
+    """
+    pendiente = None
+    for suma, cuenta in franjas:
+        if pendiente is None:
+            pendiente = (suma, cuenta)
+            continue
+        yield reducir_2x(np.vstack([pendiente[0], suma]), np.vstack([pendiente[1], cuenta]))
+        pendiente = None
+    if pendiente is not None:
+        yield reducir_2x(*pendiente)
+
+def crear_niveles_overview(src, output_dir, provincia_name, tile_pixels):
+    """
+    Crea los niveles de overview (2x, 4x, 8x...) del mosaico hasta que la
+    provincia entera entra en un solo tile, promediando sólo píxeles con dato.
+    
+    Todos los niveles salen de una sola lectura del mosaico por franjas de
+    2 * tile_pixels filas: cada franja reducida es una fila de tiles de su nivel
+    y, de a dos, la franja del nivel siguiente. En memoria hay a lo sumo un par
+    de franjas por nivel, nunca un nivel completo ni sus sumas.
+    """
+    
+    if max(src.height, src.width) <= tile_pixels:
+        return
+    
+    # Niveles hasta que la provincia entra en un tile (cada nivel mide ceil(n / 2))
+    total_niveles = 1
+    while max(-(-src.height // 2 ** total_niveles), -(-src.width // 2 ** total_niveles)) > tile_pixels:
+        total_niveles += 1
+    
+    dtype = src.profile['dtype']
+    es_entero = np.issubdtype(np.dtype(dtype), np.integer)
+    nodata = src.nodata
+    if nodata is None:
+        nodata = np.iinfo(np.dtype(dtype)).min if es_entero else np.nan
+    
+    tiles_por_nivel = {nivel: {} for nivel in range(1, total_niveles + 1)}
+    tile_paths = []
+    
+    def franjas_nivel_1():
+        franja = 2 * tile_pixels
+        for i in range(0, src.height, franja):
+            datos = src.read(1, window=Window(0, i, src.width, min(franja, src.height - i)))
+            yield reducir_2x(*sumas_iniciales(datos, src.nodata))
+    
+    def escribir_franjas(nivel, franjas):
+        """Escribe la fila de tiles de cada franja del nivel y la deja pasar al siguiente"""
+        nivel_transform = src.transform * rasterio.Affine.scale(2 ** nivel)
+        tiles_nivel = tiles_por_nivel[nivel]
+        fila = 0
+        for suma, cuenta in franjas:
+            nivel_datos = promedio(suma, cuenta)
+            if es_entero:
+                nivel_datos = np.where(np.isnan(nivel_datos), nodata, np.rint(nivel_datos))
+            else:
+                nivel_datos = np.where(np.isnan(nivel_datos), nodata, nivel_datos)
+            nivel_datos = nivel_datos.astype(dtype)
+            
+            alto, ancho = nivel_datos.shape
+            for j in range(0, ancho, tile_pixels):
+                window = Window(j, fila, min(tile_pixels, ancho - j), alto)
+                if np.all(cuenta[:, j:j + window.width] == 0):
+                    continue
+                
+                tile_id = f"{provincia_name}_nivel{nivel}_tile_{len(tiles_nivel):04d}"
+                tile_path = os.path.join(output_dir, f"{tile_id}.tif")
+                profile = src.profile.copy()
+                profile.update({
+                    'height': window.height,
+                    'width': window.width,
+                    'transform': rasterio.windows.transform(window, nivel_transform),
+                    'nodata': nodata,
+                    'compress': 'lzw'
+                })
+                with rasterio.open(tile_path, 'w', **profile) as dst:
+                    dst.write(nivel_datos[:, j:j + window.width], 1)
+                
+                bounds = rasterio.windows.bounds(window, nivel_transform)
+                tiles_nivel[tile_id] = {
+                    'id': tile_id,
+                    'filename': f"{tile_id}.tif",
+                    'bounds': {
+                        'west': bounds[0],
+                        'south': bounds[1],
+                        'east': bounds[2],
+                        'north': bounds[3]
+                    },
+                    'nivel': nivel
+                }
+                tile_paths.append((nivel, tile_path, tiles_nivel[tile_id]))
+            
+            fila += alto
+            yield suma, cuenta
+    
+    # Cadena de niveles: leer el último tira de todos los anteriores franja por franja
+    franjas = escribir_franjas(1, franjas_nivel_1())
+    for nivel in range(2, total_niveles + 1):
+        franjas = escribir_franjas(nivel, reducir_franjas(franjas))
+    for _ in franjas:
+        pass
+    
+    # Los TAR se arman al final, nivel por nivel, con el mismo reparto que si
+    # cada nivel se hubiera generado completo antes del siguiente
+    tile_paths.sort(key=lambda entrada: entrada[0])
+    tar_files = []
+    current_tar_files = []
+    current_tar_size = 0
+    tar_index = 1
+    for nivel, tile_path, tile in tile_paths:
+        tile['tar_file'] = f"{provincia_name}_overview_part_{tar_index:02d}.tar.gz"
+        current_tar_files.append(tile_path)
+        current_tar_size += os.path.getsize(tile_path) / (1024 * 1024)  # MB
+        if current_tar_size >= MAX_TAR_SIZE_MB or len(current_tar_files) >= 100:
+            crear_tar_file(current_tar_files, output_dir, f"{provincia_name}_overview", tar_index)
+            tar_files.append(tar_index)
+            current_tar_files = []
+            current_tar_size = 0
+            tar_index += 1
+    
+    if current_tar_files:
+        crear_tar_file(current_tar_files, output_dir, f"{provincia_name}_overview", tar_index)
+        tar_files.append(tar_index)
+    
+    # Al rehacer los overviews pueden sobrar parts de la construcción anterior
+    prefijo = f"{provincia_name}_overview_part_"
+    for nombre in sorted(os.listdir(output_dir)):
+        if nombre.startswith(prefijo) and nombre.endswith('.tar.gz'):
+            numero = nombre[len(prefijo):-len('.tar.gz')]
+            if numero.isdigit() and int(numero) not in tar_files:
+                os.remove(os.path.join(output_dir, nombre))
+                print(f"🧹 Overview obsoleto eliminado: {nombre}")
+    
+    niveles = {}
+    for nivel, tiles_nivel in tiles_por_nivel.items():
+        factor = 2 ** nivel
+        ancho, alto = -(-src.width // factor), -(-src.height // factor)
+        niveles[str(nivel)] = {
+            'factor': factor,
+            'resolucion': abs((src.transform * rasterio.Affine.scale(factor)).a),
+            'ancho': ancho,
+            'alto': alto,
+            'total_tiles': len(tiles_nivel),
+            'tiles': tiles_nivel
+        }
+        print(f"🔭 Nivel {nivel} ({factor}x): {len(tiles_nivel)} tiles de {ancho}x{alto} píxeles")
+    
+    index_data = {
+        'provincia': provincia_name,
+        'tile_pixels': tile_pixels,
+        'resolucion_base': abs(src.transform.a),
+        'bounds': {
+            'west': src.bounds.left,
+            'south': src.bounds.bottom,
+            'east': src.bounds.right,
+            'north': src.bounds.top
+        },
+        'total_niveles': len(niveles),
+        'total_tar_files': len(tar_files),
+        'niveles': niveles
+    }
+    index_path = os.path.join(output_dir, f"{provincia_name}_overviews_index.json")
+    with open(index_path, 'w') as f:
+        json.dump(index_data, f, indent=2)
+    
+    print(f"📄 Índice de overviews guardado: {index_path}")
 
 def crear_tar_file(tif_files, output_dir, provincia_name, tar_index):
     """
@@ -259,9 +844,10 @@ def crear_tar_file(tif_files, output_dir, provincia_name, tar_index):
     if tar_size > 95:  # Advertencia si está cerca del límite
         print(f"⚠️  ADVERTENCIA: {tar_filename} es grande ({tar_size:.1f} MB)")
 
-def procesar_todas_las_provincias(tif_files_dir):
+def procesar_todas_las_provincias(tif_files_dir, incremental=False):
     """
-    Procesa todas las provincias disponibles
+    Procesa todas las provincias disponibles (con incremental, sólo lo que
+    cambió desde la construcción anterior)
     """
     
     # Directorios (usar rutas relativas desde el script)
@@ -277,6 +863,7 @@ def procesar_todas_las_provincias(tif_files_dir):
     print(f"📁 Salida: {output_dir}")
     print(f"📏 Tamaño de tile: {TILE_SIZE_KM} km")
     print(f"📦 Límite TAR: {MAX_TAR_SIZE_MB} MB")
+    print(f"🔁 Modo: {'incremental' if incremental else 'completo'}")
     print()
     
     # Crear directorio de salida
@@ -311,7 +898,7 @@ def procesar_todas_las_provincias(tif_files_dir):
     for i, json_path in enumerate(json_files, 1):
         print(f"\n📍 [{i}/{len(json_files)}] Procesando: {os.path.basename(json_path)}")
         try:
-            crear_mini_tiles_provincia(json_path, tif_files_dir, output_dir)
+            crear_mini_tiles_provincia(json_path, tif_files_dir, output_dir, incremental=incremental)
             success_count += 1
         except Exception as e:
             print(f"❌ Error en {os.path.basename(json_path)}: {str(e)}")
@@ -360,6 +947,22 @@ def crear_indice_maestro_mini_tiles(output_dir):
                     
                     total_tar_files += provincia_index.get('total_tar_files', 0)
                     
+                    # Niveles de overview, si se generaron
+                    overviews_file = f"{provincia_name}_overviews_index.json"
+                    overviews_path = os.path.join(root, overviews_file)
+                    if os.path.exists(overviews_path):
+                        with open(overviews_path, 'r') as f:
+                            overviews_index = json.load(f)
+                        master_index['provincias'][provincia_name]['overviews'] = {
+                            'index_file': overviews_file,
+                            'niveles': {
+                                nivel: {'factor': info['factor'], 'total_tiles': info['total_tiles']}
+                                for nivel, info in overviews_index.get('niveles', {}).items()
+                            },
+                            'total_tar_files': overviews_index.get('total_tar_files', 0)
+                        }
+                        total_tar_files += overviews_index.get('total_tar_files', 0)
+                    
                 except Exception as e:
                     print(f"⚠️ Error leyendo índice de {provincia_name}: {e}")
     
@@ -387,7 +990,8 @@ if __name__ == "__main__":
     print(f"✅ Usando directorio TIF: {tif_dir}")
     
     if os.path.exists(tif_dir):
-        procesar_todas_las_provincias(tif_dir)
+        # --incremental: regenerar sólo lo que cambió según el manifiesto de construcción
+        procesar_todas_las_provincias(tif_dir, incremental='--incremental' in sys.argv)
     else:
         print("❌ Directorio no encontrado. Extrae primero los archivos TIF.")
         print("💡 Comando sugerido:")
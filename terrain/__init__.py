@@ -0,0 +1,6 @@
+"""
+MAIRA 4.0 - Servicios de terreno del lado del servidor
+
+Acceso a mini-tiles de altimetría y vegetación empaquetados en archivos TAR
+y utilidades asociadas para los endpoints de app.py.
+"""
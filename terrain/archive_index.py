@@ -0,0 +1,152 @@
+"""
+MAIRA 4.0 - Índice de acceso aleatorio para archivos TAR de mini-tiles
+
+Un `.tar.gz` sólo se puede leer de forma secuencial: extraer un miembro
+obliga a descomprimir todo lo que está antes que él. La primera vez que se
+toca un archivo se descomprime a un `.tar` plano (seekable) y se guarda al
+lado una tabla de offsets `miembro -> (offset, tamaño)`. A partir de ahí cada
+tile se sirve con un seek y una lectura acotada.
+"""
+
+import os
+import json
+import gzip
+import shutil
+import tarfile
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+
+class TileArchiveIndex:
+    """Archivo TAR de mini-tiles con tabla de offsets persistente"""
+
+    def __init__(self, archive_path: str):
+        """
+        Args:
+            archive_path: Ruta al archivo `.tar.gz` (o `.tar`) original
+        """
+        self.archive_path = archive_path
+
+        if archive_path.endswith('.gz'):
+            self.seekable_path = archive_path[:-3]
+        else:
+            self.seekable_path = archive_path
+        self.index_path = self.seekable_path + '.idx.json'
+
+        self.miembros: Dict[str, Tuple[int, int]] = {}
+        self._firma: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def firma_origen(self) -> Dict:
+        """Tamaño y mtime del archivo original, para detectar si cambió"""
+        stat = os.stat(self.archive_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def preparar(self) -> 'TileArchiveIndex':
+        """Carga el índice persistido o lo construye si falta o quedó viejo"""
+        firma = self.firma_origen()
+        if self._firma == firma:
+            return self
+
+        with self._lock:
+            if self._firma == firma:
+                return self
+            if not self._cargar(firma):
+                self._construir(firma)
+            self._firma = firma
+        return self
+
+    def _cargar(self, firma: Dict) -> bool:
+        """Lee el índice desde disco si corresponde a la versión actual del archivo"""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.seekable_path)):
+            return False
+        try:
+            with open(self.index_path, 'r') as f:
+                indice = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Índice ilegible {self.index_path}: {e}")
+            return False
+
+        if indice.get('version') != INDEX_VERSION or indice.get('origen') != firma:
+            return False
+
+        self.miembros = {nombre: tuple(pos) for nombre, pos in indice['miembros'].items()}
+        return True
+
+    def _construir(self, firma: Dict):
+        """Descomprime el archivo a un TAR plano y registra los offsets de cada miembro"""
+        logger.info(f"🗂️ Indexando {self.archive_path}...")
+
+        if self.seekable_path != self.archive_path:
+            temp_path = f"{self.seekable_path}.{os.getpid()}.tmp"
+            with gzip.open(self.archive_path, 'rb') as origen, open(temp_path, 'wb') as destino:
+                shutil.copyfileobj(origen, destino, 1024 * 1024)
+            os.replace(temp_path, self.seekable_path)
+
+        miembros = {}
+        with tarfile.open(self.seekable_path, 'r:') as tar:
+            for info in tar:
+                if info.isfile():
+                    miembros[info.name] = (info.offset_data, info.size)
+
+        indice = {
+            'version': INDEX_VERSION,
+            'archivo': os.path.basename(self.archive_path),
+            'origen': firma,
+            'miembros': miembros
+        }
+        temp_index = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_index, 'w') as f:
+            json.dump(indice, f)
+        os.replace(temp_index, self.index_path)
+
+        self.miembros = miembros
+        logger.info(f"✅ {os.path.basename(self.archive_path)}: {len(miembros)} miembros indexados")
+
+    def contiene(self, miembro: str) -> bool:
+        return miembro in self.preparar().miembros
+
+    def nombres(self) -> List[str]:
+        return list(self.preparar().miembros)
+
+    def ubicacion(self, miembro: str) -> Tuple[int, int]:
+        """Offset y tamaño del miembro dentro del TAR plano. KeyError si no existe."""
+        return self.preparar().miembros[miembro]
+
+    def leer_miembro(self, miembro: str) -> bytes:
+        """Lee los bytes de un miembro con un seek y una lectura acotada"""
+        offset, size = self.ubicacion(miembro)
+        with open(self.seekable_path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def leer_miembros(self, miembros: List[str]) -> Dict[str, bytes]:
+        """Lee varios miembros en una sola pasada, en orden de offset. Omite los que no existen."""
+        indice = self.preparar().miembros
+        ubicaciones = sorted((indice[m][0], indice[m][1], m) for m in set(miembros) if m in indice)
+        resultado = {}
+        with open(self.seekable_path, 'rb') as f:
+            for offset, size, miembro in ubicaciones:
+                f.seek(offset)
+                resultado[miembro] = f.read(size)
+        return resultado
+
+
+_indices: Dict[str, TileArchiveIndex] = {}
+_indices_lock = threading.Lock()
+
+
+def obtener_indice(archive_path: str) -> TileArchiveIndex:
+    """Devuelve el índice (compartido por proceso) de un archivo TAR"""
+    clave = os.path.abspath(archive_path)
+    with _indices_lock:
+        indice = _indices.get(clave)
+        if indice is None:
+            indice = TileArchiveIndex(archive_path)
+            _indices[clave] = indice
+    return indice.preparar()
@@ -0,0 +1,147 @@
+"""
+MAIRA 4.0 - Consultas de terreno en lote
+
+Resuelve en una sola llamada un lote mixto de consultas (elevación, línea
+de visión, pendiente y vegetación) de muchas unidades. Los puntos de todas
+las consultas que necesitan elevación se juntan en un único muestreo
+vectorizado; la pendiente, el NDVI y la clase de cobertura se leen de sus
+capas con un muestreo por capa (la pendiente que falta, de un muestreo
+exacto de la elevación en cuatro vecinos).
+"""
+
+import math
+from typing import Dict, List
+
+import numpy as np
+
+from .profile import densificar, distancia_haversine
+from .sampling import muestrear
+from .sample_cache import muestrear_memorizado
+from .slope import muestrear_pendiente, METROS_POR_GRADO
+from .cover import CAPA_NDVI, CLASES_COBERTURA, muestrear_cobertura
+from .viewshed import evaluar_linea, PASO_LOS_M
+
+TIPOS_CONSULTA = ('elevacion', 'linea_vision', 'pendiente', 'vegetacion')
+
+# Paso de las diferencias centradas cuando no hay capa de pendiente precalculada
+PASO_PENDIENTE_M = 30.0
+
+
+def _punto(consulta: Dict, clave: str = None):
+    punto = consulta[clave] if clave else consulta
+    return float(punto['lat']), float(punto['lng'] if 'lng' in punto else punto['lon'])
+
+
+def _puntos(consultas: List[Dict], indices: List[int]):
+    """Arrays (lats, lons) de las consultas puntuales indicadas"""
+    puntos = [_punto(consultas[i]) for i in indices]
+    lats = np.array([p[0] for p in puntos], dtype=np.float64)
+    lons = np.array([p[1] for p in puntos], dtype=np.float64)
+    return lats, lons
+
+
+def _redondear(valor: float, decimales: int = 2):
+    return round(float(valor), decimales) if np.isfinite(valor) else None
+
+
+def _pendiente_por_diferencias(este, oeste, norte, sur):
+    """Pendiente/orientación (grados) por diferencias centradas a PASO_PENDIENTE_M"""
+    gradiente_este = (este - oeste) / (2 * PASO_PENDIENTE_M)
+    gradiente_norte = (norte - sur) / (2 * PASO_PENDIENTE_M)
+    pendiente = np.degrees(np.arctan(np.hypot(gradiente_este, gradiente_norte)))
+    orientacion = np.degrees(np.arctan2(-gradiente_este, -gradiente_norte)) % 360
+    orientacion[(gradiente_este == 0) & (gradiente_norte == 0)] = np.nan
+    return pendiente, orientacion
+
+
+def resolver_consultas(consultas: List[Dict]) -> List[Dict]:
+    """
+    Resultados en el mismo orden que las consultas. Cada consulta es un dict
+    con 'tipo' y sus parámetros; 'id' (opcional) se devuelve tal cual.
+    ValueError si hay un tipo desconocido; KeyError si faltan parámetros.
+    """
+    resultados: List[Dict] = []
+    por_tipo: Dict[str, List[int]] = {tipo: [] for tipo in TIPOS_CONSULTA}
+    for i, consulta in enumerate(consultas):
+        tipo = consulta.get('tipo')
+        if tipo not in por_tipo:
+            raise ValueError(f"tipo de consulta desconocido: {tipo}")
+        por_tipo[tipo].append(i)
+        resultado = {'tipo': tipo}
+        if 'id' in consulta:
+            resultado['id'] = consulta['id']
+        resultados.append(resultado)
+
+    # Pendiente desde la capa precalculada; lo que falte se deriva de la elevación
+    lats_pendiente, lons_pendiente = _puntos(consultas, por_tipo['pendiente'])
+    pendientes, orientaciones = np.zeros(0), np.zeros(0)
+    if len(lats_pendiente):
+        pendientes, orientaciones = muestrear_pendiente(lats_pendiente, lons_pendiente)
+    sin_capa = np.nonzero(~np.isfinite(pendientes))[0]
+
+    # Todos los puntos que necesitan elevación, en un solo muestreo
+    lats_elevacion, lons_elevacion = _puntos(consultas, por_tipo['elevacion'])
+    lats, lons = [lats_elevacion], [lons_elevacion]
+
+    lineas = []
+    for i in por_tipo['linea_vision']:
+        lat1, lon1 = _punto(consultas[i], 'origen')
+        lat2, lon2 = _punto(consultas[i], 'destino')
+        lats_linea, lons_linea, distancias = densificar([lat1, lat2], [lon1, lon2], PASO_LOS_M)
+        lineas.append((lats_linea, lons_linea, distancias))
+        lats.append(lats_linea)
+        lons.append(lons_linea)
+
+    elevaciones = muestrear_memorizado(np.concatenate(lats), np.concatenate(lons))
+
+    for k, i in enumerate(por_tipo['elevacion']):
+        resultados[i]['elevacion'] = _redondear(elevaciones[k])
+    cursor = len(por_tipo['elevacion'])
+
+    for i, (lats_linea, lons_linea, distancias) in zip(por_tipo['linea_vision'], lineas):
+        consulta = consultas[i]
+        tramo = elevaciones[cursor:cursor + len(lats_linea)]
+        cursor += len(lats_linea)
+        resultados[i].update(evaluar_linea(
+            lats_linea, lons_linea, distancias, tramo,
+            float(consulta.get('altura_observador', 2.0)), float(consulta.get('altura_objetivo', 0.0))
+        ))
+
+    if len(sin_capa):
+        # Sin cuantizar: a 1/4 de píxel los vecinos a PASO_PENDIENTE_M se correrían
+        # varios metros y la pendiente saldría sesgada
+        lat_s, lon_s = lats_pendiente[sin_capa], lons_pendiente[sin_capa]
+        d_lat = PASO_PENDIENTE_M / METROS_POR_GRADO
+        d_lon = PASO_PENDIENTE_M / (METROS_POR_GRADO * np.cos(np.radians(lat_s)))
+        # Orden: este, oeste, norte, sur
+        vecinos = muestrear(np.concatenate([lat_s, lat_s, lat_s + d_lat, lat_s - d_lat]),
+                            np.concatenate([lon_s + d_lon, lon_s - d_lon, lon_s, lon_s]))
+        este, oeste, norte, sur = vecinos.reshape(4, len(sin_capa))
+        pendientes[sin_capa], orientaciones[sin_capa] = _pendiente_por_diferencias(este, oeste, norte, sur)
+
+    for k, i in enumerate(por_tipo['pendiente']):
+        resultados[i]['pendiente'] = _redondear(pendientes[k])
+        resultados[i]['orientacion'] = _redondear(orientaciones[k], 1)
+
+    if por_tipo['vegetacion']:
+        lats_vegetacion, lons_vegetacion = _puntos(consultas, por_tipo['vegetacion'])
+        ndvi = muestrear(lats_vegetacion, lons_vegetacion, CAPA_NDVI, interpolar=False) / 255.0
+        clases = muestrear_cobertura(lats_vegetacion, lons_vegetacion)
+        for k, i in enumerate(por_tipo['vegetacion']):
+            resultados[i]['ndvi'] = _redondear(ndvi[k], 3)
+            resultados[i]['cobertura'] = CLASES_COBERTURA[int(clases[k])]['nombre']
+
+    return resultados
+
+
+def puntos_estimados(consultas: List[Dict]) -> int:
+    """Cantidad aproximada de puntos a muestrear (para validar antes de resolver)"""
+    total = 0
+    for consulta in consultas:
+        if consulta.get('tipo') == 'linea_vision':
+            lat1, lon1 = _punto(consulta, 'origen')
+            lat2, lon2 = _punto(consulta, 'destino')
+            total += 2 + math.ceil(float(distancia_haversine(lat1, lon1, lat2, lon2)) / PASO_LOS_M)
+        else:
+            total += 5
+    return total
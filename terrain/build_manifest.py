@@ -0,0 +1,128 @@
+"""
+MAIRA 4.0 - Manifiesto de construcción para reconstrucciones incrementales
+
+scripts/crear_mini_tiles.py y tools/vegetation_tile_processor.py guardan en
+su directorio de salida un `build_manifest.json` con, por provincia o
+región, la huella (sha256, tamaño y fecha) de cada TIF fuente y el hash de
+los parámetros con que se procesó. En modo incremental se compara contra
+las fuentes actuales y sólo se regeneran los tiles que dependen de fuentes
+nuevas, cambiadas o borradas; los TAR afectados se reempaquetan en su lugar.
+
+El sha256 de un archivo sólo se recalcula si cambiaron su tamaño o su fecha.
+"""
+
+import os
+import json
+import hashlib
+import tarfile
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_MANIFIESTO = 'build_manifest.json'
+VERSION_MANIFIESTO = 1
+
+
+def hash_archivo(ruta: str, bloque: int = 1 << 20) -> str:
+    """sha256 del contenido del archivo, leído por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for datos in iter(lambda: f.read(bloque), b''):
+            h.update(datos)
+    return h.hexdigest()
+
+
+def huella_fuente(ruta: str, anterior: Optional[Dict] = None, **extra) -> Dict:
+    """
+    Huella de un TIF fuente {sha256, tamaño, mtime_ns, ...extra}. Si tamaño y
+    fecha coinciden con la huella anterior se reutiliza su sha256.
+    """
+    st = os.stat(ruta)
+    if anterior and anterior.get('tamaño') == st.st_size and anterior.get('mtime_ns') == st.st_mtime_ns:
+        sha256 = anterior['sha256']
+    else:
+        sha256 = hash_archivo(ruta)
+    return {'sha256': sha256, 'tamaño': st.st_size, 'mtime_ns': st.st_mtime_ns, **extra}
+
+
+def hash_parametros(parametros: Dict) -> str:
+    """Hash estable de los parámetros de procesamiento (si cambia, se reconstruye todo)"""
+    return hashlib.sha256(json.dumps(parametros, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def cargar_manifiesto(output_dir: str) -> Dict:
+    """Manifiesto del directorio de salida (vacío si no existe o es de otra versión)"""
+    ruta = os.path.join(output_dir, NOMBRE_MANIFIESTO)
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        if manifiesto.get('version') == VERSION_MANIFIESTO:
+            return manifiesto
+        logger.warning(f"⚠️ Manifiesto {ruta} de otra versión, se ignora")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ No se pudo leer el manifiesto {ruta}: {e}")
+    return {'version': VERSION_MANIFIESTO, 'grupos': {}}
+
+
+def guardar_manifiesto(output_dir: str, manifiesto: Dict):
+    """Escribe el manifiesto a un temporal y lo renombra (nunca queda a medio escribir)"""
+    ruta = os.path.join(output_dir, NOMBRE_MANIFIESTO)
+    manifiesto['generado'] = datetime.now().isoformat()
+    temp_path = f"{ruta}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, ruta)
+
+
+def fuentes_cambiadas(anteriores: Dict[str, Dict], actuales: Dict[str, Dict]) -> Set[str]:
+    """Nombres de las fuentes nuevas, borradas o con otro contenido"""
+    return {
+        nombre for nombre in set(anteriores) | set(actuales)
+        if (anteriores.get(nombre) or {}).get('sha256') != (actuales.get(nombre) or {}).get('sha256')
+    }
+
+
+def reempaquetar_tar(tar_path: str, reemplazos: Dict[str, str], eliminar: Iterable[str] = (),
+                     compresslevel: int = 9):
+    """
+    Reescribe un TAR.GZ cambiando sólo algunos miembros: los de `reemplazos`
+    (arcname -> archivo local) se reemplazan o se agregan al final y los de
+    `eliminar` se quitan; el resto se copia tal cual en el mismo orden. El
+    archivo nuevo reemplaza al anterior recién cuando está completo.
+    """
+    eliminar = set(eliminar)
+    temp_path = f"{tar_path}.{os.getpid()}.tmp"
+    try:
+        with tarfile.open(temp_path, 'w:gz', compresslevel=compresslevel) as destino:
+            if os.path.exists(tar_path):
+                with tarfile.open(tar_path, 'r:gz') as origen:
+                    for miembro in origen:
+                        if miembro.name in reemplazos or miembro.name in eliminar:
+                            continue
+                        destino.addfile(miembro, origen.extractfile(miembro) if miembro.isfile() else None)
+            for arcname, ruta in reemplazos.items():
+                destino.add(ruta, arcname=arcname)
+        os.replace(temp_path, tar_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def invalidar_tiles_reconstruidos(capa: str, tile_ids: Iterable[str]):
+    """
+    Descarta, en este proceso, las muestras memorizadas de los tiles
+    reconstruidos y el índice espacial de la capa, para que una
+    reconstrucción hecha dentro del servidor no siga sirviendo valores viejos.
+    """
+    from .sample_cache import invalidar_tile
+    from .spatial_index import invalidar_indice_espacial
+    from .tile_store import obtener_store
+
+    for tile_id in tile_ids:
+        invalidar_tile(tile_id, capa)
+    obtener_store(capa).olvidar()
+    invalidar_indice_espacial(capa)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+MAIRA 4.0 - Construcción del store de mini-tiles pre-decodificados
+
+Recorre los archivos TAR generados por scripts/crear_mini_tiles.py (o por
+tools/vegetation_tile_processor.py), decodifica cada GeoTIFF una sola vez y
+lo escribe como `.npy` + cabecera JSON en el store. Los tiles de pendiente
+(`*_pendiente.tif`) se separan en las capas 'pendiente' y 'orientacion', los
+de clases de cobertura del NDVI (`*_cobertura.tif`) van a 'cobertura' y los
+niveles de overview a 'elevacion_nivel1', 'elevacion_nivel2', etc.
+
+La elevación (y sus niveles de overview) se guarda en int16, en metros
+enteros.
+
+Los tiles que el índice JSON marca como constantes o duplicados no están en
+los TAR (ver terrain/tile_dedup.py): se materializan en el store a partir
+de su entrada, con la georreferenciación de sus propios bounds. Los tiles
+sin dato no se escriben.
+
+Uso:
+    python -m terrain.build_store --input mini_tiles_github --output tile_store
+    python -m terrain.build_store -i vegetation_mini_tiles -o tile_store --capa ndvi
+"""
+
+import os
+import re
+import sys
+import json
+import tarfile
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from .tile_store import CAPA_ELEVACION, RasterTileStore, a_int16, guardar_tile, guardar_indice
+from .slope import SUFIJO_PENDIENTE, CAPA_PENDIENTE, CAPA_ORIENTACION, NODATA_PENDIENTE
+from .cover import CAPA_NDVI, CAPA_COBERTURA, SUFIJO_COBERTURA, SIN_DATO
+from .tile_dedup import TIPO_CONSTANTE, geotransform_de_bounds
+from .build_manifest import invalidar_tiles_reconstruidos
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='🗺️ %(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# <provincia>_nivel<n>_tile_NNNN.tif: tiles de los niveles de overview
+PATRON_NIVEL = re.compile(r'_nivel(\d+)_tile_')
+
+
+def convertir_tar(tar_path: Path, output_dir: str, capa: str) -> Dict[str, Dict[str, Dict]]:
+    """
+    Convierte todos los GeoTIFF de un TAR al store; devuelve capa -> entradas del índice.
+
+    Los tiles de pendiente que acompañan a los de elevación van a las capas
+    'pendiente' y 'orientacion' con el mismo tile_id que su tile de elevación,
+    los de cobertura que acompañan a los NDVI a 'cobertura', y los de los
+    niveles de overview a '<capa>_nivel<n>'.
+    """
+    from rasterio.io import MemoryFile
+
+    provincia = tar_path.parent.name
+    entradas: Dict[str, Dict[str, Dict]] = {}
+    with tarfile.open(tar_path, 'r:*') as tar:
+        for miembro in tar:
+            if not miembro.isfile() or not miembro.name.lower().endswith(('.tif', '.tiff')):
+                continue
+
+            tile_id = Path(miembro.name).stem
+            extra = {'provincia': provincia, 'tar_file': tar_path.name, 'filename': Path(miembro.name).name}
+            contenido = tar.extractfile(miembro).read()
+            with MemoryFile(contenido) as memfile, memfile.open() as src:
+                geotransform = src.transform.to_gdal()
+                if capa == CAPA_ELEVACION and tile_id.endswith(SUFIJO_PENDIENTE):
+                    tile_id = tile_id[:-len(SUFIJO_PENDIENTE)]
+                    for banda, capa_banda in ((1, CAPA_PENDIENTE), (2, CAPA_ORIENTACION)):
+                        entradas.setdefault(capa_banda, {})[tile_id] = guardar_tile(
+                            os.path.join(output_dir, capa_banda), tile_id, src.read(banda),
+                            geotransform, src.nodata, extra=extra
+                        )
+                    continue
+
+                if capa == CAPA_NDVI and tile_id.endswith(SUFIJO_COBERTURA):
+                    tile_id = tile_id[:-len(SUFIJO_COBERTURA)]
+                    entradas.setdefault(CAPA_COBERTURA, {})[tile_id] = guardar_tile(
+                        os.path.join(output_dir, CAPA_COBERTURA), tile_id, src.read(1),
+                        geotransform, src.nodata, extra=extra
+                    )
+                    continue
+
+                nivel = PATRON_NIVEL.search(tile_id)
+                capa_tile = f"{capa}_nivel{nivel.group(1)}" if nivel else capa
+                datos, nodata = src.read(1), src.nodata
+                if capa == CAPA_ELEVACION:
+                    datos, nodata = a_int16(datos, nodata)
+                entradas.setdefault(capa_tile, {})[tile_id] = guardar_tile(
+                    os.path.join(output_dir, capa_tile), tile_id, datos,
+                    geotransform, nodata, extra=extra
+                )
+    return entradas
+
+
+def capas_relacionadas(capa: str) -> List[str]:
+    """Capas del store que salen de cada tile de la capa (la propia y las que la acompañan en el TAR)"""
+    if capa == CAPA_ELEVACION:
+        return [CAPA_ELEVACION, CAPA_PENDIENTE, CAPA_ORIENTACION]
+    if capa == CAPA_NDVI:
+        return [CAPA_NDVI, CAPA_COBERTURA]
+    return [capa]
+
+
+def grillas_constantes(capa: str, sintetico: Dict, alto: int, ancho: int) -> Dict[str, tuple]:
+    """Capa -> (grilla, nodata) de un tile constante"""
+    forma = (alto, ancho)
+    if capa == CAPA_ELEVACION:
+        # Terreno plano: pendiente 0 y sin orientación
+        return {
+            CAPA_ELEVACION: a_int16(np.full(forma, sintetico['valor'], dtype=sintetico.get('dtype', 'float32')), None),
+            CAPA_PENDIENTE: (np.zeros(forma, dtype=np.int16), NODATA_PENDIENTE),
+            CAPA_ORIENTACION: (np.full(forma, NODATA_PENDIENTE, dtype=np.int16), NODATA_PENDIENTE)
+        }
+    if capa == CAPA_NDVI:
+        return {
+            CAPA_NDVI: (np.full(forma, sintetico['valor'], dtype=np.uint8), 0),
+            CAPA_COBERTURA: (np.full(forma, sintetico['valor_cobertura'], dtype=np.uint8), SIN_DATO)
+        }
+    return {capa: (np.full(forma, sintetico['valor'], dtype=sintetico.get('dtype', 'float32')), None)}
+
+
+def materializar_indice(indice_path: Path, output_dir: str, capa: str) -> Dict[str, Dict[str, Dict]]:
+    """
+    Escribe en el store los tiles constantes y duplicados de un índice JSON
+    de mini-tiles; devuelve capa -> entradas del índice del store. Los
+    duplicados se copian del tile original, que ya tiene que estar convertido.
+    """
+    with open(indice_path, 'r', encoding='utf-8') as f:
+        indice = json.load(f)
+
+    # Elevación: tile_id -> entrada; vegetación: posición -> [entradas]
+    tiles = []
+    for valor in indice.get('tiles', {}).values():
+        tiles.extend(valor if isinstance(valor, list) else [valor])
+
+    provincia = indice_path.parent.name
+    stores = {capa_tile: RasterTileStore(output_dir, capa_tile) for capa_tile in capas_relacionadas(capa)}
+    entradas: Dict[str, Dict[str, Dict]] = {}
+    for tile in tiles:
+        tile_id = tile.get('id')
+        sintetico = tile.get('sintetico')
+        if not tile_id or not (tile.get('duplicado_de') or (sintetico and sintetico['tipo'] == TIPO_CONSTANTE)):
+            continue
+
+        extra = {'provincia': provincia}
+        if sintetico:
+            extra['sintetico'] = sintetico
+            grillas = grillas_constantes(capa, sintetico, tile['alto'], tile['ancho'])
+        else:
+            extra.update({k: tile[k] for k in ('tar_file', 'filename', 'duplicado_de') if tile.get(k)})
+            try:
+                originales = {capa_tile: store.cargar(tile['duplicado_de']) for capa_tile, store in stores.items()}
+            except KeyError as e:
+                logger.warning(f"⚠️ {tile_id}: el tile original {e} no está en el store")
+                continue
+            grillas = {capa_tile: (np.asarray(raster.datos), raster.nodata) for capa_tile, raster in originales.items()}
+
+        for capa_tile, (datos, nodata) in grillas.items():
+            geotransform = geotransform_de_bounds(tile['bounds'], datos.shape[1], datos.shape[0])
+            entradas.setdefault(capa_tile, {})[tile_id] = guardar_tile(
+                os.path.join(output_dir, capa_tile), tile_id, datos, geotransform, nodata, extra=extra
+            )
+    return entradas
+
+
+def construir_store(input_dir: str, output_dir: str, capa: str) -> int:
+    """Convierte todos los TAR bajo input_dir; devuelve la cantidad de tiles escritos"""
+    archivos = sorted(Path(input_dir).rglob('*.tar.gz'))
+    logger.info(f"📦 {len(archivos)} archivos TAR encontrados en {input_dir}")
+
+    total = 0
+    for i, tar_path in enumerate(archivos, 1):
+        try:
+            entradas = convertir_tar(tar_path, output_dir, capa)
+            for capa_tiles, entradas_capa in entradas.items():
+                guardar_indice(os.path.join(output_dir, capa_tiles), entradas_capa)
+                invalidar_tiles_reconstruidos(capa_tiles, entradas_capa)
+            cantidad = len(entradas.get(capa, {}))
+            total += cantidad
+            logger.info(f"✅ [{i}/{len(archivos)}] {tar_path.name}: {cantidad} tiles")
+        except Exception as e:
+            logger.error(f"❌ Error convirtiendo {tar_path}: {e}")
+
+    # Tiles constantes y duplicados, que no vienen en los TAR
+    for indice_path in sorted(Path(input_dir).rglob('*_mini_tiles_index.json')):
+        try:
+            entradas = materializar_indice(indice_path, output_dir, capa)
+            for capa_tiles, entradas_capa in entradas.items():
+                guardar_indice(os.path.join(output_dir, capa_tiles), entradas_capa)
+                invalidar_tiles_reconstruidos(capa_tiles, entradas_capa)
+            cantidad = len(entradas.get(capa, {}))
+            if cantidad:
+                total += cantidad
+                logger.info(f"🧮 {indice_path.name}: {cantidad} tiles constantes o duplicados")
+        except Exception as e:
+            logger.error(f"❌ Error materializando {indice_path}: {e}")
+
+    logger.info(f"🎉 Store de la capa '{capa}' listo: {total} tiles en {os.path.join(output_dir, capa)}")
+    return total
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description="Convierte mini-tiles GeoTIFF empaquetados en TAR a grillas .npy memory-mapped"
+    )
+    parser.add_argument('--input', '-i', required=True, help="Directorio con los TAR de mini-tiles")
+    parser.add_argument('--output', '-o', required=True, help="Directorio raíz del store")
+    parser.add_argument('--capa', '-c', default=CAPA_ELEVACION, help="Nombre de la capa (default: elevacion)")
+    args = parser.parse_args()
+
+    try:
+        import rasterio  # noqa: F401
+    except ImportError as e:
+        logger.error(f"❌ Error importando dependencias: {e}")
+        logger.error("💡 Instala las dependencias: pip install rasterio numpy")
+        sys.exit(1)
+
+    if not os.path.exists(args.input):
+        logger.error(f"❌ Directorio de entrada no existe: {args.input}")
+        sys.exit(1)
+
+    total = construir_store(args.input, args.output, args.capa)
+    sys.exit(0 if total else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+# config.py - rutas y parámetros de los servicios de terreno
+import os
+
+# Release de GitHub con los archivos TAR de mini-tiles
+GITHUB_RELEASE_BASE = os.getenv(
+    'MAIRA_GITHUB_RELEASE_BASE',
+    'https://github.com/Ehr051/MAIRA/releases/download/tiles-v3.0/'
+)
+
+# Archivos TAR de altimetría por provincia: <MINI_TILES_DIR>/<provincia>/<provincia>_part_XX.tar.gz
+MINI_TILES_DIR = os.getenv('MAIRA_MINI_TILES_DIR', 'mini_tiles_github')
+
+# Archivos TAR de vegetación descargados desde el release
+VEGETACION_TAR_DIR = os.getenv('MAIRA_VEGETACION_TAR_DIR', 'temp_extract')
+
+# Cache en memoria de bytes de tiles
+TILE_CACHE_MB = int(os.getenv('MAIRA_TILE_CACHE_MB', '64'))
+TILE_CACHE_WARMUP = os.getenv('MAIRA_TILE_CACHE_WARMUP', 'false').lower() == 'true'
+TILE_POPULARES_PATH = os.getenv('MAIRA_TILE_POPULARES_PATH', os.path.join('temp_extract', 'tiles_populares.json'))
+
+# Cache en disco del proxy de GitHub Release
+PROXY_CACHE_DIR = os.getenv('MAIRA_PROXY_CACHE_DIR', os.path.join('temp_extract', 'github_cache'))
+PROXY_CACHE_MB = int(os.getenv('MAIRA_PROXY_CACHE_MB', '1024'))
+PROXY_REVALIDAR_SEGUNDOS = int(os.getenv('MAIRA_PROXY_REVALIDAR_SEGUNDOS', '3600'))
+
+# Store de mini-tiles pre-decodificados (.npy memory-mapped)
+TILE_STORE_DIR = os.getenv('MAIRA_TILE_STORE_DIR', 'tile_store')
@@ -0,0 +1,68 @@
+"""
+MAIRA 4.0 - Clases de cobertura y ocultamiento derivadas del NDVI
+
+tools/vegetation_tile_processor.py clasifica el NDVI real de cada píxel en
+una de cuatro clases y escribe, junto a cada mini-tile NDVI, un mini-tile
+de un byte por celda con paleta (<tile>_cobertura.tif). Detección, niebla
+de guerra y la consulta de cobertura leen el código de clase en lugar de
+reinterpretar el NDVI. La transitabilidad (terrain/transitability.py) no usa
+estas clases: sigue con el NDVI normalizado y los límites de
+transitabilityService.js, para coincidir con el cliente.
+
+Códigos:
+    0 sin dato, 1 desnudo, 2 pastizal, 3 arbustal, 4 bosque
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CAPA_NDVI = 'ndvi'
+CAPA_COBERTURA = 'cobertura'
+SUFIJO_COBERTURA = '_cobertura'
+
+SIN_DATO = 0
+
+# NDVI real (-1 a 1) desde el que empieza cada clase, a partir de 'pastizal'
+UMBRALES_NDVI = np.array([0.2, 0.4, 0.6])
+
+# proteccion: fracción de protección contra fuego directo
+# ocultamiento: fracción en que reduce la distancia a la que se detecta una unidad
+CLASES_COBERTURA: Dict[int, Dict] = {
+    0: {'nombre': 'sin_dato', 'proteccion': 0.0, 'ocultamiento': 0.0, 'color': (0, 0, 0, 0)},
+    1: {'nombre': 'desnudo', 'proteccion': 0.0, 'ocultamiento': 0.0, 'color': (210, 190, 150, 255)},
+    2: {'nombre': 'pastizal', 'proteccion': 0.05, 'ocultamiento': 0.2, 'color': (190, 220, 120, 255)},
+    3: {'nombre': 'arbustal', 'proteccion': 0.2, 'ocultamiento': 0.5, 'color': (110, 170, 70, 255)},
+    4: {'nombre': 'bosque', 'proteccion': 0.5, 'ocultamiento': 0.8, 'color': (30, 100, 40, 255)}
+}
+
+# Tablas por código para consultas vectorizadas
+OCULTAMIENTO = np.array([CLASES_COBERTURA[c]['ocultamiento'] for c in sorted(CLASES_COBERTURA)])
+PROTECCION = np.array([CLASES_COBERTURA[c]['proteccion'] for c in sorted(CLASES_COBERTURA)])
+
+
+def clasificar_ndvi(ndvi: np.ndarray, salida: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Código de clase (uint8) por celda a partir del NDVI real; NaN -> sin dato.
+    Con `salida` (uint8 de la misma forma) se escribe ahí sin copias en float.
+    """
+    ndvi = np.asarray(ndvi)
+    clases = np.empty(ndvi.shape, dtype=np.uint8) if salida is None else salida
+    clases.fill(1)
+    for umbral in UMBRALES_NDVI:
+        clases += ndvi >= umbral
+    clases[np.isnan(ndvi)] = SIN_DATO
+    return clases
+
+
+def leyenda() -> List[Dict]:
+    """Clases con sus factores y colores (para la paleta del cliente)"""
+    return [{'codigo': codigo, **clase, 'color': list(clase['color'])} for codigo, clase in sorted(CLASES_COBERTURA.items())]
+
+
+def muestrear_cobertura(lats, lons) -> np.ndarray:
+    """Código de clase de cobertura en cada punto (0 donde no hay tile)"""
+    from .sampling import muestrear
+
+    valores = muestrear(lats, lons, CAPA_COBERTURA, interpolar=False)
+    return np.nan_to_num(valores, nan=SIN_DATO).astype(np.uint8)
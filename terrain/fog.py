@@ -0,0 +1,180 @@
+"""
+MAIRA 4.0 - Niebla de guerra calculada en el servidor
+
+En cada cambio/fin de turno se calcula, para cada equipo, qué unidades
+enemigas ve alguna de sus unidades: alcance del sensor (afectado por clima
+e iluminación), ocultamiento de la cobertura vegetal donde está el objetivo
+y línea de visión sobre el terreno. Cada equipo recibe sólo los enemigos
+que ve, en lugar de que cada navegador calcule todo (FogOfWar.js).
+
+Los candidatos salen de un hash espacial de celdas de CELDA_HASH_M: cada
+observador sólo mira las celdas que alcanza su sensor. Todas las líneas de
+visión que quedan se densifican y se muestrean en una sola pasada.
+"""
+
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cover import OCULTAMIENTO, muestrear_cobertura
+from .sampling import muestrear
+from .viewshed import evaluar_linea, PASO_LOS_M
+
+METROS_POR_GRADO = 111320.0
+CELDA_HASH_M = 1000.0
+
+# Alcances de sensores por tipo de unidad (m), los mismos que Client/js/gaming/FogOfWar.js
+RANGOS_SENSOR: Dict[str, Dict[str, float]] = {
+    'infantry': {'visual': 800, 'thermal': 600, 'acoustic': 300},
+    'tank': {'visual': 2000, 'thermal': 3000, 'radar': 5000},
+    'reconnaissance': {'visual': 3000, 'thermal': 4000, 'radar': 8000},
+    'artillery': {'visual': 1000, 'radar': 15000, 'acoustic': 5000},
+    'aircraft': {'visual': 10000, 'radar': 50000, 'infrared': 15000}
+}
+RANGO_SENSOR_DEFAULT = 1000.0
+
+FACTORES_CLIMA_DETECCION: Dict[str, float] = {
+    'clear': 1.0,
+    'light_rain': 0.8,
+    'heavy_rain': 0.5,
+    'fog': 0.3,
+    'snow': 0.6
+}
+FACTORES_ILUMINACION: Dict[str, float] = {
+    'day': 1.0,
+    'dawn': 0.7,
+    'dusk': 0.7,
+    'night': 0.3,
+    'night_nvg': 0.8
+}
+
+ALTURA_OBSERVADOR_M = 2.0
+ALTURA_OBJETIVO_M = 1.0
+# Observadores más cercanos que se prueban por objetivo y equipo (acota las líneas de visión)
+MAX_OBSERVADORES_POR_OBJETIVO = 4
+
+
+def normalizar_unidad(datos: Dict) -> Optional[Dict]:
+    """
+    Unidad en el formato de la niebla ({id, equipo, lat, lng, tipo, rango, sidc, nombre})
+    a partir de lo que mandan los clientes, o None si le falta algo.
+    """
+    unidad_id = datos.get('id') or datos.get('elemento_id') or datos.get('unidad_id')
+    equipo = datos.get('equipo')
+    posicion = datos.get('posicion') or datos
+    try:
+        lat = float(posicion['lat'])
+        lng = float(posicion['lng'] if 'lng' in posicion else posicion['lon'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not unidad_id or not equipo:
+        return None
+
+    unidad = {'id': str(unidad_id), 'equipo': str(equipo), 'lat': lat, 'lng': lng,
+              'tipo': datos.get('tipo') or 'infantry'}
+    if datos.get('rango_sensor') is not None:
+        unidad['rango'] = float(datos['rango_sensor'])
+    # Para que el equipo que la ve pueda dibujarla
+    for clave in ('sidc', 'nombre'):
+        if datos.get(clave):
+            unidad[clave] = str(datos[clave])
+    return unidad
+
+
+def rango_sensor(unidad: Dict) -> float:
+    """Alcance máximo (m) de los sensores de la unidad"""
+    if 'rango' in unidad:
+        return unidad['rango']
+    sensores = RANGOS_SENSOR.get(unidad.get('tipo'))
+    return float(max(sensores.values())) if sensores else RANGO_SENSOR_DEFAULT
+
+
+def _candidatos(xs: np.ndarray, ys: np.ndarray, equipos: List[str], alcances: np.ndarray,
+                ocultamiento: np.ndarray) -> Dict[Tuple[str, int], List[Tuple[float, int]]]:
+    """(equipo, objetivo) -> [(distancia, observador)] de los enemigos dentro del alcance efectivo"""
+    celdas: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    cx = np.floor(xs / CELDA_HASH_M).astype(np.int64)
+    cy = np.floor(ys / CELDA_HASH_M).astype(np.int64)
+    for i in range(len(xs)):
+        celdas[(int(cx[i]), int(cy[i]))].append(i)
+
+    candidatos: Dict[Tuple[str, int], List[Tuple[float, int]]] = defaultdict(list)
+    for observador in range(len(xs)):
+        alcance = alcances[observador]
+        if alcance <= 0:
+            continue
+        radio = int(math.ceil(alcance / CELDA_HASH_M))
+        ox, oy = int(cx[observador]), int(cy[observador])
+        if (2 * radio + 1) ** 2 <= len(celdas):
+            claves = [(ox + dx, oy + dy) for dx in range(-radio, radio + 1) for dy in range(-radio, radio + 1)]
+        else:
+            claves = [c for c in celdas if abs(c[0] - ox) <= radio and abs(c[1] - oy) <= radio]
+
+        equipo = equipos[observador]
+        for clave in claves:
+            for objetivo in celdas.get(clave, ()):
+                if equipos[objetivo] == equipo:
+                    continue
+                distancia = math.hypot(xs[objetivo] - xs[observador], ys[objetivo] - ys[observador])
+                if distancia <= alcance * (1 - ocultamiento[objetivo]):
+                    candidatos[(equipo, objetivo)].append((distancia, observador))
+    return candidatos
+
+
+def calcular_visibilidad(unidades: List[Dict], clima: str = 'clear', iluminacion: str = 'day') -> Dict[str, List[str]]:
+    """
+    Ids de las unidades enemigas que ve cada equipo. Sin datos de elevación
+    en algún extremo, la línea de visión se da por libre.
+    """
+    equipos = [u['equipo'] for u in unidades]
+    visibles: Dict[str, List[str]] = {equipo: [] for equipo in equipos}
+    if len(set(equipos)) < 2:
+        return visibles
+
+    lats = np.array([u['lat'] for u in unidades], dtype=np.float64)
+    lons = np.array([u['lng'] for u in unidades], dtype=np.float64)
+    lat_ref = float(lats.mean())
+    xs = (lons - lons.mean()) * METROS_POR_GRADO * math.cos(math.radians(lat_ref))
+    ys = (lats - lat_ref) * METROS_POR_GRADO
+
+    factor = FACTORES_CLIMA_DETECCION.get(clima, 1.0) * FACTORES_ILUMINACION.get(iluminacion, 1.0)
+    alcances = np.array([rango_sensor(u) for u in unidades]) * factor
+    ocultamiento = OCULTAMIENTO[muestrear_cobertura(lats, lons)]
+
+    candidatos = _candidatos(xs, ys, equipos, alcances, ocultamiento)
+
+    # Líneas de visión de los observadores más cercanos de cada (equipo, objetivo)
+    pares: List[Tuple[str, int, int, float]] = []
+    for (equipo, objetivo), observadores in candidatos.items():
+        for distancia, observador in sorted(observadores)[:MAX_OBSERVADORES_POR_OBJETIVO]:
+            pares.append((equipo, objetivo, observador, distancia))
+    if not pares:
+        return visibles
+
+    # Interpolación lineal en lat/lon: a alcances de sensor la diferencia con el círculo máximo es despreciable
+    puntos = np.array([int(math.ceil(d / PASO_LOS_M)) + 1 for _, _, _, d in pares])
+    t = np.concatenate([np.linspace(0.0, 1.0, n) for n in puntos])
+    observadores = np.repeat([p[2] for p in pares], puntos)
+    objetivos = np.repeat([p[1] for p in pares], puntos)
+    lats_lineas = lats[observadores] + t * (lats[objetivos] - lats[observadores])
+    lons_lineas = lons[observadores] + t * (lons[objetivos] - lons[observadores])
+    distancias = t * np.repeat([p[3] for p in pares], puntos)
+    elevaciones = muestrear(lats_lineas, lons_lineas)
+
+    vistos = set()
+    inicio = 0
+    for (equipo, objetivo, _, _), n in zip(pares, puntos):
+        tramo = slice(inicio, inicio + n)
+        inicio += n
+        if (equipo, objetivo) in vistos:
+            continue
+        resultado = evaluar_linea(lats_lineas[tramo], lons_lineas[tramo], distancias[tramo],
+                                  elevaciones[tramo], ALTURA_OBSERVADOR_M, ALTURA_OBJETIVO_M)
+        if resultado['visible'] is not False:
+            vistos.add((equipo, objetivo))
+
+    for equipo, objetivo in sorted(vistos, key=lambda par: (par[0], unidades[par[1]]['id'])):
+        visibles[equipo].append(unidades[objetivo]['id'])
+    return visibles
@@ -0,0 +1,293 @@
+"""
+MAIRA 4.0 - Proxy con cache en disco para archivos del GitHub Release
+
+Los archivos del release se descargan por chunks a una cache en disco
+direccionada por contenido (sha256), sin pasar enteros por memoria: cada
+chunk se envía al cliente a la vez que se escribe en la cache. Cada ruta
+pedida apunta a un objeto de la cache; se revalida contra GitHub con
+`If-None-Match` cada cierto tiempo y la cache se mantiene bajo un tamaño
+máximo descartando los objetos usados hace más tiempo.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+from .config import (
+    GITHUB_RELEASE_BASE, PROXY_CACHE_DIR, PROXY_CACHE_MB, PROXY_REVALIDAR_SEGUNDOS
+)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Espera máxima a la descarga de otro request antes de pedir el archivo directo a GitHub
+ESPERA_DESCARGA_SEGUNDOS = 30
+
+
+class ArchivoNoEncontrado(Exception):
+    """El archivo no existe en el release"""
+
+
+class GithubReleaseCache:
+    """Cache en disco, direccionada por contenido, de archivos del release"""
+
+    def __init__(self, base_url: str, cache_dir: str, max_bytes: int, revalidar_segundos: int):
+        self.base_url = base_url
+        cache_dir = os.path.abspath(cache_dir)
+        self.objetos_dir = os.path.join(cache_dir, 'objetos')
+        self.refs_dir = os.path.join(cache_dir, 'refs')
+        self.max_bytes = max_bytes
+        self.revalidar_segundos = revalidar_segundos
+
+        self._session = None
+        self._session_lock = threading.Lock()
+        # Descargas o revalidaciones en curso por ruta: los demás requests esperan a que terminen
+        self._descargas: Dict[str, threading.Event] = {}
+        self._descargas_lock = threading.Lock()
+        self._eviccion_lock = threading.Lock()
+
+    def _sesion(self):
+        """Sesión HTTP compartida con pool de conexiones"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    def _ruta_ref(self, file_path: str) -> str:
+        return os.path.join(self.refs_dir, hashlib.sha1(file_path.encode('utf-8')).hexdigest() + '.json')
+
+    def ruta_objeto(self, sha256: str) -> str:
+        return os.path.join(self.objetos_dir, sha256)
+
+    def _leer_ref(self, file_path: str) -> Optional[Dict]:
+        try:
+            with open(self._ruta_ref(file_path), 'r') as f:
+                ref = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.ruta_objeto(ref['sha256'])):
+            return None
+        return ref
+
+    def _guardar_ref(self, file_path: str, ref: Dict):
+        os.makedirs(self.refs_dir, exist_ok=True)
+        ruta = self._ruta_ref(file_path)
+        temp_path = f"{ruta}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(ref, f)
+        os.replace(temp_path, ruta)
+
+    def _abrir_objeto(self, ref: Dict) -> Optional[BinaryIO]:
+        """
+        Abre el objeto de la ref, o None si ya no está. Una vez abierto, un
+        desalojo concurrente puede borrarlo del directorio sin afectar la lectura.
+        """
+        try:
+            return open(self.ruta_objeto(ref['sha256']), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def abrir(self, file_path: str) -> Tuple[Dict, Union[BinaryIO, '_DescargaTee']]:
+        """
+        Abre el archivo para servirlo, descargándolo o revalidándolo si hace falta.
+
+        Si está en cache devuelve (ref, archivo abierto) con la ref completa
+        ({sha256, size, etag_origen, ...}). Si hay que descargarlo devuelve
+        ({file_path, size}, descarga): la descarga itera los chunks de GitHub
+        y los escribe en la cache a medida que se envían; hay que cerrarla.
+        ArchivoNoEncontrado si no existe.
+        """
+        # Un reintento alcanza si el objeto se desaloja entre leer la ref y abrirlo,
+        # o si la descarga concurrente que esperábamos falló
+        for _ in range(3):
+            ref = self._leer_ref(file_path)
+            if ref and time.time() - ref.get('verificado', 0) < self.revalidar_segundos:
+                archivo = self._abrir_objeto(ref)
+                if archivo is not None:
+                    self._marcar_uso(ref)
+                    return ref, archivo
+                continue
+
+            with self._descargas_lock:
+                en_curso = self._descargas.get(file_path)
+                if en_curso is None:
+                    self._descargas[file_path] = threading.Event()
+            if en_curso is not None:
+                # Otro request ya está descargando o revalidando: se sirve de la cache cuando termine.
+                # Si su cliente lo consume despacio, se pide directo a GitHub sin escribir la cache
+                if not en_curso.wait(ESPERA_DESCARGA_SEGUNDOS):
+                    return self._actualizar(file_path, None, cachear=False)
+                continue
+
+            try:
+                resultado = self._actualizar(file_path, ref)
+            except BaseException:
+                self._liberar(file_path)
+                raise
+            if not isinstance(resultado[1], _DescargaTee):
+                self._liberar(file_path)
+            return resultado
+
+        raise FileNotFoundError(f"{file_path} desalojado de la cache mientras se abría")
+
+    def _liberar(self, file_path: str):
+        with self._descargas_lock:
+            en_curso = self._descargas.pop(file_path, None)
+        if en_curso is not None:
+            en_curso.set()
+
+    def _actualizar(self, file_path: str, ref: Optional[Dict],
+                    cachear: bool = True) -> Tuple[Dict, Union[BinaryIO, '_DescargaTee']]:
+        """Pide el archivo a GitHub (con If-None-Match si ya está en cache)"""
+        headers = {}
+        if ref and ref.get('etag_origen'):
+            headers['If-None-Match'] = ref['etag_origen']
+
+        try:
+            response = self._sesion().get(self.base_url + file_path, headers=headers, stream=True, timeout=(10, 60))
+        except Exception as e:
+            archivo = self._abrir_objeto(ref) if ref else None
+            if archivo is not None:
+                logger.warning(f"⚠️ GitHub no disponible, sirviendo copia cacheada de {file_path}: {e}")
+                return ref, archivo
+            raise
+
+        if response.status_code == 304 and ref:
+            response.close()
+            archivo = self._abrir_objeto(ref)
+            if archivo is None:
+                raise FileNotFoundError(f"{file_path} desalojado de la cache durante la revalidación")
+            ref['verificado'] = time.time()
+            self._guardar_ref(file_path, ref)
+            self._marcar_uso(ref)
+            return ref, archivo
+
+        try:
+            if response.status_code == 404:
+                raise ArchivoNoEncontrado(file_path)
+            response.raise_for_status()
+        except BaseException:
+            response.close()
+            raise
+
+        descarga = _DescargaTee(self, file_path, response, cachear)
+        return {'file_path': file_path, 'size': descarga.size}, descarga
+
+    def _guardar_descarga(self, file_path: str, temp_path: str, sha256: str, size: int, etag_origen: Optional[str]) -> Dict:
+        """Mueve la descarga completa a su objeto, registra la ref y desaloja si hace falta"""
+        os.replace(temp_path, self.ruta_objeto(sha256))
+        ref = {
+            'file_path': file_path,
+            'sha256': sha256,
+            'size': size,
+            'etag_origen': etag_origen,
+            'verificado': time.time()
+        }
+        self._guardar_ref(file_path, ref)
+        logger.info(f"📥 {file_path} cacheado ({size / (1024 * 1024):.1f} MB)")
+        self._desalojar(conservar=sha256)
+        return ref
+
+    def _marcar_uso(self, ref: Dict):
+        try:
+            os.utime(self.ruta_objeto(ref['sha256']))
+        except OSError:
+            pass
+
+    def _desalojar(self, conservar: Optional[str] = None):
+        """Elimina los objetos usados hace más tiempo hasta quedar bajo el tamaño máximo"""
+        with self._eviccion_lock:
+            objetos = []
+            for nombre in os.listdir(self.objetos_dir):
+                if nombre.startswith('.'):
+                    continue
+                stat = os.stat(os.path.join(self.objetos_dir, nombre))
+                objetos.append((stat.st_mtime, stat.st_size, nombre))
+
+            total = sum(size for _, size, _ in objetos)
+            for _, size, nombre in sorted(objetos):
+                if total <= self.max_bytes:
+                    break
+                if nombre == conservar:
+                    continue
+                try:
+                    # Las refs que apuntan a un objeto eliminado se tratan como ausentes en _leer_ref
+                    os.remove(os.path.join(self.objetos_dir, nombre))
+                    total -= size
+                    logger.info(f"🧹 Objeto {nombre[:12]} eliminado de la cache del proxy")
+                except OSError:
+                    pass
+
+
+
+class _DescargaTee:
+    """
+    Chunks de una respuesta de GitHub que se escriben en la cache a medida
+    que se iteran. Al terminar la iteración el objeto queda cacheado; si se
+    cierra antes (el cliente cortó) se descarta el archivo parcial. Con
+    cachear=False sólo reenvía los chunks.
+    """
+
+    def __init__(self, cache: GithubReleaseCache, file_path: str, response, cachear: bool = True):
+        self.cache = cache
+        self.file_path = file_path
+        self.response = response
+        self.cachear = cachear
+        largo = response.headers.get('Content-Length')
+        self.size = int(largo) if largo and largo.isdigit() else None
+        self.temp_path = os.path.join(
+            cache.objetos_dir,
+            f".{hashlib.sha1(file_path.encode('utf-8')).hexdigest()}.{os.getpid()}.{threading.get_ident()}.part"
+        )
+        self._chunks = self._iterar()
+        self._cerrada = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._chunks
+
+    def _iterar(self) -> Iterator[bytes]:
+        if not self.cachear:
+            yield from self.response.iter_content(CHUNK_SIZE)
+            return
+        os.makedirs(self.cache.objetos_dir, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+        with open(self.temp_path, 'wb') as f:
+            for chunk in self.response.iter_content(CHUNK_SIZE):
+                sha.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+                yield chunk
+        if self.size is not None and size != self.size:
+            logger.warning(f"⚠️ Descarga truncada de {self.file_path}: {size} de {self.size} bytes, no se cachea")
+            return
+        self.cache._guardar_descarga(self.file_path, self.temp_path, sha.hexdigest(), size,
+                                     self.response.headers.get('ETag'))
+
+    def close(self):
+        if self._cerrada:
+            return
+        self._cerrada = True
+        try:
+            self._chunks.close()
+            self.response.close()
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+        finally:
+            if self.cachear:
+                self.cache._liberar(self.file_path)
+
+
+cache_github = GithubReleaseCache(
+    GITHUB_RELEASE_BASE, PROXY_CACHE_DIR, PROXY_CACHE_MB * 1024 * 1024, PROXY_REVALIDAR_SEGUNDOS
+)
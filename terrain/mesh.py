@@ -0,0 +1,277 @@
+"""
+MAIRA 4.0 - Mallas de terreno cuantizadas para la vista 3D
+
+Cada tile de elevación (de cualquier nivel de la pirámide) se remuestrea a
+una grilla de 2^k + 1 vértices y se triangula con una RTIN (red irregular de
+triángulos rectángulos, como Martini): se calcula una vez el error de cada
+posible subdivisión y se extrae la malla mínima cuyos triángulos no se
+subdividen mientras el error en el punto medio de su hipotenusa (propagado
+desde sus hijos) sea menor al máximo pedido, en metros.
+
+Formato maira-mesh-v1: uint32 big-endian con el largo de la cabecera JSON,
+la cabecera y a continuación las secciones binarias (little-endian) que
+lista con `offset` y `size`:
+    u, v, h      vértices cuantizados a 0-32767, delta + zigzag (uint16)
+    indices      triángulos (3 índices c/u), delta + zigzag (uint16 o uint32)
+    oeste, sur, este, norte   índices de los vértices de cada borde (para faldones)
+v = 0 es el borde sur; h = 0 es altura_min y 32767 es altura_max.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .sampling import bilineal, muestrear
+from .single_flight import SingleFlight
+from .tile_cache import TileByteCache
+from .tile_store import CAPA_ELEVACION, obtener_store
+
+MAX_CUANTIZADO = 32767
+ERROR_MALLA_M = 5.0
+# Lado máximo de la grilla de la malla: tiles más grandes se remuestrean a 513x513 vértices
+MAX_LADO_MALLA = 512
+
+cache_mallas = TileByteCache(64 * 1024 * 1024)
+vuelos = SingleFlight()
+
+_rtins: Dict[int, 'RTIN'] = {}
+_rtins_lock = threading.Lock()
+
+
+def capa_nivel(nivel: int) -> str:
+    """Capa del store con los tiles de elevación del nivel de la pirámide"""
+    return CAPA_ELEVACION if nivel == 0 else f"{CAPA_ELEVACION}_nivel{nivel}"
+
+
+class RTIN:
+    """Jerarquía de triángulos rectángulos sobre una grilla de (2^k + 1)^2 vértices"""
+
+    def __init__(self, tamaño_grilla: int):
+        self.tamaño = tamaño_grilla
+        lado = tamaño_grilla - 1
+        if lado & (lado - 1):
+            raise ValueError(f"El tamaño de grilla debe ser 2^k + 1: {tamaño_grilla}")
+
+        cantidad = lado * lado * 2 - 2
+        self.cantidad_padres = cantidad - lado * lado
+
+        # Catetos (a, b) de cada triángulo; el id codifica el camino de subdivisiones
+        ids = np.arange(cantidad, dtype=np.int64) + 2
+        impares = (ids & 1) == 1
+        ax = np.where(impares, 0, lado)
+        ay = ax.copy()
+        bx = np.where(impares, lado, 0)
+        by = bx.copy()
+        cx = np.where(impares, lado, 0)
+        cy = np.where(impares, 0, lado)
+
+        camino = ids.copy()
+        profundidad = np.zeros(cantidad, dtype=np.int64)
+        while True:
+            camino >>= 1
+            activos = camino > 1
+            if not activos.any():
+                break
+            profundidad += activos
+            mx, my = (ax + bx) >> 1, (ay + by) >> 1
+            izquierda = activos & ((camino & 1) == 1)
+            derecha = activos & ~izquierda
+            ax, ay, bx, by = (
+                np.where(izquierda, cx, np.where(derecha, bx, ax)),
+                np.where(izquierda, cy, np.where(derecha, by, ay)),
+                np.where(izquierda, ax, np.where(derecha, cx, bx)),
+                np.where(izquierda, ay, np.where(derecha, cy, by)),
+            )
+            cx = np.where(activos, mx, cx)
+            cy = np.where(activos, my, cy)
+
+        self.ax, self.ay, self.bx, self.by = ax, ay, bx, by
+        self.profundidad = profundidad
+
+    def errores(self, alturas: np.ndarray) -> np.ndarray:
+        """
+        Error de aproximación en el punto medio de la hipotenusa de cada
+        triángulo, propagado desde los hijos. Se procesa por profundidad (de
+        las hojas a la raíz) para vectorizar cada nivel.
+        """
+        tamaño = self.tamaño
+        z = alturas.ravel().astype(np.float64)
+        errores = np.zeros(tamaño * tamaño, dtype=np.float64)
+
+        for nivel in range(int(self.profundidad.max()), -1, -1):
+            i = np.nonzero(self.profundidad == nivel)[0]
+            ax, ay, bx, by = self.ax[i], self.ay[i], self.bx[i], self.by[i]
+            mx, my = (ax + bx) >> 1, (ay + by) >> 1
+            medio = my * tamaño + mx
+            error = np.abs((z[ay * tamaño + ax] + z[by * tamaño + bx]) / 2 - z[medio])
+
+            padres = i < self.cantidad_padres
+            if padres.any():
+                cx, cy = mx + my - ay, my + ax - mx
+                izquierdo = ((ay + cy) >> 1) * tamaño + ((ax + cx) >> 1)
+                derecho = ((by + cy) >> 1) * tamaño + ((bx + cx) >> 1)
+                hijos = np.maximum(errores[izquierdo], errores[derecho])
+                error = np.where(padres, np.maximum(error, hijos), error)
+            np.maximum.at(errores, medio, error)
+        return errores
+
+    def extraer(self, errores: np.ndarray, error_max: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vértices (x, y de grilla) y triángulos de la malla mínima con error <= error_max.
+        Se subdivide nivel por nivel (vectorizado); las hojas se ordenan como en
+        un recorrido en profundidad para que los deltas de índices queden chicos.
+        """
+        tamaño = self.tamaño
+        lado = tamaño - 1
+
+        # Triángulos pendientes (ax, ay, bx, by, cx, cy) y su camino: un bit por subdivisión
+        pendientes = np.array([(lado, lado, 0, 0, 0, lado), (0, 0, lado, lado, lado, 0)], dtype=np.int64)
+        caminos = np.array([0, 1], dtype=np.int64)
+        hojas, claves, profundidades = [], [], []
+        profundidad = 0
+        while len(pendientes):
+            ax, ay, bx, by, cx, cy = pendientes.T
+            mx, my = (ax + bx) >> 1, (ay + by) >> 1
+            dividir = (np.abs(ax - cx) + np.abs(ay - cy) > 1) & (errores[my * tamaño + mx] > error_max)
+
+            hojas.append(pendientes[~dividir])
+            claves.append(caminos[~dividir])
+            profundidades.append(np.full(len(claves[-1]), profundidad, dtype=np.int64))
+
+            # Hijos: primero (c, a, m) y después (b, c, m)
+            d = dividir
+            pendientes = np.concatenate([
+                np.stack([cx[d], cy[d], ax[d], ay[d], mx[d], my[d]], axis=1),
+                np.stack([bx[d], by[d], cx[d], cy[d], mx[d], my[d]], axis=1)
+            ])
+            caminos = np.concatenate([caminos[d] << 1, (caminos[d] << 1) | 1])
+            profundidad += 1
+
+        # Las hojas no son prefijo una de otra: alineados a la izquierda, los caminos ordenan en profundidad
+        hojas = np.concatenate(hojas)
+        profundidades = np.concatenate(profundidades)
+        claves = np.concatenate(claves) << (profundidades.max() - profundidades)
+        hojas = hojas[np.argsort(claves, kind='stable')]
+
+        # Vértices numerados por orden de primera aparición
+        posiciones = (hojas[:, 1::2] * tamaño + hojas[:, 0::2]).ravel()
+        unicas, primera, inversa = np.unique(posiciones, return_index=True, return_inverse=True)
+        orden = np.argsort(primera)
+        rango = np.empty(len(orden), dtype=np.int64)
+        rango[orden] = np.arange(len(orden))
+        vertices = unicas[orden]
+        return np.stack([vertices % tamaño, vertices // tamaño], axis=1), rango[inversa.ravel()]
+
+
+def obtener_rtin(tamaño_grilla: int) -> RTIN:
+    with _rtins_lock:
+        rtin = _rtins.get(tamaño_grilla)
+        if rtin is None:
+            rtin = RTIN(tamaño_grilla)
+            _rtins[tamaño_grilla] = rtin
+    return rtin
+
+
+def zigzag_delta(valores: np.ndarray) -> np.ndarray:
+    """Codificación delta + zigzag (enteros con signo chicos -> sin signo chicos)"""
+    deltas = np.diff(np.asarray(valores, dtype=np.int64), prepend=0)
+    return (deltas << 1) ^ (deltas >> 63)
+
+
+def grilla_alturas(tile_id: str, nivel: int) -> Tuple[np.ndarray, Dict]:
+    """Alturas del tile remuestreadas a (2^k + 1)^2 vértices (hasta MAX_LADO_MALLA + 1) sobre sus bounds"""
+    capa = capa_nivel(nivel)
+    raster = obtener_store(capa).cargar(tile_id)
+    lado = min(1 << int(np.ceil(np.log2(max(raster.alto, raster.ancho, 2)))), MAX_LADO_MALLA)
+    tamaño = lado + 1
+
+    b = raster.bounds
+    t = np.arange(tamaño) / lado
+    lons = np.broadcast_to(b['west'] + t * (b['east'] - b['west']), (tamaño, tamaño))
+    lats = np.broadcast_to((b['north'] - t * (b['north'] - b['south']))[:, None], (tamaño, tamaño))
+
+    # Muestreo global: los vértices de un borde compartido valen lo mismo en ambos tiles
+    alturas = muestrear(lats.ravel(), lons.ravel(), capa).reshape(tamaño, tamaño)
+    # Bordes sin tile vecino: se extiende el propio tile
+    faltantes = np.isnan(alturas)
+    if faltantes.any():
+        alturas[faltantes] = bilineal(raster, lons[faltantes], lats[faltantes])
+    if np.isnan(alturas).all():
+        alturas[:] = 0.0
+    else:
+        alturas[np.isnan(alturas)] = np.nanmin(alturas)
+    return alturas, b
+
+
+def _generar(tile_id: str, nivel: int, error_max: float) -> bytes:
+    alturas, bounds = grilla_alturas(tile_id, nivel)
+    rtin = obtener_rtin(alturas.shape[0])
+    xy, triangulos = rtin.extraer(rtin.errores(alturas), error_max)
+    lado = alturas.shape[0] - 1
+
+    altura_min, altura_max = float(alturas.min()), float(alturas.max())
+    rango = altura_max - altura_min
+    h = alturas[xy[:, 1], xy[:, 0]]
+    u = np.rint(xy[:, 0] / lado * MAX_CUANTIZADO).astype(np.int64)
+    v = np.rint((lado - xy[:, 1]) / lado * MAX_CUANTIZADO).astype(np.int64)
+    h = np.rint((h - altura_min) / rango * MAX_CUANTIZADO).astype(np.int64) if rango > 0 else np.zeros(len(u), dtype=np.int64)
+
+    tipo_indices = np.uint16 if 2 * len(u) < 65536 else np.uint32
+    secciones = [
+        ('u', zigzag_delta(u).astype('<u2')),
+        ('v', zigzag_delta(v).astype('<u2')),
+        ('h', zigzag_delta(h).astype('<u2')),
+        ('indices', zigzag_delta(triangulos).astype(np.dtype(tipo_indices).newbyteorder('<'))),
+        ('oeste', np.nonzero(u == 0)[0].astype(np.dtype(tipo_indices).newbyteorder('<'))),
+        ('sur', np.nonzero(v == 0)[0].astype(np.dtype(tipo_indices).newbyteorder('<'))),
+        ('este', np.nonzero(u == MAX_CUANTIZADO)[0].astype(np.dtype(tipo_indices).newbyteorder('<'))),
+        ('norte', np.nonzero(v == MAX_CUANTIZADO)[0].astype(np.dtype(tipo_indices).newbyteorder('<')))
+    ]
+
+    cabecera = {
+        'formato': 'maira-mesh-v1',
+        'tile': tile_id,
+        'nivel': nivel,
+        'bounds': bounds,
+        'altura_min': altura_min,
+        'altura_max': altura_max,
+        'error_max': error_max,
+        'vertices': len(u),
+        'triangulos': len(triangulos) // 3,
+        'tipo_indices': 'uint16' if tipo_indices is np.uint16 else 'uint32',
+        'secciones': {}
+    }
+    offset = 0
+    for nombre, datos in secciones:
+        cabecera['secciones'][nombre] = {'offset': offset, 'size': datos.nbytes}
+        offset += datos.nbytes
+
+    cabecera_bytes = json.dumps(cabecera, ensure_ascii=False).encode('utf-8')
+    return b''.join([struct.pack('>I', len(cabecera_bytes)), cabecera_bytes] + [datos.tobytes() for _, datos in secciones])
+
+
+def _clave(tile_id: str, nivel: int, error_max: float):
+    # La fecha del tile en el store forma parte de la clave: si se reconstruye, la malla se regenera
+    store = obtener_store(capa_nivel(nivel))
+    if not store.existe(tile_id):
+        raise KeyError(tile_id)
+    return (tile_id, nivel, round(error_max, 2), os.stat(store.ruta_datos(tile_id)).st_mtime_ns)
+
+
+def malla_tile(tile_id: str, nivel: int = 0, error_max: float = ERROR_MALLA_M) -> Tuple[bytes, str]:
+    """
+    Malla cuantizada del tile (bytes maira-mesh-v1) y su ETag.
+    KeyError si el tile no está en el store para ese nivel.
+    """
+    clave = _clave(tile_id, nivel, error_max)
+    datos = cache_mallas.obtener(clave)
+    if datos is None:
+        datos = vuelos.ejecutar(clave, lambda: _generar(tile_id, nivel, error_max))
+        cache_mallas.guardar(clave, datos)
+    etag = hashlib.sha1(repr(clave).encode('utf-8')).hexdigest()[:20]
+    return datos, etag
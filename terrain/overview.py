@@ -0,0 +1,152 @@
+"""
+MAIRA 4.0 - Pirámide de overviews de elevación
+
+scripts/crear_mini_tiles.py genera, además de los mini-tiles a resolución
+completa (nivel 0), niveles reducidos 2x, 4x, 8x... promediando sólo los
+píxeles con dato. Cada nivel se corta en tiles del mismo tamaño en píxeles,
+así un tile del nivel n cubre 4^n tiles del nivel 0.
+
+Índice por provincia (<provincia>_overviews_index.json):
+    {provincia, tile_pixels, resolucion_base, bounds, niveles: {"1": {factor, resolucion, tiles: {...}}}}
+"""
+
+import os
+import json
+import math
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import MINI_TILES_DIR
+
+logger = logging.getLogger(__name__)
+
+METROS_POR_GRADO = 111320.0
+# Resolución (m/píxel) en el ecuador de un mapa web en zoom 0 con tiles de 256 px
+RESOLUCION_ZOOM_0_M = 156543.03392
+
+
+def reducir_2x(suma: np.ndarray, cuenta: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce a la mitad una grilla de sumas y cantidades de píxeles válidos.
+    Acumular sumas (en lugar de promedios) hace que cada nivel sea el promedio
+    exacto de los píxeles con dato del nivel 0 que cubre.
+    """
+    alto, ancho = suma.shape
+    pad = ((0, alto % 2), (0, ancho % 2))
+    if any(p for _, p in pad):
+        suma = np.pad(suma, pad)
+        cuenta = np.pad(cuenta, pad)
+    alto, ancho = suma.shape
+    suma = suma.reshape(alto // 2, 2, ancho // 2, 2).sum(axis=(1, 3))
+    cuenta = cuenta.reshape(alto // 2, 2, ancho // 2, 2).sum(axis=(1, 3))
+    return suma, cuenta
+
+
+def sumas_iniciales(datos: np.ndarray, nodata) -> Tuple[np.ndarray, np.ndarray]:
+    """Grillas de suma y cantidad de válidos a partir de los datos del nivel 0"""
+    validos = np.isfinite(datos) if np.issubdtype(datos.dtype, np.floating) else np.ones(datos.shape, dtype=bool)
+    if nodata is not None and not (isinstance(nodata, float) and math.isnan(nodata)):
+        validos &= datos != nodata
+    return np.where(validos, datos, 0).astype(np.float64), validos.astype(np.int32)
+
+
+def promedio(suma: np.ndarray, cuenta: np.ndarray) -> np.ndarray:
+    """Promedio de los válidos (NaN donde no hubo ninguno)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(cuenta > 0, suma / cuenta, np.nan)
+
+
+def resolucion_zoom_m(zoom: float, lat: float) -> float:
+    """Metros por píxel de un mapa web en el zoom y latitud dados"""
+    return RESOLUCION_ZOOM_0_M * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def ruta_indice_overviews(provincia: str) -> str:
+    return os.path.join(MINI_TILES_DIR, provincia, f"{provincia}_overviews_index.json")
+
+
+_indices: Dict[str, Optional[Dict]] = {}
+_tars: Dict[str, Dict[str, str]] = {}
+_espaciales: Dict[Tuple[str, int], object] = {}
+_lock = threading.Lock()
+
+
+def indice_overviews(provincia: str) -> Optional[Dict]:
+    """Índice de overviews de la provincia (cacheado), o None si no se generó"""
+    with _lock:
+        if provincia in _indices:
+            return _indices[provincia]
+    try:
+        with open(ruta_indice_overviews(provincia), 'r') as f:
+            indice = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Overviews de {provincia} no disponibles: {e}")
+        indice = None
+    tars = {
+        tile['filename']: tile['tar_file']
+        for info in (indice or {}).get('niveles', {}).values()
+        for tile in info['tiles'].values()
+    }
+    with _lock:
+        _indices[provincia] = indice
+        _tars[provincia] = tars
+    return indice
+
+
+def nivel_para_zoom(indice: Dict, zoom: float, lat: float) -> int:
+    """
+    Nivel más grueso cuya resolución no es peor que la de pantalla en ese zoom
+    (0 = mini-tiles a resolución completa).
+    """
+    objetivo_m = resolucion_zoom_m(zoom, lat)
+    # Los dos lados en metros a esa latitud: el píxel en grados se angosta en longitud igual que el del mapa
+    metros_por_grado = METROS_POR_GRADO * math.cos(math.radians(lat))
+    nivel_elegido = 0
+    for nivel, info in sorted(indice.get('niveles', {}).items(), key=lambda item: int(item[0])):
+        if info['resolucion'] * metros_por_grado <= objetivo_m:
+            nivel_elegido = int(nivel)
+    return nivel_elegido
+
+
+def tiles_nivel(provincia: str, nivel: int, bbox: Optional[Tuple[float, float, float, float]] = None) -> List[Dict]:
+    """Tiles de un nivel de overview (todos o los que intersectan el bbox west, south, east, north)"""
+    from .spatial_index import TileSpatialIndex
+
+    indice = indice_overviews(provincia)
+    info = (indice or {}).get('niveles', {}).get(str(nivel))
+    if info is None:
+        raise KeyError(nivel)
+
+    clave = (provincia, nivel)
+    with _lock:
+        espacial = _espaciales.get(clave)
+        if espacial is None:
+            espacial = TileSpatialIndex(info['tiles'])
+            _espaciales[clave] = espacial
+
+    tile_ids = espacial.tiles_en_bbox(*bbox) if bbox else espacial.tile_ids
+    return [info['tiles'][tile_id] for tile_id in tile_ids]
+
+
+def buscar_tar_overview(provincia: str, tile_filename: str) -> Optional[str]:
+    """TAR de overviews que contiene el tile, o None"""
+    indice_overviews(provincia)
+    with _lock:
+        return _tars.get(provincia, {}).get(tile_filename)
+
+
+def invalidar_overviews(provincia: Optional[str] = None):
+    """Descarta los índices cacheados (de una provincia o de todas)"""
+    with _lock:
+        if provincia is None:
+            _indices.clear()
+            _tars.clear()
+            _espaciales.clear()
+        else:
+            _indices.pop(provincia, None)
+            _tars.pop(provincia, None)
+            for clave in [c for c in _espaciales if c[0] == provincia]:
+                del _espaciales[clave]
@@ -0,0 +1,96 @@
+"""
+MAIRA 4.0 - Perfil de elevación del lado del servidor
+
+Densifica una polilínea siguiendo círculos máximos (interpolación
+geodésica sobre la esfera) y muestrea todos los puntos en una sola pasada
+vectorizada sobre los mini-tiles.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from .sample_cache import muestrear_memorizado
+
+RADIO_TIERRA_M = 6371008.8
+
+
+def distancia_haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distancia en metros sobre la esfera (vectorizada)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _a_vector(lats, lons) -> np.ndarray:
+    lat, lon = np.radians(lats), np.radians(lons)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def densificar(lats, lons, espaciado_m: float):
+    """
+    Puntos intermedios cada ~espaciado_m metros a lo largo de cada tramo
+    (sobre el círculo máximo). Devuelve (lats, lons, distancia acumulada).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    vectores = _a_vector(lats, lons)
+    largos = distancia_haversine(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+    partes = [vectores[:1]]
+    distancias = [np.zeros(1)]
+    acumulada = 0.0
+    for i, largo in enumerate(largos):
+        n = max(1, int(np.ceil(largo / espaciado_m)))
+        t = np.arange(1, n + 1, dtype=np.float64) / n
+        angulo = largo / RADIO_TIERRA_M
+        if angulo < 1e-12:
+            tramo = np.repeat(vectores[i + 1][None, :], n, axis=0)
+        else:
+            # Interpolación esférica (slerp) entre los extremos del tramo
+            a = np.sin((1 - t) * angulo) / np.sin(angulo)
+            b = np.sin(t * angulo) / np.sin(angulo)
+            tramo = a[:, None] * vectores[i] + b[:, None] * vectores[i + 1]
+        partes.append(tramo)
+        distancias.append(acumulada + t * largo)
+        acumulada += largo
+
+    puntos = np.concatenate(partes)
+    lats_densos = np.degrees(np.arcsin(np.clip(puntos[:, 2], -1, 1)))
+    lons_densos = np.degrees(np.arctan2(puntos[:, 1], puntos[:, 0]))
+    return lats_densos, lons_densos, np.concatenate(distancias)
+
+
+def cantidad_puntos(lats, lons, espaciado_m: float) -> int:
+    """Cantidad de puntos que generaría densificar() (para validar antes de calcular)"""
+    largos = distancia_haversine(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    return 1 + int(np.maximum(1, np.ceil(largos / espaciado_m)).sum())
+
+
+def calcular_perfil(lats, lons, espaciado_m: float) -> Dict:
+    """Distancias, elevaciones, pendientes (%) y ascenso/descenso acumulados de la polilínea"""
+    lats_densos, lons_densos, distancias = densificar(lats, lons, espaciado_m)
+    elevaciones = muestrear_memorizado(lats_densos, lons_densos)
+
+    delta_elevacion = np.diff(elevaciones)
+    delta_distancia = np.diff(distancias)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pendientes = np.where(delta_distancia > 0, delta_elevacion / delta_distancia * 100, 0.0)
+    # La pendiente de cada punto es la del tramo que llega a él; el primero toma la del siguiente
+    pendientes = np.concatenate([pendientes[:1], pendientes]) if len(pendientes) else np.zeros(1)
+
+    validos = delta_elevacion[np.isfinite(delta_elevacion)]
+    validas = elevaciones[np.isfinite(elevaciones)]
+
+    return {
+        'lats': lats_densos,
+        'lons': lons_densos,
+        'distancias': distancias,
+        'elevaciones': elevaciones,
+        'pendientes': pendientes,
+        'distancia_total': float(distancias[-1]),
+        'ascenso_acumulado': float(validos[validos > 0].sum()),
+        'descenso_acumulado': float(-validos[validos < 0].sum()),
+        'elevacion_min': float(validas.min()) if len(validas) else None,
+        'elevacion_max': float(validas.max()) if len(validas) else None
+    }
@@ -0,0 +1,237 @@
+"""
+MAIRA 4.0 - Ruta de menor costo sobre la transitabilidad
+
+A* con heap sobre una grilla métrica local acotada a una ventana alrededor
+de origen y destino. El costo de cada celda es el tiempo por metro
+(s/m) que resulta de la transitabilidad del vehículo; la heurística es la
+distancia octil por el menor costo posible (velocidad base a transitabilidad
+plena), así que es admisible y consistente.
+
+El tamaño de celda crece con la ventana para no superar MAX_CELDAS_LADO por
+lado: la memoria de la búsqueda queda acotada sin importar la distancia.
+"""
+
+import math
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .transitability import (CLASES_VEHICULO, FACTORES_CLIMA, VEHICULO_DEFAULT,
+                             muestrear_transitabilidad)
+
+METROS_POR_GRADO = 111320.0
+RESOLUCION_RUTA_M = 100.0
+MAX_CELDAS_LADO = 400
+MARGEN_MIN_M = 2000.0
+# Fracción de la distancia origen-destino que se agrega alrededor como margen de desvío
+MARGEN_RELATIVO = 0.25
+
+RAIZ_2 = math.sqrt(2)
+VECINOS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+           (1, 1, RAIZ_2), (1, -1, RAIZ_2), (-1, 1, RAIZ_2), (-1, -1, RAIZ_2)]
+
+
+class GrillaRuta:
+    """Ventana de búsqueda: grilla métrica (x al este, y al norte) alrededor de una latitud de referencia"""
+
+    def __init__(self, lat_ref: float, lon_ref: float, x0: float, y0: float,
+                 ancho: int, alto: int, celda_m: float):
+        self.lat_ref = lat_ref
+        self.lon_ref = lon_ref
+        self.metros_lon = METROS_POR_GRADO * math.cos(math.radians(lat_ref))
+        self.x0 = x0
+        self.y0 = y0
+        self.ancho = ancho
+        self.alto = alto
+        self.celda_m = celda_m
+
+    def a_celda(self, lat: float, lon: float) -> int:
+        x = (lon - self.lon_ref) * self.metros_lon
+        y = (lat - self.lat_ref) * METROS_POR_GRADO
+        col = min(self.ancho - 1, max(0, int((x - self.x0) // self.celda_m)))
+        fila = min(self.alto - 1, max(0, int((y - self.y0) // self.celda_m)))
+        return fila * self.ancho + col
+
+    def centros(self, indices) -> Tuple[np.ndarray, np.ndarray]:
+        """Lat/lon del centro de las celdas indicadas"""
+        indices = np.asarray(indices, dtype=np.int64)
+        x = self.x0 + (indices % self.ancho + 0.5) * self.celda_m
+        y = self.y0 + (indices // self.ancho + 0.5) * self.celda_m
+        return self.lat_ref + y / METROS_POR_GRADO, self.lon_ref + x / self.metros_lon
+
+    def xy(self, indices) -> np.ndarray:
+        indices = np.asarray(indices, dtype=np.int64)
+        return np.stack([(indices % self.ancho) * self.celda_m, (indices // self.ancho) * self.celda_m], axis=1)
+
+
+def ventana_busqueda(lat1: float, lon1: float, lat2: float, lon2: float,
+                     resolucion_m: float = RESOLUCION_RUTA_M) -> GrillaRuta:
+    """Grilla que cubre origen y destino con margen, a la resolución pedida o más gruesa"""
+    lat_ref, lon_ref = (lat1 + lat2) / 2, (lon1 + lon2) / 2
+    metros_lon = METROS_POR_GRADO * math.cos(math.radians(lat_ref))
+    xs = [(lon1 - lon_ref) * metros_lon, (lon2 - lon_ref) * metros_lon]
+    ys = [(lat1 - lat_ref) * METROS_POR_GRADO, (lat2 - lat_ref) * METROS_POR_GRADO]
+
+    margen = max(MARGEN_MIN_M, MARGEN_RELATIVO * math.hypot(xs[1] - xs[0], ys[1] - ys[0]))
+    x0, x1 = min(xs) - margen, max(xs) + margen
+    y0, y1 = min(ys) - margen, max(ys) + margen
+
+    celda_m = max(resolucion_m, max(x1 - x0, y1 - y0) / MAX_CELDAS_LADO)
+    ancho = int(math.ceil((x1 - x0) / celda_m))
+    alto = int(math.ceil((y1 - y0) / celda_m))
+    return GrillaRuta(lat_ref, lon_ref, x0, y0, ancho, alto, celda_m)
+
+
+def a_estrella(costos: List[float], ancho: int, alto: int, inicio: int, fin: int,
+               celda_m: float, costo_minimo: float) -> Tuple[Optional[List[int]], List[float], int]:
+    """
+    A* 8-conexo. `costos` es el costo por metro de cada celda (inf = intransitable);
+    el costo de un paso es el promedio de ambas celdas por el largo del paso.
+    Devuelve (camino de celdas o None, costo acumulado por celda, celdas expandidas).
+    """
+    n = ancho * alto
+    infinito = math.inf
+    g = [infinito] * n
+    padre = [-1] * n
+    cerrado = bytearray(n)
+    fin_x, fin_y = fin % ancho, fin // ancho
+    factor_h = celda_m * costo_minimo
+
+    def heuristica(x: int, y: int) -> float:
+        dx, dy = abs(x - fin_x), abs(y - fin_y)
+        return ((dx + dy) + (RAIZ_2 - 2) * min(dx, dy)) * factor_h
+
+    g[inicio] = 0.0
+    heap = [(heuristica(inicio % ancho, inicio // ancho), inicio)]
+    expandidas = 0
+
+    while heap:
+        _, actual = heapq.heappop(heap)
+        if cerrado[actual]:
+            continue
+        cerrado[actual] = 1
+        expandidas += 1
+        if actual == fin:
+            break
+
+        x, y = actual % ancho, actual // ancho
+        g_actual = g[actual]
+        costo_actual = costos[actual]
+        for ox, oy, largo in VECINOS:
+            nx, ny = x + ox, y + oy
+            if nx < 0 or ny < 0 or nx >= ancho or ny >= alto:
+                continue
+            vecino = ny * ancho + nx
+            if cerrado[vecino]:
+                continue
+            costo_vecino = costos[vecino]
+            if costo_vecino == infinito:
+                continue
+            nuevo = g_actual + (costo_actual + costo_vecino) * 0.5 * largo * celda_m
+            if nuevo < g[vecino]:
+                g[vecino] = nuevo
+                padre[vecino] = actual
+                heapq.heappush(heap, (nuevo + heuristica(nx, ny), vecino))
+
+    if not cerrado[fin]:
+        return None, g, expandidas
+
+    camino = [fin]
+    while camino[-1] != inicio:
+        camino.append(padre[camino[-1]])
+    camino.reverse()
+    return camino, g, expandidas
+
+
+def simplificar(puntos: np.ndarray, tolerancia: float) -> List[int]:
+    """Douglas-Peucker iterativo; devuelve los índices de los puntos que se conservan"""
+    if len(puntos) < 3:
+        return list(range(len(puntos)))
+
+    conservar = np.zeros(len(puntos), dtype=bool)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, len(puntos) - 1)]
+    while pendientes:
+        a, b = pendientes.pop()
+        if b - a < 2:
+            continue
+        segmento = puntos[b] - puntos[a]
+        relativos = puntos[a + 1:b] - puntos[a]
+        largo = np.hypot(segmento[0], segmento[1])
+        if largo == 0:
+            distancias = np.hypot(relativos[:, 0], relativos[:, 1])
+        else:
+            distancias = np.abs(segmento[0] * relativos[:, 1] - segmento[1] * relativos[:, 0]) / largo
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            medio = a + 1 + k
+            conservar[medio] = True
+            pendientes.append((a, medio))
+            pendientes.append((medio, b))
+    return [int(i) for i in np.nonzero(conservar)[0]]
+
+
+def ruta_optima(lat1: float, lon1: float, lat2: float, lon2: float,
+                vehiculo: str = VEHICULO_DEFAULT, clima: str = 'clear',
+                resolucion_m: float = RESOLUCION_RUTA_M) -> Optional[Dict]:
+    """
+    Ruta de menor tiempo entre dos puntos para la clase de vehículo.
+    None si no hay camino transitable dentro de la ventana de búsqueda.
+    """
+    grilla = ventana_busqueda(lat1, lon1, lat2, lon2, resolucion_m)
+    todas = np.arange(grilla.ancho * grilla.alto)
+    lats, lons = grilla.centros(todas)
+
+    velocidad_base = CLASES_VEHICULO[vehiculo]['velocidad_base'] * FACTORES_CLIMA.get(clima, 1.0)
+    transitabilidad = muestrear_transitabilidad(lats, lons, vehiculo)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Segundos por metro: 3.6 / velocidad en km/h
+        costos = np.where(transitabilidad > 0, 3.6 / (velocidad_base * transitabilidad), np.inf)
+    costos = np.nan_to_num(costos, nan=np.inf)
+
+    inicio = grilla.a_celda(lat1, lon1)
+    fin = grilla.a_celda(lat2, lon2)
+    if not np.isfinite(costos[inicio]) or not np.isfinite(costos[fin]):
+        return None
+
+    camino, g, expandidas = a_estrella(costos.tolist(), grilla.ancho, grilla.alto, inicio, fin,
+                                       grilla.celda_m, 3.6 / velocidad_base)
+    if camino is None:
+        return None
+
+    xy = grilla.xy(camino)
+    pasos = np.hypot(*np.diff(xy, axis=0).T) if len(camino) > 1 else np.zeros(0)
+    distancia_acumulada = np.concatenate([[0.0], np.cumsum(pasos)])
+    tiempo_acumulado = np.array([g[c] for c in camino])
+
+    vertices = simplificar(xy, grilla.celda_m)
+    lats_camino, lons_camino = grilla.centros(camino)
+    # Los extremos son los puntos pedidos, no el centro de su celda
+    lats_camino[0], lons_camino[0] = lat1, lon1
+    lats_camino[-1], lons_camino[-1] = lat2, lon2
+
+    segmentos = []
+    for a, b in zip(vertices[:-1], vertices[1:]):
+        distancia = float(distancia_acumulada[b] - distancia_acumulada[a])
+        tiempo = float(tiempo_acumulado[b] - tiempo_acumulado[a])
+        segmentos.append({
+            'desde': [round(float(lats_camino[a]), 7), round(float(lons_camino[a]), 7)],
+            'hasta': [round(float(lats_camino[b]), 7), round(float(lons_camino[b]), 7)],
+            'distancia': round(distancia, 1),
+            'tiempo': round(tiempo, 1),
+            'velocidad_media': round(distancia / tiempo * 3.6, 2) if tiempo > 0 else None,
+            'eta': round(float(tiempo_acumulado[b]), 1)
+        })
+
+    return {
+        'vehiculo': vehiculo,
+        'clima': clima,
+        'resolucion': round(grilla.celda_m, 1),
+        'puntos': [[round(float(lats_camino[i]), 7), round(float(lons_camino[i]), 7)] for i in vertices],
+        'segmentos': segmentos,
+        'distancia_total': round(float(distancia_acumulada[-1]), 1),
+        'tiempo_total': round(float(tiempo_acumulado[-1]), 1),
+        'celdas_expandidas': expandidas,
+        'celdas_ventana': grilla.ancho * grilla.alto
+    }
@@ -0,0 +1,123 @@
+"""
+MAIRA 4.0 - Memoización de muestras puntuales de elevación
+
+Mediciones, perfiles y colocación de unidades piden una y otra vez las
+mismas coordenadas. Cada punto se cuantiza a una subgrilla de
+SUBDIVISIONES_PIXEL x SUBDIVISIONES_PIXEL por píxel del tile que lo contiene
+y el valor se interpola en ese punto cuantizado, así la misma clave siempre
+da el mismo valor (el desplazamiento es de 1/8 de píxel como máximo).
+
+Las muestras se guardan por tile como arrays ordenados (claves, valores) en
+una cache LRU acotada en bytes: la búsqueda es vectorizada (searchsorted) y
+un acierto no toca la grilla memory-mapped. Cada entrada lleva la fecha del
+archivo del tile; si el tile se reconstruyó, sus muestras se descartan y el
+tile se vuelve a mapear.
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from .sampling import bilineal
+from .spatial_index import obtener_indice_espacial
+from .tile_cache import TileByteCache
+from .tile_store import CAPA_ELEVACION, RasterTileStore, obtener_store
+
+SUBDIVISIONES_PIXEL = 4
+# Muestras por tile a partir de las que se descartan las viejas (acota el costo de cada fusión)
+MAX_MUESTRAS_TILE = 1 << 18
+
+cache_muestras = TileByteCache(
+    32 * 1024 * 1024,
+    medir=lambda entrada: entrada[1].nbytes + entrada[2].nbytes
+)
+
+_contadores = {'puntos_memorizados': 0, 'puntos_calculados': 0}
+_contadores_lock = threading.Lock()
+
+
+def _muestrear_tile(store: RasterTileStore, tile_id: str, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    try:
+        fecha = os.stat(store.ruta_datos(tile_id)).st_mtime_ns
+    except OSError:
+        raise KeyError(tile_id)
+
+    clave_cache = (store.capa, tile_id)
+    entrada = cache_muestras.obtener(clave_cache)
+    if entrada is not None and entrada[0] != fecha:
+        # El tile se reconstruyó: se descartan sus muestras y se vuelve a mapear
+        store.olvidar(tile_id)
+        entrada = None
+    raster = store.cargar(tile_id)
+
+    ancho_q = raster.ancho * SUBDIVISIONES_PIXEL + 1
+    col, fila = raster.a_pixel(lons, lats)
+    cols_q = np.clip(np.rint(col * SUBDIVISIONES_PIXEL), 0, ancho_q - 1).astype(np.int64)
+    filas_q = np.clip(np.rint(fila * SUBDIVISIONES_PIXEL), 0, raster.alto * SUBDIVISIONES_PIXEL).astype(np.int64)
+    claves, inversa = np.unique(filas_q * ancho_q + cols_q, return_inverse=True)
+
+    valores = np.full(len(claves), np.nan, dtype=np.float64)
+    faltan = np.ones(len(claves), dtype=bool)
+    if entrada is not None and len(entrada[1]):
+        _, conocidas, conocidos = entrada
+        posiciones = np.minimum(np.searchsorted(conocidas, claves), len(conocidas) - 1)
+        aciertos = conocidas[posiciones] == claves
+        valores[aciertos] = conocidos[posiciones[aciertos]]
+        faltan = ~aciertos
+
+    nuevas = claves[faltan]
+    if len(nuevas):
+        lons_q, lats_q = raster.a_coordenadas((nuevas % ancho_q) / SUBDIVISIONES_PIXEL,
+                                              (nuevas // ancho_q) / SUBDIVISIONES_PIXEL)
+        valores[faltan] = bilineal(raster, lons_q, lats_q)
+
+        todas, todos = nuevas, valores[faltan].astype(np.float32)
+        if entrada is not None and len(entrada[1]) + len(nuevas) <= MAX_MUESTRAS_TILE:
+            todas = np.concatenate([entrada[1], nuevas])
+            todos = np.concatenate([entrada[2], todos])
+        orden = np.argsort(todas, kind='stable')
+        cache_muestras.guardar(clave_cache, (fecha, todas[orden], todos[orden]))
+
+    with _contadores_lock:
+        _contadores['puntos_memorizados'] += int(len(claves) - len(nuevas))
+        _contadores['puntos_calculados'] += int(len(nuevas))
+    return valores[inversa]
+
+
+def muestrear_memorizado(lats, lons, capa: str = CAPA_ELEVACION) -> np.ndarray:
+    """Como sampling.muestrear (bilineal), pero sobre coordenadas cuantizadas y memorizadas"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    store = obtener_store(capa)
+    indice = obtener_indice_espacial(capa)
+
+    resultado = np.full(len(lats), np.nan, dtype=np.float64)
+    posiciones = indice.resolver_puntos(lons, lats)
+
+    for posicion in np.unique(posiciones):
+        if posicion < 0:
+            continue
+        seleccion = posiciones == posicion
+        try:
+            resultado[seleccion] = _muestrear_tile(store, indice.tile_ids[posicion], lons[seleccion], lats[seleccion])
+        except KeyError:
+            continue
+
+    return resultado
+
+
+def invalidar_tile(tile_id: str, capa: Optional[str] = None) -> int:
+    """Descarta las muestras memorizadas de un tile (de una capa o de todas)"""
+    return cache_muestras.invalidar(
+        lambda clave: clave[1] == tile_id and (capa is None or clave[0] == capa)
+    )
+
+
+def estadisticas() -> Dict:
+    with _contadores_lock:
+        contadores = dict(_contadores)
+    consultados = contadores['puntos_memorizados'] + contadores['puntos_calculados']
+    contadores['tasa_memorizados'] = round(contadores['puntos_memorizados'] / consultados, 4) if consultados else 0.0
+    return {**cache_muestras.estadisticas(), **contadores}
@@ -0,0 +1,95 @@
+"""
+MAIRA 4.0 - Muestreo vectorizado de capas raster del store
+
+Agrupa los puntos por mini-tile y calcula los valores con interpolación
+bilineal sobre las grillas memory-mapped, ignorando los píxeles nodata.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .tile_store import CAPA_ELEVACION, TileRaster, obtener_store
+from .spatial_index import obtener_indice_espacial
+
+
+def bilineal(raster: TileRaster, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """Interpolación bilineal en un tile, con los vecinos nodata excluidos del promedio"""
+    col, fila = raster.a_pixel(lons, lats)
+    # Los valores del raster representan el centro de cada píxel
+    col = np.clip(col - 0.5, 0, raster.ancho - 1)
+    fila = np.clip(fila - 0.5, 0, raster.alto - 1)
+
+    c0 = np.floor(col).astype(np.int64)
+    f0 = np.floor(fila).astype(np.int64)
+    c1 = np.minimum(c0 + 1, raster.ancho - 1)
+    f1 = np.minimum(f0 + 1, raster.alto - 1)
+    tc = col - c0
+    tf = fila - f0
+
+    datos = raster.datos
+    valores = np.stack([datos[f0, c0], datos[f0, c1], datos[f1, c0], datos[f1, c1]]).astype(np.float64)
+    pesos = np.stack([(1 - tc) * (1 - tf), tc * (1 - tf), (1 - tc) * tf, tc * tf])
+
+    validos = np.isfinite(valores)
+    if raster.nodata is not None:
+        validos &= valores != raster.nodata
+    pesos = np.where(validos, pesos, 0.0)
+    suma_pesos = pesos.sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resultado = (np.where(validos, valores, 0.0) * pesos).sum(axis=0) / suma_pesos
+    resultado[suma_pesos <= 0] = np.nan
+    return resultado
+
+
+def vecino_cercano(raster: TileRaster, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """Valor del píxel que contiene cada punto (para capas que no se interpolan, como la orientación)"""
+    col, fila = raster.a_pixel(lons, lats)
+    col = np.clip(np.floor(col).astype(np.int64), 0, raster.ancho - 1)
+    fila = np.clip(np.floor(fila).astype(np.int64), 0, raster.alto - 1)
+
+    resultado = raster.datos[fila, col].astype(np.float64)
+    if raster.nodata is not None:
+        resultado[resultado == raster.nodata] = np.nan
+    return resultado
+
+
+def muestrear(lats, lons, capa: str = CAPA_ELEVACION, interpolar: bool = True) -> np.ndarray:
+    """Valores de la capa en cada punto (NaN donde no hay tile o datos)"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    store = obtener_store(capa)
+    indice = obtener_indice_espacial(capa)
+
+    resultado = np.full(len(lats), np.nan, dtype=np.float64)
+    posiciones = indice.resolver_puntos(lons, lats)
+
+    for posicion in np.unique(posiciones):
+        if posicion < 0:
+            continue
+        seleccion = posiciones == posicion
+        try:
+            raster = store.cargar(indice.tile_ids[posicion])
+        except KeyError:
+            continue
+        metodo = bilineal if interpolar else vecino_cercano
+        resultado[seleccion] = metodo(raster, lons[seleccion], lats[seleccion])
+
+    return resultado
+
+
+def parsear_puntos(puntos) -> Tuple[np.ndarray, np.ndarray]:
+    """Acepta [[lat, lng], ...] o [{'lat':..., 'lng':...}, ...]; devuelve (lats, lons)"""
+    if puntos and isinstance(puntos[0], dict):
+        lats = [p['lat'] for p in puntos]
+        lons = [p['lng'] if 'lng' in p else p['lon'] for p in puntos]
+    else:
+        lats = [p[0] for p in puntos]
+        lons = [p[1] for p in puntos]
+    return np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+
+
+def a_lista(valores: np.ndarray, decimales: int = 2) -> List[Optional[float]]:
+    """Array a lista JSON, con None en lugar de NaN"""
+    return [None if not np.isfinite(v) else round(float(v), decimales) for v in valores]
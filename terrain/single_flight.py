@@ -0,0 +1,54 @@
+"""
+MAIRA 4.0 - Coalescencia de operaciones concurrentes (single-flight)
+
+Si varios requests piden al mismo tiempo la misma descarga o extracción,
+sólo el primero la ejecuta; el resto espera y recibe el mismo resultado
+(o la misma excepción).
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Llamada:
+    def __init__(self):
+        self.terminada = threading.Event()
+        self.resultado: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """Ejecuta una sola vez cada operación en curso por clave"""
+
+    def __init__(self):
+        self._en_curso: Dict[Hashable, _Llamada] = {}
+        self._lock = threading.Lock()
+
+    def ejecutar(self, clave: Hashable, funcion: Callable[[], Any]) -> Any:
+        with self._lock:
+            llamada = self._en_curso.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = _Llamada()
+                self._en_curso[clave] = llamada
+
+        if not lider:
+            llamada.terminada.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = funcion()
+            return llamada.resultado
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            llamada.terminada.set()
+
+    def en_curso(self) -> int:
+        with self._lock:
+            return len(self._en_curso)
@@ -0,0 +1,152 @@
+"""
+MAIRA 4.0 - Pendiente y orientación por diferencias finitas
+
+Método de Horn (ventana 3x3) vectorizado sobre toda la grilla. La entrada
+lleva un halo de un píxel alrededor del tile, así los bordes usan los
+vecinos reales del tile contiguo en lugar de quedar sesgados.
+
+Codificación compacta para los tiles de pendiente (GeoTIFF int16, 2 bandas):
+    banda 1: pendiente en centésimas de grado (0-9000)
+    banda 2: orientación en décimas de grado, sentido horario desde el norte (0-3599)
+    -1 = sin dato (o terreno plano, para la orientación)
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+METROS_POR_GRADO = 111320.0
+ESCALA_PENDIENTE = 100
+ESCALA_ORIENTACION = 10
+NODATA_PENDIENTE = -1
+
+# <provincia>_tile_NNNN_pendiente.tif junto a <provincia>_tile_NNNN.tif en el mismo TAR
+SUFIJO_PENDIENTE = '_pendiente'
+CAPA_PENDIENTE = 'pendiente'
+CAPA_ORIENTACION = 'orientacion'
+
+
+def pendiente_orientacion(elevacion_con_halo: np.ndarray, geotransform: Tuple[float, ...],
+                          nodata: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pendiente y orientación (grados, float32, NaN sin dato) del interior de la grilla.
+
+    Args:
+        elevacion_con_halo: Grilla (alto + 2, ancho + 2) con un píxel de halo
+        geotransform: Geotransform estilo GDAL de la grilla con halo (en grados)
+        nodata: Valor sin dato de la elevación
+    """
+    z = elevacion_con_halo.astype(np.float64)
+    if nodata is not None:
+        z[elevacion_con_halo == nodata] = np.nan
+
+    x0, dx, _, y0, _, dy = geotransform
+    alto = z.shape[0] - 2
+
+    # Tamaño de píxel en metros; el ancho depende de la latitud de cada fila
+    lats_filas = y0 + (np.arange(alto) + 1.5) * dy
+    dx_m = (abs(dx) * METROS_POR_GRADO * np.cos(np.radians(lats_filas)))[:, None]
+    dy_m = abs(dy) * METROS_POR_GRADO
+
+    a, b, c = z[:-2, :-2], z[:-2, 1:-1], z[:-2, 2:]
+    d, f = z[1:-1, :-2], z[1:-1, 2:]
+    g, h, i = z[2:, :-2], z[2:, 1:-1], z[2:, 2:]
+
+    gradiente_este = ((c + 2 * f + i) - (a + 2 * d + g)) / (8 * dx_m)
+    gradiente_norte = ((a + 2 * b + c) - (g + 2 * h + i)) / (8 * dy_m)
+
+    pendiente = np.degrees(np.arctan(np.hypot(gradiente_este, gradiente_norte)))
+    # La orientación es hacia donde cae la pendiente (opuesto al gradiente)
+    orientacion = np.degrees(np.arctan2(-gradiente_este, -gradiente_norte)) % 360
+    orientacion[(gradiente_este == 0) & (gradiente_norte == 0)] = np.nan
+
+    return pendiente.astype(np.float32), orientacion.astype(np.float32)
+
+
+def agregar_halo(datos: np.ndarray, faltantes: Tuple[int, int, int, int]) -> np.ndarray:
+    """
+    Completa replicando el borde los lados donde no hubo vecinos para el halo.
+
+    Args:
+        faltantes: Píxeles de halo que faltan (arriba, abajo, izquierda, derecha)
+    """
+    arriba, abajo, izquierda, derecha = faltantes
+    if not any(faltantes):
+        return datos
+    return np.pad(datos, ((arriba, abajo), (izquierda, derecha)), mode='edge')
+
+
+def codificar(pendiente: np.ndarray, orientacion: np.ndarray) -> np.ndarray:
+    """Pendiente/orientación en grados a la grilla int16 de 2 bandas de los tiles"""
+    bandas = np.full((2,) + pendiente.shape, NODATA_PENDIENTE, dtype=np.int16)
+    validos = np.isfinite(pendiente)
+    bandas[0][validos] = np.rint(pendiente[validos] * ESCALA_PENDIENTE)
+    validos = np.isfinite(orientacion)
+    bandas[1][validos] = np.rint(orientacion[validos] * ESCALA_ORIENTACION).astype(np.int16) % (360 * ESCALA_ORIENTACION)
+    return bandas
+
+
+def decodificar(valores: np.ndarray, escala: int) -> np.ndarray:
+    """Valores int16 codificados a grados (NaN donde no hay dato)"""
+    grados = np.asarray(valores, dtype=np.float64) / escala
+    grados[np.asarray(valores) == NODATA_PENDIENTE] = np.nan
+    return grados
+
+
+def tamaño_pixel_m(geotransform: Tuple[float, ...], lat: float) -> Tuple[float, float]:
+    """Tamaño aproximado de un píxel en metros (ancho, alto) a una latitud"""
+    return (abs(geotransform[1]) * METROS_POR_GRADO * math.cos(math.radians(lat)),
+            abs(geotransform[5]) * METROS_POR_GRADO)
+
+
+def muestrear_pendiente(lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pendiente y orientación (grados, NaN sin dato) en cada punto, leídas de
+    las capas precalculadas del store. La orientación no se interpola (es
+    circular): se toma el píxel que contiene al punto.
+    """
+    from .sampling import muestrear
+
+    pendiente = muestrear(lats, lons, CAPA_PENDIENTE) / ESCALA_PENDIENTE
+    orientacion = muestrear(lats, lons, CAPA_ORIENTACION, interpolar=False) / ESCALA_ORIENTACION
+    return pendiente, orientacion
+
+
+def pendiente_de_raster(raster) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pendiente y orientación (grados) de un tile de elevación del store,
+    calculadas al vuelo. El halo se completa muestreando los tiles vecinos;
+    donde no hay vecino se replica el borde.
+    """
+    from .sampling import muestrear
+
+    z = raster.como_float()
+    halo = np.pad(z, 1, mode='constant', constant_values=np.nan)
+    borde = np.zeros(halo.shape, dtype=bool)
+    borde[0, :] = borde[-1, :] = borde[:, 0] = borde[:, -1] = True
+
+    filas, cols = np.nonzero(borde)
+    # Centro de cada píxel del halo (las coordenadas del halo están corridas un píxel)
+    lons, lats = raster.a_coordenadas(cols - 0.5, filas - 0.5)
+    halo[filas, cols] = muestrear(lats, lons)
+    halo = np.where(np.isnan(halo) & borde, np.pad(z, 1, mode='edge'), halo)
+
+    x0, dx, _, y0, _, dy = raster.geotransform
+    return pendiente_orientacion(halo, (x0 - dx, dx, 0.0, y0 - dy, 0.0, dy))
+
+
+def pendiente_de_tile(tile_id: str) -> np.ndarray:
+    """
+    Pendiente (grados, NaN sin dato) de un tile de elevación: desde la capa
+    precalculada si está en el store, si no calculada desde la elevación.
+    KeyError si el tile de elevación no está en el store.
+    """
+    from .tile_store import CAPA_ELEVACION, obtener_store
+
+    store_pendiente = obtener_store(CAPA_PENDIENTE)
+    if store_pendiente.existe(tile_id):
+        return decodificar(store_pendiente.cargar(tile_id).datos, ESCALA_PENDIENTE).astype(np.float32)
+
+    pendiente, _ = pendiente_de_raster(obtener_store(CAPA_ELEVACION).cargar(tile_id))
+    return pendiente
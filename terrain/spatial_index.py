@@ -0,0 +1,183 @@
+"""
+MAIRA 4.0 - Índice espacial de mini-tiles
+
+Grilla regular (hash de celdas) sobre los bounds de los mini-tiles: cada
+celda guarda los tiles que la intersectan, así resolver un punto, un bbox o
+una polilínea sólo mira un puñado de candidatos en lugar de recorrer todos
+los tiles de la provincia.
+"""
+
+import os
+import json
+import math
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .config import MINI_TILES_DIR
+from .tile_store import CAPA_ELEVACION, obtener_store
+
+logger = logging.getLogger(__name__)
+
+
+class TileSpatialIndex:
+    """Hash de celdas regulares sobre los bounds de los tiles"""
+
+    def __init__(self, tiles: Dict[str, Dict]):
+        """
+        Args:
+            tiles: tile_id -> metadatos con al menos 'bounds' {west, south, east, north}
+        """
+        self.tile_ids: List[str] = list(tiles)
+        self.metadatos: List[Dict] = [tiles[t] for t in self.tile_ids]
+        self.posiciones: Dict[str, int] = {t: i for i, t in enumerate(self.tile_ids)}
+
+        bounds = [m['bounds'] for m in self.metadatos]
+        self.west = np.array([b['west'] for b in bounds], dtype=np.float64)
+        self.east = np.array([b['east'] for b in bounds], dtype=np.float64)
+        self.south = np.array([b['south'] for b in bounds], dtype=np.float64)
+        self.north = np.array([b['north'] for b in bounds], dtype=np.float64)
+
+        # Celda del tamaño típico de un tile: cada tile cae en muy pocas celdas
+        if self.tile_ids:
+            self.celda = float(max(np.median(self.east - self.west), np.median(self.north - self.south)))
+        else:
+            self.celda = 1.0
+        self.celdas: Dict[Tuple[int, int], List[int]] = {}
+
+        for i in range(len(self.tile_ids)):
+            for clave in self._celdas_bbox(self.west[i], self.south[i], self.east[i], self.north[i]):
+                self.celdas.setdefault(clave, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.tile_ids)
+
+    def _celdas_bbox(self, west: float, south: float, east: float, north: float) -> Iterable[Tuple[int, int]]:
+        ix0, ix1 = math.floor(west / self.celda), math.floor(east / self.celda)
+        iy0, iy1 = math.floor(south / self.celda), math.floor(north / self.celda)
+        for ix in range(ix0, ix1 + 1):
+            for iy in range(iy0, iy1 + 1):
+                yield (ix, iy)
+
+    def resolver_puntos(self, lons, lats) -> np.ndarray:
+        """Posición del tile que contiene cada punto (-1 si ninguno)"""
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        resultado = np.full(len(lons), -1, dtype=np.int64)
+        if not self.tile_ids:
+            return resultado
+
+        ix = np.floor(lons / self.celda).astype(np.int64)
+        iy = np.floor(lats / self.celda).astype(np.int64)
+        celdas_puntos = np.stack([ix, iy], axis=1)
+        unicas, inversa = np.unique(celdas_puntos, axis=0, return_inverse=True)
+        inversa = inversa.reshape(-1)
+
+        for k, (cx, cy) in enumerate(unicas):
+            candidatos = self.celdas.get((int(cx), int(cy)))
+            if not candidatos:
+                continue
+            seleccion = np.nonzero(inversa == k)[0]
+            for tile in candidatos:
+                pendientes = seleccion[resultado[seleccion] < 0]
+                if not len(pendientes):
+                    break
+                dentro = (
+                    (self.west[tile] <= lons[pendientes]) & (lons[pendientes] < self.east[tile]) &
+                    (self.south[tile] < lats[pendientes]) & (lats[pendientes] <= self.north[tile])
+                )
+                resultado[pendientes[dentro]] = tile
+        return resultado
+
+    def tiles_en_bbox(self, west: float, south: float, east: float, north: float) -> List[str]:
+        """Tiles que intersectan el bbox"""
+        vistos = set()
+        for clave in self._celdas_bbox(west, south, east, north):
+            vistos.update(self.celdas.get(clave, ()))
+        return [
+            self.tile_ids[i] for i in sorted(vistos)
+            if self.west[i] < east and west < self.east[i] and self.south[i] < north and south < self.north[i]
+        ]
+
+    def tiles_en_polilinea(self, lats, lons) -> List[str]:
+        """Tiles que atraviesa una polilínea (densificada a un cuarto de celda)"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        paso = self.celda / 4
+        muestras_lat, muestras_lon = [lats[:1]], [lons[:1]]
+        for i in range(len(lats) - 1):
+            largo = math.hypot(lats[i + 1] - lats[i], lons[i + 1] - lons[i])
+            n = max(1, math.ceil(largo / paso))
+            t = np.arange(1, n + 1) / n
+            muestras_lat.append(lats[i] + (lats[i + 1] - lats[i]) * t)
+            muestras_lon.append(lons[i] + (lons[i + 1] - lons[i]) * t)
+
+        posiciones = self.resolver_puntos(np.concatenate(muestras_lon), np.concatenate(muestras_lat))
+        ordenados = dict.fromkeys(int(p) for p in posiciones if p >= 0)
+        return [self.tile_ids[p] for p in ordenados]
+
+    def metadatos_tile(self, tile_id: str) -> Optional[Dict]:
+        posicion = self.posiciones.get(tile_id)
+        return None if posicion is None else self.metadatos[posicion]
+
+
+def cargar_indices_mini_tiles(base_dir: str) -> Dict[str, Dict]:
+    """Tiles de todas las provincias a partir del índice maestro y los índices provinciales"""
+    master_path = os.path.join(base_dir, 'master_mini_tiles_index.json')
+    with open(master_path, 'r') as f:
+        master = json.load(f)
+
+    tiles = {}
+    for provincia, info in master.get('provincias', {}).items():
+        index_file = info.get('index_file', f"{provincia}_mini_tiles_index.json")
+        for candidato in (os.path.join(base_dir, provincia, index_file), os.path.join(base_dir, index_file)):
+            if os.path.exists(candidato):
+                with open(candidato, 'r') as f:
+                    indice = json.load(f)
+                for tile_id, tile in indice.get('tiles', {}).items():
+                    tiles[tile_id] = {**tile, 'provincia': provincia}
+                break
+        else:
+            logger.warning(f"⚠️ Índice de {provincia} no encontrado ({index_file})")
+    return tiles
+
+
+_indices: Dict[str, TileSpatialIndex] = {}
+_indices_lock = threading.Lock()
+
+
+def obtener_indice_espacial(capa: str = CAPA_ELEVACION) -> TileSpatialIndex:
+    """
+    Índice espacial compartido por proceso. Para la elevación se arma desde el
+    índice maestro de mini-tiles; si no está disponible (o para otras capas),
+    desde el indice.json de la capa en el store.
+    """
+    with _indices_lock:
+        indice = _indices.get(capa)
+        if indice is not None:
+            return indice
+
+        tiles = None
+        if capa == CAPA_ELEVACION:
+            try:
+                tiles = cargar_indices_mini_tiles(MINI_TILES_DIR)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Índice maestro de mini-tiles no disponible, usando el store: {e}")
+        if not tiles:
+            tiles = obtener_store(capa).indice()
+
+        indice = TileSpatialIndex(tiles)
+        _indices[capa] = indice
+        logger.info(f"🧭 Índice espacial '{capa}': {len(indice)} tiles en {len(indice.celdas)} celdas")
+        return indice
+
+
+def invalidar_indice_espacial(capa: Optional[str] = None):
+    """Descarta el índice (de una capa o de todas) para reconstruirlo en el próximo uso"""
+    with _indices_lock:
+        if capa is None:
+            _indices.clear()
+        else:
+            _indices.pop(capa, None)
@@ -0,0 +1,153 @@
+"""
+MAIRA 4.0 - Cache LRU en memoria para bytes de mini-tiles
+
+Cache acotada por tamaño total en bytes: cuando se supera el presupuesto se
+descartan los tiles usados hace más tiempo. Lleva contadores de aciertos,
+fallos y desalojos, y un ranking de los tiles más pedidos que se persiste
+para poder precalentar la cache al arrancar.
+"""
+
+import os
+import json
+import threading
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TileByteCache:
+    """Cache LRU con presupuesto en bytes (por defecto, de valores bytes)"""
+
+    def __init__(self, max_bytes: int, medir: Callable[[Any], int] = len):
+        """
+        Args:
+            max_bytes: Presupuesto total de la cache
+            medir: Tamaño en bytes de cada valor (len para bytes, nbytes para arrays)
+        """
+        self.max_bytes = max_bytes
+        self.medir = medir
+        self._datos: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        with self._lock:
+            datos = self._datos.get(clave)
+            if datos is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return datos
+
+    def guardar(self, clave: Hashable, datos: Any):
+        tamaño = self.medir(datos)
+        if tamaño > self.max_bytes:
+            return
+
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= self.medir(anterior)
+
+            self._datos[clave] = datos
+            self._bytes += tamaño
+
+            while self._bytes > self.max_bytes:
+                _, descartado = self._datos.popitem(last=False)
+                self._bytes -= self.medir(descartado)
+                self.desalojos += 1
+
+    def obtener_o_cargar(self, clave: Hashable, cargar: Callable[[], Any]) -> Any:
+        """Devuelve el valor cacheado o lo carga con `cargar` y lo guarda"""
+        datos = self.obtener(clave)
+        if datos is None:
+            datos = cargar()
+            self.guardar(clave, datos)
+        return datos
+
+    def invalidar(self, filtro: Callable[[Hashable], bool]) -> int:
+        """Elimina las entradas cuya clave cumple `filtro`; devuelve cuántas"""
+        with self._lock:
+            claves = [clave for clave in self._datos if filtro(clave)]
+            for clave in claves:
+                self._bytes -= self.medir(self._datos.pop(clave))
+        return len(claves)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0
+            }
+
+
+class TilePopularity:
+    """Ranking de tiles más pedidos, persistido en JSON para el precalentado"""
+
+    def __init__(self, path: str, max_entradas: int = 500, guardar_cada: int = 200):
+        self.path = path
+        self.max_entradas = max_entradas
+        self.guardar_cada = guardar_cada
+        self._contador: Counter = Counter()
+        self._pendientes = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, tar_path: str, miembro: str):
+        with self._lock:
+            self._contador[(tar_path, miembro)] += 1
+            self._pendientes += 1
+            guardar = self._pendientes >= self.guardar_cada
+        if guardar:
+            self.guardar()
+
+    def mas_pedidos(self, limite: Optional[int] = None) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [clave for clave, _ in self._contador.most_common(limite or self.max_entradas)]
+
+    def cargar(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                entradas = json.load(f)
+            with self._lock:
+                for entrada in entradas:
+                    self._contador[(entrada['archivo'], entrada['tile'])] += entrada['pedidos']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Ranking de tiles ilegible {self.path}: {e}")
+
+    def guardar(self):
+        with self._lock:
+            entradas = [
+                {'archivo': archivo, 'tile': tile, 'pedidos': pedidos}
+                for (archivo, tile), pedidos in self._contador.most_common(self.max_entradas)
+            ]
+            self._pendientes = 0
+        try:
+            directorio = os.path.dirname(self.path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(entradas, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo guardar el ranking de tiles: {e}")
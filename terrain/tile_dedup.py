@@ -0,0 +1,59 @@
+"""
+MAIRA 4.0 - Tiles sin dato, constantes y duplicados en la construcción
+
+Al cortar mini-tiles (scripts/crear_mini_tiles.py y
+tools/vegetation_tile_processor.py), los tiles sin ningún píxel con dato
+(mar, fuera de la frontera) o con un único valor no se escriben: el índice
+lleva una entrada con 'sintetico' y lo necesario para reconstruirlos.
+
+Del resto se calcula un hash del contenido de píxeles (no del GeoTIFF, que
+incluye la georreferenciación). Un tile idéntico a uno ya guardado no se
+vuelve a empaquetar: su entrada apunta al archivo del primero y lleva
+'duplicado_de'. Quien lo lea toma la georreferenciación de los bounds de su
+propia entrada, no de la del archivo.
+"""
+
+import hashlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+TIPO_SIN_DATO = 'sin_dato'
+TIPO_CONSTANTE = 'constante'
+
+
+def es_sin_dato(datos: np.ndarray, nodata) -> bool:
+    """True si ningún píxel tiene dato"""
+    if nodata is None:
+        return False
+    if np.isnan(nodata):
+        return bool(np.isnan(datos).all())
+    return bool((datos == nodata).all())
+
+
+def valor_constante(datos: np.ndarray, nodata) -> Optional[float]:
+    """Valor único del tile si todos sus píxeles tienen dato y son iguales; si no, None"""
+    primero = datos.flat[0]
+    if np.isnan(primero) or (nodata is not None and primero == nodata):
+        return None
+    if not (datos == primero).all():
+        return None
+    return primero.item()
+
+
+def hash_contenido(*grillas: np.ndarray) -> str:
+    """Hash de los píxeles (tipo, forma y bytes) de una o más grillas"""
+    h = hashlib.sha256()
+    for grilla in grillas:
+        grilla = np.ascontiguousarray(grilla)
+        h.update(f"{grilla.dtype.str}{grilla.shape}".encode('ascii'))
+        h.update(grilla.tobytes())
+    return h.hexdigest()[:32]
+
+
+def geotransform_de_bounds(bounds: Dict, ancho: int, alto: int) -> Tuple[float, ...]:
+    """Geotransform estilo GDAL (norte arriba) de una grilla de ancho x alto sobre los bounds"""
+    return (
+        bounds['west'], (bounds['east'] - bounds['west']) / ancho, 0.0,
+        bounds['north'], 0.0, -(bounds['north'] - bounds['south']) / alto
+    )
@@ -0,0 +1,210 @@
+"""
+MAIRA 4.0 - Store de mini-tiles pre-decodificados
+
+Cada mini-tile (GeoTIFF) se convierte una sola vez a un `.npy` con la grilla
+de píxeles y un `.json` chico con la georreferenciación. Del lado del
+servidor los arrays se abren con `np.load(mmap_mode='r')`: no hay que
+parsear nada y el page cache del sistema operativo se comparte entre
+workers. La elevación se guarda en metros enteros (int16), la mitad de
+bytes que float32.
+
+Estructura en disco:
+    <store>/<capa>/indice.json        {tile_id: {bounds, width, height, ...}}
+    <store>/<capa>/<tile_id>.npy      grilla (alto x ancho)
+    <store>/<capa>/<tile_id>.json     cabecera: geotransform, nodata, bounds
+"""
+
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .config import TILE_STORE_DIR
+
+logger = logging.getLogger(__name__)
+
+CAPA_ELEVACION = 'elevacion'
+NODATA_INT16 = -32768
+
+
+class TileRaster:
+    """Grilla de un mini-tile con su georreferenciación (geotransform estilo GDAL)"""
+
+    def __init__(self, tile_id: str, datos: np.ndarray, cabecera: Dict):
+        self.tile_id = tile_id
+        self.datos = datos
+        self.geotransform: Tuple[float, ...] = tuple(cabecera['geotransform'])
+        self.nodata = cabecera.get('nodata')
+        self.bounds: Dict[str, float] = cabecera['bounds']
+
+    @property
+    def alto(self) -> int:
+        return self.datos.shape[0]
+
+    @property
+    def ancho(self) -> int:
+        return self.datos.shape[1]
+
+    def a_pixel(self, lon, lat):
+        """Coordenadas de píxel (fraccionarias, columna y fila) de lon/lat; 0.0 es el borde del píxel"""
+        x0, dx, _, y0, _, dy = self.geotransform
+        col = (np.asarray(lon, dtype=np.float64) - x0) / dx
+        fila = (np.asarray(lat, dtype=np.float64) - y0) / dy
+        return col, fila
+
+    def a_coordenadas(self, col, fila):
+        """Lon/lat de coordenadas de píxel (fraccionarias)"""
+        x0, dx, _, y0, _, dy = self.geotransform
+        return x0 + np.asarray(col) * dx, y0 + np.asarray(fila) * dy
+
+    def como_float(self) -> np.ndarray:
+        """Copia en float32 con NaN en lugar del valor nodata"""
+        datos = self.datos.astype(np.float32)
+        if self.nodata is not None:
+            datos[self.datos == self.nodata] = np.nan
+        return datos
+
+
+class RasterTileStore:
+    """Acceso a las grillas memory-mapped de una capa del store"""
+
+    def __init__(self, base_dir: str, capa: str, max_abiertos: int = 512):
+        self.capa = capa
+        self.directorio = os.path.join(base_dir, capa)
+        self.max_abiertos = max_abiertos
+        self._abiertos: 'OrderedDict[str, TileRaster]' = OrderedDict()
+        self._indice: Optional[Dict[str, Dict]] = None
+        self._lock = threading.Lock()
+
+    def ruta_datos(self, tile_id: str) -> str:
+        return os.path.join(self.directorio, f"{tile_id}.npy")
+
+    def ruta_cabecera(self, tile_id: str) -> str:
+        return os.path.join(self.directorio, f"{tile_id}.json")
+
+    def indice(self) -> Dict[str, Dict]:
+        """Índice de la capa: tile_id -> metadatos (bounds, tamaño)"""
+        with self._lock:
+            if self._indice is None:
+                ruta = os.path.join(self.directorio, 'indice.json')
+                try:
+                    with open(ruta, 'r') as f:
+                        self._indice = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"⚠️ Índice de la capa {self.capa} no disponible: {e}")
+                    self._indice = {}
+            return self._indice
+
+    def existe(self, tile_id: str) -> bool:
+        return os.path.exists(self.ruta_datos(tile_id))
+
+    def cargar(self, tile_id: str) -> TileRaster:
+        """Abre (memory-mapped) un tile de la capa. KeyError si no está en el store."""
+        with self._lock:
+            raster = self._abiertos.get(tile_id)
+            if raster is not None:
+                self._abiertos.move_to_end(tile_id)
+                return raster
+
+        if not self.existe(tile_id):
+            raise KeyError(tile_id)
+
+        with open(self.ruta_cabecera(tile_id), 'r') as f:
+            cabecera = json.load(f)
+        raster = TileRaster(tile_id, np.load(self.ruta_datos(tile_id), mmap_mode='r'), cabecera)
+
+        with self._lock:
+            self._abiertos[tile_id] = raster
+            while len(self._abiertos) > self.max_abiertos:
+                self._abiertos.popitem(last=False)
+        return raster
+
+    def olvidar(self, tile_id: Optional[str] = None):
+        """Descarta los tiles abiertos (todos o uno) para releerlos tras una reconstrucción"""
+        with self._lock:
+            if tile_id is None:
+                self._abiertos.clear()
+                self._indice = None
+            else:
+                self._abiertos.pop(tile_id, None)
+
+
+def a_int16(datos: np.ndarray, nodata) -> Tuple[np.ndarray, Optional[float]]:
+    """
+    Grilla redondeada a enteros en int16, con NODATA_INT16 donde no hay dato
+    (nodata o NaN). Si algún valor no entra en int16 se devuelve sin cambios.
+    """
+    if datos.dtype == np.int16:
+        return datos, nodata
+    validos = np.isfinite(datos) if np.issubdtype(datos.dtype, np.floating) else np.ones(datos.shape, dtype=bool)
+    if nodata is not None and not np.isnan(nodata):
+        validos &= datos != nodata
+    valores = datos[validos]
+    if valores.size and (valores.min() <= NODATA_INT16 - 0.5 or valores.max() >= 32767.5):
+        return datos, nodata
+
+    salida = np.full(datos.shape, NODATA_INT16, dtype=np.int16)
+    salida[validos] = np.rint(valores)
+    return salida, (NODATA_INT16 if nodata is not None or not validos.all() else None)
+
+
+def guardar_tile(directorio: str, tile_id: str, datos: np.ndarray,
+                 geotransform: Tuple[float, ...], nodata, extra: Optional[Dict] = None) -> Dict:
+    """Escribe un tile en el store y devuelve su entrada para indice.json"""
+    os.makedirs(directorio, exist_ok=True)
+    alto, ancho = datos.shape
+    x0, dx, _, y0, _, dy = geotransform
+    bounds = {
+        'west': min(x0, x0 + ancho * dx),
+        'east': max(x0, x0 + ancho * dx),
+        'north': max(y0, y0 + alto * dy),
+        'south': min(y0, y0 + alto * dy)
+    }
+    cabecera = {
+        'id': tile_id,
+        'geotransform': list(geotransform),
+        'nodata': None if nodata is None else float(nodata),
+        'dtype': str(datos.dtype),
+        'width': ancho,
+        'height': alto,
+        'bounds': bounds,
+        **(extra or {})
+    }
+
+    np.save(os.path.join(directorio, f"{tile_id}.npy"), np.ascontiguousarray(datos))
+    with open(os.path.join(directorio, f"{tile_id}.json"), 'w') as f:
+        json.dump(cabecera, f)
+
+    return {'bounds': bounds, 'width': ancho, 'height': alto, **(extra or {})}
+
+
+def guardar_indice(directorio: str, entradas: Dict[str, Dict]):
+    """Escribe (o actualiza) el indice.json de una capa"""
+    ruta = os.path.join(directorio, 'indice.json')
+    indice = {}
+    if os.path.exists(ruta):
+        with open(ruta, 'r') as f:
+            indice = json.load(f)
+    indice.update(entradas)
+    temp_path = f"{ruta}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(indice, f)
+    os.replace(temp_path, ruta)
+
+
+_stores: Dict[str, RasterTileStore] = {}
+_stores_lock = threading.Lock()
+
+
+def obtener_store(capa: str = CAPA_ELEVACION) -> RasterTileStore:
+    """Store compartido por proceso para una capa"""
+    with _stores_lock:
+        store = _stores.get(capa)
+        if store is None:
+            store = RasterTileStore(TILE_STORE_DIR, capa)
+            _stores[capa] = store
+    return store
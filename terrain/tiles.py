@@ -0,0 +1,184 @@
+"""
+MAIRA 4.0 - Acceso a mini-tiles empaquetados
+
+Resuelve en qué archivo TAR está cada tile y lee sus bytes a través del
+índice de offsets, sin extraer archivos al disco.
+"""
+
+import os
+import json
+import struct
+import atexit
+import hashlib
+import threading
+import logging
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from .config import (
+    GITHUB_RELEASE_BASE, MINI_TILES_DIR, VEGETACION_TAR_DIR,
+    TILE_CACHE_MB, TILE_POPULARES_PATH
+)
+from .archive_index import obtener_indice
+from .tile_cache import TileByteCache, TilePopularity
+from .single_flight import SingleFlight
+from .github_proxy import ArchivoNoEncontrado
+
+logger = logging.getLogger(__name__)
+
+cache_tiles = TileByteCache(TILE_CACHE_MB * 1024 * 1024)
+tiles_populares = TilePopularity(TILE_POPULARES_PATH)
+atexit.register(tiles_populares.guardar)
+
+# Coalesce descargas y lecturas concurrentes de la misma clave
+vuelos = SingleFlight()
+
+_tiles_por_provincia: Dict[str, Dict[str, str]] = {}
+_tiles_lock = threading.Lock()
+
+
+def ruta_tar_provincia(provincia: str, tar_filename: str) -> str:
+    return os.path.join(MINI_TILES_DIR, provincia, tar_filename)
+
+
+def ruta_tar_vegetacion(archivo_tar: str) -> str:
+    return os.path.join(VEGETACION_TAR_DIR, archivo_tar)
+
+
+def _cargar_tiles_provincia(provincia: str) -> Dict[str, str]:
+    """Mapa filename -> tar_file a partir del índice JSON de la provincia"""
+    index_path = os.path.join(MINI_TILES_DIR, provincia, f"{provincia}_mini_tiles_index.json")
+    mapa = {}
+    try:
+        with open(index_path, 'r') as f:
+            indice = json.load(f)
+        for tile in indice.get('tiles', {}).values():
+            if tile.get('filename') and tile.get('tar_file'):
+                mapa[tile['filename']] = tile['tar_file']
+                if tile.get('pendiente_filename'):
+                    mapa[tile['pendiente_filename']] = tile['tar_file']
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ No se pudo leer el índice de {provincia}: {e}")
+    return mapa
+
+
+def buscar_tar_tile(provincia: str, tile_filename: str) -> Optional[str]:
+    """Nombre del archivo TAR de la provincia que contiene el tile, o None"""
+    with _tiles_lock:
+        mapa = _tiles_por_provincia.get(provincia)
+        if mapa is None:
+            mapa = _cargar_tiles_provincia(provincia)
+            _tiles_por_provincia[provincia] = mapa
+    return mapa.get(tile_filename)
+
+
+def descargar_tar_vegetacion(archivo_tar: str) -> str:
+    """Descarga el TAR de vegetación desde el release si no está en disco. ArchivoNoEncontrado si no existe."""
+    local_tar_path = ruta_tar_vegetacion(archivo_tar)
+    if not os.path.exists(local_tar_path):
+        vuelos.ejecutar(('descarga', local_tar_path), lambda: _descargar(archivo_tar, local_tar_path))
+    return local_tar_path
+
+
+def _descargar(archivo_tar: str, local_tar_path: str):
+    """Descarga a un archivo temporal y lo renombra al terminar, para no exponer TARs truncados"""
+    if os.path.exists(local_tar_path):
+        return
+    os.makedirs(os.path.dirname(local_tar_path) or '.', exist_ok=True)
+    tar_url = GITHUB_RELEASE_BASE + archivo_tar
+    temp_path = f"{local_tar_path}.{os.getpid()}.part"
+    logger.info(f"📥 Descargando archivo TAR: {tar_url}")
+    try:
+        urllib.request.urlretrieve(tar_url, temp_path)
+        os.replace(temp_path, local_tar_path)
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            raise ArchivoNoEncontrado(archivo_tar) from e
+        raise
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _clave_cache(tar_path: str, tile_filename: str):
+    # La firma del archivo forma parte de la clave: si el TAR se regenera, las entradas viejas no se reutilizan
+    firma = obtener_indice(tar_path).firma_origen()
+    return (os.path.abspath(tar_path), firma['mtime_ns'], tile_filename)
+
+
+def leer_tile(tar_path: str, tile_filename: str) -> bytes:
+    """Bytes del tile dentro del archivo TAR (vía cache). KeyError si no existe."""
+    clave = _clave_cache(tar_path, tile_filename)
+    datos = cache_tiles.obtener_o_cargar(
+        clave,
+        lambda: vuelos.ejecutar(('tile', clave), lambda: obtener_indice(tar_path).leer_miembro(tile_filename))
+    )
+    tiles_populares.registrar(tar_path, tile_filename)
+    return datos
+
+
+def leer_tiles(tar_path: str, tile_filenames: List[str]) -> Dict[str, bytes]:
+    """Bytes de varios tiles del mismo archivo: los que no están en cache se leen en una pasada"""
+    resultado = {}
+    faltantes = []
+    for tile_filename in dict.fromkeys(tile_filenames):
+        datos = cache_tiles.obtener(_clave_cache(tar_path, tile_filename))
+        if datos is None:
+            faltantes.append(tile_filename)
+        else:
+            resultado[tile_filename] = datos
+
+    if faltantes:
+        leidos = obtener_indice(tar_path).leer_miembros(faltantes)
+        for tile_filename, datos in leidos.items():
+            cache_tiles.guardar(_clave_cache(tar_path, tile_filename), datos)
+        resultado.update(leidos)
+
+    for tile_filename in resultado:
+        tiles_populares.registrar(tar_path, tile_filename)
+    return resultado
+
+
+def empaquetar_tiles(tiles: List[Tuple[Dict, bytes]], faltantes: List[Dict]) -> bytes:
+    """
+    Paquete binario con varios tiles (formato maira-tiles-v1):
+    uint32 big-endian con el largo del manifiesto JSON, el manifiesto y a
+    continuación los bytes de cada tile. En el manifiesto cada tile indica
+    `offset` y `size` relativos al inicio de la sección de datos.
+    """
+    manifiesto = {'formato': 'maira-tiles-v1', 'tiles': [], 'faltantes': faltantes}
+    offset = 0
+    for entrada, datos in tiles:
+        manifiesto['tiles'].append({**entrada, 'offset': offset, 'size': len(datos)})
+        offset += len(datos)
+
+    cabecera = json.dumps(manifiesto, ensure_ascii=False).encode('utf-8')
+    return b''.join([struct.pack('>I', len(cabecera)), cabecera] + [datos for _, datos in tiles])
+
+
+def precalentar_cache() -> int:
+    """Carga en la cache los tiles más pedidos en ejecuciones anteriores"""
+    tiles_populares.cargar()
+    cargados = 0
+    for tar_path, tile_filename in tiles_populares.mas_pedidos():
+        if cache_tiles.estadisticas()['bytes'] >= cache_tiles.max_bytes:
+            break
+        try:
+            if os.path.exists(tar_path):
+                datos = obtener_indice(tar_path).leer_miembro(tile_filename)
+                cache_tiles.guardar(_clave_cache(tar_path, tile_filename), datos)
+                cargados += 1
+        except (OSError, KeyError) as e:
+            logger.warning(f"⚠️ No se pudo precalentar {tile_filename}: {e}")
+    logger.info(f"🔥 Cache de tiles precalentada con {cargados} tiles")
+    return cargados
+
+
+def etag_tile(tar_path: str, tile_filename: str) -> str:
+    """ETag estable mientras no cambie el archivo TAR que contiene el tile"""
+    indice = obtener_indice(tar_path)
+    offset, size = indice.ubicacion(tile_filename)
+    firma = indice.firma_origen()
+    clave = f"{os.path.basename(tar_path)}:{firma['size']}:{firma['mtime_ns']}:{tile_filename}:{offset}:{size}"
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()[:20]
@@ -0,0 +1,179 @@
+"""
+MAIRA 4.0 - Superficies de transitabilidad por clase de vehículo
+
+Fusiona pendiente (capa precalculada o derivada de la elevación) y NDVI de
+los mini-tiles de vegetación en una grilla de transitabilidad (0-1) sobre la
+grilla de cada tile de elevación. Usa los mismos umbrales y factores que
+Client/js/services/transitabilityService.js, para que servidor y cliente
+coincidan.
+
+Las grillas se cachean por (tile, vehículo): muchos jugadores consultando la
+misma zona reutilizan el mismo cálculo. El clima es un factor escalar y se
+aplica al responder, sin ocupar entradas de cache.
+"""
+
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .cover import CAPA_NDVI
+from .slope import pendiente_de_tile
+from .single_flight import SingleFlight
+from .spatial_index import obtener_indice_espacial
+from .tile_cache import TileByteCache
+from .tile_store import CAPA_ELEVACION, TileRaster, obtener_store
+
+logger = logging.getLogger(__name__)
+
+
+# Umbral de pendiente (grados) y velocidad base (km/h) por clase de vehículo
+CLASES_VEHICULO: Dict[str, Dict[str, float]] = {
+    'infantry': {'umbral_pendiente': 45, 'velocidad_base': 4},
+    'lightVehicles': {'umbral_pendiente': 30, 'velocidad_base': 40},
+    'heavyVehicles': {'umbral_pendiente': 20, 'velocidad_base': 25},
+    'armored': {'umbral_pendiente': 25, 'velocidad_base': 30},
+    'artillery': {'umbral_pendiente': 15, 'velocidad_base': 20}
+}
+VEHICULO_DEFAULT = 'infantry'
+
+FACTORES_CLIMA: Dict[str, float] = {
+    'clear': 1.0,
+    'rain': 0.7,
+    'snow': 0.5,
+    'fog': 0.8,
+    'storm': 0.4
+}
+
+# NDVI normalizado (valor del tile / 255): límites de cada clase y su factor
+# agua, suelo desnudo, vegetación rala, liviana, moderada, densa, muy densa, extrema
+LIMITES_NDVI = np.array([0.1, 0.2, 0.3, 0.4, 0.6, 0.8, 0.9])
+FACTORES_NDVI = np.array([0.1, 0.9, 0.8, 0.7, 0.5, 0.3, 0.2, 0.1], dtype=np.float32)
+FACTOR_NDVI_SIN_DATO = 0.8
+FACTOR_MINIMO = 0.1
+
+cache_transitabilidad = TileByteCache(64 * 1024 * 1024, medir=lambda grilla: grilla.nbytes)
+vuelos = SingleFlight()
+
+
+def factor_pendiente(pendiente: np.ndarray, vehiculo: str) -> np.ndarray:
+    """Factor lineal por pendiente; por encima del umbral el terreno es casi intransitable"""
+    umbral = CLASES_VEHICULO[vehiculo]['umbral_pendiente']
+    factor = np.maximum(FACTOR_MINIMO, 1.0 - pendiente / umbral)
+    return np.where(pendiente > umbral, FACTOR_MINIMO, factor).astype(np.float32)
+
+
+def factor_vegetacion(ndvi: np.ndarray) -> np.ndarray:
+    """Factor por clase de NDVI (normalizado 0-1); neutro donde no hay dato de vegetación"""
+    factor = FACTORES_NDVI[np.digitize(np.nan_to_num(ndvi, nan=0.0), LIMITES_NDVI)]
+    return np.where(np.isfinite(ndvi), factor, FACTOR_NDVI_SIN_DATO).astype(np.float32)
+
+
+def ndvi_en_grilla(raster: TileRaster) -> np.ndarray:
+    """
+    NDVI normalizado en el centro de cada píxel del tile de elevación (vecino
+    más cercano). Cada tile NDVI que se superpone se lee una sola vez: las
+    grillas están alineadas a los ejes, así que alcanza con mapear columnas y
+    filas por separado y tomar el bloque con un único indexado.
+    """
+    x0, dx, _, y0, _, dy = raster.geotransform
+    lons = x0 + (np.arange(raster.ancho) + 0.5) * dx
+    lats = y0 + (np.arange(raster.alto) + 0.5) * dy
+    ndvi = np.full((raster.alto, raster.ancho), np.nan, dtype=np.float32)
+
+    b = raster.bounds
+    store = obtener_store(CAPA_NDVI)
+    for tile_id in obtener_indice_espacial(CAPA_NDVI).tiles_en_bbox(b['west'], b['south'], b['east'], b['north']):
+        try:
+            fuente = store.cargar(tile_id)
+        except KeyError:
+            continue
+        col, _ = fuente.a_pixel(lons, 0.0)
+        _, fila = fuente.a_pixel(0.0, lats)
+        col, fila = np.floor(col).astype(np.int64), np.floor(fila).astype(np.int64)
+        cols_dentro = (col >= 0) & (col < fuente.ancho)
+        filas_dentro = (fila >= 0) & (fila < fuente.alto)
+        if not cols_dentro.any() or not filas_dentro.any():
+            continue
+
+        bloque = np.asarray(fuente.datos[np.ix_(fila[filas_dentro], col[cols_dentro])], dtype=np.float32)
+        if fuente.nodata is not None:
+            bloque[bloque == fuente.nodata] = np.nan
+        # Donde se superponen tiles manda el primero, como en sampling.muestrear
+        destino = np.ix_(filas_dentro, cols_dentro)
+        actual = ndvi[destino]
+        ndvi[destino] = np.where(np.isnan(actual), bloque, actual)
+        if not np.isnan(ndvi).any():
+            break
+    return ndvi / 255.0
+
+
+def _calcular(tile_id: str, vehiculo: str) -> np.ndarray:
+    raster = obtener_store(CAPA_ELEVACION).cargar(tile_id)
+    transitabilidad = factor_pendiente(pendiente_de_tile(tile_id), vehiculo) * factor_vegetacion(ndvi_en_grilla(raster))
+    # Sin elevación no hay transitabilidad conocida
+    transitabilidad[np.isnan(raster.como_float())] = np.nan
+    return transitabilidad
+
+
+def transitabilidad_tile(tile_id: str, vehiculo: str = VEHICULO_DEFAULT) -> Tuple[TileRaster, np.ndarray]:
+    """
+    Grilla de transitabilidad (float32 0-1, NaN sin dato) del tile para la clase
+    de vehículo, junto con el raster de elevación que define su grilla.
+    KeyError si el tile o la clase de vehículo no existen.
+    """
+    if vehiculo not in CLASES_VEHICULO:
+        raise KeyError(vehiculo)
+    raster = obtener_store(CAPA_ELEVACION).cargar(tile_id)
+
+    clave = (tile_id, vehiculo)
+    grilla = cache_transitabilidad.obtener(clave)
+    if grilla is None:
+        grilla = vuelos.ejecutar(clave, lambda: _calcular(tile_id, vehiculo))
+        cache_transitabilidad.guardar(clave, grilla)
+    return raster, grilla
+
+
+def velocidad_kmh(transitabilidad: np.ndarray, vehiculo: str, clima: str = 'clear') -> np.ndarray:
+    """Velocidad esperada por celda según la clase de vehículo y el clima"""
+    factor_clima = FACTORES_CLIMA.get(clima, 1.0)
+    return CLASES_VEHICULO[vehiculo]['velocidad_base'] * transitabilidad * factor_clima
+
+
+def codificar_transitabilidad(transitabilidad: np.ndarray) -> np.ndarray:
+    """Grilla uint8 compacta: 0 = sin dato, 1-255 = transitabilidad 0-1"""
+    codificada = np.zeros(transitabilidad.shape, dtype=np.uint8)
+    validos = np.isfinite(transitabilidad)
+    codificada[validos] = 1 + np.rint(np.clip(transitabilidad[validos], 0, 1) * 254).astype(np.uint8)
+    return codificada
+
+
+def invalidar_tile(tile_id: str) -> int:
+    """Descarta las grillas cacheadas de un tile (todas las clases de vehículo)"""
+    return cache_transitabilidad.invalidar(lambda clave: clave[0] == tile_id)
+
+
+def muestrear_transitabilidad(lats, lons, vehiculo: str = VEHICULO_DEFAULT) -> np.ndarray:
+    """
+    Transitabilidad (0-1, NaN sin dato) en cada punto, tomada de la celda que
+    lo contiene. Las grillas de los tiles se cargan a demanda desde la cache.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    indice = obtener_indice_espacial()
+
+    resultado = np.full(len(lats), np.nan, dtype=np.float64)
+    posiciones = indice.resolver_puntos(lons, lats)
+    for posicion in np.unique(posiciones):
+        if posicion < 0:
+            continue
+        seleccion = posiciones == posicion
+        try:
+            raster, grilla = transitabilidad_tile(indice.tile_ids[posicion], vehiculo)
+        except KeyError:
+            continue
+        col, fila = raster.a_pixel(lons[seleccion], lats[seleccion])
+        col = np.clip(np.floor(col).astype(np.int64), 0, raster.ancho - 1)
+        fila = np.clip(np.floor(fila).astype(np.int64), 0, raster.alto - 1)
+        resultado[seleccion] = grilla[fila, col]
+    return resultado
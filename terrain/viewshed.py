@@ -0,0 +1,172 @@
+"""
+MAIRA 4.0 - Línea de visión y cuenca visual sobre los mini-tiles de elevación
+
+La cuenca visual se calcula con ray casting vectorizado: desde el observador
+se lanzan tantos rayos como celdas tiene el perímetro del radio, se muestrean
+todos los puntos de todos los rayos en una sola pasada y el horizonte de
+cada rayo se obtiene con un máximo acumulado. Se corrige la curvatura
+terrestre con refracción atmosférica estándar.
+
+Los resultados se cachean por celda del observador, así mover una unidad
+dentro de la misma celda (o volver a consultarla en el turno) no recalcula.
+"""
+
+import math
+import base64
+from typing import Dict, Optional
+
+import numpy as np
+
+from .sampling import muestrear
+from .sample_cache import muestrear_memorizado
+from .profile import densificar, RADIO_TIERRA_M
+from .tile_cache import TileByteCache
+
+# Coeficiente de refracción atmosférica estándar
+K_REFRACCION = 0.13
+METROS_POR_GRADO = 111320.0
+
+PASO_LOS_M = 50.0
+RESOLUCION_CUENCA_M = 100.0
+MAX_CELDAS_LADO = 512
+
+cache_cuencas = TileByteCache(32 * 1024 * 1024, medir=lambda resultado: len(resultado['visibilidad']) + 512)
+
+
+def caida_curvatura(distancia_m) -> np.ndarray:
+    """Descenso aparente del terreno por curvatura terrestre (con refracción)"""
+    distancia_m = np.asarray(distancia_m, dtype=np.float64)
+    return distancia_m ** 2 / (2 * RADIO_TIERRA_M) * (1 - K_REFRACCION)
+
+
+def linea_de_vision(lat1: float, lon1: float, lat2: float, lon2: float,
+                    altura_observador: float = 2.0, altura_objetivo: float = 0.0,
+                    paso_m: float = PASO_LOS_M) -> Dict:
+    """Intervisibilidad entre dos puntos y primer punto que obstruye (si hay)"""
+    lats, lons, distancias = densificar([lat1, lat2], [lon1, lon2], paso_m)
+    elevaciones = muestrear_memorizado(lats, lons)
+    return evaluar_linea(lats, lons, distancias, elevaciones, altura_observador, altura_objetivo)
+
+
+def evaluar_linea(lats: np.ndarray, lons: np.ndarray, distancias: np.ndarray, elevaciones: np.ndarray,
+                  altura_observador: float, altura_objetivo: float) -> Dict:
+    """Intervisibilidad sobre una línea ya densificada y muestreada (extremos incluidos)"""
+    if not np.isfinite(elevaciones[0]) or not np.isfinite(elevaciones[-1]):
+        return {'visible': None, 'motivo': 'sin datos de elevación en los extremos', 'distancia': float(distancias[-1])}
+
+    z_observador = elevaciones[0] + altura_observador
+    z_objetivo = elevaciones[-1] + altura_objetivo - caida_curvatura(distancias[-1])
+    distancia_total = distancias[-1]
+    if distancia_total <= 0:
+        return {'visible': True, 'distancia': 0.0}
+
+    # Altura de la visual sobre cada punto intermedio vs. el terreno (corregido por curvatura)
+    intermedios = slice(1, -1)
+    d = distancias[intermedios]
+    visual = z_observador + (z_objetivo - z_observador) * d / distancia_total
+    terreno = np.nan_to_num(elevaciones[intermedios] - caida_curvatura(d), nan=-np.inf)
+    obstrucciones = np.nonzero(terreno > visual)[0]
+
+    resultado = {
+        'visible': not len(obstrucciones),
+        'distancia': float(distancia_total),
+        'elevacion_observador': float(elevaciones[0]),
+        'elevacion_objetivo': float(elevaciones[-1])
+    }
+    if len(obstrucciones):
+        i = obstrucciones[0] + 1
+        resultado['obstruccion'] = {
+            'lat': float(lats[i]),
+            'lng': float(lons[i]),
+            'distancia': float(distancias[i]),
+            'elevacion': float(elevaciones[i])
+        }
+    return resultado
+
+
+def _cuenca_visual(lat: float, lon: float, radio_m: float, altura_observador: float,
+                   altura_objetivo: float, resolucion_m: float) -> Dict:
+    metros_lon = METROS_POR_GRADO * math.cos(math.radians(lat))
+    pasos = max(1, int(math.ceil(radio_m / resolucion_m)))
+    n_rayos = max(8, int(math.ceil(2 * math.pi * pasos)))
+
+    # Muestras de todos los rayos (n_rayos x pasos) en una sola pasada
+    azimuts = np.arange(n_rayos) * (2 * math.pi / n_rayos)
+    distancias = np.arange(1, pasos + 1) * resolucion_m
+    este = np.sin(azimuts)[:, None] * distancias[None, :]
+    norte = np.cos(azimuts)[:, None] * distancias[None, :]
+    lats = lat + norte / METROS_POR_GRADO
+    lons = lon + este / metros_lon
+
+    elevaciones = muestrear(np.append(lats.ravel(), lat), np.append(lons.ravel(), lon))
+    elevacion_observador = elevaciones[-1]
+    if not np.isfinite(elevacion_observador):
+        return None
+    elevaciones = elevaciones[:-1].reshape(n_rayos, pasos)
+
+    z_observador = elevacion_observador + altura_observador
+    caida = caida_curvatura(distancias)[None, :]
+    angulo_terreno = np.nan_to_num((elevaciones - caida - z_observador) / distancias, nan=-np.inf)
+    angulo_objetivo = (elevaciones + altura_objetivo - caida - z_observador) / distancias
+
+    # Horizonte de cada muestra: máximo ángulo del terreno entre el observador y ella
+    horizonte = np.maximum.accumulate(angulo_terreno, axis=1)
+    horizonte = np.concatenate([np.full((n_rayos, 1), -np.inf), horizonte[:, :-1]], axis=1)
+    visible_rayos = np.isfinite(angulo_objetivo) & (angulo_objetivo >= horizonte)
+
+    # Rasterizar: cada celda toma el valor de la muestra más cercana de su rayo
+    lado = 2 * pasos + 1
+    offsets = (np.arange(lado) - pasos) * resolucion_m
+    este_celdas, norte_celdas = np.meshgrid(offsets, -offsets)
+    distancia_celdas = np.hypot(este_celdas, norte_celdas)
+    rayo = np.rint(np.arctan2(este_celdas, norte_celdas) % (2 * math.pi) / (2 * math.pi) * n_rayos).astype(np.int64) % n_rayos
+    paso = np.clip(np.rint(distancia_celdas / resolucion_m).astype(np.int64) - 1, 0, pasos - 1)
+
+    visible = visible_rayos[rayo, paso] & (distancia_celdas <= radio_m)
+    visible[pasos, pasos] = True
+
+    medio_lado_lat = (pasos + 0.5) * resolucion_m / METROS_POR_GRADO
+    medio_lado_lon = (pasos + 0.5) * resolucion_m / metros_lon
+    dentro = distancia_celdas <= radio_m
+
+    return {
+        'observador': {'lat': lat, 'lng': lon, 'elevacion': float(elevacion_observador)},
+        'radio': radio_m,
+        'resolucion': resolucion_m,
+        'ancho': lado,
+        'alto': lado,
+        'bounds': {
+            'west': lon - medio_lado_lon,
+            'east': lon + medio_lado_lon,
+            'south': lat - medio_lado_lat,
+            'north': lat + medio_lado_lat
+        },
+        'porcentaje_visible': round(float(visible[dentro].mean() * 100), 2),
+        # Bits por celda, filas de norte a sur (np.packbits / orden big-endian)
+        'visibilidad': base64.b64encode(np.packbits(visible).tobytes()).decode('ascii')
+    }
+
+
+def cuenca_visual(lat: float, lon: float, radio_m: float,
+                  altura_observador: float = 2.0, altura_objetivo: float = 0.0,
+                  resolucion_m: Optional[float] = None) -> Optional[Dict]:
+    """
+    Raster de visibilidad alrededor del observador. La resolución se
+    agranda si hace falta para no superar MAX_CELDAS_LADO celdas por lado.
+    None si no hay datos de elevación en la posición del observador.
+    """
+    resolucion_m = max(resolucion_m or RESOLUCION_CUENCA_M, 2 * radio_m / MAX_CELDAS_LADO)
+
+    # El observador se ubica en el centro de su celda: clave de cache estable por celda
+    paso_lat = resolucion_m / METROS_POR_GRADO
+    paso_lon = resolucion_m / (METROS_POR_GRADO * math.cos(math.radians(lat)))
+    celda = (int(round(lat / paso_lat)), int(round(lon / paso_lon)))
+    lat_celda, lon_celda = celda[0] * paso_lat, celda[1] * paso_lon
+
+    clave = (celda, round(radio_m), round(altura_observador, 1), round(altura_objetivo, 1), round(resolucion_m, 1))
+    resultado = cache_cuencas.obtener(clave)
+    if resultado is None:
+        resultado = _cuenca_visual(lat_celda, lon_celda, radio_m, altura_observador, altura_objetivo, resolucion_m)
+        if resultado is not None:
+            cache_cuencas.guardar(clave, resultado)
+    return resultado
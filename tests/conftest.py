@@ -0,0 +1,123 @@
+import io
+import math
+import os
+import sys
+import tarfile
+import tempfile
+
+import numpy as np
+import pytest
+
+# Los tests importan el paquete terrain desde la raíz del repo
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# El ranking de tiles populares se guarda al salir: que no quede en temp_extract/ del repo
+os.environ.setdefault('MAIRA_TILE_POPULARES_PATH', os.path.join(tempfile.gettempdir(), 'maira_tests_tiles_populares.json'))
+
+METROS_POR_GRADO = 111320.0
+
+
+@pytest.fixture
+def cliente():
+    """Cliente HTTP de la app Flask"""
+    import app
+    app.app.config['TESTING'] = True
+    return app.app.test_client()
+
+
+@pytest.fixture
+def crear_tar():
+    """crear_tar(ruta, {nombre: bytes}, modo='w:gz'): TAR con esos miembros, en ese orden"""
+    def crear(ruta, miembros, modo='w:gz'):
+        with tarfile.open(ruta, modo) as tar:
+            for nombre, datos in miembros.items():
+                info = tarfile.TarInfo(nombre)
+                info.size = len(datos)
+                tar.addfile(info, io.BytesIO(datos))
+        return ruta
+    return crear
+
+
+@pytest.fixture
+def leer_tar():
+    """leer_tar(ruta): [(nombre, bytes)] de los miembros de un TAR.GZ, en orden"""
+    def leer(ruta):
+        with tarfile.open(ruta, 'r:gz') as tar:
+            return [(m.name, tar.extractfile(m).read()) for m in tar]
+    return leer
+
+
+@pytest.fixture
+def geotiff():
+    """geotiff(datos, west, north, resolucion, nodata): bytes de un GeoTIFF EPSG:4326 (una banda o bandas x alto x ancho)"""
+    pytest.importorskip('rasterio')
+    from rasterio.io import MemoryFile
+    from rasterio.transform import from_origin
+
+    def crear(datos, west, north, resolucion, nodata=None):
+        bandas = datos if datos.ndim == 3 else datos[np.newaxis]
+        with MemoryFile() as memfile:
+            with memfile.open(driver='GTiff', width=bandas.shape[2], height=bandas.shape[1], count=bandas.shape[0],
+                              dtype=bandas.dtype, crs='EPSG:4326', nodata=nodata,
+                              transform=from_origin(west, north, resolucion, resolucion)) as dst:
+                dst.write(bandas)
+            return memfile.read()
+    return crear
+
+
+@pytest.fixture
+def plano():
+    """plano(alto, ancho): valor en el centro de cada píxel = 100 + 2 * columna + 3 * fila"""
+    def crear(alto=10, ancho=10):
+        filas, cols = np.mgrid[0:alto, 0:ancho]
+        return (100 + 2 * cols + 3 * filas).astype(np.float32)
+    return crear
+
+
+@pytest.fixture
+def rampa():
+    """rampa(alto, ancho, grados, hacia, resolucion): plano con esa pendiente que sube al este o al norte"""
+    def crear(alto, ancho, grados, hacia='este', resolucion=0.001):
+        filas, cols = np.mgrid[0:alto, 0:ancho]
+        subida = math.tan(math.radians(grados)) * resolucion * METROS_POR_GRADO
+        return (cols * subida if hacia == 'este' else (alto - filas) * subida).astype(np.float64)
+    return crear
+
+
+@pytest.fixture
+def terreno():
+    """terreno(tamaño, semilla): relieve aleatorio suave (ruido acumulado en ambos ejes)"""
+    def crear(tamaño, semilla=0):
+        forma = (tamaño, tamaño) if np.isscalar(tamaño) else tamaño
+        rng = np.random.default_rng(semilla)
+        return np.cumsum(np.cumsum(rng.normal(size=forma), axis=0), axis=1)
+    return crear
+
+
+@pytest.fixture
+def store_sintetico(tmp_path, monkeypatch):
+    """
+    Store de tiles vacío en tmp_path, el que devuelven obtener_store y
+    obtener_indice_espacial durante el test. Devuelve una función para
+    agregar tiles: agregar(tile_id, datos, west, north, resolucion, capa, nodata).
+    """
+    from terrain import tile_store, spatial_index, transitability, mesh, sample_cache
+
+    base = str(tmp_path / 'store')
+    monkeypatch.setattr(tile_store, 'TILE_STORE_DIR', base)
+    monkeypatch.setattr(tile_store, '_stores', {})
+    monkeypatch.setattr(spatial_index, 'MINI_TILES_DIR', str(tmp_path / 'sin_mini_tiles'))
+    monkeypatch.setattr(spatial_index, '_indices', {})
+    transitability.cache_transitabilidad.limpiar()
+    mesh.cache_mallas.limpiar()
+    sample_cache.cache_muestras.limpiar()
+
+    def agregar(tile_id, datos, west, north, resolucion, capa=tile_store.CAPA_ELEVACION, nodata=None):
+        directorio = os.path.join(base, capa)
+        geotransform = (west, resolucion, 0.0, north, 0.0, -resolucion)
+        entrada = tile_store.guardar_tile(directorio, tile_id, datos, geotransform, nodata)
+        tile_store.guardar_indice(directorio, {tile_id: entrada})
+        tile_store.obtener_store(capa).olvidar()
+        spatial_index.invalidar_indice_espacial(capa)
+        return entrada
+
+    return agregar
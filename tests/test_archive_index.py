@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+from terrain.archive_index import TileArchiveIndex, obtener_indice, INDEX_VERSION
+
+
+@pytest.fixture
+def miembros():
+    return {f"prov_tile_{i:04d}.tif": bytes([i]) * (100 + 37 * i) for i in range(5)}
+
+
+def test_lee_miembros_de_un_tar_gz(tmp_path, miembros, crear_tar):
+    ruta = str(tmp_path / 'prov_part_01.tar.gz')
+    crear_tar(ruta, miembros)
+
+    indice = TileArchiveIndex(ruta).preparar()
+
+    assert sorted(indice.nombres()) == sorted(miembros)
+    for nombre, datos in miembros.items():
+        assert indice.contiene(nombre)
+        assert indice.leer_miembro(nombre) == datos
+    assert os.path.exists(str(tmp_path / 'prov_part_01.tar'))
+    assert os.path.exists(str(tmp_path / 'prov_part_01.tar.idx.json'))
+
+
+def test_tar_plano_se_indexa_en_el_lugar(tmp_path, miembros, crear_tar):
+    ruta = str(tmp_path / 'plano.tar')
+    crear_tar(ruta, miembros, 'w')
+
+    indice = TileArchiveIndex(ruta).preparar()
+
+    assert indice.seekable_path == ruta
+    assert indice.leer_miembro('prov_tile_0003.tif') == miembros['prov_tile_0003.tif']
+
+
+def test_leer_miembros_omite_los_que_faltan(tmp_path, miembros, crear_tar):
+    ruta = str(tmp_path / 'prov_part_01.tar.gz')
+    crear_tar(ruta, miembros)
+
+    leidos = TileArchiveIndex(ruta).leer_miembros(['prov_tile_0004.tif', 'no_existe.tif', 'prov_tile_0000.tif'])
+
+    assert leidos == {n: miembros[n] for n in ('prov_tile_0000.tif', 'prov_tile_0004.tif')}
+
+
+def test_miembro_inexistente_es_key_error(tmp_path, miembros, crear_tar):
+    ruta = str(tmp_path / 'prov_part_01.tar.gz')
+    crear_tar(ruta, miembros)
+
+    with pytest.raises(KeyError):
+        TileArchiveIndex(ruta).leer_miembro('no_existe.tif')
+
+
+def test_indice_persistido_se_reutiliza(tmp_path, miembros, crear_tar):
+    ruta = str(tmp_path / 'prov_part_01.tar.gz')
+    crear_tar(ruta, miembros)
+    TileArchiveIndex(ruta).preparar()
+
+    # Otro proceso: no debe volver a descomprimir si el original no cambió
+    plano = str(tmp_path / 'prov_part_01.tar')
+    mtime = os.stat(plano).st_mtime_ns
+    indice = TileArchiveIndex(ruta).preparar()
+
+    assert os.stat(plano).st_mtime_ns == mtime
+    assert indice.leer_miembro('prov_tile_0002.tif') == miembros['prov_tile_0002.tif']
+    with open(str(tmp_path / 'prov_part_01.tar.idx.json')) as f:
+        assert json.load(f)['version'] == INDEX_VERSION
+
+
+def test_se_reconstruye_si_cambia_el_original(tmp_path, miembros, crear_tar):
+    ruta = str(tmp_path / 'prov_part_01.tar.gz')
+    crear_tar(ruta, miembros)
+    indice = TileArchiveIndex(ruta).preparar()
+
+    nuevos = {'prov_tile_0009.tif': b'nuevo' * 50}
+    crear_tar(ruta, nuevos)
+    os.utime(ruta, ns=(0, os.stat(ruta).st_mtime_ns + 10 ** 9))
+
+    assert indice.nombres() == ['prov_tile_0009.tif']
+    assert indice.leer_miembro('prov_tile_0009.tif') == nuevos['prov_tile_0009.tif']
+
+
+def test_obtener_indice_es_compartido(tmp_path, miembros, crear_tar):
+    ruta = str(tmp_path / 'prov_part_01.tar.gz')
+    crear_tar(ruta, miembros)
+
+    assert obtener_indice(ruta) is obtener_indice(os.path.join(str(tmp_path), '.', 'prov_part_01.tar.gz'))
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from terrain.batch import resolver_consultas, puntos_estimados
+from terrain.cover import CAPA_NDVI, CAPA_COBERTURA
+from terrain.sample_cache import muestrear_memorizado
+from terrain.slope import CAPA_PENDIENTE, CAPA_ORIENTACION, ESCALA_PENDIENTE, ESCALA_ORIENTACION
+from terrain.viewshed import linea_de_vision
+
+# Rampa de 10° que sube al este, cerca del ecuador (1 píxel = 0.001° ≈ 111 m)
+WEST, NORTH, RES = -0.05, 0.05, 0.001
+
+
+@pytest.fixture
+def ladera(store_sintetico, rampa):
+    store_sintetico('t0', rampa(100, 100, 10).astype(np.float32), WEST, NORTH, RES)
+    return store_sintetico
+
+
+def test_lote_mixto_coincide_con_las_consultas_individuales(ladera):
+    consultas = [
+        {'tipo': 'elevacion', 'id': 'a', 'lat': 0.01, 'lng': 0.0},
+        {'tipo': 'linea_vision', 'id': 'b', 'origen': {'lat': 0.0, 'lng': -0.02},
+         'destino': {'lat': 0.0, 'lng': 0.03}, 'altura_observador': 5},
+        {'tipo': 'elevacion', 'lat': -0.02, 'lon': 0.021},
+        {'tipo': 'pendiente', 'id': 'c', 'lat': 0.0, 'lng': 0.0}
+    ]
+
+    resultados = resolver_consultas(consultas)
+
+    assert [r['tipo'] for r in resultados] == [c['tipo'] for c in consultas]
+    assert [r.get('id') for r in resultados] == ['a', 'b', None, 'c']
+    elevaciones = muestrear_memorizado(np.array([0.01, -0.02]), np.array([0.0, 0.021]))
+    assert resultados[0]['elevacion'] == pytest.approx(elevaciones[0], abs=0.01)
+    assert resultados[2]['elevacion'] == pytest.approx(elevaciones[1], abs=0.01)
+    linea = linea_de_vision(0.0, -0.02, 0.0, 0.03, altura_observador=5)
+    assert resultados[1]['visible'] == linea['visible']
+    assert resultados[1]['distancia'] == pytest.approx(linea['distancia'])
+    assert resultados[1]['elevacion_observador'] == pytest.approx(linea['elevacion_observador'])
+    assert resultados[1]['elevacion_objetivo'] == pytest.approx(linea['elevacion_objetivo'])
+
+
+def test_pendiente_sin_capa_se_deriva_de_la_elevacion(ladera):
+    resultado, = resolver_consultas([{'tipo': 'pendiente', 'lat': 0.0, 'lng': 0.0}])
+
+    assert resultado['pendiente'] == pytest.approx(10, abs=0.1)
+    # Sube al este: la ladera mira al oeste
+    assert resultado['orientacion'] == pytest.approx(270, abs=0.5)
+
+
+def test_pendiente_usa_la_capa_precalculada(ladera):
+    ladera('p0', np.full((100, 100), 25 * ESCALA_PENDIENTE, dtype=np.uint16), WEST, NORTH, RES, capa=CAPA_PENDIENTE)
+    ladera('o0', np.full((100, 100), 90 * ESCALA_ORIENTACION, dtype=np.uint16), WEST, NORTH, RES,
+           capa=CAPA_ORIENTACION)
+
+    resultado, = resolver_consultas([{'tipo': 'pendiente', 'lat': 0.0, 'lng': 0.0}])
+
+    assert resultado['pendiente'] == pytest.approx(25)
+    assert resultado['orientacion'] == pytest.approx(90)
+
+
+def test_vegetacion_devuelve_ndvi_y_clase_de_cobertura(ladera):
+    ladera('v0', np.full((100, 50), 180, dtype=np.uint8), WEST, NORTH, RES, capa=CAPA_NDVI, nodata=0)
+    ladera('c0', np.full((100, 50), 4, dtype=np.uint8), WEST, NORTH, RES, capa=CAPA_COBERTURA, nodata=0)
+
+    con_vegetacion, fuera = resolver_consultas([
+        {'tipo': 'vegetacion', 'lat': 0.0, 'lng': -0.03},
+        {'tipo': 'vegetacion', 'lat': 0.0, 'lng': 0.03}
+    ])
+
+    assert con_vegetacion['ndvi'] == pytest.approx(180 / 255, abs=1e-3)
+    assert con_vegetacion['cobertura'] == 'bosque'
+    assert fuera['ndvi'] is None
+    assert fuera['cobertura'] == 'sin_dato'
+
+
+def test_sin_datos_devuelve_nulos(store_sintetico):
+    elevacion, linea = resolver_consultas([
+        {'tipo': 'elevacion', 'lat': 10.0, 'lng': 10.0},
+        {'tipo': 'linea_vision', 'origen': {'lat': 10.0, 'lng': 10.0}, 'destino': {'lat': 10.0, 'lng': 10.01}}
+    ])
+
+    assert elevacion['elevacion'] is None
+    assert linea['visible'] is None
+
+
+def test_tipo_desconocido():
+    with pytest.raises(ValueError):
+        resolver_consultas([{'tipo': 'temperatura', 'lat': 0, 'lng': 0}])
+
+
+def test_puntos_estimados_crece_con_la_longitud_de_la_linea():
+    corta = {'tipo': 'linea_vision', 'origen': {'lat': 0, 'lng': 0}, 'destino': {'lat': 0, 'lng': 0.01}}
+    larga = {'tipo': 'linea_vision', 'origen': {'lat': 0, 'lng': 0}, 'destino': {'lat': 0, 'lng': 1.0}}
+
+    assert puntos_estimados([{'tipo': 'elevacion', 'lat': 0, 'lng': 0}]) == 5
+    assert puntos_estimados([larga]) > 50 * puntos_estimados([corta])
+
+
+def test_endpoint_resuelve_el_lote(cliente, ladera):
+    respuesta = cliente.post('/api/terreno/consultas', json={'consultas': [
+        {'tipo': 'elevacion', 'id': 1, 'lat': 0.0, 'lng': 0.0},
+        {'tipo': 'pendiente', 'id': 2, 'lat': 0.0, 'lng': 0.0}
+    ]})
+
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos['success'] and datos['total'] == 2
+    assert [r['id'] for r in datos['resultados']] == [1, 2]
+    assert datos['resultados'][1]['pendiente'] == pytest.approx(10, abs=0.1)
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {},
+    {'consultas': []},
+    {'consultas': [{'tipo': 'temperatura', 'lat': 0, 'lng': 0}]},
+    {'consultas': [{'tipo': 'elevacion', 'lat': 0}]},
+    {'consultas': [{'tipo': 'linea_vision', 'origen': {'lat': 0, 'lng': 0}}]}
+])
+def test_endpoint_rechaza_consultas_invalidas(cliente, store_sintetico, cuerpo):
+    respuesta = cliente.post('/api/terreno/consultas', json=cuerpo)
+
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['success'] is False
+
+
+def test_endpoint_limita_consultas_y_puntos(cliente, store_sintetico, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'MAX_CONSULTAS_TERRENO', 2)
+    monkeypatch.setattr(app, 'MAX_PUNTOS_CONSULTAS', 100)
+    elevacion = {'tipo': 'elevacion', 'lat': 0, 'lng': 0}
+    linea = {'tipo': 'linea_vision', 'origen': {'lat': 0, 'lng': 0}, 'destino': {'lat': 0, 'lng': 1.0}}
+
+    assert cliente.post('/api/terreno/consultas', json={'consultas': [elevacion] * 3}).status_code == 400
+    assert cliente.post('/api/terreno/consultas', json={'consultas': [linea]}).status_code == 400
+    assert cliente.post('/api/terreno/consultas', json={'consultas': [elevacion] * 2}).status_code == 200
@@ -0,0 +1,96 @@
+import hashlib
+import os
+
+import pytest
+
+from terrain.build_manifest import (hash_archivo, huella_fuente, hash_parametros, cargar_manifiesto,
+                                    guardar_manifiesto, fuentes_cambiadas, reempaquetar_tar,
+                                    NOMBRE_MANIFIESTO, VERSION_MANIFIESTO)
+
+
+def test_hash_archivo_por_bloques(tmp_path):
+    ruta = tmp_path / 'fuente.tif'
+    ruta.write_bytes(b'abc' * 1000)
+
+    assert hash_archivo(str(ruta), bloque=7) == hashlib.sha256(b'abc' * 1000).hexdigest()
+
+
+def test_huella_reutiliza_el_sha_si_no_cambio_tamaño_ni_fecha(tmp_path):
+    ruta = tmp_path / 'fuente.tif'
+    ruta.write_bytes(b'datos')
+    huella = huella_fuente(str(ruta), region='centro')
+    assert huella['region'] == 'centro'
+
+    # Mismo tamaño y fecha: el sha se toma de la huella anterior sin leer el archivo
+    anterior = dict(huella, sha256='sha-anterior')
+    assert huella_fuente(str(ruta), anterior)['sha256'] == 'sha-anterior'
+
+    ruta.write_bytes(b'otros datos')
+    assert huella_fuente(str(ruta), anterior)['sha256'] == hashlib.sha256(b'otros datos').hexdigest()
+
+
+def test_hash_parametros_no_depende_del_orden():
+    assert hash_parametros({'a': 1, 'b': [1, 2]}) == hash_parametros({'b': [1, 2], 'a': 1})
+    assert hash_parametros({'a': 1}) != hash_parametros({'a': 2})
+
+
+def test_manifiesto_ida_y_vuelta(tmp_path):
+    assert cargar_manifiesto(str(tmp_path)) == {'version': VERSION_MANIFIESTO, 'grupos': {}}
+
+    manifiesto = {'version': VERSION_MANIFIESTO, 'grupos': {'centro': {'fuentes': {'a.tif': {'sha256': 'x'}}}}}
+    guardar_manifiesto(str(tmp_path), manifiesto)
+
+    cargado = cargar_manifiesto(str(tmp_path))
+    assert cargado['grupos'] == manifiesto['grupos']
+    assert 'generado' in cargado
+    assert os.listdir(str(tmp_path)) == [NOMBRE_MANIFIESTO]
+
+
+@pytest.mark.parametrize('contenido', ['{"version": 999, "grupos": {"x": {}}}', 'no es json'])
+def test_manifiesto_de_otra_version_o_ilegible_se_ignora(tmp_path, contenido):
+    (tmp_path / NOMBRE_MANIFIESTO).write_text(contenido)
+
+    assert cargar_manifiesto(str(tmp_path))['grupos'] == {}
+
+
+def test_fuentes_cambiadas():
+    anteriores = {'igual.tif': {'sha256': '1'}, 'cambiada.tif': {'sha256': '2'}, 'borrada.tif': {'sha256': '3'}}
+    actuales = {'igual.tif': {'sha256': '1'}, 'cambiada.tif': {'sha256': '9'}, 'nueva.tif': {'sha256': '4'}}
+
+    assert fuentes_cambiadas(anteriores, actuales) == {'cambiada.tif', 'borrada.tif', 'nueva.tif'}
+
+
+def test_reempaquetar_tar(tmp_path, crear_tar, leer_tar):
+    tar_path = str(tmp_path / 'centro_part_01.tar.gz')
+    crear_tar(tar_path, {'t0.tif': b'cero', 't1.tif': b'uno', 't2.tif': b'dos'})
+    reemplazo = tmp_path / 'nuevo_t1.tif'
+    reemplazo.write_bytes(b'uno nuevo')
+    agregado = tmp_path / 't3.tif'
+    agregado.write_bytes(b'tres')
+
+    reempaquetar_tar(tar_path, {'t1.tif': str(reemplazo), 't3.tif': str(agregado)}, eliminar=['t2.tif'])
+
+    # El resto conserva su orden; reemplazados y nuevos van al final
+    assert leer_tar(tar_path) == [('t0.tif', b'cero'), ('t1.tif', b'uno nuevo'), ('t3.tif', b'tres')]
+    assert not [f for f in os.listdir(str(tmp_path)) if f.endswith('.tmp')]
+
+
+def test_reempaquetar_crea_el_tar_si_no_existe(tmp_path, leer_tar):
+    tar_path = str(tmp_path / 'nuevo.tar.gz')
+    fuente = tmp_path / 't0.tif'
+    fuente.write_bytes(b'cero')
+
+    reempaquetar_tar(tar_path, {'t0.tif': str(fuente)})
+
+    assert leer_tar(tar_path) == [('t0.tif', b'cero')]
+
+
+def test_reempaquetar_no_deja_el_tar_a_medias_si_falla(tmp_path, crear_tar, leer_tar):
+    tar_path = str(tmp_path / 'centro_part_01.tar.gz')
+    crear_tar(tar_path, {'t0.tif': b'cero'})
+
+    with pytest.raises(OSError):
+        reempaquetar_tar(tar_path, {'t1.tif': str(tmp_path / 'no_existe.tif')})
+
+    assert leer_tar(tar_path) == [('t0.tif', b'cero')]
+    assert os.listdir(str(tmp_path)) == ['centro_part_01.tar.gz']
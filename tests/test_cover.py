@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from terrain.cover import (clasificar_ndvi, leyenda, muestrear_cobertura, CAPA_COBERTURA, CLASES_COBERTURA,
+                           OCULTAMIENTO, PROTECCION, SIN_DATO, UMBRALES_NDVI)
+
+WEST, NORTH, RES = -60.0, -30.0, 0.001
+
+
+@pytest.fixture
+def cobertura(store_sintetico):
+    """Tile de cobertura de 10x40: una franja de 10 columnas por clase, de desnudo a bosque"""
+    clases = np.repeat(np.arange(1, 5, dtype=np.uint8), 10)[np.newaxis].repeat(10, axis=0)
+    store_sintetico('c0', clases, WEST, NORTH, RES, capa=CAPA_COBERTURA, nodata=SIN_DATO)
+    return store_sintetico
+
+
+def centro_franja(clase):
+    """(lat, lng) del centro de la franja de esa clase"""
+    return NORTH - 5 * RES, WEST + ((clase - 1) * 10 + 5) * RES
+
+
+def test_clasificar_ndvi_por_umbrales():
+    ndvi = np.array([-1.0, 0.0, 0.199, 0.2, 0.399, 0.4, 0.599, 0.6, 1.0, np.nan])
+
+    np.testing.assert_array_equal(clasificar_ndvi(ndvi), [1, 1, 1, 2, 2, 3, 3, 4, 4, SIN_DATO])
+    assert clasificar_ndvi(ndvi).dtype == np.uint8
+
+
+def test_clasificar_ndvi_escribe_en_la_salida():
+    ndvi = np.array([[0.1, 0.5], [0.9, np.nan]], dtype=np.float32)
+    salida = np.full(ndvi.shape, 99, dtype=np.uint8)
+
+    resultado = clasificar_ndvi(ndvi, salida=salida)
+
+    assert resultado is salida
+    np.testing.assert_array_equal(salida, [[1, 3], [4, SIN_DATO]])
+
+
+def test_clases_crecen_en_proteccion_y_ocultamiento():
+    assert len(CLASES_COBERTURA) == len(UMBRALES_NDVI) + 2
+    assert OCULTAMIENTO[SIN_DATO] == 0 and PROTECCION[SIN_DATO] == 0
+    assert np.all(np.diff(OCULTAMIENTO[1:]) > 0)
+    assert np.all(np.diff(PROTECCION[1:]) >= 0)
+
+
+def test_leyenda_ordenada_con_colores_en_lista():
+    clases = leyenda()
+
+    assert [c['codigo'] for c in clases] == sorted(CLASES_COBERTURA)
+    assert clases[4]['nombre'] == 'bosque'
+    assert clases[4]['color'] == list(CLASES_COBERTURA[4]['color'])
+    assert clases[4]['ocultamiento'] == OCULTAMIENTO[4]
+
+
+def test_muestrear_cobertura_por_franja_y_sin_tile(cobertura):
+    puntos = [centro_franja(clase) for clase in range(1, 5)] + [(0.0, 0.0)]
+    lats, lons = np.array(puntos).T
+
+    np.testing.assert_array_equal(muestrear_cobertura(lats, lons), [1, 2, 3, 4, SIN_DATO])
+
+
+def test_muestrear_cobertura_no_interpola_entre_clases(cobertura):
+    # Justo a cada lado del borde entre pastizal (2) y arbustal (3)
+    borde = WEST + 20 * RES
+    lats = np.full(2, NORTH - 5 * RES)
+    lons = np.array([borde - RES * 0.01, borde + RES * 0.01])
+
+    np.testing.assert_array_equal(muestrear_cobertura(lats, lons), [2, 3])
+
+
+def test_endpoint_clases(cliente):
+    datos = cliente.get('/api/cobertura/clases').get_json()
+
+    assert datos['success']
+    assert datos['clases'] == leyenda()
+
+
+def test_endpoint_muestrea_clases_y_factores(cliente, cobertura):
+    lat, lng = centro_franja(4)
+
+    respuesta = cliente.post('/api/cobertura/sample', json={'puntos': [{'lat': lat, 'lng': lng}, {'lat': 0, 'lng': 0}]})
+
+    datos = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert datos['clases'] == [4, SIN_DATO]
+    assert datos['nombres'] == ['bosque', 'sin_dato']
+    assert datos['ocultamiento'] == [OCULTAMIENTO[4], 0.0]
+    assert datos['proteccion'] == [PROTECCION[4], 0.0]
+
+
+def test_endpoint_valida_los_puntos(cliente, store_sintetico, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'MAX_PUNTOS_MUESTREO', 2)
+
+    assert cliente.post('/api/cobertura/sample', json={}).status_code == 400
+    assert cliente.post('/api/cobertura/sample', json={'puntos': [{'lat': 0}]}).status_code == 400
+    assert cliente.post('/api/cobertura/sample', json={'puntos': [{'lat': 0, 'lng': 0}] * 3}).status_code == 400
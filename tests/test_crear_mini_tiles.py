@@ -0,0 +1,176 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip('rasterio')
+from rasterio.merge import merge  # noqa: E402
+from rasterio.windows import Window  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+import crear_mini_tiles  # noqa: E402
+from crear_mini_tiles import MosaicoVirtual, crear_mini_tiles_provincia  # noqa: E402
+
+# 0.01° por píxel: mini-tiles de 22 píxeles (TILE_SIZE_KM = 25)
+RES = 0.01
+NODATA = -9999.0
+
+
+@pytest.fixture
+def fuentes(tmp_path, geotiff, terreno):
+    """
+    escribir(desplazamiento_oeste=0.0, res_b=RES): dos TIF de 30x30 que se
+    superponen en 10 columnas y 20 filas; el primero tiene un hueco de nodata
+    en la superposición que cubre el segundo. Devuelve las rutas.
+    """
+    def escribir(desplazamiento_oeste=0.0, res_b=RES):
+        a = terreno(30, semilla=1).astype(np.float32) * 10 + 500
+        a[12:18, 22:28] = NODATA
+        b = terreno(30, semilla=2).astype(np.float32) * 10 + 800
+        directorio = tmp_path / 'tifs'
+        directorio.mkdir(exist_ok=True)
+        rutas = [str(directorio / 'a.tif'), str(directorio / 'b.tif')]
+        with open(rutas[0], 'wb') as f:
+            f.write(geotiff(a, -60.0, -30.0, RES, nodata=NODATA))
+        with open(rutas[1], 'wb') as f:
+            f.write(geotiff(b, -59.8 + desplazamiento_oeste, -30.1, res_b, nodata=NODATA))
+        return rutas
+    return escribir
+
+
+def provincia_json(tmp_path, rutas):
+    ruta = tmp_path / 'prueba.json'
+    ruta.write_text(json.dumps({
+        'metadata': {'provincia': 'prueba'},
+        'tiles': {os.path.basename(r): {'filename': os.path.basename(r)} for r in rutas}
+    }))
+    return str(ruta)
+
+
+def test_lee_lo_mismo_que_rasterio_merge(fuentes):
+    rutas = fuentes()
+    abiertos = [rasterio.open(r) for r in rutas]
+    try:
+        mosaico, transform = merge(abiertos)
+    finally:
+        for fuente in abiertos:
+            fuente.close()
+
+    with MosaicoVirtual(rutas) as virtual:
+        assert (virtual.height, virtual.width) == mosaico.shape[1:]
+        assert virtual.transform.almost_equals(transform)
+        np.testing.assert_array_equal(virtual.read(), mosaico)
+        # Ventanas sueltas, incluida una que cruza el hueco del primer archivo y el borde del segundo
+        for ventana in (Window(0, 0, 22, 22), Window(20, 10, 15, 12), Window(45, 35, 5, 5)):
+            filas = slice(ventana.row_off, ventana.row_off + ventana.height)
+            cols = slice(ventana.col_off, ventana.col_off + ventana.width)
+            np.testing.assert_array_equal(virtual.read(1, window=ventana), mosaico[0, filas, cols])
+
+
+def test_rechaza_fuentes_fuera_de_grilla(fuentes):
+    with pytest.raises(ValueError, match='alineado'):
+        MosaicoVirtual(fuentes(desplazamiento_oeste=RES / 2))
+    with pytest.raises(ValueError, match='resolución'):
+        MosaicoVirtual(fuentes(res_b=RES / 2))
+
+
+def salida_provincia(directorio):
+    """Entradas del índice de mini-tiles y niveles de overview de la provincia"""
+    with open(directorio / 'prueba' / 'prueba_mini_tiles_index.json') as f:
+        tiles = json.load(f)['tiles']
+    with open(directorio / 'prueba' / 'prueba_overviews_index.json') as f:
+        niveles = json.load(f)['niveles']
+    return tiles, niveles
+
+
+def test_mosaico_virtual_y_temporal_generan_los_mismos_tiles(tmp_path, fuentes):
+    rutas = fuentes()
+    json_path = provincia_json(tmp_path, rutas)
+
+    crear_mini_tiles_provincia(json_path, str(tmp_path / 'tifs'), str(tmp_path / 'virtual'), mosaico_virtual=True)
+    crear_mini_tiles_provincia(json_path, str(tmp_path / 'tifs'), str(tmp_path / 'temporal'), mosaico_virtual=False)
+
+    tiles, niveles = salida_provincia(tmp_path / 'virtual')
+    assert len(tiles) == 6
+    assert salida_provincia(tmp_path / 'temporal') == (tiles, niveles)
+    assert not os.path.exists(tmp_path / 'temporal' / 'prueba' / 'prueba_mosaic_temp.tif')
+
+
+def test_fuentes_desalineadas_vuelven_al_mosaico_temporal(tmp_path, fuentes, monkeypatch):
+    rutas = fuentes(desplazamiento_oeste=RES / 2)
+    llamadas = []
+    merge_original = crear_mini_tiles.merge
+    monkeypatch.setattr(crear_mini_tiles, 'merge', lambda *args, **kwargs: llamadas.append(1) or
+                        merge_original(*args, **kwargs))
+
+    crear_mini_tiles_provincia(provincia_json(tmp_path, rutas), str(tmp_path / 'tifs'), str(tmp_path / 'salida'),
+                               mosaico_virtual=True)
+
+    assert llamadas == [1]
+    tiles, _ = salida_provincia(tmp_path / 'salida')
+    assert tiles
+    assert not os.path.exists(tmp_path / 'salida' / 'prueba' / 'prueba_mosaic_temp.tif')
+    with open(tmp_path / 'salida' / 'build_manifest.json') as f:
+        grilla = json.load(f)['grupos']['prueba']['grilla']
+    assert grilla['transform'][0] == pytest.approx(RES)
+
+
+def test_actualizar_abre_un_tar_nuevo_y_limpia_overviews_obsoletos(tmp_path, geotiff, terreno, monkeypatch):
+    # a.tif con relieve y b.tif constante al este: los tiles del borde este quedan sintéticos
+    directorio = tmp_path / 'tifs'
+    directorio.mkdir()
+    rutas = [str(directorio / 'a.tif'), str(directorio / 'b.tif')]
+    with open(rutas[0], 'wb') as f:
+        f.write(geotiff(terreno(44, semilla=1).astype(np.float32) * 10 + 500, -60.0, -30.0, RES, nodata=NODATA))
+    with open(rutas[1], 'wb') as f:
+        f.write(geotiff(np.full((44, 44), 800, dtype=np.float32), -59.56, -30.0, RES, nodata=NODATA))
+    crear_mini_tiles_provincia(provincia_json(tmp_path, rutas), str(directorio), str(tmp_path / 'salida'))
+    provincia = tmp_path / 'salida' / 'prueba'
+    tiles, _ = salida_provincia(tmp_path / 'salida')
+    sinteticos = {t['id'] for t in tiles.values() if t.get('sintetico')}
+    assert len(sinteticos) == 2 and {t['tar_file'] for t in tiles.values() if 'tar_file' in t} == \
+        {'prueba_part_01.tar.gz'}
+    # Un overview de una construcción anterior con más niveles
+    (provincia / 'prueba_overview_part_09.tar.gz').write_bytes(b'')
+
+    # b ahora tiene relieve; con límite 0 cada TAR se llena con un solo tile
+    with open(rutas[1], 'wb') as f:
+        f.write(geotiff(terreno(44, semilla=2).astype(np.float32) * 10 + 800, -59.56, -30.0, RES, nodata=NODATA))
+    monkeypatch.setattr(crear_mini_tiles, 'MAX_TAR_SIZE_MB', 0)
+    with MosaicoVirtual(rutas) as mosaico:
+        crear_mini_tiles.actualizar_mini_tiles(mosaico, str(provincia), 'prueba', [[-59.56, -30.44, -59.12, -30.0]])
+
+    tiles, _ = salida_provincia(tmp_path / 'salida')
+    assert [tiles[t]['tar_file'] for t in sorted(sinteticos)] == ['prueba_part_02.tar.gz', 'prueba_part_03.tar.gz']
+    assert (provincia / 'prueba_part_02.tar.gz').exists() and (provincia / 'prueba_part_03.tar.gz').exists()
+    with open(provincia / 'prueba_mini_tiles_index.json') as f:
+        assert json.load(f)['total_tar_files'] == 3
+    assert not (provincia / 'prueba_overview_part_09.tar.gz').exists()
+    assert (provincia / 'prueba_overview_part_01.tar.gz').exists()
+
+
+def test_duplicados_y_sinteticos_en_el_indice(tmp_path, geotiff, terreno):
+    # El mismo bloque de 22x22 repetido a lo ancho (los tiles del medio coinciden con su halo)
+    # y una franja constante al este
+    bloque = terreno(22, semilla=3).astype(np.float32) * 10 + 500
+    datos = np.hstack([np.tile(bloque, (1, 4)), np.full((22, 44), 900, dtype=np.float32)])
+    directorio = tmp_path / 'tifs'
+    directorio.mkdir()
+    ruta = str(directorio / 'a.tif')
+    with open(ruta, 'wb') as f:
+        f.write(geotiff(datos, -60.0, -30.0, RES, nodata=NODATA))
+
+    crear_mini_tiles_provincia(provincia_json(tmp_path, [ruta]), str(directorio), str(tmp_path / 'salida'))
+
+    tiles, _ = salida_provincia(tmp_path / 'salida')
+    duplicados = [t for t in tiles.values() if t.get('duplicado_de')]
+    assert duplicados and any(t.get('sintetico') for t in tiles.values())
+    # Los cargadores leen filename y tar_file de toda entrada que no sea sintética
+    for tile in tiles.values():
+        assert tile.get('sintetico') or (tile['filename'] and tile['tar_file'])
+    for tile in duplicados:
+        canonico = tiles[tile['duplicado_de']]
+        assert (tile['filename'], tile['pendiente_filename'], tile['tar_file']) == \
+            (canonico['filename'], canonico['pendiente_filename'], canonico['tar_file'])
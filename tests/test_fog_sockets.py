@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('flask_socketio')
+
+PARTIDA = 'P123'
+WEST, NORTH, RES = -0.05, 0.05, 0.001
+
+
+@pytest.fixture
+def partida(store_sintetico):
+    """Llanura a 0 m y una función para conectar jugadores a la partida (con o sin equipo)"""
+    import app
+    store_sintetico('t0', np.zeros((100, 100), dtype=np.float32), WEST, NORTH, RES)
+    app.unidades_niebla.pop(PARTIDA, None)
+    clientes = []
+
+    def conectar(equipo=None):
+        cliente = app.socketio.test_client(app.app)
+        cliente.emit('unirseAPartidaJuego', {'sala': PARTIDA})
+        if equipo:
+            cliente.emit('unirseEquipo', {'partidaCodigo': PARTIDA, 'equipo': equipo})
+        cliente.get_received()
+        clientes.append(cliente)
+        return cliente
+
+    yield conectar
+    for cliente in clientes:
+        cliente.disconnect()
+    app.unidades_niebla.pop(PARTIDA, None)
+
+
+def eventos(cliente, nombre):
+    return [e['args'][0] for e in cliente.get_received() if e['name'] == nombre]
+
+
+def unidad(unidad_id, equipo, lat, lng, **extra):
+    return {'partidaCodigo': PARTIDA, 'id': unidad_id, 'equipo': equipo, 'posicion': {'lat': lat, 'lng': lng},
+            'tipo': 'infantry', **extra}
+
+
+def test_unidad_desplegada_solo_llega_a_su_equipo(partida):
+    azul, aliado, rojo = partida('azul'), partida('azul'), partida('rojo')
+
+    azul.emit('unidadDesplegada', unidad('u1', 'azul', 0.0, 0.0))
+
+    assert [e['id'] for e in eventos(aliado, 'unidadDesplegada')] == ['u1']
+    assert [e['id'] for e in eventos(azul, 'unidadDesplegada')] == ['u1']
+    assert eventos(rojo, 'unidadDesplegada') == []
+
+
+def test_posicion_de_una_unidad_solo_llega_al_resto_de_su_equipo(partida):
+    azul, aliado, rojo = partida('azul'), partida('azul'), partida('rojo')
+
+    azul.emit('actualizarPosicion', {'partidaCodigo': PARTIDA, 'elemento_id': 'u1', 'equipo': 'azul',
+                                     'usuario_id': 7, 'posicion': {'lat': 0.0, 'lng': 0.001}})
+
+    assert [e['elemento_id'] for e in eventos(aliado, 'posicionActualizada')] == ['u1']
+    assert eventos(azul, 'posicionActualizada') == []
+    assert eventos(rojo, 'posicionActualizada') == []
+
+
+def test_nuevo_elemento_envuelto_va_a_la_sala_del_equipo(partida):
+    azul, rojo = partida('azul'), partida('rojo')
+
+    azul.emit('nuevoElemento', {'partidaCodigo': PARTIDA, 'tipo': 'unidad',
+                                'datos': {'id': 'u1', 'equipo': 'azul', 'posicion': {'lat': 0.0, 'lng': 0.0}}})
+
+    assert len(eventos(azul, 'elementoCreado')) == 1
+    assert eventos(rojo, 'elementoCreado') == []
+
+
+def test_sin_equipo_o_sin_unidad_se_reenvia_a_todos(partida):
+    import app
+    azul, rojo = partida('azul'), partida('rojo')
+
+    # Dibujo: no es una unidad aunque tenga equipo
+    dibujo = {'partidaCodigo': PARTIDA, 'sala': PARTIDA, 'tipo': 'dibujo',
+              'datos': {'id': 'd1', 'equipo': 'azul', 'puntos': [[0, 0], [0.01, 0.01]]}}
+    azul.emit('nuevoElemento', dibujo)
+    assert eventos(rojo, 'elementoCreado') == [dibujo]
+
+    # Elemento de un cliente sin equipo
+    sin_equipo = {'partidaCodigo': PARTIDA, 'sala': PARTIDA, 'id': 'u9', 'posicion': {'lat': 0.0, 'lng': 0.0}}
+    azul.emit('unidadDesplegada', sin_equipo)
+    assert eventos(rojo, 'unidadDesplegada') == [sin_equipo]
+
+    azul.emit('actualizarPosicion', {'partidaCodigo': PARTIDA, 'elemento_id': 'u9', 'usuario_id': 7,
+                                     'posicion': {'lat': 0.0, 'lng': 0.001}})
+    assert [e['elemento_id'] for e in eventos(rojo, 'posicionActualizada')] == ['u9']
+    assert eventos(azul, 'posicionActualizada') == []
+
+    # Nada de eso entra en la niebla
+    assert app.unidades_niebla.get(PARTIDA, {}) == {}
+
+
+@pytest.mark.parametrize('evento', ['finTurno', 'cambioTurno'])
+def test_cada_equipo_recibe_los_enemigos_que_ve(partida, evento):
+    azul, rojo = partida('azul'), partida('rojo')
+    azul.emit('unidadDesplegada', unidad('a1', 'azul', 0.0, 0.0, sidc='SFGPUCI-----'))
+    # A ~550 m del azul, dentro de los 800 m de la infantería
+    rojo.emit('unidadDesplegada', unidad('r1', 'rojo', 0.0, 0.005))
+    # A ~3.3 km: fuera del alcance de cualquiera
+    rojo.emit('unidadDesplegada', unidad('r2', 'rojo', 0.0, 0.03))
+    azul.get_received()
+    rojo.get_received()
+
+    azul.emit(evento, {'partidaCodigo': PARTIDA, 'turno': 2})
+
+    niebla_azul, = eventos(azul, 'nieblaActualizada')
+    niebla_roja, = eventos(rojo, 'nieblaActualizada')
+    assert niebla_azul['equipo'] == 'azul' and niebla_azul['turno'] == 2
+    assert [u['id'] for u in niebla_azul['unidades_visibles']] == ['r1']
+    assert [u['id'] for u in niebla_roja['unidades_visibles']] == ['a1']
+    assert niebla_roja['unidades_visibles'][0]['sidc'] == 'SFGPUCI-----'
+
+
+def test_la_niebla_usa_la_ultima_posicion(partida):
+    azul, rojo = partida('azul'), partida('rojo')
+    azul.emit('unidadDesplegada', unidad('a1', 'azul', 0.0, 0.0))
+    rojo.emit('unidadDesplegada', unidad('r1', 'rojo', 0.0, 0.03))
+    rojo.emit('actualizarPosicion', {'partidaCodigo': PARTIDA, 'elemento_id': 'r1', 'equipo': 'rojo',
+                                     'usuario_id': 8, 'posicion': {'lat': 0.0, 'lng': 0.005}})
+    azul.get_received()
+
+    rojo.emit('finTurno', {'partidaCodigo': PARTIDA, 'turno': 1})
+
+    niebla_azul, = eventos(azul, 'nieblaActualizada')
+    assert [u['id'] for u in niebla_azul['unidades_visibles']] == ['r1']
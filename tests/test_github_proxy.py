@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+
+import pytest
+
+from terrain import github_proxy
+from terrain.github_proxy import GithubReleaseCache, ArchivoNoEncontrado
+
+CONTENIDO = bytes(range(256)) * 40
+
+
+class RespuestaFalsa:
+    def __init__(self, status_code, cuerpo=b'', etag=None, chunk=1000):
+        self.status_code = status_code
+        self.cuerpo = cuerpo
+        self.chunk = chunk
+        self.headers = {'Content-Length': str(len(cuerpo))}
+        if etag:
+            self.headers['ETag'] = etag
+        self.enviados = 0
+        self.cerrada = False
+
+    def iter_content(self, _tamaño):
+        for inicio in range(0, len(self.cuerpo), self.chunk):
+            self.enviados += 1
+            yield self.cuerpo[inicio:inicio + self.chunk]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f'HTTP {self.status_code}')
+
+    def close(self):
+        self.cerrada = True
+
+
+class GithubFalso:
+    """Sesión HTTP que responde con los archivos dados y contesta 304 al ETag vigente"""
+
+    def __init__(self, archivos):
+        self.archivos = archivos
+        self.pedidos = []
+
+    def get(self, url, headers=None, **_kwargs):
+        nombre = url.rsplit('/', 1)[-1]
+        self.pedidos.append((nombre, dict(headers or {})))
+        if nombre not in self.archivos:
+            return RespuestaFalsa(404)
+        etag = f'"{nombre}-v1"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return RespuestaFalsa(304)
+        return RespuestaFalsa(200, self.archivos[nombre], etag)
+
+
+@pytest.fixture
+def github():
+    return GithubFalso({'a.bin': CONTENIDO, 'b.bin': CONTENIDO[::-1], 'c.json': b'{"ok": true}'})
+
+
+@pytest.fixture
+def cache(tmp_path, github, monkeypatch):
+    cache = GithubReleaseCache('https://github.test/release/', str(tmp_path / 'cache'), 20000, 3600)
+    monkeypatch.setattr(cache, '_sesion', lambda: github)
+    monkeypatch.setattr(github_proxy, 'cache_github', cache)
+    return cache
+
+
+def consumir(contenido):
+    try:
+        return b''.join(contenido) if not hasattr(contenido, 'read') else contenido.read()
+    finally:
+        contenido.close()
+
+
+def objetos(cache):
+    return sorted(os.listdir(cache.objetos_dir)) if os.path.isdir(cache.objetos_dir) else []
+
+
+def test_la_descarga_se_envia_mientras_se_escribe_la_cache(cache, github):
+    ref, descarga = cache.abrir('a.bin')
+    assert 'sha256' not in ref and ref['size'] == len(CONTENIDO)
+
+    chunks = iter(descarga)
+    primero = next(chunks)
+    # El primer chunk ya está disponible sin haber bajado el resto
+    assert primero == CONTENIDO[:1000]
+    assert objetos(cache)[0].endswith('.part') and len(objetos(cache)) == 1
+
+    assert primero + b''.join(chunks) == CONTENIDO
+    descarga.close()
+
+    ref, archivo = cache.abrir('a.bin')
+    assert consumir(archivo) == CONTENIDO
+    assert ref['size'] == len(CONTENIDO) and objetos(cache) == [ref['sha256']]
+    assert len(github.pedidos) == 1
+
+
+def test_descarga_cortada_no_deja_nada_en_cache(cache, github):
+    _, descarga = cache.abrir('a.bin')
+    next(iter(descarga))
+    descarga.close()
+
+    assert objetos(cache) == []
+    # La ruta queda libre para volver a descargarse
+    assert consumir(cache.abrir('a.bin')[1]) == CONTENIDO
+    assert len(github.pedidos) == 2
+
+
+def test_revalida_con_if_none_match(cache, github):
+    consumir(cache.abrir('a.bin')[1])
+    cache.revalidar_segundos = 0
+
+    ref, archivo = cache.abrir('a.bin')
+
+    assert consumir(archivo) == CONTENIDO
+    assert 'sha256' in ref
+    assert github.pedidos[-1] == ('a.bin', {'If-None-Match': '"a.bin-v1"'})
+
+
+def test_desaloja_los_objetos_menos_usados(cache, github):
+    consumir(cache.abrir('a.bin')[1])
+    time.sleep(0.01)
+    consumir(cache.abrir('b.bin')[1])
+
+    # 2 x 10240 bytes superan los 20000 del presupuesto: se va 'a', el usado hace más tiempo
+    ref_b, archivo = cache.abrir('b.bin')
+    archivo.close()
+    assert objetos(cache) == [ref_b['sha256']]
+    _, descarga = cache.abrir('a.bin')
+    assert consumir(descarga) == CONTENIDO
+    assert [nombre for nombre, _ in github.pedidos] == ['a.bin', 'b.bin', 'a.bin']
+
+
+def test_el_archivo_abierto_sobrevive_al_desalojo(cache):
+    consumir(cache.abrir('a.bin')[1])
+    ref, archivo = cache.abrir('a.bin')
+
+    os.remove(cache.ruta_objeto(ref['sha256']))
+
+    assert consumir(archivo) == CONTENIDO
+
+
+def test_objeto_desalojado_entre_la_ref_y_la_apertura_se_vuelve_a_descargar(cache, github, monkeypatch):
+    consumir(cache.abrir('a.bin')[1])
+    leer_ref = cache._leer_ref
+
+    def leer_ref_y_desalojar(file_path):
+        ref = leer_ref(file_path)
+        if ref and os.path.exists(cache.ruta_objeto(ref['sha256'])):
+            os.remove(cache.ruta_objeto(ref['sha256']))
+        return ref
+    monkeypatch.setattr(cache, '_leer_ref', leer_ref_y_desalojar)
+
+    _, contenido = cache.abrir('a.bin')
+
+    assert consumir(contenido) == CONTENIDO
+    assert len(github.pedidos) == 2
+
+
+def test_pedido_concurrente_espera_la_descarga_y_lee_la_cache(cache, github):
+    _, descarga = cache.abrir('a.bin')
+    resultado = {}
+
+    def segundo_pedido():
+        ref, contenido = cache.abrir('a.bin')
+        resultado['ref'] = ref
+        resultado['datos'] = consumir(contenido)
+
+    hilo = threading.Thread(target=segundo_pedido)
+    hilo.start()
+    time.sleep(0.05)
+    assert hilo.is_alive()
+
+    consumir(descarga)
+    hilo.join(5)
+
+    assert resultado['datos'] == CONTENIDO and 'sha256' in resultado['ref']
+    assert len(github.pedidos) == 1
+
+
+def test_descarga_lenta_de_otro_pedido_no_bloquea(cache, github, monkeypatch):
+    monkeypatch.setattr(github_proxy, 'ESPERA_DESCARGA_SEGUNDOS', 0.05)
+    _, lenta = cache.abrir('a.bin')
+
+    # El segundo pedido deja de esperar y baja el archivo directo, sin tocar la cache
+    _, directa = cache.abrir('a.bin')
+    assert consumir(directa) == CONTENIDO
+    assert objetos(cache) == []
+
+    assert consumir(lenta) == CONTENIDO
+    assert len(objetos(cache)) == 1
+    assert cache._descargas == {}
+
+
+def test_archivo_inexistente(cache):
+    with pytest.raises(ArchivoNoEncontrado):
+        cache.abrir('no_existe.bin')
+    assert cache._descargas == {}
+
+
+def test_endpoint_descarga_y_luego_sirve_rangos(cliente, cache):
+    primera = cliente.get('/api/proxy/github/a.bin')
+    assert primera.status_code == 200
+    assert primera.data == CONTENIDO
+    assert primera.headers['Access-Control-Allow-Origin'] == '*'
+
+    completa = cliente.get('/api/proxy/github/a.bin')
+    assert completa.status_code == 200
+    assert completa.headers['Accept-Ranges'] == 'bytes'
+    assert completa.headers['Cache-Control'] == 'public, max-age=3600'
+
+    rango = cliente.get('/api/proxy/github/a.bin', headers={'Range': 'bytes=1000-1999'})
+    assert rango.status_code == 206
+    assert rango.data == CONTENIDO[1000:2000]
+    assert rango.headers['Content-Range'] == f'bytes 1000-1999/{len(CONTENIDO)}'
+
+
+def test_endpoint_responde_304_al_etag_vigente(cliente, cache):
+    assert cliente.get('/api/proxy/github/c.json').data == b'{"ok": true}'
+    respuesta = cliente.get('/api/proxy/github/c.json')
+    assert respuesta.mimetype == 'application/json'
+
+    revalidada = cliente.get('/api/proxy/github/c.json', headers={'If-None-Match': respuesta.headers['ETag']})
+
+    assert revalidada.status_code == 304
+
+
+def test_endpoint_archivo_inexistente_es_404(cliente, cache):
+    assert cliente.get('/api/proxy/github/no_existe.bin').status_code == 404
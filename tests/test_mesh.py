@@ -0,0 +1,121 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from terrain.mesh import (RTIN, zigzag_delta, grilla_alturas, malla_tile, MAX_CUANTIZADO, MAX_LADO_MALLA)
+
+
+def deszigzag(valores):
+    valores = np.asarray(valores, dtype=np.int64)
+    return np.cumsum((valores >> 1) ^ -(valores & 1))
+
+
+def areas(xy, triangulos):
+    a, b, c = (xy[triangulos[k::3]].astype(np.float64) for k in range(3))
+    return np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])) / 2
+
+
+def test_tamaño_de_grilla_invalido():
+    with pytest.raises(ValueError):
+        RTIN(16)
+
+
+def test_plano_se_resuelve_con_dos_triangulos():
+    filas, cols = np.mgrid[0:17, 0:17]
+    rtin = RTIN(17)
+
+    xy, triangulos = rtin.extraer(rtin.errores(3.0 * cols + 2.0 * filas), 0.0)
+
+    assert len(triangulos) == 6
+    assert sorted(map(tuple, xy.tolist())) == [(0, 0), (0, 16), (16, 0), (16, 16)]
+
+
+def test_sin_tolerancia_usa_toda_la_grilla(terreno):
+    rtin = RTIN(9)
+
+    xy, triangulos = rtin.extraer(rtin.errores(terreno(9)), -1.0)
+
+    assert len(xy) == 81
+    assert len(triangulos) == 3 * 2 * 8 * 8
+    np.testing.assert_allclose(areas(xy, triangulos), 0.5)
+
+
+@pytest.mark.parametrize('error_max', [0.0, 1.0, 5.0, 20.0])
+def test_la_malla_cubre_el_tile_sin_huecos(error_max, terreno):
+    rtin = RTIN(33)
+
+    xy, triangulos = rtin.extraer(rtin.errores(terreno(33)), error_max)
+
+    superficies = areas(xy, triangulos)
+    assert (superficies > 0).all()
+    assert superficies.sum() == pytest.approx(32 * 32)
+    assert len(np.unique(triangulos)) == len(xy)
+
+
+def test_menos_tolerancia_mas_triangulos(terreno):
+    rtin = RTIN(65)
+    errores = rtin.errores(terreno(65, 3))
+
+    cantidades = [len(rtin.extraer(errores, e)[1]) for e in (50.0, 10.0, 2.0, 0.0)]
+
+    assert cantidades == sorted(cantidades)
+    assert cantidades[0] < cantidades[-1]
+
+
+def test_zigzag_delta():
+    valores = np.array([5, 3, 3, 10, 0])
+
+    codificados = zigzag_delta(valores)
+
+    assert (codificados >= 0).all()
+    np.testing.assert_array_equal(codificados, [10, 3, 0, 14, 19])
+    np.testing.assert_array_equal(deszigzag(codificados), valores)
+
+
+def test_grilla_limitada_a_max_lado(store_sintetico):
+    store_sintetico('grande', np.zeros((600, 600), dtype=np.float32), 0.0, 0.6, 0.001)
+
+    alturas, _ = grilla_alturas('grande', 0)
+
+    assert alturas.shape == (MAX_LADO_MALLA + 1, MAX_LADO_MALLA + 1)
+
+
+def test_malla_tile_se_decodifica(store_sintetico):
+    filas, cols = np.mgrid[0:64, 0:64]
+    store_sintetico('t0', (200 + 40 * np.sin(cols / 6.0) * np.cos(filas / 9.0)).astype(np.float32),
+                    -60.0, -30.0, 0.001)
+
+    datos, etag = malla_tile('t0', error_max=1.0)
+
+    largo = struct.unpack('>I', datos[:4])[0]
+    cabecera = json.loads(datos[4:4 + largo])
+    cuerpo = datos[4 + largo:]
+    assert cabecera['formato'] == 'maira-mesh-v1'
+    assert cabecera['tile'] == 't0' and cabecera['tipo_indices'] == 'uint16'
+    assert cabecera['bounds'] == pytest.approx({'west': -60.0, 'east': -59.936, 'north': -30.0, 'south': -30.064})
+
+    def seccion(nombre, tipo='<u2'):
+        info = cabecera['secciones'][nombre]
+        return np.frombuffer(cuerpo[info['offset']:info['offset'] + info['size']], dtype=tipo)
+
+    u, v, h = (deszigzag(seccion(n)) for n in ('u', 'v', 'h'))
+    indices = deszigzag(seccion('indices'))
+    assert len(u) == cabecera['vertices'] and len(indices) == 3 * cabecera['triangulos']
+    assert indices.min() == 0 and indices.max() == len(u) - 1
+    assert u.min() == 0 and u.max() == MAX_CUANTIZADO and v.min() == 0 and v.max() == MAX_CUANTIZADO
+    # El rango de alturas es el de toda la grilla: sus extremos no tienen por qué ser vértices
+    assert 0 <= h.min() <= h.max() <= MAX_CUANTIZADO
+    assert 160 <= cabecera['altura_min'] < cabecera['altura_max'] <= 240
+    np.testing.assert_array_equal(seccion('oeste'), np.nonzero(u == 0)[0])
+    np.testing.assert_array_equal(seccion('norte'), np.nonzero(v == MAX_CUANTIZADO)[0])
+
+    # La segunda vez sale de la cache con el mismo ETag
+    assert malla_tile('t0', error_max=1.0) == (datos, etag)
+    assert malla_tile('t0', error_max=10.0)[1] != etag
+
+
+def test_malla_de_tile_inexistente(store_sintetico):
+    with pytest.raises(KeyError):
+        malla_tile('no_existe')
@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pytest
+
+from terrain import overview
+from terrain.overview import reducir_2x, sumas_iniciales, promedio, nivel_para_zoom, resolucion_zoom_m
+
+RES_BASE = 0.0003
+
+
+def indice_niveles(n=4):
+    """Índice de overviews con n niveles a partir de RES_BASE (≈33 m)"""
+    return {
+        'provincia': 'prueba',
+        'resolucion_base': RES_BASE,
+        'bounds': {'west': -66.0, 'south': -55.0, 'east': -65.0, 'north': -54.0},
+        'niveles': {str(n): {'factor': 2 ** n, 'resolucion': RES_BASE * 2 ** n, 'tiles': {}} for n in range(1, n + 1)}
+    }
+
+
+def test_sumas_iniciales_descartan_nodata_y_nan():
+    enteros = np.array([[1, -9999], [3, 4]], dtype=np.int16)
+    suma, cuenta = sumas_iniciales(enteros, -9999)
+    np.testing.assert_array_equal(suma, [[1, 0], [3, 4]])
+    np.testing.assert_array_equal(cuenta, [[1, 0], [1, 1]])
+
+    flotantes = np.array([[1.5, np.nan], [2.5, -1.0]], dtype=np.float32)
+    suma, cuenta = sumas_iniciales(flotantes, float('nan'))
+    np.testing.assert_array_equal(cuenta, [[1, 0], [1, 1]])
+    assert suma.dtype == np.float64 and suma[0, 1] == 0
+
+
+def test_reducir_2x_promedia_solo_los_validos():
+    datos = np.array([[10, 20, 7],
+                      [-1, -1, 9],
+                      [-1, -1, -1]], dtype=np.int16)
+
+    suma, cuenta = reducir_2x(*sumas_iniciales(datos, -1))
+
+    # Una grilla impar se completa con celdas sin dato
+    assert suma.shape == (2, 2)
+    np.testing.assert_array_equal(cuenta, [[2, 2], [0, 0]])
+    resultado = promedio(suma, cuenta)
+    np.testing.assert_allclose(resultado[0], [15, 8])
+    assert np.isnan(resultado[1]).all()
+
+
+def test_niveles_sucesivos_son_el_promedio_exacto_del_nivel_0():
+    rng = np.random.default_rng(5)
+    datos = rng.normal(500, 100, size=(13, 11)).astype(np.float32)
+    datos[rng.random(datos.shape) < 0.3] = -32768
+
+    suma, cuenta = sumas_iniciales(datos, -32768)
+    for _ in range(2):
+        suma, cuenta = reducir_2x(suma, cuenta)
+
+    # Promedio directo de los válidos de cada bloque de 4x4 del nivel 0
+    for fila in range(suma.shape[0]):
+        for col in range(suma.shape[1]):
+            bloque = datos[fila * 4:(fila + 1) * 4, col * 4:(col + 1) * 4]
+            validos = bloque[bloque != -32768].astype(np.float64)
+            if len(validos):
+                assert promedio(suma, cuenta)[fila, col] == pytest.approx(validos.mean())
+            else:
+                assert cuenta[fila, col] == 0
+
+
+def test_nivel_para_zoom_elige_el_mas_grueso_que_alcanza():
+    indice = indice_niveles()
+
+    # En el ecuador el nivel n (33 m · 2^n) sirve mientras no supere la resolución de pantalla
+    for zoom in range(6, 15):
+        objetivo = resolucion_zoom_m(zoom, 0)
+        esperado = max([0] + [n for n in range(1, 5) if RES_BASE * 2 ** n * overview.METROS_POR_GRADO <= objetivo])
+        assert nivel_para_zoom(indice, zoom, 0) == esperado
+    assert nivel_para_zoom(indice, 6, 0) == 4
+    assert nivel_para_zoom(indice, 14, 0) == 0
+
+
+def test_nivel_para_zoom_no_depende_de_la_latitud():
+    # El píxel del mapa y el de los tiles (en grados) se angostan igual con la latitud:
+    # en Tierra del Fuego no hay que bajar de nivel respecto del ecuador
+    indice = indice_niveles()
+
+    for zoom in range(6, 15):
+        assert nivel_para_zoom(indice, zoom, -54.5) == nivel_para_zoom(indice, zoom, 0)
+
+
+def test_nivel_para_zoom_sin_niveles():
+    assert nivel_para_zoom({'niveles': {}}, 5, -30) == 0
+
+
+def test_endpoint_elige_el_nivel_por_zoom(cliente, tmp_path, monkeypatch):
+    indice = indice_niveles()
+    indice['niveles']['2']['tiles'] = {
+        'o2_0_0': {'id': 'o2_0_0', 'filename': 'o2_0_0.tif', 'tar_file': 'prueba_overview_part_00.tar.gz',
+                   'bounds': {'west': -66.0, 'south': -55.0, 'east': -65.0, 'north': -54.0}}
+    }
+    (tmp_path / 'prueba').mkdir()
+    (tmp_path / 'prueba' / 'prueba_overviews_index.json').write_text(json.dumps(indice))
+    monkeypatch.setattr(overview, 'MINI_TILES_DIR', str(tmp_path))
+    overview.invalidar_overviews()
+
+    zoom = next(z for z in range(20) if nivel_para_zoom(indice, z, -54.5) == 2)
+    try:
+        respuesta = cliente.get(f'/api/tiles/overview/prueba?zoom={zoom}')
+    finally:
+        overview.invalidar_overviews()
+
+    datos = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert datos['nivel'] == 2 and datos['factor'] == 4
+    assert datos['tiles'] == [{'id': 'o2_0_0', 'bounds': indice['niveles']['2']['tiles']['o2_0_0']['bounds'],
+                               'path': '/api/tiles/overview/prueba/o2_0_0.tif'}]
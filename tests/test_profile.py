@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from terrain.profile import distancia_haversine, densificar, cantidad_puntos, calcular_perfil
+
+WEST, NORTH, RES = -60.0, -30.0, 0.01
+
+
+def test_distancia_haversine():
+    assert distancia_haversine(0, 0, 1, 0) == pytest.approx(111195, rel=1e-4)
+    assert distancia_haversine(-30, -60, -30, -60) == 0
+    np.testing.assert_allclose(distancia_haversine([0, 0], [0, 0], [0, 0], [1, 2]), [111195, 222390], rtol=1e-4)
+
+
+def test_densificar_respeta_el_espaciado_y_los_extremos():
+    lats, lons, distancias = densificar([0.0, 0.0, 0.05], [0.0, 0.1, 0.1], 500)
+
+    assert (lats[0], lons[0]) == pytest.approx((0.0, 0.0))
+    assert (lats[-1], lons[-1]) == pytest.approx((0.05, 0.1))
+    # Los vértices intermedios se conservan
+    assert np.any(np.isclose(lats, 0.0, atol=1e-9) & np.isclose(lons, 0.1, atol=1e-9))
+    assert np.all(np.diff(distancias) <= 500 + 1e-6)
+    assert np.all(np.diff(distancias) > 0)
+    assert distancias[-1] == pytest.approx(distancia_haversine(0, 0, 0, 0.1) + distancia_haversine(0, 0.1, 0.05, 0.1))
+    assert len(lats) == cantidad_puntos(np.array([0.0, 0.0, 0.05]), np.array([0.0, 0.1, 0.1]), 500)
+
+
+def test_densificar_sigue_el_circulo_maximo():
+    # Entre dos puntos del mismo paralelo, el círculo máximo pasa más cerca del polo
+    lats, _, _ = densificar([60.0, 60.0], [0.0, 40.0], 10000)
+    assert lats.max() > 61.5
+
+
+def test_perfil_sobre_un_plano(store_sintetico, plano):
+    store_sintetico('t0', plano(), WEST, NORTH, RES)
+    # Por el centro de la fila 4, de la columna 0 a la 9: la elevación sube 2 m por píxel
+    lat = NORTH - 4.5 * RES
+    perfil = calcular_perfil(np.array([lat, lat]), np.array([WEST + 0.5 * RES, WEST + 9.5 * RES]), 50)
+
+    assert perfil['elevaciones'][0] == pytest.approx(112, abs=0.01)
+    assert perfil['elevaciones'][-1] == pytest.approx(130, abs=0.01)
+    assert perfil['ascenso_acumulado'] == pytest.approx(18, abs=0.01)
+    assert perfil['descenso_acumulado'] == pytest.approx(0, abs=0.01)
+    assert (perfil['elevacion_min'], perfil['elevacion_max']) == pytest.approx((112, 130), abs=0.01)
+    # 2 m cada 0.01° de longitud a 30°S. Las muestras caen en la grilla de 1/4 de
+    # píxel de la cache, así que la pendiente de cada tramo varía: se compara el promedio
+    pendiente = 2 / distancia_haversine(lat, 0, lat, RES) * 100
+    promedio = np.average(perfil['pendientes'][1:], weights=np.diff(perfil['distancias']))
+    assert promedio == pytest.approx(pendiente, rel=1e-3)
+    assert len(perfil['pendientes']) == len(perfil['distancias'])
+
+
+def test_perfil_fuera_de_los_tiles(store_sintetico, plano):
+    store_sintetico('t0', plano(), WEST, NORTH, RES)
+
+    perfil = calcular_perfil(np.array([10.0, 10.0]), np.array([10.0, 10.01]), 100)
+
+    assert np.isnan(perfil['elevaciones']).all()
+    assert perfil['elevacion_min'] is None and perfil['ascenso_acumulado'] == 0
+
+
+def test_endpoint_perfil(cliente, store_sintetico, plano):
+    store_sintetico('t0', plano(), WEST, NORTH, RES)
+    lat = NORTH - 4.5 * RES
+    puntos = [{'lat': lat, 'lng': WEST + 0.5 * RES}, {'lat': lat, 'lng': WEST + 9.5 * RES}]
+
+    respuesta = cliente.post('/api/elevation/profile', json={'puntos': puntos, 'espaciado': 100}).get_json()
+
+    assert respuesta['success']
+    assert len(respuesta['puntos']) == len(respuesta['elevaciones']) == len(respuesta['distancias'])
+    assert respuesta['ascenso_acumulado'] == pytest.approx(18, abs=0.1)
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {'puntos': [[-30, -60]]},
+    {'puntos': [[-30, -60], [-30, -59]], 'espaciado': 0.5},
+    {'puntos': [[-30, -60], [-30, -50]], 'espaciado': 1},
+    {'puntos': [['a', 'b'], [-30, -59]]},
+])
+def test_endpoint_perfil_rechaza_parametros_invalidos(cliente, store_sintetico, cuerpo):
+    assert cliente.post('/api/elevation/profile', json=cuerpo).status_code == 400
@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+import pytest
+
+from terrain.routing import (a_estrella, simplificar, ventana_busqueda, ruta_optima,
+                             MAX_CELDAS_LADO, MARGEN_MIN_M, METROS_POR_GRADO)
+
+INF = math.inf
+
+
+def test_ventana_cubre_los_extremos_con_margen():
+    grilla = ventana_busqueda(-31.0, -64.0, -31.05, -63.9, resolucion_m=100)
+
+    for lat, lon in [(-31.0, -64.0), (-31.05, -63.9)]:
+        celda = grilla.a_celda(lat, lon)
+        x, y = celda % grilla.ancho, celda // grilla.ancho
+        assert MARGEN_MIN_M / grilla.celda_m - 1 <= min(x, y, grilla.ancho - 1 - x, grilla.alto - 1 - y)
+    assert grilla.celda_m == 100
+
+
+def test_ventana_grande_engrosa_la_celda():
+    grilla = ventana_busqueda(-30.0, -65.0, -31.0, -64.0, resolucion_m=100)
+
+    assert max(grilla.ancho, grilla.alto) <= MAX_CELDAS_LADO
+    assert grilla.celda_m > 100
+
+
+def test_centros_y_a_celda_son_inversos():
+    grilla = ventana_busqueda(-31.0, -64.0, -31.05, -63.9)
+    celdas = np.array([0, 17, grilla.ancho * grilla.alto - 1])
+    lats, lons = grilla.centros(celdas)
+
+    assert [grilla.a_celda(lat, lon) for lat, lon in zip(lats, lons)] == celdas.tolist()
+
+
+def test_a_estrella_en_linea_recta():
+    ancho, alto = 10, 5
+    camino, g, _ = a_estrella([1.0] * (ancho * alto), ancho, alto, 2 * ancho, 2 * ancho + 9, 10.0, 1.0)
+
+    assert camino == list(range(2 * ancho, 2 * ancho + 10))
+    assert g[camino[-1]] == pytest.approx(90.0)
+
+
+def test_a_estrella_rodea_un_muro_por_el_hueco():
+    ancho, alto = 9, 9
+    costos = [1.0] * (ancho * alto)
+    for y in range(alto):
+        if y != 7:
+            costos[y * ancho + 4] = INF
+
+    camino, _, _ = a_estrella(costos, ancho, alto, 4 * ancho, 4 * ancho + 8, 1.0, 1.0)
+
+    assert 7 * ancho + 4 in camino
+    assert all(costos[c] != INF for c in camino)
+
+
+def test_a_estrella_sin_camino():
+    ancho, alto = 5, 5
+    costos = [1.0] * (ancho * alto)
+    for y in range(alto):
+        costos[y * ancho + 2] = INF
+
+    camino, _, _ = a_estrella(costos, ancho, alto, 0, 4, 1.0, 1.0)
+
+    assert camino is None
+
+
+def test_a_estrella_da_el_mismo_costo_que_dijkstra():
+    rng = np.random.default_rng(7)
+    ancho, alto = 30, 20
+    costos = rng.uniform(1.0, 5.0, ancho * alto)
+    costos[rng.random(ancho * alto) < 0.15] = INF
+    costos[0] = costos[-1] = 1.0
+    costos = costos.tolist()
+
+    camino, g, expandidas = a_estrella(costos, ancho, alto, 0, ancho * alto - 1, 10.0, 1.0)
+    # Con heurística nula la misma búsqueda es Dijkstra
+    camino_d, g_d, expandidas_d = a_estrella(costos, ancho, alto, 0, ancho * alto - 1, 10.0, 0.0)
+
+    assert (camino is None) == (camino_d is None)
+    if camino is not None:
+        assert g[-1] == pytest.approx(g_d[-1])
+        assert expandidas <= expandidas_d
+
+
+def test_simplificar():
+    recta = np.array([[0, 0], [1, 0], [2, 0], [3, 0]], dtype=float)
+    assert simplificar(recta, 0.1) == [0, 3]
+
+    ele = np.array([[0, 0], [1, 0], [2, 0], [2, 1], [2, 2]], dtype=float)
+    assert simplificar(ele, 0.1) == [0, 2, 4]
+    assert simplificar(ele[:2], 0.1) == [0, 1]
+
+
+@pytest.fixture
+def terreno_con_muro(store_sintetico):
+    """Llanura de 200x200 píxeles de 0.001° con un muro de 1000 m en lon 0.1 y un hueco entre lat 0.11 y 0.12"""
+    res = 0.001
+    elevacion = np.zeros((200, 200), dtype=np.float32)
+    lats = 0.2 - (np.arange(200) + 0.5) * res
+    muro = (lats < 0.11) | (lats > 0.12)
+    elevacion[np.ix_(muro, np.arange(99, 102))] = 1000.0
+    store_sintetico('llanura', elevacion, 0.0, 0.2, res)
+
+
+def test_ruta_en_llano(terreno_con_muro):
+    ruta = ruta_optima(0.05, 0.03, 0.05, 0.07)
+
+    distancia = 0.04 * METROS_POR_GRADO
+    assert ruta['puntos'][0] == [0.05, 0.03] and ruta['puntos'][-1] == [0.05, 0.07]
+    assert ruta['distancia_total'] == pytest.approx(distancia, rel=0.03)
+    # Infantería a 4 km/h con transitabilidad 0.8 (sin dato de vegetación)
+    assert ruta['tiempo_total'] == pytest.approx(ruta['distancia_total'] * 3.6 / (4 * 0.8), rel=0.01)
+    assert ruta['segmentos'][-1]['eta'] == ruta['tiempo_total']
+
+
+def test_ruta_cruza_el_muro_por_el_hueco(terreno_con_muro):
+    ruta = ruta_optima(0.1, 0.05, 0.1, 0.15)
+
+    # Cada tramo que pasa por lon 0.1 lo hace dentro del hueco
+    cruces = [
+        lat1 + (lat2 - lat1) * (0.1 - lon1) / (lon2 - lon1)
+        for (lat1, lon1), (lat2, lon2) in zip(ruta['puntos'][:-1], ruta['puntos'][1:])
+        if min(lon1, lon2) <= 0.1 <= max(lon1, lon2) and lon1 != lon2
+    ]
+    assert cruces and all(0.11 <= lat <= 0.12 for lat in cruces), ruta['puntos']
+    assert ruta['distancia_total'] > 0.1 * METROS_POR_GRADO
+
+
+def test_sin_dato_no_hay_ruta(store_sintetico):
+    assert ruta_optima(0.05, 0.03, 0.05, 0.07) is None
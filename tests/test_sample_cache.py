@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from terrain.sample_cache import SUBDIVISIONES_PIXEL, muestrear_memorizado, cache_muestras
+from terrain.sampling import muestrear
+
+WEST, NORTH, RES = -60.0, -30.0, 0.001
+PASO = 1 / SUBDIVISIONES_PIXEL
+
+
+def exacto(col, fila):
+    """Valor del plano de conftest en coordenadas de píxel (0.0 = borde, centros en +0.5)"""
+    return 100 + 2 * (col - 0.5) + 3 * (fila - 0.5)
+
+
+def punto(col, fila):
+    return {'lat': NORTH - fila * RES, 'lng': WEST + col * RES}
+
+
+@pytest.fixture
+def plano_en_store(store_sintetico, plano):
+    store_sintetico('t0', plano(20, 20), WEST, NORTH, RES)
+
+
+def elevaciones(cliente, puntos):
+    respuesta = cliente.post('/api/elevation/sample', json={'puntos': puntos})
+    assert respuesta.status_code == 200
+    return respuesta.get_json()['elevaciones']
+
+
+def test_sobre_la_subgrilla_coincide_con_la_bilineal(cliente, plano_en_store):
+    posiciones = [(5.25, 7.5), (10.0, 10.0), (3.75, 12.25)]
+
+    valores = elevaciones(cliente, [punto(c, f) for c, f in posiciones])
+
+    assert valores == pytest.approx([exacto(c, f) for c, f in posiciones], abs=0.01)
+
+
+def test_entre_nodos_devuelve_el_nodo_mas_cercano(cliente, plano_en_store):
+    # 0.1 px al este de un nodo de la subgrilla: se mide en el nodo, 0.2 m por debajo del valor exacto
+    valor, = elevaciones(cliente, [punto(5.25 + 0.1, 7.5)])
+
+    assert valor == pytest.approx(exacto(5.25, 7.5), abs=0.01)
+    assert valor != pytest.approx(exacto(5.35, 7.5), abs=0.1)
+
+
+def test_el_valor_salta_en_el_punto_medio_entre_nodos(cliente, plano_en_store):
+    # Hasta 1/8 de píxel se redondea al nodo de la izquierda; después, al de la derecha (2 m/px -> 0.5 m)
+    antes, despues = elevaciones(cliente, [punto(5.0 + PASO / 2 - 0.01, 7.5), punto(5.0 + PASO / 2 + 0.01, 7.5)])
+
+    assert antes == pytest.approx(exacto(5.0, 7.5), abs=0.01)
+    assert despues - antes == pytest.approx(2 * PASO, abs=0.01)
+
+
+def test_error_acotado_a_un_octavo_de_pixel(cliente, plano_en_store):
+    rng = np.random.default_rng(11)
+    cols = rng.uniform(1, 19, 300)
+    filas = rng.uniform(1, 19, 300)
+
+    valores = np.array(elevaciones(cliente, [punto(c, f) for c, f in zip(cols, filas)]))
+    errores = np.abs(valores - exacto(cols, filas))
+
+    # Gradiente de 2 m/px en columnas y 3 m/px en filas, desplazamiento máximo de 1/8 px en cada eje
+    assert errores.max() <= (2 + 3) * PASO / 2 + 0.01
+    # Y se nota: respecto de la bilineal exacta la mitad de los puntos se corre más de 0.1 m
+    lats = np.array([punto(c, f)['lat'] for c, f in zip(cols, filas)])
+    lons = np.array([punto(c, f)['lng'] for c, f in zip(cols, filas)])
+    diferencias = np.abs(valores - muestrear(lats, lons))
+    assert np.median(diferencias) > 0.1 and diferencias.max() > 0.5
+
+
+def test_misma_celda_de_subgrilla_memoriza_una_sola_muestra(plano_en_store):
+    cache_muestras.limpiar()
+    lats = np.full(3, NORTH - 7.5 * RES)
+    lons = WEST + np.array([5.24, 5.25, 5.26]) * RES
+
+    valores = muestrear_memorizado(lats, lons)
+
+    assert len(set(valores)) == 1
+    _, claves, _ = cache_muestras.obtener(('elevacion', 't0'))
+    assert len(claves) == 1
+
+
+def test_reconstruir_el_store_invalida_indice_y_muestras(store_sintetico, plano, crear_tar, geotiff, tmp_path):
+    from terrain.build_store import construir_store
+    from terrain import tile_store
+
+    store_sintetico('t0', plano(10, 10), WEST, NORTH, RES)
+    al_este = (np.array([NORTH - 5 * RES]), np.array([WEST + 15 * RES]))
+    adentro = (np.array([NORTH - 5.25 * RES]), np.array([WEST + 5.25 * RES]))
+    assert np.isnan(muestrear_memorizado(*al_este))
+    anterior = muestrear_memorizado(*adentro)
+
+    # Reconstrucción: t0 sube 1000 m y aparece un tile nuevo al este
+    entrada = tmp_path / 'mini_tiles' / 'prov'
+    entrada.mkdir(parents=True)
+    crear_tar(str(entrada / 'prov_part_01.tar.gz'), {
+        't0.tif': geotiff(plano(10, 10) + 1000, WEST, NORTH, RES),
+        't1.tif': geotiff(np.full((10, 10), 500, dtype=np.float32), WEST + 10 * RES, NORTH, RES)
+    })
+    assert construir_store(str(tmp_path / 'mini_tiles'), tile_store.TILE_STORE_DIR, 'elevacion') == 2
+
+    assert muestrear_memorizado(*al_este)[0] == pytest.approx(500)
+    assert muestrear_memorizado(*adentro)[0] == pytest.approx(anterior[0] + 1000, abs=0.5)
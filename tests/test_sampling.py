@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from terrain.sampling import muestrear, parsear_puntos, a_lista, bilineal, vecino_cercano
+from terrain.tile_store import obtener_store
+
+WEST, NORTH, RES = -60.0, -30.0, 0.01
+
+
+def coordenadas(x, y):
+    """Lon/lat de una posición en píxeles (fraccionaria) del tile de prueba"""
+    return WEST + np.asarray(x) * RES, NORTH - np.asarray(y) * RES
+
+
+def test_bilineal_reproduce_un_plano(store_sintetico, plano):
+    store_sintetico('t0', plano(), WEST, NORTH, RES)
+    x = np.array([0.5, 1.25, 4.5, 7.9, 9.5])
+    y = np.array([0.5, 2.75, 4.5, 1.1, 9.5])
+    lons, lats = coordenadas(x, y)
+
+    valores = muestrear(lats, lons)
+
+    np.testing.assert_allclose(valores, 100 + 2 * (x - 0.5) + 3 * (y - 0.5))
+
+
+def test_fuera_de_los_tiles_es_nan(store_sintetico, plano):
+    store_sintetico('t0', plano(), WEST, NORTH, RES)
+    lons, lats = coordenadas(np.array([-5.0, 15.0, 5.0]), np.array([5.0, 5.0, 20.0]))
+
+    assert np.isnan(muestrear(lats, lons)).all()
+
+
+def test_los_vecinos_nodata_no_entran_en_el_promedio(store_sintetico):
+    datos = np.full((4, 4), 10.0, dtype=np.float32)
+    datos[1, 2] = -9999
+    store_sintetico('t0', datos, WEST, NORTH, RES, nodata=-9999)
+    raster = obtener_store().cargar('t0')
+
+    # Punto entre los centros de (1,1), (1,2), (2,1) y (2,2): el nodata no arrastra el valor
+    lons, lats = coordenadas(np.array([2.0]), np.array([2.0]))
+    assert bilineal(raster, lons, lats)[0] == pytest.approx(10.0)
+    # Píxel nodata con vecino cercano: NaN
+    lons, lats = coordenadas(np.array([2.5]), np.array([1.5]))
+    assert np.isnan(vecino_cercano(raster, lons, lats)[0])
+
+
+def test_puntos_de_varios_tiles(store_sintetico):
+    store_sintetico('oeste', np.full((10, 10), 1.0, dtype=np.float32), WEST, NORTH, RES)
+    store_sintetico('este', np.full((10, 10), 2.0, dtype=np.float32), WEST + 10 * RES, NORTH, RES)
+    lons, lats = coordenadas(np.array([3.0, 13.0, 7.0, 19.0]), np.array([5.0, 5.0, 1.0, 9.0]))
+
+    np.testing.assert_allclose(muestrear(lats, lons), [1.0, 2.0, 1.0, 2.0])
+
+
+def test_vecino_cercano_sin_interpolar(store_sintetico, plano):
+    store_sintetico('t0', plano(), WEST, NORTH, RES)
+    lons, lats = coordenadas(np.array([3.9]), np.array([6.1]))
+
+    assert muestrear(lats, lons, interpolar=False)[0] == 100 + 2 * 3 + 3 * 6
+
+
+def test_parsear_puntos_acepta_listas_y_diccionarios():
+    lats, lons = parsear_puntos([[-30.5, -60.1], [-31.0, -61.0]])
+    np.testing.assert_array_equal(lats, [-30.5, -31.0])
+    np.testing.assert_array_equal(lons, [-60.1, -61.0])
+
+    lats, lons = parsear_puntos([{'lat': -30.5, 'lng': -60.1}, {'lat': -31.0, 'lon': -61.0}])
+    np.testing.assert_array_equal(lats, [-30.5, -31.0])
+    np.testing.assert_array_equal(lons, [-60.1, -61.0])
+
+
+def test_a_lista_redondea_y_cambia_nan_por_none():
+    assert a_lista(np.array([1.234, np.nan, np.inf, 2.0])) == [1.23, None, None, 2.0]
+    assert a_lista(np.array([1.26]), 1) == [1.3]
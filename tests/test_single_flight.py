@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from terrain import tiles
+from terrain.archive_index import TileArchiveIndex
+from terrain.single_flight import SingleFlight
+
+
+def lanzar(vuelos, clave, funcion, cantidad):
+    resultados, errores, llegadas = [], [], []
+
+    def trabajo():
+        llegadas.append(1)
+        try:
+            resultados.append(vuelos.ejecutar(clave, funcion))
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=trabajo) for _ in range(cantidad)]
+    for hilo in hilos:
+        hilo.start()
+    return hilos, resultados, errores, llegadas
+
+
+def esperar_llegadas(vuelos, llegadas, cantidad):
+    """Espera a que todos los hilos estén por entrar y el primero esté ejecutando"""
+    while len(llegadas) < cantidad or vuelos.en_curso() == 0:
+        time.sleep(0.001)
+    time.sleep(0.05)
+
+
+def test_llamadas_concurrentes_ejecutan_una_sola_vez():
+    vuelos = SingleFlight()
+    liberar = threading.Event()
+    ejecuciones = []
+
+    def lenta():
+        ejecuciones.append(1)
+        liberar.wait(5)
+        return 'resultado'
+
+    hilos, resultados, errores, llegadas = lanzar(vuelos, 'tile', lenta, 8)
+    esperar_llegadas(vuelos, llegadas, 8)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert len(ejecuciones) == 1
+    assert resultados == ['resultado'] * 8
+    assert errores == []
+    assert vuelos.en_curso() == 0
+
+
+def test_la_excepcion_llega_a_todos_y_no_queda_en_curso():
+    vuelos = SingleFlight()
+    liberar = threading.Event()
+
+    def falla():
+        liberar.wait(5)
+        raise ValueError('tile corrupto')
+
+    hilos, resultados, errores, llegadas = lanzar(vuelos, 'tile', falla, 4)
+    esperar_llegadas(vuelos, llegadas, 4)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert resultados == []
+    assert len(errores) == 4 and all(isinstance(e, ValueError) for e in errores)
+    assert vuelos.en_curso() == 0
+
+
+def test_claves_distintas_no_se_coalescen_y_se_puede_reintentar():
+    vuelos = SingleFlight()
+
+    assert vuelos.ejecutar('a', lambda: 1) == 1
+    assert vuelos.ejecutar('b', lambda: 2) == 2
+    with pytest.raises(RuntimeError):
+        vuelos.ejecutar('a', lambda: (_ for _ in ()).throw(RuntimeError('x')))
+    assert vuelos.ejecutar('a', lambda: 3) == 3
+
+
+def en_paralelo(funcion, cantidad):
+    """Ejecuta `funcion` en `cantidad` hilos que arrancan juntos; devuelve sus resultados"""
+    barrera = threading.Barrier(cantidad)
+    resultados = []
+
+    def trabajo():
+        barrera.wait()
+        resultados.append(funcion())
+
+    hilos = [threading.Thread(target=trabajo) for _ in range(cantidad)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(5)
+    return resultados
+
+
+def test_lecturas_concurrentes_del_mismo_tile_leen_el_tar_una_vez(tmp_path, monkeypatch, crear_tar):
+    ruta = crear_tar(str(tmp_path / 'prov_part_01.tar.gz'), {'prov_tile_0000.tif': b'II*\x00' + b'z' * 500})
+    tiles.cache_tiles.limpiar()
+    lecturas = []
+    leer_miembro = TileArchiveIndex.leer_miembro
+
+    def leer_lento(indice, nombre):
+        lecturas.append(nombre)
+        time.sleep(0.1)
+        return leer_miembro(indice, nombre)
+    monkeypatch.setattr(TileArchiveIndex, 'leer_miembro', leer_lento)
+
+    resultados = en_paralelo(lambda: tiles.leer_tile(ruta, 'prov_tile_0000.tif'), 6)
+
+    assert lecturas == ['prov_tile_0000.tif']
+    assert resultados == [b'II*\x00' + b'z' * 500] * 6
+
+
+def test_descargas_concurrentes_del_mismo_tar_bajan_una_vez(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiles, 'VEGETACION_TAR_DIR', str(tmp_path))
+    descargas = []
+
+    def urlretrieve(url, destino):
+        descargas.append(url)
+        time.sleep(0.1)
+        with open(destino, 'wb') as f:
+            f.write(b'tar')
+    monkeypatch.setattr(tiles.urllib.request, 'urlretrieve', urlretrieve)
+
+    rutas = en_paralelo(lambda: tiles.descargar_tar_vegetacion('veg_01.tar.gz'), 6)
+
+    assert len(descargas) == 1
+    assert set(rutas) == {str(tmp_path / 'veg_01.tar.gz')}
+    assert (tmp_path / 'veg_01.tar.gz').read_bytes() == b'tar'
+    assert [p.name for p in tmp_path.iterdir()] == ['veg_01.tar.gz']
@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+import pytest
+
+from terrain.slope import (pendiente_orientacion, agregar_halo, codificar, decodificar, muestrear_pendiente,
+                           pendiente_de_tile, ESCALA_PENDIENTE, ESCALA_ORIENTACION,
+                           NODATA_PENDIENTE, CAPA_PENDIENTE, CAPA_ORIENTACION)
+
+# Grilla chica cerca del ecuador: un píxel de 0.001° mide ~111 m en ambos ejes
+RES = 0.001
+
+
+def test_plano_inclinado_hacia_el_este(rampa):
+    pendiente, orientacion = pendiente_orientacion(rampa(7, 7, 30), (0.0, RES, 0.0, 0.0035, 0.0, -RES))
+
+    assert pendiente.shape == (5, 5)
+    np.testing.assert_allclose(pendiente, 30.0, atol=0.01)
+    # Sube al este: cae hacia el oeste
+    np.testing.assert_allclose(orientacion, 270.0, atol=0.01)
+
+
+def test_plano_inclinado_hacia_el_norte(rampa):
+    pendiente, orientacion = pendiente_orientacion(rampa(7, 7, 10, 'norte'), (0.0, RES, 0.0, 0.0035, 0.0, -RES))
+
+    np.testing.assert_allclose(pendiente, 10.0, atol=0.01)
+    np.testing.assert_allclose(orientacion, 180.0, atol=0.01)
+
+
+def test_terreno_plano_no_tiene_orientacion():
+    pendiente, orientacion = pendiente_orientacion(np.full((5, 5), 250.0), (0.0, RES, 0.0, 0.0, 0.0, -RES))
+
+    assert (pendiente == 0).all()
+    assert np.isnan(orientacion).all()
+
+
+def test_nodata_se_propaga_a_sus_vecinos():
+    z = np.full((5, 5), 100.0)
+    z[2, 2] = -9999
+    pendiente, _ = pendiente_orientacion(z, (0.0, RES, 0.0, 0.0, 0.0, -RES), nodata=-9999)
+
+    # La ventana de Horn no usa el píxel central: sólo sus vecinos quedan sin dato
+    esperado = np.ones((3, 3), dtype=bool)
+    esperado[1, 1] = False
+    np.testing.assert_array_equal(np.isnan(pendiente), esperado)
+
+
+def test_agregar_halo_replica_el_borde():
+    datos = np.arange(6, dtype=np.float32).reshape(2, 3)
+
+    assert agregar_halo(datos, (0, 0, 0, 0)) is datos
+    con_halo = agregar_halo(datos, (1, 0, 0, 1))
+    assert con_halo.shape == (3, 4)
+    np.testing.assert_array_equal(con_halo[0], [0, 1, 2, 2])
+    np.testing.assert_array_equal(con_halo[:, -1], [2, 2, 5])
+
+
+def test_codificar_y_decodificar():
+    pendiente = np.array([[0.0, 12.345, np.nan]], dtype=np.float32)
+    orientacion = np.array([[np.nan, 359.99, 90.04]], dtype=np.float32)
+
+    bandas = codificar(pendiente, orientacion)
+
+    assert bandas.dtype == np.int16 and bandas.shape == (2, 1, 3)
+    np.testing.assert_array_equal(bandas[0, 0], [0, 1234, NODATA_PENDIENTE])
+    # 359.99° redondea a 3600 décimas, que es el norte (0)
+    np.testing.assert_array_equal(bandas[1, 0], [NODATA_PENDIENTE, 0, 900])
+    np.testing.assert_allclose(decodificar(bandas[0], ESCALA_PENDIENTE), [[0.0, 12.34, np.nan]])
+
+
+def test_muestrear_pendiente_de_las_capas_precalculadas(store_sintetico):
+    pendiente = np.full((4, 4), 1500, dtype=np.int16)
+    orientacion = np.full((4, 4), 2700, dtype=np.int16)
+    orientacion[0, 0] = NODATA_PENDIENTE
+    store_sintetico('t0', pendiente, 0.0, 0.004, RES, capa=CAPA_PENDIENTE, nodata=NODATA_PENDIENTE)
+    store_sintetico('t0', orientacion, 0.0, 0.004, RES, capa=CAPA_ORIENTACION, nodata=NODATA_PENDIENTE)
+
+    pendientes, orientaciones = muestrear_pendiente([0.0025, 0.0035], [0.0025, 0.0005])
+
+    np.testing.assert_allclose(pendientes, [15.0, 15.0])
+    assert orientaciones[0] == 270.0 and np.isnan(orientaciones[1])
+
+
+def test_pendiente_de_tile_usa_los_vecinos_en_el_borde(store_sintetico, rampa):
+    # Una rampa continua cortada en dos tiles: con el halo del vecino, el borde
+    # compartido da la misma pendiente que el interior
+    z = rampa(8, 16, 20).astype(np.float32)
+    store_sintetico('oeste', z[:, :8], 0.0, 0.008, RES)
+    store_sintetico('este', z[:, 8:], 8 * RES, 0.008, RES)
+
+    pendiente = pendiente_de_tile('oeste')
+
+    assert pendiente.shape == (8, 8)
+    # (las esquinas no tienen vecino en diagonal: no hay tiles al norte ni al sur)
+    np.testing.assert_allclose(pendiente[1:-1, -1], 20.0, atol=0.05)
+    # Sin vecino al oeste se replica el borde: la pendiente queda a la mitad
+    np.testing.assert_allclose(pendiente[1:-1, 0], math.degrees(math.atan(math.tan(math.radians(20)) / 2)), atol=0.05)
+
+
+def test_pendiente_de_tile_prefiere_la_capa_precalculada(store_sintetico):
+    store_sintetico('t0', np.zeros((4, 4), dtype=np.float32), 0.0, 0.004, RES)
+    store_sintetico('t0', np.full((4, 4), 4200, dtype=np.int16), 0.0, 0.004, RES,
+                    capa=CAPA_PENDIENTE, nodata=NODATA_PENDIENTE)
+
+    np.testing.assert_allclose(pendiente_de_tile('t0'), 42.0)
+
+
+def test_pendiente_de_tile_inexistente():
+    with pytest.raises(KeyError):
+        pendiente_de_tile('no_existe')
@@ -0,0 +1,92 @@
+import json
+import os
+
+import numpy as np
+
+from terrain.spatial_index import TileSpatialIndex, cargar_indices_mini_tiles, obtener_indice_espacial
+
+
+def grilla_tiles(columnas=4, filas=3, lado=0.5, west=-62.0, north=-30.0):
+    """Tiles contiguos de lado x lado grados, numerados por fila"""
+    tiles = {}
+    for f in range(filas):
+        for c in range(columnas):
+            tiles[f"t_{f}_{c}"] = {'bounds': {
+                'west': west + c * lado, 'east': west + (c + 1) * lado,
+                'north': north - f * lado, 'south': north - (f + 1) * lado
+            }}
+    return tiles
+
+
+def test_resolver_puntos():
+    indice = TileSpatialIndex(grilla_tiles())
+    lons = np.array([-61.9, -60.1, -61.25, -70.0])
+    lats = np.array([-30.1, -31.4, -30.75, -30.5])
+
+    posiciones = indice.resolver_puntos(lons, lats)
+
+    assert [indice.tile_ids[p] if p >= 0 else None for p in posiciones] == ['t_0_0', 't_2_3', 't_1_1', None]
+
+
+def test_los_bordes_compartidos_van_a_un_solo_tile():
+    indice = TileSpatialIndex(grilla_tiles())
+    # Borde entre t_0_0 y t_0_1 (oeste inclusivo) y entre t_0_0 y t_1_0 (norte inclusivo)
+    posiciones = indice.resolver_puntos(np.array([-61.5, -61.75]), np.array([-30.25, -30.5]))
+
+    assert [indice.tile_ids[p] for p in posiciones] == ['t_0_1', 't_1_0']
+
+
+def test_tiles_en_bbox():
+    indice = TileSpatialIndex(grilla_tiles())
+
+    assert indice.tiles_en_bbox(-61.4, -30.9, -60.6, -30.6) == ['t_1_1', 't_1_2']
+    assert indice.tiles_en_bbox(-80.0, -40.0, -79.0, -39.0) == []
+    assert len(indice.tiles_en_bbox(-63.0, -32.0, -59.0, -29.0)) == 12
+
+
+def test_tiles_en_polilinea_en_orden_de_recorrido():
+    indice = TileSpatialIndex(grilla_tiles())
+
+    tiles = indice.tiles_en_polilinea([-30.25, -30.25, -31.25], [-61.9, -60.1, -60.1])
+
+    assert tiles == ['t_0_0', 't_0_1', 't_0_2', 't_0_3', 't_1_3', 't_2_3']
+
+
+def test_indice_vacio():
+    indice = TileSpatialIndex({})
+
+    assert len(indice) == 0
+    assert (indice.resolver_puntos([-60.0], [-30.0]) == -1).all()
+    assert indice.tiles_en_bbox(-61, -31, -60, -30) == []
+
+
+def test_metadatos_tile():
+    tiles = grilla_tiles()
+    indice = TileSpatialIndex(tiles)
+
+    assert indice.metadatos_tile('t_1_2') is tiles['t_1_2']
+    assert indice.metadatos_tile('no_existe') is None
+
+
+def test_cargar_indices_mini_tiles(tmp_path):
+    tiles = grilla_tiles(2, 1)
+    (tmp_path / 'master_mini_tiles_index.json').write_text(json.dumps({'provincias': {
+        'centro': {'index_file': 'centro_mini_tiles_index.json'},
+        'sur': {}
+    }}))
+    os.makedirs(str(tmp_path / 'centro'))
+    (tmp_path / 'centro' / 'centro_mini_tiles_index.json').write_text(json.dumps({'tiles': tiles}))
+
+    cargados = cargar_indices_mini_tiles(str(tmp_path))
+
+    assert sorted(cargados) == sorted(tiles)
+    assert all(tile['provincia'] == 'centro' for tile in cargados.values())
+
+
+def test_sin_indice_maestro_usa_el_del_store(store_sintetico):
+    store_sintetico('t0', np.zeros((4, 4), dtype=np.float32), -60.0, -30.0, 0.25)
+
+    indice = obtener_indice_espacial()
+
+    assert indice.tile_ids == ['t0']
+    assert obtener_indice_espacial() is indice
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+from terrain.tile_cache import TileByteCache, TilePopularity
+
+
+def test_desaloja_los_menos_usados_al_superar_el_presupuesto():
+    cache = TileByteCache(max_bytes=30)
+    cache.guardar('a', b'x' * 10)
+    cache.guardar('b', b'x' * 10)
+    cache.guardar('c', b'x' * 10)
+    assert cache.obtener('a') is not None  # 'a' pasa a ser el más reciente
+
+    cache.guardar('d', b'x' * 10)
+
+    assert cache.obtener('b') is None
+    assert all(cache.obtener(k) is not None for k in ('a', 'c', 'd'))
+    stats = cache.estadisticas()
+    assert stats['bytes'] == 30
+    assert stats['desalojos'] == 1
+
+
+def test_valor_mas_grande_que_el_presupuesto_no_se_guarda():
+    cache = TileByteCache(max_bytes=10)
+    cache.guardar('a', b'x' * 5)
+    cache.guardar('grande', b'x' * 11)
+
+    assert cache.obtener('grande') is None
+    assert cache.obtener('a') == b'x' * 5
+
+
+def test_reemplazar_una_clave_actualiza_los_bytes():
+    cache = TileByteCache(max_bytes=100)
+    cache.guardar('a', b'x' * 40)
+    cache.guardar('a', b'x' * 10)
+
+    assert cache.estadisticas()['bytes'] == 10
+    assert cache.estadisticas()['entradas'] == 1
+
+
+def test_accesos_concurrentes_mantienen_la_cuenta_de_bytes():
+    # 8 hilos guardan, leen, reemplazan e invalidan las mismas 40 claves; cada
+    # clave tiene siempre el mismo tamaño, así que la cuenta final es verificable
+    cache = TileByteCache(max_bytes=2000)
+    claves = [f'tile_{i}' for i in range(40)]
+    tamaño = {clave: 20 + i for i, clave in enumerate(claves)}
+    barrera = threading.Barrier(8)
+
+    def trabajo(semilla):
+        barrera.wait()
+        for paso in range(2000):
+            clave = claves[(semilla * 7 + paso) % len(claves)]
+            if paso % 5 == 0:
+                cache.invalidar(lambda c: c == clave)
+            elif paso % 2 == 0:
+                cache.guardar(clave, b'x' * tamaño[clave])
+            else:
+                cache.obtener_o_cargar(clave, lambda: b'x' * tamaño[clave])
+
+    hilos = [threading.Thread(target=trabajo, args=(i,)) for i in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(10)
+
+    presentes = [clave for clave in claves if cache.obtener(clave) is not None]
+    stats = cache.estadisticas()
+    assert stats['bytes'] == sum(tamaño[clave] for clave in presentes)
+    assert stats['bytes'] <= cache.max_bytes
+    assert stats['entradas'] == len(presentes)
+
+
+def test_medir_arrays_por_nbytes():
+    cache = TileByteCache(max_bytes=1000, medir=lambda grilla: grilla.nbytes)
+    cache.guardar('grilla', np.zeros((10, 10), dtype=np.float32))
+
+    assert cache.estadisticas()['bytes'] == 400
+
+
+def test_obtener_o_cargar_y_contadores():
+    cache = TileByteCache(max_bytes=100)
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        return b'datos'
+
+    assert cache.obtener_o_cargar('k', cargar) == b'datos'
+    assert cache.obtener_o_cargar('k', cargar) == b'datos'
+
+    assert len(cargas) == 1
+    stats = cache.estadisticas()
+    assert (stats['aciertos'], stats['fallos'], stats['tasa_aciertos']) == (1, 1, 0.5)
+
+
+def test_invalidar_y_limpiar():
+    cache = TileByteCache(max_bytes=100)
+    for clave in [('p', 1), ('p', 2), ('q', 1)]:
+        cache.guardar(clave, b'x' * 5)
+
+    assert cache.invalidar(lambda clave: clave[0] == 'p') == 2
+    assert cache.estadisticas()['bytes'] == 5
+
+    cache.limpiar()
+    assert cache.estadisticas()['entradas'] == 0
+
+
+def test_ranking_de_populares_persiste(tmp_path):
+    ruta = str(tmp_path / 'sub' / 'populares.json')
+    ranking = TilePopularity(ruta, guardar_cada=3)
+    for miembro in ['b.tif', 'a.tif', 'b.tif']:
+        ranking.registrar('prov.tar', miembro)
+
+    # Al llegar a guardar_cada registros se escribe solo
+    otro = TilePopularity(ruta)
+    otro.cargar()
+    assert otro.mas_pedidos() == [('prov.tar', 'b.tif'), ('prov.tar', 'a.tif')]
+    assert otro.mas_pedidos(1) == [('prov.tar', 'b.tif')]
+
+
+def test_ranking_ilegible_se_ignora(tmp_path):
+    ruta = tmp_path / 'populares.json'
+    ruta.write_text('no es json')
+
+    ranking = TilePopularity(str(ruta))
+    ranking.cargar()
+
+    assert ranking.mas_pedidos() == []
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from terrain.tile_dedup import es_sin_dato, valor_constante, hash_contenido, geotransform_de_bounds
+
+
+@pytest.mark.parametrize('datos, nodata, esperado', [
+    (np.full((4, 4), -32768, dtype=np.int16), -32768, True),
+    (np.array([[-32768, 5]], dtype=np.int16), -32768, False),
+    (np.full((3, 3), np.nan, dtype=np.float32), float('nan'), True),
+    (np.array([[np.nan, 1.0]], dtype=np.float32), float('nan'), False),
+    (np.zeros((2, 2), dtype=np.uint8), None, False),
+])
+def test_es_sin_dato(datos, nodata, esperado):
+    assert es_sin_dato(datos, nodata) is esperado
+
+
+def test_valor_constante():
+    assert valor_constante(np.full((4, 4), 120, dtype=np.int16), -32768) == 120
+    assert valor_constante(np.full((4, 4), 0.25, dtype=np.float32), None) == 0.25
+    # Con algún píxel sin dato o distinto no es constante
+    assert valor_constante(np.array([[120, 121]], dtype=np.int16), -32768) is None
+    assert valor_constante(np.array([[120, -32768]], dtype=np.int16), -32768) is None
+    assert valor_constante(np.full((2, 2), -32768, dtype=np.int16), -32768) is None
+    assert valor_constante(np.array([[np.nan, np.nan]], dtype=np.float32), None) is None
+
+
+def test_valor_constante_es_un_escalar_de_python():
+    assert type(valor_constante(np.full((2, 2), 7, dtype=np.int16), None)) is int
+
+
+def test_hash_contenido_depende_de_pixeles_tipo_y_forma():
+    datos = np.arange(12, dtype=np.int16).reshape(3, 4)
+
+    assert hash_contenido(datos) == hash_contenido(datos.copy())
+    assert hash_contenido(datos[:, ::2]) == hash_contenido(np.ascontiguousarray(datos[:, ::2]))
+    assert hash_contenido(datos) != hash_contenido(datos.reshape(4, 3))
+    assert hash_contenido(datos) != hash_contenido(datos.astype(np.int32))
+    assert hash_contenido(datos, datos) != hash_contenido(datos)
+    assert len(hash_contenido(datos)) == 32
+
+
+def test_geotransform_de_bounds():
+    bounds = {'west': -60.0, 'east': -59.0, 'north': -30.0, 'south': -30.5}
+
+    assert geotransform_de_bounds(bounds, 100, 50) == pytest.approx((-60.0, 0.01, 0.0, -30.0, 0.0, -0.01))
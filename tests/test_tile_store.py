@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pytest
+
+from terrain.tile_store import RasterTileStore, a_int16, guardar_tile, guardar_indice, NODATA_INT16
+
+
+def test_a_int16_redondea_y_marca_nodata():
+    datos = np.array([[10.4, 10.6, -9999.0], [np.nan, -3.5, 2500.2]], dtype=np.float32)
+
+    enteros, nodata = a_int16(datos, -9999.0)
+
+    assert enteros.dtype == np.int16
+    assert nodata == NODATA_INT16
+    np.testing.assert_array_equal(enteros, [[10, 11, NODATA_INT16], [NODATA_INT16, -4, 2500]])
+
+
+def test_a_int16_sin_nodata_ni_huecos_queda_sin_nodata():
+    enteros, nodata = a_int16(np.full((2, 2), 7.2, dtype=np.float64), None)
+    assert nodata is None and (enteros == 7).all()
+
+
+def test_a_int16_deja_los_valores_fuera_de_rango():
+    datos = np.array([[0.0, 40000.0]], dtype=np.float32)
+    salida, nodata = a_int16(datos, None)
+    assert salida is datos and nodata is None
+
+
+def test_guardar_y_cargar_memory_mapped(tmp_path):
+    directorio = str(tmp_path / 'elevacion')
+    datos = np.arange(12, dtype=np.int16).reshape(3, 4)
+    entrada = guardar_tile(directorio, 't0', datos, (-60.0, 0.5, 0.0, -30.0, 0.0, -0.5), NODATA_INT16,
+                           extra={'provincia': 'prov'})
+    guardar_indice(directorio, {'t0': entrada})
+
+    store = RasterTileStore(str(tmp_path), 'elevacion')
+    raster = store.cargar('t0')
+
+    assert isinstance(raster.datos, np.memmap)
+    assert raster.datos.dtype == np.int16
+    np.testing.assert_array_equal(raster.datos, datos)
+    assert raster.bounds == {'west': -60.0, 'east': -58.0, 'north': -30.0, 'south': -31.5}
+    assert store.indice()['t0']['provincia'] == 'prov'
+    assert store.cargar('t0') is raster
+    with pytest.raises(KeyError):
+        store.cargar('no_existe')
+
+
+def test_como_float_cambia_nodata_por_nan(tmp_path):
+    directorio = str(tmp_path / 'elevacion')
+    guardar_tile(directorio, 't0', np.array([[5, NODATA_INT16]], dtype=np.int16), (0, 1, 0, 0, 0, -1), NODATA_INT16)
+
+    valores = RasterTileStore(str(tmp_path), 'elevacion').cargar('t0').como_float()
+
+    assert valores[0, 0] == 5 and np.isnan(valores[0, 1])
+
+
+def test_olvidar_relee_un_tile_reconstruido(tmp_path):
+    directorio = str(tmp_path / 'elevacion')
+    guardar_tile(directorio, 't0', np.zeros((2, 2), dtype=np.int16), (0, 1, 0, 0, 0, -1), None)
+    store = RasterTileStore(str(tmp_path), 'elevacion')
+    assert store.cargar('t0').datos.sum() == 0
+
+    guardar_tile(directorio, 't0', np.ones((2, 2), dtype=np.int16), (0, 1, 0, 0, 0, -1), None)
+    store.olvidar('t0')
+
+    assert store.cargar('t0').datos.sum() == 4
+
+
+def test_build_store_guarda_la_elevacion_en_int16(tmp_path, crear_tar, geotiff):
+    from terrain.build_store import construir_store
+
+    elevacion = np.array([[100.4, 101.6], [-9999.0, 250.0]], dtype=np.float32)
+    entrada = tmp_path / 'mini_tiles' / 'prov'
+    entrada.mkdir(parents=True)
+    crear_tar(str(entrada / 'prov_part_01.tar.gz'), {
+        'prov_tile_0000.tif': geotiff(elevacion, -60.0, -30.0, 0.01, nodata=-9999.0)
+    })
+    salida = str(tmp_path / 'store')
+
+    assert construir_store(str(tmp_path / 'mini_tiles'), salida, 'elevacion') == 1
+
+    raster = RasterTileStore(salida, 'elevacion').cargar('prov_tile_0000')
+    assert raster.datos.dtype == np.int16
+    np.testing.assert_array_equal(raster.datos, [[100, 102], [NODATA_INT16, 250]])
+    assert raster.nodata == NODATA_INT16
+    with open(tmp_path / 'store' / 'elevacion' / 'prov_tile_0000.json') as f:
+        assert json.load(f)['dtype'] == 'int16'
+    assert raster.bounds['west'] == pytest.approx(-60.0) and raster.bounds['south'] == pytest.approx(-30.02)
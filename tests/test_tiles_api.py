@@ -0,0 +1,169 @@
+import json
+import struct
+import urllib.error
+import urllib.request
+
+import pytest
+
+from terrain import tiles
+from terrain.archive_index import TileArchiveIndex
+
+MIEMBROS = {
+    'prov_tile_0000.tif': b'II*\x00' + b'a' * 200,
+    'prov_tile_0001.tif': b'II*\x00' + b'b' * 300,
+}
+
+
+@pytest.fixture
+def directorios(tmp_path, monkeypatch, crear_tar):
+    """Una provincia con un TAR e índice JSON, y un TAR de vegetación ya descargado"""
+    mini_tiles = tmp_path / 'mini_tiles'
+    vegetacion = tmp_path / 'vegetacion'
+    (mini_tiles / 'prov').mkdir(parents=True)
+    vegetacion.mkdir()
+    monkeypatch.setattr(tiles, 'MINI_TILES_DIR', str(mini_tiles))
+    monkeypatch.setattr(tiles, 'VEGETACION_TAR_DIR', str(vegetacion))
+    monkeypatch.setattr(tiles, '_tiles_por_provincia', {})
+    tiles.cache_tiles.limpiar()
+
+    crear_tar(str(mini_tiles / 'prov' / 'prov_part_01.tar.gz'), MIEMBROS)
+    indice = {'tiles': {
+        nombre[:-4]: {'filename': nombre, 'tar_file': 'prov_part_01.tar.gz'} for nombre in MIEMBROS
+    }}
+    (mini_tiles / 'prov' / 'prov_mini_tiles_index.json').write_text(json.dumps(indice))
+    crear_tar(str(vegetacion / 'veg_01.tar.gz'), {'veg_tile_0000.tif': b'II*\x00vegetacion'})
+    return tmp_path
+
+
+def test_tile_se_sirve_desde_el_tar_con_etag(cliente, directorios):
+    respuesta = cliente.get('/api/tiles/prov/prov_tile_0001.tif')
+
+    assert respuesta.status_code == 200
+    assert respuesta.data == MIEMBROS['prov_tile_0001.tif']
+    assert respuesta.mimetype == 'image/tiff'
+    assert respuesta.headers['Cache-Control'] == 'public, max-age=86400'
+    assert respuesta.headers['ETag']
+
+
+def test_etag_vigente_responde_304(cliente, directorios):
+    etag = cliente.get('/api/tiles/prov/prov_tile_0000.tif').headers['ETag']
+
+    respuesta = cliente.get('/api/tiles/prov/prov_tile_0000.tif', headers={'If-None-Match': etag})
+
+    assert respuesta.status_code == 304
+    assert respuesta.data == b''
+
+
+def test_etag_cambia_por_tile(cliente, directorios):
+    etags = {cliente.get(f'/api/tiles/prov/{nombre}').headers['ETag'] for nombre in MIEMBROS}
+    assert len(etags) == 2
+
+
+def test_tile_fuera_del_indice_es_404(cliente, directorios):
+    assert cliente.get('/api/tiles/prov/prov_tile_9999.tif').status_code == 404
+
+
+def test_miembro_inexistente_en_el_tar_es_404(cliente, directorios):
+    respuesta = cliente.get('/api/tiles/prov/prov_tile_9999.tif?tar=prov_part_01.tar.gz')
+    assert respuesta.status_code == 404
+
+
+def test_tar_con_ruta_insegura_es_404(cliente, directorios):
+    respuesta = cliente.get('/api/tiles/prov/prov_tile_0000.tif?tar=../prov_part_01.tar.gz')
+    assert respuesta.status_code == 404
+
+
+def test_tile_de_vegetacion(cliente, directorios):
+    respuesta = cliente.get('/api/tiles/vegetacion/veg_01.tar.gz/veg_tile_0000.tif')
+
+    assert respuesta.status_code == 200
+    assert respuesta.data == b'II*\x00vegetacion'
+    etag = respuesta.headers['ETag']
+    assert cliente.get('/api/tiles/vegetacion/veg_01.tar.gz/veg_tile_0000.tif',
+                       headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_miembro_de_vegetacion_inexistente_es_404(cliente, directorios):
+    respuesta = cliente.get('/api/tiles/vegetacion/veg_01.tar.gz/no_existe.tif')
+    assert respuesta.status_code == 404
+
+
+def test_tar_de_vegetacion_ausente_en_el_release_es_404(cliente, directorios, monkeypatch):
+    def urlretrieve(url, destino):
+        raise urllib.error.HTTPError(url, 404, 'Not Found', {}, None)
+    monkeypatch.setattr(urllib.request, 'urlretrieve', urlretrieve)
+
+    respuesta = cliente.get('/api/tiles/vegetacion/veg_99.tar.gz/veg_tile_0000.tif')
+
+    assert respuesta.status_code == 404
+    assert not (directorios / 'vegetacion' / 'veg_99.tar.gz').exists()
+
+
+def test_otros_errores_de_descarga_siguen_siendo_500(cliente, directorios, monkeypatch):
+    def urlretrieve(url, destino):
+        raise urllib.error.HTTPError(url, 503, 'Service Unavailable', {}, None)
+    monkeypatch.setattr(urllib.request, 'urlretrieve', urlretrieve)
+
+    assert cliente.get('/api/tiles/vegetacion/veg_99.tar.gz/veg_tile_0000.tif').status_code == 500
+
+
+def desempaquetar(datos):
+    """Manifiesto y bytes de cada tile de un paquete maira-tiles-v1"""
+    largo = struct.unpack('>I', datos[:4])[0]
+    manifiesto = json.loads(datos[4:4 + largo])
+    seccion = datos[4 + largo:]
+    return manifiesto, {t['tile_filename']: seccion[t['offset']:t['offset'] + t['size']] for t in manifiesto['tiles']}
+
+
+def test_lote_de_tiles_en_un_paquete(cliente, directorios, monkeypatch):
+    pasadas = []
+    leer_miembros = TileArchiveIndex.leer_miembros
+    monkeypatch.setattr(TileArchiveIndex, 'leer_miembros',
+                        lambda indice, nombres: pasadas.append(list(nombres)) or leer_miembros(indice, nombres))
+
+    respuesta = cliente.post('/api/extract-tiles', json={'provincia': 'prov', 'tiles': [
+        {'tar_filename': 'prov_part_01.tar.gz', 'tile_filename': 'prov_tile_0000.tif'},
+        {'tar_filename': 'prov_part_01.tar.gz', 'tile_filename': 'prov_tile_0001.tif'},
+        {'tar_filename': 'prov_part_01.tar.gz', 'tile_filename': 'prov_tile_0404.tif'},
+        {'tar_filename': 'prov_part_99.tar.gz', 'tile_filename': 'prov_tile_0002.tif'},
+        {'tar_filename': '../prov_part_01.tar.gz', 'tile_filename': 'prov_tile_0000.tif'},
+    ]})
+
+    assert respuesta.status_code == 200
+    assert respuesta.headers['X-Bundle-Format'] == 'maira-tiles-v1'
+    manifiesto, contenido = desempaquetar(respuesta.data)
+    assert manifiesto['formato'] == 'maira-tiles-v1'
+    assert contenido == MIEMBROS
+    assert sorted((f['tar_filename'], f['tile_filename']) for f in manifiesto['faltantes']) == [
+        ('../prov_part_01.tar.gz', 'prov_tile_0000.tif'),
+        ('prov_part_01.tar.gz', 'prov_tile_0404.tif'),
+        ('prov_part_99.tar.gz', 'prov_tile_0002.tif'),
+    ]
+    # Los tres tiles del mismo archivo se leen en una sola pasada
+    assert pasadas == [['prov_tile_0000.tif', 'prov_tile_0001.tif', 'prov_tile_0404.tif']]
+
+
+def test_lote_usa_la_cache_para_los_ya_leidos(cliente, directorios, monkeypatch):
+    cliente.get('/api/tiles/prov/prov_tile_0000.tif')
+    pasadas = []
+    leer_miembros = TileArchiveIndex.leer_miembros
+    monkeypatch.setattr(TileArchiveIndex, 'leer_miembros',
+                        lambda indice, nombres: pasadas.append(list(nombres)) or leer_miembros(indice, nombres))
+
+    respuesta = cliente.post('/api/extract-tiles', json={'provincia': 'prov', 'tiles': [
+        {'tar_filename': 'prov_part_01.tar.gz', 'tile_filename': nombre} for nombre in MIEMBROS
+    ]})
+
+    assert desempaquetar(respuesta.data)[1] == MIEMBROS
+    assert pasadas == [['prov_tile_0001.tif']]
+
+
+@pytest.mark.parametrize('cuerpo', [{}, {'tiles': []}])
+def test_lote_vacio_es_400(cliente, directorios, cuerpo):
+    assert cliente.post('/api/extract-tiles', json=cuerpo).status_code == 400
+
+
+def test_lote_demasiado_grande_es_400(cliente, directorios):
+    from app import MAX_TILES_POR_LOTE
+    cuerpo = {'tiles': [{'provincia': 'prov'}] * (MAX_TILES_POR_LOTE + 1)}
+    assert cliente.post('/api/extract-tiles', json=cuerpo).status_code == 400
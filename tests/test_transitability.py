@@ -0,0 +1,130 @@
+import base64
+
+import numpy as np
+import pytest
+
+from terrain.cover import CAPA_NDVI
+from terrain.sampling import muestrear
+from terrain.transitability import (factor_pendiente, factor_vegetacion, ndvi_en_grilla, transitabilidad_tile,
+                                    muestrear_transitabilidad, codificar_transitabilidad, velocidad_kmh,
+                                    invalidar_tile, cache_transitabilidad, FACTOR_NDVI_SIN_DATO)
+from terrain.tile_store import obtener_store
+
+WEST, NORTH, RES = -60.0, -30.0, 0.001
+
+
+@pytest.fixture
+def llano_con_vegetacion(store_sintetico):
+    """Tile de elevación plano de 20x20 cubierto por la mitad oeste con NDVI denso (0.7)"""
+    store_sintetico('t0', np.full((20, 20), 100.0, dtype=np.float32), WEST, NORTH, RES)
+    store_sintetico('v0', np.full((20, 10), 180, dtype=np.uint8), WEST, NORTH, RES, capa=CAPA_NDVI, nodata=0)
+    return store_sintetico
+
+
+def test_factor_pendiente_por_vehiculo():
+    pendientes = np.array([0.0, 10.0, 20.0, 21.0])
+
+    np.testing.assert_allclose(factor_pendiente(pendientes, 'heavyVehicles'), [1.0, 0.5, 0.1, 0.1])
+    np.testing.assert_allclose(factor_pendiente(pendientes, 'infantry'), [1.0, 1 - 10 / 45, 1 - 20 / 45, 1 - 21 / 45],
+                               rtol=1e-6)
+
+
+def test_factor_vegetacion_por_clase_de_ndvi():
+    ndvi = np.array([0.05, 0.15, 0.35, 0.7, 0.95, np.nan])
+    np.testing.assert_allclose(factor_vegetacion(ndvi), [0.1, 0.9, 0.7, 0.3, 0.1, FACTOR_NDVI_SIN_DATO])
+
+
+def test_ndvi_en_grilla_coincide_con_el_muestreo_por_punto(store_sintetico):
+    # Tile de elevación de 30x40 y dos tiles NDVI de otra resolución, desalineados,
+    # superpuestos entre sí y con huecos de nodata y sin cobertura
+    store_sintetico('t0', np.zeros((30, 40), dtype=np.float32), WEST, NORTH, RES)
+    rng = np.random.default_rng(3)
+    a = rng.integers(1, 256, size=(13, 9)).astype(np.uint8)
+    a[2:4, 3:5] = 0
+    b = rng.integers(1, 256, size=(20, 20)).astype(np.uint8)
+    store_sintetico('va', a, WEST - 0.0013, NORTH + 0.0007, 0.0021, capa=CAPA_NDVI, nodata=0)
+    store_sintetico('vb', b, WEST + 0.0152, NORTH - 0.0049, 0.0013, capa=CAPA_NDVI, nodata=0)
+    raster = obtener_store().cargar('t0')
+
+    filas, cols = np.mgrid[0:raster.alto, 0:raster.ancho]
+    lons, lats = raster.a_coordenadas(cols.ravel() + 0.5, filas.ravel() + 0.5)
+    esperado = (muestrear(lats, lons, CAPA_NDVI, interpolar=False) / 255.0).reshape(raster.alto, raster.ancho)
+
+    ndvi = ndvi_en_grilla(raster)
+
+    np.testing.assert_allclose(ndvi, esperado, rtol=1e-6)
+    assert np.isnan(ndvi).any() and np.isfinite(ndvi).any()
+
+
+def test_ndvi_en_grilla_lee_cada_tile_una_vez(store_sintetico, monkeypatch):
+    store_sintetico('t0', np.zeros((20, 20), dtype=np.float32), WEST, NORTH, RES)
+    store_sintetico('v0', np.full((40, 40), 100, dtype=np.uint8), WEST, NORTH, RES / 2, capa=CAPA_NDVI)
+    store = obtener_store(CAPA_NDVI)
+    cargas = []
+    cargar = store.cargar
+    monkeypatch.setattr(store, 'cargar', lambda tile_id: cargas.append(tile_id) or cargar(tile_id))
+
+    ndvi = ndvi_en_grilla(obtener_store().cargar('t0'))
+
+    assert cargas == ['v0']
+    np.testing.assert_allclose(ndvi, 100 / 255.0, rtol=1e-6)
+
+
+def test_transitabilidad_combina_pendiente_y_vegetacion(llano_con_vegetacion):
+    raster, grilla = transitabilidad_tile('t0', 'lightVehicles')
+
+    assert grilla.shape == (raster.alto, raster.ancho)
+    # Llano: factor de pendiente 1. Oeste con NDVI 0.71 (densa), este sin dato de vegetación
+    np.testing.assert_allclose(grilla[:, :10], 0.3)
+    np.testing.assert_allclose(grilla[:, 10:], FACTOR_NDVI_SIN_DATO)
+
+
+def test_transitabilidad_se_cachea_e_invalida(llano_con_vegetacion):
+    _, primera = transitabilidad_tile('t0', 'armored')
+    assert transitabilidad_tile('t0', 'armored')[1] is primera
+
+    assert invalidar_tile('t0') == 1
+    assert cache_transitabilidad.obtener(('t0', 'armored')) is None
+
+
+def test_transitabilidad_sin_elevacion_es_nan(store_sintetico):
+    datos = np.full((10, 10), 50.0, dtype=np.float32)
+    datos[0, 0] = -9999
+    store_sintetico('t0', datos, WEST, NORTH, RES, nodata=-9999)
+
+    _, grilla = transitabilidad_tile('t0')
+
+    assert np.isnan(grilla[0, 0]) and np.isfinite(grilla[5, 5])
+
+
+def test_tile_o_vehiculo_inexistente(llano_con_vegetacion):
+    with pytest.raises(KeyError):
+        transitabilidad_tile('no_existe')
+    with pytest.raises(KeyError):
+        transitabilidad_tile('t0', 'submarino')
+
+
+def test_muestrear_transitabilidad(llano_con_vegetacion):
+    lats = np.array([NORTH - 0.0055, NORTH - 0.0055, 10.0])
+    lons = np.array([WEST + 0.0025, WEST + 0.0155, 10.0])
+
+    valores = muestrear_transitabilidad(lats, lons, 'lightVehicles')
+
+    np.testing.assert_allclose(valores[:2], [0.3, FACTOR_NDVI_SIN_DATO])
+    assert np.isnan(valores[2])
+
+
+def test_codificacion_y_velocidad():
+    codificada = codificar_transitabilidad(np.array([0.0, 0.5, 1.0, np.nan]))
+    np.testing.assert_array_equal(codificada, [1, 128, 255, 0])
+    np.testing.assert_allclose(velocidad_kmh(np.array([0.5]), 'lightVehicles', 'rain'), [40 * 0.5 * 0.7])
+
+
+def test_endpoint_transitabilidad(cliente, llano_con_vegetacion):
+    respuesta = cliente.get('/api/transitabilidad/t0?vehiculo=lightVehicles&clima=rain').get_json()
+
+    assert respuesta['success'] and (respuesta['ancho'], respuesta['alto']) == (20, 20)
+    grilla = np.frombuffer(base64.b64decode(respuesta['transitabilidad']), dtype=np.uint8).reshape(20, 20)
+    assert grilla[0, 0] == 1 + round(0.3 * 0.7 * 254)
+    assert cliente.get('/api/transitabilidad/t0?vehiculo=submarino').status_code == 400
+    assert cliente.get('/api/transitabilidad/no_existe').status_code == 404
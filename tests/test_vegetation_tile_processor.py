@@ -0,0 +1,194 @@
+import json
+import os
+import sys
+import tarfile
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PIL')
+gdal = pytest.importorskip('osgeo.gdal')
+from osgeo import osr  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+import vegetation_tile_processor  # noqa: E402
+from vegetation_tile_processor import VegetationTileProcessor  # noqa: E402
+
+TILE = 16
+NODATA = -3000
+# 4 filas y 3 columnas de tiles; la última fila y la última columna quedan incompletas
+ALTO, ANCHO = 3 * TILE + 5, 2 * TILE + 7
+
+
+def escribir_tif(ruta, datos, nodata=NODATA, west=-60.0, north=-30.0, resolucion=0.001):
+    """GeoTIFF EPSG:4326 de una banda escrito con GDAL"""
+    tipo = gdal.GDT_Int16 if datos.dtype == np.int16 else gdal.GDT_Float32
+    dataset = gdal.GetDriverByName('GTiff').Create(str(ruta), datos.shape[1], datos.shape[0], 1, tipo)
+    dataset.SetGeoTransform((west, resolucion, 0.0, north, 0.0, -resolucion))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    dataset.SetProjection(srs.ExportToWkt())
+    banda = dataset.GetRasterBand(1)
+    banda.WriteArray(datos)
+    if nodata is not None:
+        banda.SetNoDataValue(nodata)
+    dataset = None
+    return ruta
+
+
+def ndvi_escalado(semilla=0):
+    """NDVI x 10000 (int16) variado, con un hueco de nodata que cruza tiles"""
+    datos = np.random.default_rng(semilla).integers(-1000, 9000, size=(ALTO, ANCHO)).astype(np.int16)
+    datos[10:20, 12:20] = NODATA
+    return datos
+
+
+def procesador(tmp_path, workers=1):
+    proc = VegetationTileProcessor(str(tmp_path / 'entrada'), str(tmp_path / 'salida'), workers=workers)
+    proc.tile_size = TILE
+    return proc
+
+
+@pytest.fixture(params=['escalado', 'desconocido'])
+def archivo_ndvi(request, tmp_path):
+    """(ruta, datos): NDVI escalado por 10000 o en una escala que hay que normalizar por el rango del archivo"""
+    (tmp_path / 'entrada').mkdir()
+    datos = ndvi_escalado()
+    if request.param == 'desconocido':
+        huecos = datos == NODATA
+        datos = datos.astype(np.float32) * 5
+        datos[huecos] = NODATA
+    return escribir_tif(tmp_path / 'entrada' / 'region_ndvi.tif', datos), datos
+
+
+def leer_tif(ruta):
+    return gdal.Open(str(ruta)).GetRasterBand(1).ReadAsArray()
+
+
+def resumen(tiles):
+    return [(t['id'], t['bounds'], t.get('hash_contenido'), t.get('sintetico')) for t in tiles]
+
+
+def test_dividir_en_tareas_por_rangos_de_filas(tmp_path, monkeypatch):
+    monkeypatch.setattr(vegetation_tile_processor, 'FILAS_POR_TAREA', 3)
+    grande = {'alto': 7 * TILE + 1}
+    chico = {'alto': TILE}
+
+    secuencial = procesador(tmp_path).dividir_en_tareas([grande, chico], tmp_path)
+    paralelo = procesador(tmp_path, workers=4).dividir_en_tareas([grande, chico], tmp_path)
+
+    assert [(t[0] is grande, t[2]) for t in secuencial] == [(True, (0, 8)), (False, (0, 1))]
+    assert [(t[0] is grande, t[2]) for t in paralelo] == [(True, (0, 3)), (True, (3, 6)), (True, (6, 8)),
+                                                          (False, (0, 1))]
+
+
+def test_rangos_de_filas_dan_los_mismos_tiles_que_el_archivo_entero(tmp_path, archivo_ndvi):
+    proc = procesador(tmp_path)
+    info = proc.analizar_archivo_tif(archivo_ndvi[0])
+
+    completo = proc.procesar_archivo_ndvi(info, tmp_path / 'completo')
+    por_rangos = (proc.procesar_archivo_ndvi(info, tmp_path / 'rangos', (0, 1)) +
+                  proc.procesar_archivo_ndvi(info, tmp_path / 'rangos', (1, 3)) +
+                  proc.procesar_archivo_ndvi(info, tmp_path / 'rangos', (3, 4)))
+
+    assert len(completo) == 4 * 3
+    assert resumen(por_rangos) == resumen(completo)
+    for tile in completo:
+        if tile.get('filename'):
+            np.testing.assert_array_equal(leer_tif(tmp_path / 'rangos' / tile['filename']), leer_tif(tile['path']))
+
+
+def test_cada_tile_es_su_ventana_del_archivo_escalada(tmp_path):
+    (tmp_path / 'entrada').mkdir()
+    datos = ndvi_escalado()
+    proc = procesador(tmp_path)
+    info = proc.analizar_archivo_tif(escribir_tif(tmp_path / 'entrada' / 'region_ndvi.tif', datos))
+    assert info['ndvi_tipo'] == 'escalado'
+
+    tiles = proc.procesar_archivo_ndvi(info, tmp_path / 'tiles')
+
+    for tile in tiles:
+        filas = slice(tile['tile_y'] * TILE, (tile['tile_y'] + 1) * TILE)
+        ventana = datos[filas, tile['tile_x'] * TILE:(tile['tile_x'] + 1) * TILE]
+        esperado = ((ventana.astype(np.float64) + 2000) * 255 / 12000).astype(np.uint8)
+        esperado[ventana == NODATA] = 0
+        leido = leer_tif(tile['path'])
+        assert leido.shape == ventana.shape
+        np.testing.assert_allclose(leido, esperado, atol=1)
+        assert (leido[ventana == NODATA] == 0).all()
+    # Los bordes incompletos conservan su tamaño
+    assert {leer_tif(t['path']).shape for t in tiles if t['tile_x'] == 2 and t['tile_y'] == 3} == {(5, 7)}
+
+
+def contenido_salida(salida):
+    """Índice de la región (sin la fecha) y {miembro: bytes} de sus TAR"""
+    with open(salida / 'centro_norte_mini_tiles_index.json', encoding='utf-8') as f:
+        indice = json.load(f)
+    indice.pop('generated')
+    miembros = {}
+    for tar_path in sorted(salida.glob('centro_norte_part_*.tar.gz')):
+        with tarfile.open(tar_path, 'r:gz') as tar:
+            miembros.update({m.name: tar.extractfile(m).read() for m in tar})
+    return indice, miembros
+
+
+def test_workers_producen_la_misma_salida_que_el_modo_secuencial(tmp_path, monkeypatch):
+    # Un rango por fila de tiles, así el archivo se reparte entre los procesos
+    monkeypatch.setattr(vegetation_tile_processor, 'FILAS_POR_TAREA', 1)
+    (tmp_path / 'entrada').mkdir()
+    escribir_tif(tmp_path / 'entrada' / 'a_ndvi.tif', ndvi_escalado(1))
+    escribir_tif(tmp_path / 'entrada' / 'b_ndvi.tif', ndvi_escalado(2), west=-59.9)
+
+    secuencial = VegetationTileProcessor(str(tmp_path / 'entrada'), str(tmp_path / 'secuencial'))
+    paralelo = VegetationTileProcessor(str(tmp_path / 'entrada'), str(tmp_path / 'paralelo'), workers=3)
+    for proc in (secuencial, paralelo):
+        proc.tile_size = TILE
+        assert proc.procesar_todos()['status'] == 'success'
+
+    indice, miembros = contenido_salida(tmp_path / 'secuencial')
+    assert indice['total_tiles'] == 2 * 4 * 3 and miembros
+    assert contenido_salida(tmp_path / 'paralelo') == (indice, miembros)
+    assert not (tmp_path / 'paralelo' / 'temp' / 'centro_norte').exists()
+
+class Envoltorio:
+    """Delega todo en `objeto` salvo los atributos que se reemplazan"""
+
+    def __init__(self, objeto, **reemplazos):
+        self._objeto = objeto
+        self.__dict__.update(reemplazos)
+
+    def __getattr__(self, nombre):
+        return getattr(self._objeto, nombre)
+
+
+def test_lee_una_fila_de_tiles_por_vez(tmp_path, monkeypatch):
+    (tmp_path / 'entrada').mkdir()
+    proc = procesador(tmp_path)
+    info = proc.analizar_archivo_tif(escribir_tif(tmp_path / 'entrada' / 'region_ndvi.tif', ndvi_escalado()))
+
+    # Registra cada ReadAsArray de la banda que abre procesar_archivo_ndvi
+    lecturas = []
+    abrir = gdal.Open
+
+    def abrir_registrando(ruta, *args):
+        dataset = abrir(ruta, *args)
+
+        def banda(numero):
+            real = dataset.GetRasterBand(numero)
+
+            def leer(*args, **kwargs):
+                lecturas.append((args, kwargs.get('buf_obj')))
+                return real.ReadAsArray(*args, **kwargs)
+            return Envoltorio(real, ReadAsArray=leer)
+        return Envoltorio(dataset, GetRasterBand=banda)
+
+    monkeypatch.setattr(vegetation_tile_processor, 'gdal', Envoltorio(gdal, Open=abrir_registrando))
+
+    proc.procesar_archivo_ndvi(info, tmp_path / 'tiles')
+
+    filas = [(args, buffer) for args, buffer in lecturas if args[2:4] != (1, 1)]
+    assert [args for args, _ in filas] == [(0, 0, ANCHO, TILE), (0, TILE, ANCHO, TILE),
+                                           (0, 2 * TILE, ANCHO, TILE), (0, 3 * TILE, ANCHO, 5)]
+    # Todas las filas se leen sobre el mismo buffer reservado al principio
+    assert all(buffer is not None for _, buffer in filas)
+    assert len({buffer.__array_interface__['data'][0] for _, buffer in filas}) == 1
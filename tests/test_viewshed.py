@@ -0,0 +1,118 @@
+import base64
+import math
+
+import numpy as np
+import pytest
+
+from terrain.viewshed import caida_curvatura, evaluar_linea, linea_de_vision, cuenca_visual, cache_cuencas
+
+# Llanura a 0 m cerca del ecuador (1 píxel = 0.001° ≈ 111 m) con un muro de 200 m en lng 0.060-0.062
+WEST, NORTH, RES = -0.05, 0.05, 0.001
+
+
+@pytest.fixture
+def llanura_con_muro(store_sintetico):
+    cache_cuencas.limpiar()
+    datos = np.zeros((100, 150), dtype=np.float32)
+    datos[:, 110:112] = 200
+    store_sintetico('t0', datos, WEST, NORTH, RES)
+
+
+def visibilidad(resultado):
+    lado = resultado['ancho']
+    bits = np.unpackbits(np.frombuffer(base64.b64decode(resultado['visibilidad']), dtype=np.uint8))
+    return bits[:lado * lado].reshape(lado, lado).astype(bool)
+
+
+def test_caida_por_curvatura_con_refraccion():
+    assert caida_curvatura(10000) == pytest.approx(10000 ** 2 / (2 * 6371008.8) * 0.87)
+    assert caida_curvatura(0) == 0
+
+
+def test_evaluar_linea_detecta_la_primera_obstruccion():
+    distancias = np.arange(6) * 100.0
+    lats = np.zeros(6)
+    lons = np.arange(6) * 0.001
+    elevaciones = np.array([10, 10, 30, 50, 10, 10], dtype=np.float64)
+
+    resultado = evaluar_linea(lats, lons, distancias, elevaciones, 2.0, 0.0)
+
+    assert resultado['visible'] is False
+    assert resultado['obstruccion']['distancia'] == 200
+    assert resultado['obstruccion']['elevacion'] == 30
+    assert evaluar_linea(lats, lons, distancias, np.full(6, 10.0), 2.0, 0.0)['visible'] is True
+
+
+def test_evaluar_linea_sin_datos_en_un_extremo():
+    resultado = evaluar_linea(np.zeros(3), np.zeros(3), np.array([0, 50, 100.0]),
+                              np.array([np.nan, 0, 0.0]), 2.0, 0.0)
+    assert resultado['visible'] is None
+
+
+def test_linea_de_vision_sobre_el_store(llanura_con_muro):
+    assert linea_de_vision(0.0, 0.0, 0.0, 0.03)['visible'] is True
+    # Sobre la llanura, un objetivo al ras más allá de ~5.4 km queda bajo el horizonte
+    assert linea_de_vision(0.0, -0.05, 0.0, 0.0)['visible'] is False
+
+    tapada = linea_de_vision(0.0, 0.04, 0.0, 0.08)
+
+    assert tapada['visible'] is False
+    assert 0.059 <= tapada['obstruccion']['lng'] <= 0.063
+    # Desde una torre sobre el muro se ve lo que hay detrás
+    assert linea_de_vision(0.0, 0.061, 0.0, 0.08, altura_observador=10)['visible'] is True
+
+
+def test_cuenca_visual_oculta_lo_que_esta_detras_del_muro(llanura_con_muro):
+    resultado = cuenca_visual(0.0, 0.03, 4000, resolucion_m=100)
+
+    visible = visibilidad(resultado)
+    centro = resultado['ancho'] // 2
+    assert resultado['ancho'] == resultado['alto'] == 81
+    assert visible[centro, centro]
+    # 3.5 km al oeste: llanura abierta. 3.8 km al este: detrás del muro (a ~3.3 km)
+    assert visible[centro, centro - 35]
+    assert not visible[centro, centro + 38]
+    # Fuera del radio no se marca nada
+    assert not visible[0, 0]
+    assert 0 < resultado['porcentaje_visible'] < 100
+
+
+def test_cuenca_visual_se_cachea_por_celda(llanura_con_muro):
+    primera = cuenca_visual(0.0, 0.0297, 2000, resolucion_m=100)
+    # Otro punto dentro de la misma celda de 100 m
+    segunda = cuenca_visual(0.0001, 0.0299, 2000, resolucion_m=100)
+    assert segunda is primera
+
+
+def test_cuenca_visual_limita_las_celdas_por_lado(llanura_con_muro):
+    resultado = cuenca_visual(0.0, 0.03, 30000, resolucion_m=10)
+    assert resultado['ancho'] <= 513
+    assert resultado['resolucion'] == pytest.approx(2 * 30000 / 512)
+
+
+def test_cuenca_visual_sin_datos_en_el_observador(llanura_con_muro):
+    assert cuenca_visual(10.0, 10.0, 1000) is None
+
+
+def test_endpoints(cliente, llanura_con_muro):
+    los = cliente.post('/api/terreno/linea-vision', json={
+        'origen': {'lat': 0.0, 'lng': 0.04}, 'destino': {'lat': 0.0, 'lng': 0.08}
+    }).get_json()
+    assert los['success'] and los['visible'] is False
+
+    cuenca = cliente.post('/api/terreno/cuenca-visual', json={'lat': 0.0, 'lng': 0.03, 'radio': 2000})
+    assert cuenca.status_code == 200 and cuenca.get_json()['ancho'] == 41
+
+    assert cliente.post('/api/terreno/cuenca-visual', json={'lat': 10.0, 'lng': 10.0, 'radio': 1000}).status_code == 404
+
+
+def test_endpoints_rechazan_distancias_fuera_del_limite(cliente, llanura_con_muro):
+    from app import MAX_RADIO_CUENCA_M
+    lejos = math.degrees((MAX_RADIO_CUENCA_M + 1000) / 6371008.8)
+
+    assert cliente.post('/api/terreno/linea-vision', json={
+        'origen': {'lat': 0.0, 'lng': 0.0}, 'destino': {'lat': 0.0, 'lng': lejos}
+    }).status_code == 400
+    assert cliente.post('/api/terreno/cuenca-visual', json={'lat': 0, 'lng': 0, 'radio': MAX_RADIO_CUENCA_M + 1}).status_code == 400
+    assert cliente.post('/api/terreno/cuenca-visual', json={'lat': 0, 'lng': 0, 'radio': 0}).status_code == 400
+    assert cliente.post('/api/terreno/linea-vision', json={'origen': {'lat': 0}}).status_code == 400
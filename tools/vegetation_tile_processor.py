@@ -13,6 +13,7 @@ import tarfile
 import tempfile
 import shutil
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import logging
@@ -34,10 +35,21 @@ except ImportError as e:
     logger.error("💡 Instala las dependencias: pip install gdal pillow numpy")
     sys.exit(1)
 
+# Clases de cobertura compartidas con el servidor (terrain/cover.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from terrain.cover import clasificar_ndvi, leyenda, CLASES_COBERTURA, SIN_DATO, SUFIJO_COBERTURA, UMBRALES_NDVI
+from terrain.build_manifest import (cargar_manifiesto, guardar_manifiesto, huella_fuente,
+                                    hash_parametros, fuentes_cambiadas, reempaquetar_tar)
+from terrain.tile_dedup import es_sin_dato, valor_constante, hash_contenido, TIPO_SIN_DATO, TIPO_CONSTANTE
+
+# Filas de mini-tiles por tarea cuando se reparte un archivo entre workers
+FILAS_POR_TAREA = 8
+
 class VegetationTileProcessor:
     """Procesador de tiles de vegetación NDVI para MAIRA 4.0"""
     
-    def __init__(self, input_dir: str, output_dir: str, max_archive_size: int = 95):
+    def __init__(self, input_dir: str, output_dir: str, max_archive_size: int = 95, workers: int = 1,
+                 incremental: bool = False):
         """
         Inicializar procesador de tiles de vegetación
         
@@ -45,10 +57,15 @@ class VegetationTileProcessor:
             input_dir: Directorio con archivos TIF de vegetación
             output_dir: Directorio de salida para mini-tiles
             max_archive_size: Tamaño máximo de archivo TAR en MB
+            workers: Procesos para cortar tiles y comprimir TARs (1 = secuencial)
+            incremental: Regenerar sólo los tiles de archivos nuevos o cambiados según el manifiesto
         """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.max_archive_size = max_archive_size * 1024 * 1024  # Convertir a bytes
+        self.workers = max(1, workers)
+        self.incremental = incremental
+        self._pool: Optional[ProcessPoolExecutor] = None
         
         # Configuración específica para datos NDVI
         self.ndvi_scale_factor = 10000  # Factor de escala típico para NDVI
@@ -62,6 +79,30 @@ class VegetationTileProcessor:
         logger.info(f"📂 Input: {self.input_dir}")
         logger.info(f"📁 Output: {self.output_dir}")
         logger.info(f"📦 Max size: {max_archive_size}MB")
+        logger.info(f"⚙️ Workers: {self.workers}")
+        logger.info(f"🔁 Modo: {'incremental' if incremental else 'completo'}")
+    
+    def __getstate__(self) -> Dict:
+        # El pool no se envía a los workers (no es serializable)
+        estado = self.__dict__.copy()
+        estado['_pool'] = None
+        return estado
+    
+    def ejecutar(self, funcion, argumentos: List[Tuple]) -> List:
+        """Aplica `funcion` a cada tupla de argumentos, en el pool si hay workers; resultados en el orden de entrada"""
+        if self._pool is None:
+            return [funcion(*args) for args in argumentos]
+        return list(self._pool.map(funcion, *zip(*argumentos))) if argumentos else []
+    
+    def parametros(self) -> str:
+        """Hash de los parámetros que afectan a los tiles generados (si cambia, se reconstruye todo)"""
+        return hash_parametros({
+            'tile_size': self.tile_size,
+            'max_archive_size': self.max_archive_size,
+            'ndvi_scale_factor': self.ndvi_scale_factor,
+            'ndvi_range': self.ndvi_range,
+            'umbrales_cobertura': UMBRALES_NDVI.tolist()
+        })
     
     def encontrar_archivos_tif(self) -> List[Path]:
         """Encuentra todos los archivos TIF de vegetación en el directorio"""
@@ -202,10 +243,31 @@ class VegetationTileProcessor:
         
         return regiones
     
-    def procesar_archivo_ndvi(self, archivo_info: Dict, output_dir: Path) -> List[Dict]:
-        """Procesa un archivo NDVI en mini-tiles"""
+    def dividir_en_tareas(self, archivos_region: List[Dict], output_dir: Path) -> List[Tuple]:
+        """
+        Tareas (archivo_info, output_dir, filas) en orden de archivo y de fila.
+        Con workers, los archivos grandes se reparten en rangos de FILAS_POR_TAREA
+        filas de mini-tiles.
+        """
+        tareas = []
+        for archivo_info in archivos_region:
+            tiles_y = (archivo_info['alto'] + self.tile_size - 1) // self.tile_size
+            paso = tiles_y if self.workers == 1 else FILAS_POR_TAREA
+            for inicio in range(0, tiles_y, max(1, paso)):
+                tareas.append((archivo_info, output_dir, (inicio, min(tiles_y, inicio + paso))))
+        return tareas
+    
+    def procesar_archivo_ndvi(self, archivo_info: Dict, output_dir: Path,
+                              filas: Optional[Tuple[int, int]] = None) -> List[Dict]:
+        """
+        Procesa un archivo NDVI en mini-tiles (todas sus filas de tiles o el rango [inicio, fin)).
+        
+        Se lee una fila de tiles por vez en buffers reservados una sola vez y
+        sus tiles se escriben enseguida: la memoria máxima depende del ancho
+        del raster, no de su tamaño total.
+        """
         archivo = Path(archivo_info['ruta_completa'])
-        logger.info(f"🔄 Procesando {archivo.name}...")
+        logger.info(f"🔄 Procesando {archivo.name}" + (f" (filas {filas[0]}-{filas[1] - 1})..." if filas else "..."))
         
         try:
             dataset = gdal.Open(str(archivo))
@@ -215,38 +277,50 @@ class VegetationTileProcessor:
             banda = dataset.GetRasterBand(1)
             geotransform = dataset.GetGeoTransform()
             proyeccion = dataset.GetProjection()
-            
-            # Leer datos de la banda
-            datos = banda.ReadAsArray()
-            if datos is None:
-                raise ValueError("No se pudieron leer los datos del raster")
-            
-            # Optimizar datos NDVI
-            datos_optimizados = self.optimizar_datos_ndvi(datos, archivo_info)
+            nodata = banda.GetNoDataValue()
+            ancho = dataset.RasterXSize
             
             # Calcular número de tiles
-            tiles_x = (dataset.RasterXSize + self.tile_size - 1) // self.tile_size
+            tiles_x = (ancho + self.tile_size - 1) // self.tile_size
             tiles_y = (dataset.RasterYSize + self.tile_size - 1) // self.tile_size
+            fila_inicio, fila_fin = filas or (0, tiles_y)
+            
+            logger.info(f"🧩 Generando {tiles_x}x{fila_fin - fila_inicio} = "
+                       f"{tiles_x * (fila_fin - fila_inicio)} mini-tiles")
             
-            logger.info(f"🧩 Generando {tiles_x}x{tiles_y} = {tiles_x * tiles_y} mini-tiles")
+            # Buffers de una fila de tiles, reutilizados en cada fila
+            tipo_lectura = banda.ReadAsArray(0, 0, 1, 1).dtype
+            buffers = {
+                'lectura': np.empty((self.tile_size, ancho), dtype=tipo_lectura),
+                'trabajo': np.empty((self.tile_size, ancho), dtype=np.float32),
+                'invalidos': np.empty((self.tile_size, ancho), dtype=bool),
+                'ndvi': np.empty((self.tile_size, ancho), dtype=np.uint8),
+                'clases': np.empty((self.tile_size, ancho), dtype=np.uint8)
+            }
+            rango = self.rango_observado(banda, archivo_info)
             
             tiles_generados = []
             
-            for tile_y in range(tiles_y):
+            for tile_y in range(fila_inicio, fila_fin):
+                y_offset = tile_y * self.tile_size
+                y_size = min(self.tile_size, dataset.RasterYSize - y_offset)
+                if y_size <= 0:
+                    continue
+                
+                # Leer la fila de tiles y escalarla en los buffers
+                fila = {nombre: buffer[:y_size] for nombre, buffer in buffers.items()}
+                if banda.ReadAsArray(0, y_offset, ancho, y_size, buf_obj=fila['lectura']) is None:
+                    raise ValueError(f"No se pudieron leer las filas {y_offset}-{y_offset + y_size}")
+                self.optimizar_datos_ndvi(fila, archivo_info, nodata, rango)
+                
                 for tile_x in range(tiles_x):
                     # Calcular extents del tile
                     x_offset = tile_x * self.tile_size
-                    y_offset = tile_y * self.tile_size
-                    x_size = min(self.tile_size, dataset.RasterXSize - x_offset)
-                    y_size = min(self.tile_size, dataset.RasterYSize - y_offset)
+                    x_size = min(self.tile_size, ancho - x_offset)
                     
-                    if x_size <= 0 or y_size <= 0:
+                    if x_size <= 0:
                         continue
                     
-                    # Extraer datos del tile
-                    tile_data = datos_optimizados[y_offset:y_offset + y_size, 
-                                                 x_offset:x_offset + x_size]
-                    
                     # Calcular geotransform del tile
                     tile_geotransform = (
                         geotransform[0] + x_offset * geotransform[1],
@@ -257,13 +331,40 @@ class VegetationTileProcessor:
                         geotransform[5]
                     )
                     
+                    datos_tile = fila['ndvi'][:, x_offset:x_offset + x_size]
+                    clases_tile = fila['clases'][:, x_offset:x_offset + x_size]
+                    
+                    # Tiles sin dato o constantes: sólo van al índice
+                    sintetico = self.tile_sintetico(datos_tile, clases_tile)
+                    if sintetico:
+                        tiles_generados.append({
+                            'id': f"{archivo.stem}_tile_{tile_x:03d}_{tile_y:03d}",
+                            'bounds': self.calcular_bounds_geotransform(tile_geotransform, x_size, y_size),
+                            'tile_x': tile_x,
+                            'tile_y': tile_y,
+                            'ancho': x_size,
+                            'alto': y_size,
+                            'sintetico': sintetico,
+                            'fuente': archivo.name
+                        })
+                        continue
+                    
                     # Crear tile
                     tile_info = self.crear_mini_tile_ndvi(
-                        tile_data, tile_geotransform, proyeccion,
+                        datos_tile, tile_geotransform, proyeccion,
                         output_dir, archivo.stem, tile_x, tile_y
                     )
                     
                     if tile_info:
+                        # Tile de cobertura con el mismo nombre base, va en el mismo TAR
+                        cobertura_info = self.crear_mini_tile_cobertura(
+                            clases_tile, tile_geotransform, proyeccion, output_dir, tile_info['filename']
+                        )
+                        if cobertura_info:
+                            tile_info.update(cobertura_info)
+                        tile_info['id'] = Path(tile_info['filename']).stem
+                        tile_info['hash_contenido'] = hash_contenido(datos_tile, clases_tile)
+                        tile_info['fuente'] = archivo.name
                         tiles_generados.append(tile_info)
             
             logger.info(f"✅ Generados {len(tiles_generados)} mini-tiles de {archivo.name}")
@@ -273,32 +374,120 @@ class VegetationTileProcessor:
             logger.error(f"❌ Error procesando {archivo}: {e}")
             return []
     
-    def optimizar_datos_ndvi(self, datos: np.ndarray, archivo_info: Dict) -> np.ndarray:
-        """Optimiza datos NDVI para mini-tiles"""
-        # Detectar tipo de datos NDVI
+    def tile_sintetico(self, ndvi: np.ndarray, clases: np.ndarray) -> Optional[Dict]:
+        """Descripción del tile si no hace falta escribirlo (todo sin dato o constante); None si tiene contenido"""
+        if es_sin_dato(ndvi, 0) and es_sin_dato(clases, SIN_DATO):
+            return {'tipo': TIPO_SIN_DATO}
+        valor = valor_constante(ndvi, 0)
+        valor_cobertura = valor_constante(clases, SIN_DATO)
+        if valor is not None and valor_cobertura is not None:
+            return {'tipo': TIPO_CONSTANTE, 'valor': valor, 'valor_cobertura': valor_cobertura}
+        return None
+    
+    def deduplicar(self, tiles: List[Dict], canonicos: Dict[str, Dict]) -> int:
+        """
+        Convierte en duplicados los tiles con el mismo contenido que uno de
+        `canonicos` (hash -> tile) o que uno anterior de la lista: se borran
+        sus archivos temporales y la entrada apunta a los del primero.
+        Devuelve la cantidad de duplicados.
+        """
+        duplicados = 0
+        for tile in tiles:
+            contenido = tile.get('hash_contenido')
+            if not contenido:
+                continue
+            canonico = canonicos.setdefault(contenido, tile)
+            if canonico is tile:
+                continue
+            for path_key in ('path', 'cobertura_path'):
+                if tile.get(path_key):
+                    Path(tile.pop(path_key)).unlink(missing_ok=True)
+            tile.update({
+                'filename': canonico['filename'],
+                'cobertura_filename': canonico.get('cobertura_filename'),
+                'duplicado_de': canonico['id']
+            })
+            duplicados += 1
+        return duplicados
+    
+    @staticmethod
+    def tiene_archivo_propio(tile: Dict) -> bool:
+        """True si el tile tiene archivos en un TAR (no es sintético ni duplicado)"""
+        return bool(tile.get('filename')) and not tile.get('duplicado_de')
+    
+    def asignar_parts_duplicados(self, tiles: List[Dict]):
+        """Cada duplicado queda en el part del tile cuyo archivo usa"""
+        por_id = {tile['id']: tile for tile in tiles if tile.get('id')}
+        for tile in tiles:
+            if tile.get('duplicado_de'):
+                tile['part'] = por_id[tile['duplicado_de']]['part']
+    
+    def optimizar_datos_ndvi(self, fila: Dict[str, np.ndarray], archivo_info: Dict,
+                             nodata: Optional[float], rango: Tuple[float, float]):
+        """
+        Escala una fila leída ('lectura') a NDVI 0-255 en 'ndvi' y la clasifica en
+        'clases', operando en los buffers de la fila sin copias del tamaño del raster.
+        """
         ndvi_tipo = archivo_info.get('ndvi_tipo', 'desconocido')
+        lectura, trabajo, invalidos = fila['lectura'], fila['trabajo'], fila['invalidos']
+        min_val, max_val = rango
+        
+        # Píxeles sin dato: NaN o el valor nodata de la banda
+        np.copyto(trabajo, lectura, casting='unsafe')
+        np.isnan(trabajo, out=invalidos)
+        if nodata is not None:
+            invalidos |= lectura == nodata
         
+        # NDVI 0-255 para el mini-tile
         if ndvi_tipo == 'escalado':
             # Datos escalados por 10000, convertir a rango 0-255
-            datos = np.clip(datos, -2000, 10000)  # Clip a rango válido
-            datos = ((datos + 2000) / 12000 * 255).astype(np.uint8)
+            np.clip(trabajo, -2000, 10000, out=trabajo)  # Clip a rango válido
+            trabajo += 2000
+            trabajo *= 255 / 12000
         elif ndvi_tipo == 'real':
             # Datos reales -1 a 1, convertir a rango 0-255
-            datos = np.clip(datos, -1, 1)
-            datos = ((datos + 1) / 2 * 255).astype(np.uint8)
-        else:
+            np.clip(trabajo, -1, 1, out=trabajo)
+            trabajo += 1
+            trabajo *= 255 / 2
+        elif max_val > min_val:
             # Datos desconocidos, normalizar al rango observado
-            min_val = np.nanmin(datos)
-            max_val = np.nanmax(datos)
+            trabajo -= min_val
+            trabajo /= max_val - min_val
+            np.clip(trabajo, 0, 1, out=trabajo)
+            trabajo *= 255
+        else:
+            trabajo.fill(0)
+        np.copyto(trabajo, 0, where=invalidos)
+        np.copyto(fila['ndvi'], trabajo, casting='unsafe')
+        
+        # Clases de cobertura a partir del NDVI real (-1 a 1)
+        np.copyto(trabajo, lectura, casting='unsafe')
+        if ndvi_tipo == 'escalado':
+            trabajo /= self.ndvi_scale_factor
+        elif ndvi_tipo == 'desconocido':
+            # Sin escala conocida: el rango observado se toma como NDVI 0 a 1
             if max_val > min_val:
-                datos = ((datos - min_val) / (max_val - min_val) * 255).astype(np.uint8)
+                trabajo -= min_val
+                trabajo /= max_val - min_val
             else:
-                datos = np.zeros_like(datos, dtype=np.uint8)
-        
-        # Manejar valores NoData
-        datos = np.nan_to_num(datos, nan=0, posinf=255, neginf=0)
-        
-        return datos
+                trabajo.fill(0)
+        np.clip(trabajo, -1, 1, out=trabajo)
+        np.copyto(trabajo, np.nan, where=invalidos)
+        clasificar_ndvi(trabajo, salida=fila['clases'])
+    
+    def rango_observado(self, banda, archivo_info: Dict) -> Tuple[float, float]:
+        """
+        Mínimo y máximo para normalizar datos de escala desconocida. Se usan
+        las estadísticas del archivo completo (así cada fila y cada rango de
+        filas normaliza igual); si no las hay, GDAL recorre la banda por bloques.
+        """
+        if archivo_info.get('ndvi_tipo', 'desconocido') != 'desconocido':
+            return 0.0, 0.0
+        estadisticas = archivo_info.get('estadisticas')
+        if estadisticas:
+            return estadisticas['minimo'], estadisticas['maximo']
+        minimo, maximo = banda.ComputeRasterMinMax(False)
+        return float(minimo), float(maximo)
     
     def crear_mini_tile_ndvi(self, datos: np.ndarray, geotransform: tuple, 
                             proyeccion: str, output_dir: Path, 
@@ -364,6 +553,52 @@ class VegetationTileProcessor:
             logger.error(f"❌ Error creando mini-tile {tile_x},{tile_y}: {e}")
             return None
     
+    def crear_mini_tile_cobertura(self, clases: np.ndarray, geotransform: tuple,
+                                  proyeccion: str, output_dir: Path, ndvi_filename: str) -> Dict:
+        """Crea el mini-tile de clases de cobertura (un byte por píxel con paleta)"""
+        try:
+            tile_name = f"{Path(ndvi_filename).stem}{SUFIJO_COBERTURA}.tif"
+            tile_path = output_dir / tile_name
+            alto, ancho = clases.shape
+            
+            # Pocas clases: DEFLATE sin predictor comprime mejor que LZW con PREDICTOR=2
+            dataset = gdal.GetDriverByName('GTiff').Create(
+                str(tile_path), ancho, alto, 1, gdal.GDT_Byte,
+                options=['COMPRESS=DEFLATE', 'TILED=YES', 'BLOCKXSIZE=256', 'BLOCKYSIZE=256']
+            )
+            if not dataset:
+                raise ValueError(f"No se pudo crear {tile_path}")
+            
+            dataset.SetGeoTransform(geotransform)
+            dataset.SetProjection(proyeccion)
+            
+            banda = dataset.GetRasterBand(1)
+            banda.WriteArray(clases)
+            banda.SetNoDataValue(SIN_DATO)
+            
+            paleta = gdal.ColorTable()
+            for codigo, clase in CLASES_COBERTURA.items():
+                paleta.SetColorEntry(codigo, clase['color'])
+            banda.SetRasterColorTable(paleta)
+            banda.SetRasterColorInterpretation(gdal.GCI_PaletteIndex)
+            
+            banda.SetDescription("Clase de cobertura/ocultamiento")
+            dataset.SetMetadataItem('COVER_CLASSES', json.dumps(
+                {str(codigo): clase['nombre'] for codigo, clase in CLASES_COBERTURA.items()}
+            ))
+            dataset.SetMetadataItem('PROCESSOR', 'MAIRA_vegetation_processor')
+            dataset = None
+            
+            return {
+                'cobertura_filename': tile_name,
+                'cobertura_path': str(tile_path),
+                'cobertura_size_bytes': tile_path.stat().st_size
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Error creando tile de cobertura de {ndvi_filename}: {e}")
+            return None
+    
     def calcular_bounds_geotransform(self, geotransform: tuple, ancho: int, alto: int) -> Dict:
         """Calcula bounds a partir de geotransform"""
         x_min = geotransform[0]
@@ -387,10 +622,11 @@ class VegetationTileProcessor:
         try:
             with tarfile.open(output_tar, 'w:gz', compresslevel=6) as tar:
                 for tile in tiles:
-                    tile_path = Path(tile['path'])
-                    if tile_path.exists():
-                        arcname = f"{region}/{tile['filename']}"
-                        tar.add(tile_path, arcname=arcname)
+                    for path_key, filename_key in (('path', 'filename'), ('cobertura_path', 'cobertura_filename')):
+                        tile_path = Path(tile[path_key]) if tile.get(path_key) else None
+                        if tile_path and tile_path.exists():
+                            arcname = f"{region}/{tile[filename_key]}"
+                            tar.add(tile_path, arcname=arcname)
             
             # Verificar tamaño
             size_mb = output_tar.stat().st_size / (1024 * 1024)
@@ -398,9 +634,10 @@ class VegetationTileProcessor:
             
             # Limpiar tiles temporales
             for tile in tiles:
-                tile_path = Path(tile['path'])
-                if tile_path.exists():
-                    tile_path.unlink()
+                for path_key in ('path', 'cobertura_path'):
+                    tile_path = Path(tile[path_key]) if tile.get(path_key) else None
+                    if tile_path and tile_path.exists():
+                        tile_path.unlink()
             
             return str(output_tar)
             
@@ -418,6 +655,9 @@ class VegetationTileProcessor:
             'total_parts': len(archivos_tar),
             'total_tiles': len(tiles_info),
             'compression': 'tar.gz',
+            'synthetic_tiles': sum(1 for t in tiles_info if t.get('sintetico')),
+            'duplicate_tiles': sum(1 for t in tiles_info if t.get('duplicado_de')),
+            'cover_classes': leyenda(),
             'archives': []
         }
         
@@ -429,19 +669,38 @@ class VegetationTileProcessor:
                     'part': i,
                     'filename': tar_path.name,
                     'size_mb': round(tar_path.stat().st_size / (1024 * 1024), 2),
-                    'tiles_count': len([t for t in tiles_info if t.get('part') == i])
+                    'tiles_count': len([t for t in tiles_info if t.get('part') == i and not t.get('duplicado_de')])
                 })
         
         # Índice de tiles
         indice['tiles'] = {}
+        # Cada clave junta los tiles de esa posición de todos los archivos de la región.
+        # Los sintéticos no tienen archivo; los duplicados apuntan a los del tile que repiten.
         for tile in tiles_info:
             tile_key = f"tile_{tile['tile_x']:03d}_{tile['tile_y']:03d}"
-            indice['tiles'][tile_key] = [{
-                'filename': tile['filename'],
-                'bounds': tile['bounds'],
-                'part': tile.get('part', 1),
-                'size_bytes': tile['size_bytes']
-            }]
+            if tile.get('sintetico'):
+                entrada = {
+                    'id': tile['id'],
+                    'bounds': tile['bounds'],
+                    'ancho': tile['ancho'],
+                    'alto': tile['alto'],
+                    'sintetico': tile['sintetico']
+                }
+            else:
+                entrada = {
+                    'id': tile.get('id') or Path(tile['filename']).stem,
+                    'filename': tile['filename'],
+                    'cobertura_filename': tile.get('cobertura_filename'),
+                    'bounds': tile['bounds'],
+                    'part': tile.get('part', 1),
+                    'size_bytes': tile['size_bytes'],
+                    'cobertura_size_bytes': tile.get('cobertura_size_bytes', 0),
+                    'hash_contenido': tile.get('hash_contenido')
+                }
+                if tile.get('duplicado_de'):
+                    entrada['duplicado_de'] = tile['duplicado_de']
+            entrada['fuente'] = tile.get('fuente')
+            indice['tiles'].setdefault(tile_key, []).append(entrada)
         
         # Guardar índice
         indice_path = self.output_dir / f"{region}_mini_tiles_index.json"
@@ -456,10 +715,37 @@ class VegetationTileProcessor:
         from datetime import datetime
         return datetime.now().isoformat()
     
-    def procesar_region(self, region: str, archivos_region: List[Dict]) -> Dict:
-        """Procesa todos los archivos de una región"""
+    def procesar_region(self, region: str, archivos_region: List[Dict], manifiesto: Dict) -> Dict:
+        """
+        Procesa todos los archivos de una región y registra la construcción en
+        el manifiesto. En modo incremental, si la región ya se construyó con
+        los mismos parámetros, sólo se procesan sus archivos nuevos o cambiados.
+        """
         logger.info(f"🌍 Procesando región: {region} ({len(archivos_region)} archivos)")
         
+        anterior = manifiesto['grupos'].get(region, {})
+        fuentes = {
+            info['archivo']: huella_fuente(info['ruta_completa'], anterior.get('fuentes', {}).get(info['archivo']))
+            for info in archivos_region
+        }
+        registro = {'fuentes': fuentes, 'parametros': self.parametros()}
+        
+        if self.incremental and anterior.get('parametros') == registro['parametros']:
+            resultado = self.actualizar_region(region, archivos_region,
+                                               fuentes_cambiadas(anterior.get('fuentes', {}), fuentes))
+            if resultado:
+                if resultado['status'] == 'success':
+                    manifiesto['grupos'][region] = registro
+                return resultado
+            logger.info(f"🔄 Región {region}: reconstrucción completa")
+        
+        resultado = self.construir_region(region, archivos_region)
+        if resultado['status'] == 'success':
+            manifiesto['grupos'][region] = registro
+        return resultado
+    
+    def construir_region(self, region: str, archivos_region: List[Dict]) -> Dict:
+        """Corta todos los archivos de una región y arma sus TAR e índice desde cero"""
         # Directorio temporal para tiles
         temp_dir = self.output_dir / 'temp' / region
         temp_dir.mkdir(parents=True, exist_ok=True)
@@ -468,42 +754,41 @@ class VegetationTileProcessor:
         archivos_tar = []
         
         try:
-            # Procesar cada archivo
-            for archivo_info in archivos_region:
-                tiles_archivo = self.procesar_archivo_ndvi(archivo_info, temp_dir)
-                todos_tiles.extend(tiles_archivo)
+            # Procesar cada archivo (o rango de filas); los resultados vuelven en el orden de las tareas
+            tareas = self.dividir_en_tareas(archivos_region, temp_dir)
+            for tiles_tarea in self.ejecutar(self.procesar_archivo_ndvi, tareas):
+                todos_tiles.extend(tiles_tarea)
             
             if not todos_tiles:
                 logger.warning(f"⚠️ No se generaron tiles para región {region}")
                 return {'region': region, 'status': 'empty'}
             
+            # Tiles con los mismos píxeles que uno anterior: se guarda uno solo
+            duplicados = self.deduplicar(todos_tiles, {})
+            propios = [t for t in todos_tiles if self.tiene_archivo_propio(t)]
+            logger.info(f"🧮 {len(todos_tiles) - len(propios) - duplicados} tiles sintéticos, "
+                       f"{duplicados} duplicados, {len(propios)} con archivo propio")
+            
             # Dividir tiles en parts según tamaño máximo
-            part_num = 1
-            tiles_actuales = []
+            parts = [[]]
             size_actual = 0
             
-            for tile in todos_tiles:
+            for tile in propios:
                 # Añadir tile al part actual
-                tiles_actuales.append({**tile, 'part': part_num})
-                size_actual += tile['size_bytes']
+                tile['part'] = len(parts)
+                parts[-1].append(tile)
+                size_actual += tile['size_bytes'] + tile.get('cobertura_size_bytes', 0)
                 
                 # Verificar si necesitamos crear un nuevo part
-                if size_actual >= self.max_archive_size or len(tiles_actuales) >= 1000:
-                    # Crear archivo TAR
-                    tar_file = self.crear_archivo_tar(tiles_actuales, region, part_num)
-                    if tar_file:
-                        archivos_tar.append(tar_file)
-                    
-                    # Reiniciar para siguiente part
-                    part_num += 1
-                    tiles_actuales = []
+                if size_actual >= self.max_archive_size or len(parts[-1]) >= 1000:
+                    parts.append([])
                     size_actual = 0
             
-            # Procesar tiles restantes
-            if tiles_actuales:
-                tar_file = self.crear_archivo_tar(tiles_actuales, region, part_num)
-                if tar_file:
-                    archivos_tar.append(tar_file)
+            self.asignar_parts_duplicados(todos_tiles)
+            
+            # Crear los archivos TAR (en paralelo si hay workers)
+            tareas_tar = [(tiles, region, part_num) for part_num, tiles in enumerate(parts, 1) if tiles]
+            archivos_tar = [tar_file for tar_file in self.ejecutar(self.crear_archivo_tar, tareas_tar) if tar_file]
             
             # Generar índice de la región
             indice_path = self.generar_indice_region(region, archivos_tar, todos_tiles)
@@ -527,6 +812,132 @@ class VegetationTileProcessor:
             shutil.rmtree(temp_dir, ignore_errors=True)
             return {'region': region, 'status': 'error', 'error': str(e)}
     
+    def actualizar_region(self, region: str, archivos_region: List[Dict], cambiadas: set) -> Optional[Dict]:
+        """
+        Reconstrucción incremental de una región a partir de su índice: corta
+        sólo los archivos nuevos o cambiados, saca de los TAR los tiles de los
+        archivos cambiados o borrados, ubica los tiles nuevos en los parts con
+        lugar (o en parts nuevos) y reempaqueta sólo los parts tocados. El resto
+        de las entradas del índice se conservan tal cual.
+        
+        Devuelve None si no hay un índice utilizable y hace falta reconstruir todo.
+        """
+        indice_path = self.output_dir / f"{region}_mini_tiles_index.json"
+        try:
+            with open(indice_path, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        tiles_previos = []
+        for tile_key, entradas in indice.get('tiles', {}).items():
+            _, tile_x, tile_y = tile_key.split('_')
+            tiles_previos.extend(dict(entrada, tile_x=int(tile_x), tile_y=int(tile_y)) for entrada in entradas)
+        for tile in tiles_previos:
+            tile.setdefault('id', Path(tile.get('filename', '')).stem)
+        if any(not tile.get('fuente') for tile in tiles_previos):
+            # Índice anterior al manifiesto: no se sabe de qué archivo salió cada tile
+            return None
+        
+        if not cambiadas:
+            logger.info(f"⏭️ Región {region} sin cambios")
+            return {
+                'region': region,
+                'status': 'success',
+                'archives': indice.get('total_parts', 0),
+                'tiles': indice.get('total_tiles', len(tiles_previos)),
+                'index': str(indice_path)
+            }
+        
+        logger.info(f"🔁 Región {region}: {len(cambiadas)} archivos nuevos, cambiados o borrados")
+        temp_dir = self.output_dir / 'temp' / region
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            # Un duplicado cuyo tile original se quita se queda sin archivo: su
+            # fuente también se vuelve a cortar (y así hasta que no cambie nada)
+            cambiadas = set(cambiadas)
+            while True:
+                ids_quitados = {tile['id'] for tile in tiles_previos if tile['fuente'] in cambiadas}
+                arrastradas = {tile['fuente'] for tile in tiles_previos
+                               if tile['fuente'] not in cambiadas and tile.get('duplicado_de') in ids_quitados}
+                if not arrastradas:
+                    break
+                cambiadas |= arrastradas
+            
+            conservados = [tile for tile in tiles_previos if tile['fuente'] not in cambiadas]
+            quitados = [tile for tile in tiles_previos if tile['fuente'] in cambiadas]
+            
+            nuevos = []
+            tareas = self.dividir_en_tareas([a for a in archivos_region if a['archivo'] in cambiadas], temp_dir)
+            for tiles_tarea in self.ejecutar(self.procesar_archivo_ndvi, tareas):
+                nuevos.extend(tiles_tarea)
+            
+            # Los tiles nuevos idénticos a uno que se conserva (o a otro nuevo) no se guardan
+            canonicos = {tile['hash_contenido']: tile for tile in conservados
+                         if tile.get('hash_contenido') and not tile.get('duplicado_de') and tile.get('filename')}
+            self.deduplicar(nuevos, canonicos)
+            quitados = [tile for tile in quitados if self.tiene_archivo_propio(tile)]
+            
+            # Ocupación de cada part con los tiles que se conservan
+            ocupacion = {part: [0, 0] for part in range(1, indice.get('total_parts', 0) + 1)}
+            for tile in filter(self.tiene_archivo_propio, conservados):
+                uso = ocupacion.setdefault(tile['part'], [0, 0])
+                uso[0] += tile['size_bytes'] + tile.get('cobertura_size_bytes', 0)
+                uso[1] += 1
+            
+            # Cada tile nuevo va al primer part con lugar (mismos límites que construir_region)
+            for tile in filter(self.tiene_archivo_propio, nuevos):
+                part = next((p for p in sorted(ocupacion)
+                             if ocupacion[p][0] < self.max_archive_size and ocupacion[p][1] < 1000), None)
+                if part is None:
+                    part = max(ocupacion, default=0) + 1
+                    ocupacion[part] = [0, 0]
+                tile['part'] = part
+                ocupacion[part][0] += tile['size_bytes'] + tile.get('cobertura_size_bytes', 0)
+                ocupacion[part][1] += 1
+            todos_tiles = conservados + nuevos
+            self.asignar_parts_duplicados(todos_tiles)
+            
+            # Reempaquetar sólo los parts con tiles quitados o agregados
+            tareas_tar = []
+            for part in sorted({tile['part'] for tile in quitados + nuevos if self.tiene_archivo_propio(tile)}):
+                reemplazos = {
+                    f"{region}/{tile[filename_key]}": tile[path_key]
+                    for tile in nuevos if tile.get('part') == part
+                    for path_key, filename_key in (('path', 'filename'), ('cobertura_path', 'cobertura_filename'))
+                    if tile.get(path_key)
+                }
+                eliminar = {
+                    f"{region}/{tile[filename_key]}"
+                    for tile in quitados if tile['part'] == part
+                    for filename_key in ('filename', 'cobertura_filename') if tile.get(filename_key)
+                }
+                tar_path = self.output_dir / f"{region}_part_{part:02d}.tar.gz"
+                tareas_tar.append((str(tar_path), reemplazos, eliminar, 6))
+                logger.info(f"📦 Reempaquetando {tar_path.name}: +{len(reemplazos)} / -{len(eliminar)} archivos")
+            self.ejecutar(reempaquetar_tar, tareas_tar)
+            
+            archivos_tar = [str(self.output_dir / f"{region}_part_{part:02d}.tar.gz") for part in sorted(ocupacion)]
+            indice_path = self.generar_indice_region(region, archivos_tar, todos_tiles)
+            
+            resultado = {
+                'region': region,
+                'status': 'success',
+                'archives': len(archivos_tar),
+                'tiles': len(todos_tiles),
+                'index': indice_path
+            }
+            logger.info(f"✅ Región {region} actualizada: {len(quitados)} tiles quitados, {len(nuevos)} generados, "
+                       f"{len(tareas_tar)} de {len(archivos_tar)} archivos reempaquetados")
+            return resultado
+            
+        except Exception as e:
+            logger.error(f"❌ Error actualizando región {region}: {e}")
+            return {'region': region, 'status': 'error', 'error': str(e)}
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
     def generar_indice_maestro(self, resultados_regiones: List[Dict]) -> str:
         """Genera índice maestro con todas las regiones"""
         indice_maestro = {
@@ -534,6 +945,7 @@ class VegetationTileProcessor:
             'version': '1.0',
             'generated': self.obtener_timestamp(),
             'processor': 'MAIRA_vegetation_processor',
+            'cover_classes': leyenda(),
             'regions': {}
         }
         
@@ -582,12 +994,25 @@ class VegetationTileProcessor:
         # Clasificar por regiones
         regiones = self.clasificar_por_regiones(archivos_info)
         
-        # Procesar cada región
+        # Procesar cada región (un solo pool para todas); el manifiesto se guarda después de cada una
+        manifiesto = cargar_manifiesto(str(self.output_dir))
+        for region in set(manifiesto['grupos']) - {r for r, archivos in regiones.items() if archivos}:
+            logger.warning(f"⚠️ Región {region} ya no tiene archivos, se quita del manifiesto")
+            del manifiesto['grupos'][region]
+        
         resultados = []
-        for region, archivos_region in regiones.items():
-            if archivos_region:  # Solo procesar regiones con archivos
-                resultado = self.procesar_region(region, archivos_region)
-                resultados.append(resultado)
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for region, archivos_region in regiones.items():
+                if archivos_region:  # Solo procesar regiones con archivos
+                    resultado = self.procesar_region(region, archivos_region, manifiesto)
+                    resultados.append(resultado)
+                    guardar_manifiesto(str(self.output_dir), manifiesto)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
         
         # Generar índice maestro
         indice_maestro = self.generar_indice_maestro(resultados)
@@ -630,6 +1055,17 @@ def main():
         default=95,
         help="Tamaño máximo de archivo TAR en MB (default: 95)"
     )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help="Procesos en paralelo para cortar tiles y comprimir TARs (default: 1)"
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Regenerar sólo los tiles de archivos nuevos o cambiados desde la última construcción"
+    )
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -651,7 +1087,9 @@ def main():
     processor = VegetationTileProcessor(
         input_dir=str(input_dir),
         output_dir=args.output,
-        max_archive_size=args.max_size
+        max_archive_size=args.max_size,
+        workers=args.workers,
+        incremental=args.incremental
     )
     
     # Procesar